@@ -0,0 +1,41 @@
+"""Add search_tombstones and (updated_at, id) indexes for incremental search indexing
+
+Revision ID: a3b7c9d1e2f4
+Revises: e1a2b3c4d5f6
+Create Date: 2025-10-02 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a3b7c9d1e2f4'
+down_revision = 'e1a2b3c4d5f6'
+branch_labels = None
+depends_on = None
+
+# Tables the search indexer scans by (updated_at, id)
+INDEXED_TABLES = ('data_sources', 'data_sinks', 'data_sets', 'flow_nodes', 'projects')
+
+
+def upgrade() -> None:
+    op.create_table('search_tombstones',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('resource_type', sa.String(length=50), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.Column('org_id', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index(op.f('ix_search_tombstones_id'), 'search_tombstones', ['id'], unique=False)
+    op.create_index('ix_search_tombstones_deleted_at_id', 'search_tombstones', ['deleted_at', 'id'], unique=False)
+
+    for table in INDEXED_TABLES:
+        op.create_index(f'ix_{table}_updated_at_id', table, ['updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    for table in INDEXED_TABLES:
+        op.drop_index(f'ix_{table}_updated_at_id', table_name=table)
+    op.drop_index('ix_search_tombstones_deleted_at_id', table_name='search_tombstones')
+    op.drop_index(op.f('ix_search_tombstones_id'), table_name='search_tombstones')
+    op.drop_table('search_tombstones')
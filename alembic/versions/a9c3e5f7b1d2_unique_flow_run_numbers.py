@@ -0,0 +1,53 @@
+"""Make run numbers unique within a flow
+
+Revision ID: a9c3e5f7b1d2
+Revises: f8a2b6c0d5e7
+Create Date: 2025-10-24 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e5f7b1d2'
+down_revision = 'f8a2b6c0d5e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Manual and scheduled runs could race to the same number; move the later duplicates past the flow's last run
+    conn = op.get_bind()
+    runs = sa.table('flow_runs', sa.column('id', sa.Integer), sa.column('flow_id', sa.Integer),
+                    sa.column('run_number', sa.Integer))
+    duplicated = (
+        sa.select(runs.c.flow_id, runs.c.run_number)
+        .group_by(runs.c.flow_id, runs.c.run_number)
+        .having(sa.func.count() > 1)
+        .subquery()
+    )
+    rows = conn.execute(
+        sa.select(runs.c.id, runs.c.flow_id, runs.c.run_number)
+        .join(duplicated, sa.and_(runs.c.flow_id == duplicated.c.flow_id,
+                                  runs.c.run_number == duplicated.c.run_number))
+        .order_by(runs.c.flow_id, runs.c.run_number, runs.c.id)
+    ).all()
+    kept, last_numbers = set(), {}
+    for run_id, flow_id, run_number in rows:
+        if (flow_id, run_number) not in kept:
+            kept.add((flow_id, run_number))
+            continue
+        if flow_id not in last_numbers:
+            last_numbers[flow_id] = conn.execute(
+                sa.select(sa.func.max(runs.c.run_number)).where(runs.c.flow_id == flow_id)
+            ).scalar()
+        last_numbers[flow_id] += 1
+        conn.execute(sa.update(runs).where(runs.c.id == run_id).values(run_number=last_numbers[flow_id]))
+
+    op.drop_index('ix_flow_runs_flow_run_number', table_name='flow_runs')
+    op.create_index('uq_flow_runs_flow_run_number', 'flow_runs', ['flow_id', 'run_number'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_flow_runs_flow_run_number', table_name='flow_runs')
+    op.create_index('ix_flow_runs_flow_run_number', 'flow_runs', ['flow_id', 'run_number'], unique=False)
@@ -0,0 +1,50 @@
+"""Add tag_assignments and tag_counts for indexed tag filters and facets
+
+Revision ID: b4c8d2e6f1a3
+Revises: a3b7c9d1e2f4
+Create Date: 2025-10-09 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b4c8d2e6f1a3'
+down_revision = 'a3b7c9d1e2f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('tag_assignments',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('org_id', sa.Integer(), nullable=True),
+        sa.Column('resource_type', sa.String(length=50), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.Column('tag', sa.String(length=100), nullable=False),
+        sa.UniqueConstraint('resource_type', 'resource_id', 'tag', name='uq_tag_assignments_resource_tag'),
+    )
+    op.create_index(op.f('ix_tag_assignments_id'), 'tag_assignments', ['id'], unique=False)
+    op.create_index('ix_tag_assignments_type_tag_resource', 'tag_assignments', ['resource_type', 'tag', 'resource_id'], unique=False)
+
+    op.create_table('tag_counts',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('org_id', sa.Integer(), nullable=True),
+        sa.Column('resource_type', sa.String(length=50), nullable=False),
+        sa.Column('tag', sa.String(length=100), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.UniqueConstraint('org_id', 'resource_type', 'tag', name='uq_tag_counts_org_type_tag'),
+    )
+    op.create_index(op.f('ix_tag_counts_id'), 'tag_counts', ['id'], unique=False)
+    op.create_index('ix_tag_counts_org_type_count', 'tag_counts', ['org_id', 'resource_type', 'count'], unique=False)
+
+    # Existing tags are loaded by the rebuild_tag_index task
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tag_counts_org_type_count', table_name='tag_counts')
+    op.drop_index(op.f('ix_tag_counts_id'), table_name='tag_counts')
+    op.drop_table('tag_counts')
+    op.drop_index('ix_tag_assignments_type_tag_resource', table_name='tag_assignments')
+    op.drop_index(op.f('ix_tag_assignments_id'), table_name='tag_assignments')
+    op.drop_table('tag_assignments')
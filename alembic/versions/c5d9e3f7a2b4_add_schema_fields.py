@@ -0,0 +1,43 @@
+"""Add schema_fields for indexed lookups of schema fields by name and type
+
+Revision ID: c5d9e3f7a2b4
+Revises: b4c8d2e6f1a3
+Create Date: 2025-10-13 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c5d9e3f7a2b4'
+down_revision = 'b4c8d2e6f1a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('schema_fields',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('org_id', sa.Integer(), nullable=True),
+        sa.Column('resource_type', sa.String(length=50), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.Column('schema_column', sa.String(length=50), nullable=False),
+        sa.Column('path', sa.String(length=1000), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('name_key', sa.String(length=255), nullable=False),
+        sa.Column('field_type', sa.String(length=50), nullable=True),
+    )
+    op.create_index(op.f('ix_schema_fields_id'), 'schema_fields', ['id'], unique=False)
+    op.create_index('ix_schema_fields_name_type_resource', 'schema_fields', ['name_key', 'resource_type', 'field_type', 'resource_id'], unique=False)
+    op.create_index('ix_schema_fields_type_resource', 'schema_fields', ['field_type', 'resource_type', 'resource_id'], unique=False)
+    op.create_index('ix_schema_fields_resource', 'schema_fields', ['resource_type', 'resource_id'], unique=False)
+
+    # Existing schemas are loaded by the rebuild_schema_field_index task
+
+
+def downgrade() -> None:
+    op.drop_index('ix_schema_fields_resource', table_name='schema_fields')
+    op.drop_index('ix_schema_fields_type_resource', table_name='schema_fields')
+    op.drop_index('ix_schema_fields_name_type_resource', table_name='schema_fields')
+    op.drop_index(op.f('ix_schema_fields_id'), table_name='schema_fields')
+    op.drop_table('schema_fields')
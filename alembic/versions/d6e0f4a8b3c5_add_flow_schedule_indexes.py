@@ -0,0 +1,24 @@
+"""Index flows by next run time and flow runs by run number for the scheduler
+
+Revision ID: d6e0f4a8b3c5
+Revises: c5d9e3f7a2b4
+Create Date: 2025-10-20 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd6e0f4a8b3c5'
+down_revision = 'c5d9e3f7a2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_flows_next_run_at', 'flows', ['next_run_at'], unique=False)
+    op.create_index('ix_flow_runs_flow_run_number', 'flow_runs', ['flow_id', 'run_number'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_flow_runs_flow_run_number', table_name='flow_runs')
+    op.drop_index('ix_flows_next_run_at', table_name='flows')
@@ -0,0 +1,31 @@
+"""Store flow validation results with the definition hash they were computed for
+
+Revision ID: e7f1a5b9c4d6
+Revises: d6e0f4a8b3c5
+Create Date: 2025-10-21 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e7f1a5b9c4d6'
+down_revision = 'd6e0f4a8b3c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('flows', sa.Column('validation_hash', sa.String(length=64), nullable=True))
+    op.add_column('flows', sa.Column('validation_valid', sa.Boolean(), nullable=True))
+    op.add_column('flows', sa.Column('validation_errors', sa.JSON(), nullable=True))
+    op.add_column('flows', sa.Column('validated_at', sa.DateTime(), nullable=True))
+
+    # Existing flows have no hash, so the next flow.validate_all validates them all
+
+
+def downgrade() -> None:
+    op.drop_column('flows', 'validated_at')
+    op.drop_column('flows', 'validation_errors')
+    op.drop_column('flows', 'validation_valid')
+    op.drop_column('flows', 'validation_hash')
@@ -0,0 +1,47 @@
+"""Keep the state of each node of a flow run in its own row with an indegree counter
+
+Revision ID: f8a2b6c0d5e7
+Revises: e7f1a5b9c4d6
+Create Date: 2025-10-22 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f8a2b6c0d5e7'
+down_revision = 'e7f1a5b9c4d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('flow_node_runs',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('flow_run_id', sa.Integer(), sa.ForeignKey('flow_runs.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('node_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=True),
+        sa.Column('state', sa.String(length=20), nullable=False),
+        sa.Column('waiting_on', sa.Integer(), nullable=False),
+        sa.Column('downstream_node_ids', sa.JSON(), nullable=True),
+        sa.Column('queued_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('wait_ms', sa.Integer(), nullable=True),
+        sa.Column('duration_ms', sa.Integer(), nullable=True),
+        sa.Column('records_processed', sa.Integer(), nullable=True),
+        sa.Column('records_output', sa.Integer(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+    )
+    op.create_index(op.f('ix_flow_node_runs_id'), 'flow_node_runs', ['id'], unique=False)
+    op.create_index('uq_flow_node_runs_run_node', 'flow_node_runs', ['flow_run_id', 'node_id'], unique=True)
+    op.create_index('ix_flow_node_runs_run_state', 'flow_node_runs', ['flow_run_id', 'state', 'waiting_on'], unique=False)
+
+    # Runs in flight during the upgrade kept their state in log_data["dag"] and do not resume
+
+
+def downgrade() -> None:
+    op.drop_index('ix_flow_node_runs_run_state', table_name='flow_node_runs')
+    op.drop_index('uq_flow_node_runs_run_node', table_name='flow_node_runs')
+    op.drop_index(op.f('ix_flow_node_runs_id'), table_name='flow_node_runs')
+    op.drop_table('flow_node_runs')
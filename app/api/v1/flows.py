@@ -17,10 +17,11 @@ from ...auth.rbac import (
     RBACService, SystemPermissions, check_admin_permission
 )
 from ...models.user import User
-from ...models.flow import Flow, FlowRun, FlowTemplate, FlowPermission
+from ...models.flow import Flow, FlowRun, FlowTemplate, FlowPermission, ScheduleTypes
 from ...models.project import Project
 from ...models.org import Org
 from ...models.team import Team
+from ...services.flow_scheduler import next_fire_time
 
 logger = logging.getLogger(__name__)
 
@@ -517,7 +518,7 @@ async def execute_flow(
     Equivalent to Rails FlowsController#execute
     """
     try:
-        flow = db.query(Flow).filter(Flow.id == flow_id).first()
+        flow = db.query(Flow).filter(Flow.id == flow_id).with_for_update().first()
         if not flow:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -532,7 +533,7 @@ async def execute_flow(
                 detail="Flow cannot be started (inactive or already running)"
             )
         
-        # Get next run number
+        # Next run number; the flow row lock above serializes this with the scheduler's claim
         last_run = db.query(FlowRun).filter(FlowRun.flow_id == flow_id).order_by(FlowRun.run_number.desc()).first()
         run_number = (last_run.run_number + 1) if last_run else 1
         
@@ -699,14 +700,23 @@ async def schedule_flow(
         
         # TODO: Check if user has permission to schedule this flow
         
-        # Update flow schedule
-        flow.schedule_type = schedule_request.schedule_type
+        try:
+            next_run_at = next_fire_time(
+                schedule_request.schedule_type, schedule_request.schedule_config, datetime.utcnow()
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        
+        # Update flow schedule; the scheduler fires it from next_run_at
+        flow.schedule_type = ScheduleTypes(schedule_request.schedule_type)
         flow.schedule_config = schedule_request.schedule_config
         flow.is_active = schedule_request.is_active
+        flow.next_run_at = next_run_at
         flow.updated_at = func.now()
         
-        # TODO: Register with scheduler service
-        
         db.commit()
         
         logger.info(f"Flow scheduled: {flow_id} by user {current_user.id}")
@@ -745,13 +755,11 @@ async def unschedule_flow(
         # TODO: Check if user has permission to unschedule this flow
         
         # Remove schedule
-        flow.schedule_type = "manual"
+        flow.schedule_type = ScheduleTypes.MANUAL
         flow.schedule_config = None
         flow.next_run_at = None
         flow.updated_at = func.now()
         
-        # TODO: Unregister from scheduler service
-        
         db.commit()
         
         logger.info(f"Flow unscheduled: {flow_id} by user {current_user.id}")
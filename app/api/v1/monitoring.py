@@ -25,6 +25,7 @@ from ...models.data_source import DataSource
 from ...models.data_set import DataSet
 from ...models.data_sink import DataSink
 from ...models.org import Org
+from ...services.system_sampler import SystemSampler
 
 logger = logging.getLogger(__name__)
 
@@ -118,8 +119,10 @@ def get_system_health() -> SystemHealth:
 
 def get_resource_usage() -> ResourceUsage:
     """Get current system resource usage"""
-    # CPU usage
-    cpu_percent = psutil.cpu_percent(interval=1)
+    # CPU usage from the background sampler; never block waiting for a reading
+    cpu_percent = SystemSampler.instance().latest()["cpu_percent"]
+    if cpu_percent is None:
+        cpu_percent = psutil.cpu_percent(interval=None)
     
     # Memory usage
     memory = psutil.virtual_memory()
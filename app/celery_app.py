@@ -4,8 +4,20 @@ This replaces Rails Sidekiq functionality with pure Python.
 """
 
 from celery import Celery
+from celery.signals import (
+    before_task_publish, task_prerun, task_postrun, task_failure, worker_init, worker_process_init,
+    worker_process_shutdown
+)
 from .config import settings
+from .database import SessionLocal, engine
+from .services.latency_sketch import LatencyTracker, SharedLatencyStore
+from .services.search_indexer import install_tombstone_hooks
+from .services.tag_index import install_tag_hooks
+from .services.schema_field_index import install_schema_field_hooks
+from .services.tracing import Tracer, CONSUMER, TRACEPARENT_HEADER, parse_traceparent, instrument_sqlalchemy
 import os
+import time
+import redis
 
 # Create Celery app
 celery_app = Celery(
@@ -61,11 +73,12 @@ celery_app.conf.update(
         },
         'update-elasticsearch-index': {
             'task': 'app.tasks.data_processing_tasks.update_search_index',
-            'schedule': 1800.0,  # Every 30 minutes
+            'schedule': 300.0,  # Every 5 minutes (incremental from the last watermark)
         },
         'check-scheduled-flows': {
             'task': 'flow.schedule_check',
-            'schedule': 300.0,  # Every 5 minutes
+            'schedule': float(settings.FLOW_SCHEDULE_TICK_SECONDS),  # Later fires within the tick get eta wakeups
+            'options': {'expires': settings.FLOW_SCHEDULE_TICK_SECONDS},
         },
         'cleanup-old-flow-runs': {
             'task': 'flow.cleanup_old_runs',
@@ -75,5 +88,96 @@ celery_app.conf.update(
             'task': 'flow.validate_all',
             'schedule': 3600.0,  # Every hour
         },
+        'revalidate-all-flows': {
+            'task': 'flow.validate_all',
+            'schedule': 86400.0,  # Every 24 hours, for edits the definition hash cannot see
+            'kwargs': {'force': True},
+        },
     },
-)
\ No newline at end of file
+)
+
+
+@worker_init.connect
+def _install_write_hooks(**kwargs):
+    # Deletes, tag and schema changes made by tasks must reach the search indexer and derived indexes too;
+    # installed before the pool forks, so every child inherits them
+    install_tombstone_hooks(SessionLocal)
+    install_tag_hooks(SessionLocal)
+    install_schema_field_hooks(SessionLocal)
+
+
+# Task latency sketches, keyed by task id between the prerun and postrun signals
+_task_start_times = {}
+
+
+@task_prerun.connect
+def _record_task_start(task_id=None, **kwargs):
+    _task_start_times[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _record_task_latency(task_id=None, task=None, **kwargs):
+    start = _task_start_times.pop(task_id, None)
+    if start is not None and task is not None:
+        LatencyTracker.instance().record("task", task.name, time.perf_counter() - start)
+
+
+@worker_process_init.connect
+def _share_latency_sketches(**kwargs):
+    # Task and flow node sketches live in the pool child; ship them to the API through Redis
+    if settings.LATENCY_SHARING_ENABLED:
+        LatencyTracker.instance().share(
+            SharedLatencyStore(redis.from_url(settings.REDIS_URL), ttl_seconds=settings.LATENCY_SERIES_TTL_SECONDS),
+            interval_seconds=settings.LATENCY_PUBLISH_SECONDS
+        )
+
+
+@worker_process_shutdown.connect
+def _flush_latency_sketches(**kwargs):
+    LatencyTracker.instance().stop_sharing()
+
+
+# Tracing: the publisher's span context travels in the task message headers
+tracer = Tracer.instance()
+if settings.TRACING_ENABLED:
+    tracer.configure(True, settings.TRACING_EXPORT_PATH)
+    instrument_sqlalchemy(engine)
+
+_task_spans = {}
+
+
+@before_task_publish.connect
+def _inject_trace_context(headers=None, **kwargs):
+    if headers is not None:
+        tracer.inject(headers)
+
+
+@task_prerun.connect
+def _start_task_span(task_id=None, task=None, **kwargs):
+    if not tracer.enabled or task is None:
+        return
+    parent = parse_traceparent(getattr(task.request, TRACEPARENT_HEADER, None))
+    span = tracer.start_span(f"celery {task.name}", CONSUMER, {
+        "celery.task_id": task_id,
+        "celery.task_name": task.name,
+        "celery.retries": task.request.retries or 0
+    }, parent=parent)
+    _task_spans[task_id] = (span, tracer.activate(span))
+
+
+@task_failure.connect
+def _record_task_error(task_id=None, exception=None, **kwargs):
+    entry = _task_spans.get(task_id)
+    if entry is not None and exception is not None:
+        entry[0].record_exception(exception)
+
+
+@task_postrun.connect
+def _end_task_span(task_id=None, state=None, **kwargs):
+    entry = _task_spans.pop(task_id, None)
+    if entry is None:
+        return
+    span, token = entry
+    span.set_attribute("celery.state", state)
+    tracer.deactivate(token)
+    span.end()
@@ -51,6 +51,16 @@ class Settings(BaseSettings):
     # Elasticsearch (replaces Rails Elasticsearch configuration)
     ELASTICSEARCH_URL: str = "http://localhost:9200"
     ELASTICSEARCH_INDEX_PREFIX: str = "admin_api"
+    ELASTICSEARCH_BULK_MAX_ACTIONS: int = 500
+    ELASTICSEARCH_BULK_MAX_BYTES: int = 5 * 1024 * 1024  # 5MB per bulk request
+    ELASTICSEARCH_BULK_MAX_RETRIES: int = 5
+    ELASTICSEARCH_SYNC_LOCK_SECONDS: int = 900  # one sync at a time; a crashed sync's lock expires after this
+    
+    # In-process search index for global search (rebuilt from the database on startup)
+    SEARCH_INDEX_ENABLED: bool = True
+    SEARCH_INDEX_REFRESH_SECONDS: int = 60  # catch up with other processes' commits; 0 disables
+    # MinHash/LSH index of data set tags and schema fields for related-dataset suggestions
+    RELATED_INDEX_ENABLED: bool = True
     
     # Email (replaces Rails ActionMailer)
     SMTP_HOST: str = "localhost"
@@ -89,6 +99,15 @@ class Settings(BaseSettings):
     SENTRY_DSN: Optional[str] = None
     METRICS_ENABLED: bool = True
     HEALTH_CHECK_ENABLED: bool = True
+    EVENT_LOOP_WATCHDOG_ENABLED: bool = False
+    EVENT_LOOP_BLOCK_THRESHOLD_MS: int = 100
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORT_PATH: Optional[str] = None  # JSON-lines span file; spans kept in memory when unset
+    LATENCY_SHARING_ENABLED: bool = False  # merge latency sketches of every API and worker process through Redis
+    LATENCY_PUBLISH_SECONDS: int = 10
+    LATENCY_SERIES_TTL_SECONDS: int = 3900  # series of a process that stopped publishing are dropped after this
+    REALTIME_MONITORING_ENABLED: bool = False  # request counters and events for live dashboards, written to Redis
+    REALTIME_MONITORING_FLUSH_SECONDS: float = 1.0
     
     # Background Jobs (Celery configuration)
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
@@ -96,6 +115,14 @@ class Settings(BaseSettings):
     CELERY_TASK_SERIALIZER: str = "json"
     CELERY_ACCEPT_CONTENT: List[str] = ["json"]
     CELERY_TIMEZONE: str = "UTC"
+    # Flow execution: nodes of one run and of one org running at once
+    FLOW_MAX_CONCURRENT_NODES: int = 8
+    ORG_MAX_CONCURRENT_NODES: int = 32
+    FLOW_NODE_SLOT_LEASE_SECONDS: int = 3600  # org slots of crashed node tasks are reclaimed after this
+    FLOW_SLOT_RETRY_SECONDS: int = 15  # a run held back by the org cap checks again after this
+    FLOW_SCHEDULE_TICK_SECONDS: int = 60  # each schedule check fires what is due within this window
+    FLOW_SCHEDULE_BATCH_SIZE: int = 500  # due flows claimed per transaction
+    FLOW_VALIDATION_CHUNK_SIZE: int = 500  # changed flows validated per worker task
     
     # Frontend Integration
     FRONTEND_URL: str = "http://localhost:3000"
@@ -125,6 +152,9 @@ class Settings(BaseSettings):
     RELOAD_ON_CHANGE: bool = True
     SHOW_DOCS: bool = True
     ENABLE_PROFILING: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.01  # Fraction of requests profiled when enabled
+    PROFILING_DEBUG_TOKEN: Optional[str] = None  # X-Debug-Profile header value that forces profiling
+    PROFILING_INTERVAL_MS: float = 5.0
     
     class Config:
         env_file = ".env"
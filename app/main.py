@@ -1,21 +1,29 @@
 from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 import uvicorn
+import asyncio
 import os
 
-from .database import get_db
+from .database import SessionLocal, get_db, engine
 from .config import settings
 from .auth import get_current_user
-from .middleware import (
-    RequestMetricsMiddleware,
-    RequestLoggingMiddleware, 
-    AuditLoggingMiddleware,
-    ErrorHandlingMiddleware,
-    SecurityHeadersMiddleware,
-    RateLimitingMiddleware
-)
+from .middleware import RequestPipelineMiddleware
+from .services.prometheus_metric_service import PrometheusMetricService, CONTENT_TYPE_LATEST
+from .services.system_sampler import SystemSampler
+from .services.latency_sketch import LatencyTracker, SharedLatencyStore
+from .services.loop_watchdog import EventLoopWatchdog
+from .services.request_profiler import RequestProfiler
+from .services.realtime_monitor import RealTimeMonitor
+from .services.tracing import Tracer, instrument_sqlalchemy, instrument_redis
+from .services.caching_service import cache_manager
+from .services.search_index import SearchIndex
+from .services.related_index import RelatedIndex
+from .services.search_indexer import install_tombstone_hooks, remove_tombstone_hooks
+from .services.tag_index import install_tag_hooks, remove_tag_hooks
+from .services.schema_field_index import install_schema_field_hooks, remove_schema_field_hooks
 from .routers import (
     auth, users, orgs, projects, data_credentials,
     data_sources, data_sinks, data_sets, flows,
@@ -33,13 +41,31 @@ app = FastAPI(
     redoc_url="/redoc" if settings.DEBUG else None
 )
 
-# Add custom middleware
-app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(ErrorHandlingMiddleware) 
-app.add_middleware(AuditLoggingMiddleware)
-app.add_middleware(RequestLoggingMiddleware)
-app.add_middleware(RequestMetricsMiddleware)
-app.add_middleware(RateLimitingMiddleware, requests_per_minute=300)
+# Add custom middleware (single fused ASGI pipeline, one stage per concern)
+app.add_middleware(
+    RequestPipelineMiddleware,
+    security_headers=True,
+    error_handling=True,
+    audit_logging=settings.ENABLE_AUDIT_LOGGING,
+    request_logging=True,
+    metrics=settings.METRICS_ENABLED,
+    rate_limiting=settings.RATE_LIMIT_ENABLED,
+    requests_per_minute=300,
+    profiling=settings.ENABLE_PROFILING,
+    tracing=settings.TRACING_ENABLED,
+    realtime_monitoring=settings.REALTIME_MONITORING_ENABLED
+)
+RequestProfiler.instance().configure(
+    settings.PROFILING_SAMPLE_RATE,
+    settings.PROFILING_DEBUG_TOKEN,
+    settings.PROFILING_INTERVAL_MS
+)
+if settings.REALTIME_MONITORING_ENABLED:
+    RealTimeMonitor.instance().configure(settings.REDIS_URL, settings.REALTIME_MONITORING_FLUSH_SECONDS)
+if settings.TRACING_ENABLED:
+    Tracer.instance().configure(True, settings.TRACING_EXPORT_PATH)
+    instrument_sqlalchemy(engine)
+    instrument_redis(cache_manager.redis_client)
 
 # CORS middleware
 app.add_middleware(
@@ -91,6 +117,57 @@ app.include_router(catalog.router, prefix="/api/v1/catalog", tags=["Data Catalog
 app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics & Metrics"])
 app.include_router(security_router.router, prefix="/api/v1/security", tags=["Security & RBAC"])
 
+@app.on_event("startup")
+async def start_system_sampler():
+    sampler = SystemSampler.instance()
+    sampler.watch_db_engine(engine)
+    sampler.watch_redis_pool(cache_manager.redis_client.connection_pool)
+    sampler.start(asyncio.get_running_loop())
+    
+    if settings.EVENT_LOOP_WATCHDOG_ENABLED:
+        EventLoopWatchdog.instance().start(threshold_ms=settings.EVENT_LOOP_BLOCK_THRESHOLD_MS)
+    
+    # Each gunicorn worker keeps its own sketches; /metrics/latency merges them with the Celery workers'
+    if settings.LATENCY_SHARING_ENABLED:
+        LatencyTracker.instance().share(
+            SharedLatencyStore(cache_manager.redis_client, ttl_seconds=settings.LATENCY_SERIES_TTL_SECONDS),
+            interval_seconds=settings.LATENCY_PUBLISH_SECONDS
+        )
+
+@app.on_event("shutdown")
+async def stop_system_sampler():
+    SystemSampler.instance().stop()
+    EventLoopWatchdog.instance().stop()
+    LatencyTracker.instance().stop_sharing()
+    # Counters buffered since the last flush would be lost with the process
+    await RealTimeMonitor.instance().close()
+
+@app.on_event("startup")
+async def start_search_index():
+    # Deletes leave tombstones for the Elasticsearch indexer whether or not the in-process index runs
+    install_tombstone_hooks(SessionLocal)
+    # Tag filters, facets and schema field lookups read derived tables kept in step on every write
+    install_tag_hooks(SessionLocal)
+    install_schema_field_hooks(SessionLocal)
+    if settings.SEARCH_INDEX_ENABLED:
+        index = SearchIndex.instance()
+        index.install_session_hooks(SessionLocal)
+        # Global search falls back to database scans until the first rebuild finishes
+        index.start(engine, refresh_seconds=settings.SEARCH_INDEX_REFRESH_SECONDS)
+    if settings.RELATED_INDEX_ENABLED:
+        related = RelatedIndex.instance()
+        related.install_session_hooks(SessionLocal)
+        related.start(engine, refresh_seconds=settings.SEARCH_INDEX_REFRESH_SECONDS)
+
+@app.on_event("shutdown")
+async def stop_search_index():
+    for index in (SearchIndex.instance(), RelatedIndex.instance()):
+        index.stop()
+        index.remove_session_hooks()
+    remove_tombstone_hooks()
+    remove_tag_hooks()
+    remove_schema_field_hooks()
+
 @app.get("/")
 async def root():
     return {"status": "ok", "message": "Admin API FastAPI"}
@@ -99,6 +176,15 @@ async def root():
 async def status():
     return {"status": "ok", "version": "1.0.0"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(
+        PrometheusMetricService.instance().expose(),
+        headers={"content-type": CONTENT_TYPE_LATEST}
+    )
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
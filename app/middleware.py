@@ -4,16 +4,26 @@ Middleware components for request/response processing
 
 import time
 import uuid
-from typing import Callable
+from collections import deque
+from typing import Any, Callable, Dict, Optional
 from fastapi import Request, Response
 from fastapi.responses import JSONResponse
+from starlette.datastructures import Address, Headers
 import logging
 
 from app.services.prometheus_metric_service import PrometheusMetricService
+from app.services.latency_sketch import LatencyTracker
+from app.services.realtime_monitor import RealTimeMonitor
+from app.services.request_profiler import RequestProfiler
+from app.services.tracing import Tracer, SERVER
 from app.services.request_logger_service import RequestLoggerService
 from app.services.audit_service import AuditService
 
 logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger("app.audit")
+
+UNMATCHED_ROUTE = "unmatched"
+KNOWN_METHODS = frozenset(["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
 
 
 class RequestMetricsMiddleware:
@@ -91,21 +101,11 @@ class RequestLoggingMiddleware:
         
         start_time = time.time()
         request = Request(scope, receive)
-        
-        # Log request start
-        request_data = {
-            "method": request.method,
-            "url": str(request.url),
-            "headers": dict(request.headers),
-            "client_ip": request.client.host if request.client else None
-        }
-        
         response_data = {}
         
         async def send_wrapper(message):
             if message["type"] == "http.response.start":
                 response_data["status"] = message["status"]
-                response_data["headers"] = dict(message.get("headers", []))
             await send(message)
         
         try:
@@ -119,7 +119,11 @@ class RequestLoggingMiddleware:
             duration = time.time() - start_time
             response_data["duration_ms"] = duration * 1000
             
-            await self.request_logger.log_request(request_data, response_data)
+            self.request_logger.log(
+                None, None, request,
+                Response(status_code=response_data["status"]),
+                processing_time_ms=int(response_data["duration_ms"])
+            )
 
 
 class AuditLoggingMiddleware:
@@ -353,4 +357,369 @@ class RateLimitingMiddleware:
             ]
             
             if not self.client_requests[client_ip]:
-                del self.client_requests[client_ip]
\ No newline at end of file
+                del self.client_requests[client_ip]
+
+class RequestContext:
+    """Per-request state parsed once from the ASGI scope and shared by every pipeline stage"""
+    
+    __slots__ = (
+        "scope", "method", "path", "client", "request_id",
+        "start_time", "status_code", "error", "profile", "span", "realtime_id", "response_length", "_headers"
+    )
+    
+    def __init__(self, scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        client = scope.get("client")
+        self.client = Address(*client) if client else None
+        self.request_id = str(uuid.uuid4())
+        self.start_time = time.perf_counter()
+        self.status_code = 500  # Default to error until a response starts
+        self.error = None
+        self.profile = None  # Stack samples while the request profiler is attached
+        self.span = None  # Server span while tracing is on
+        self.realtime_id = None  # Request number in the real-time monitor's events
+        self.response_length = None  # Response Content-Length, read only for real-time monitoring
+        self._headers = None
+    
+    @property
+    def headers(self) -> Headers:
+        """Request headers, decoded lazily on first lookup instead of copied per request"""
+        if self._headers is None:
+            self._headers = Headers(scope=self.scope)
+        return self._headers
+    
+    @property
+    def host(self) -> str:
+        return self.headers.get("host", "unknown")
+    
+    @property
+    def client_ip(self) -> Optional[str]:
+        return self.client.host if self.client else None
+    
+    @property
+    def route_template(self) -> str:
+        """
+        Matched route path (e.g. /api/v1/flows/{flow_id}) for bounded-cardinality labels.
+        Only meaningful once routing has run.
+        """
+        route = self.scope.get("route")
+        template = getattr(route, "path", None)
+        if template:
+            return template
+        
+        if "endpoint" not in self.scope:
+            return UNMATCHED_ROUTE
+        
+        # Matched by a plain Starlette route; rebuild the template from path params
+        path = self.path
+        for name, value in (self.scope.get("path_params") or {}).items():
+            path = path.replace(f"/{value}", "/{" + name + "}", 1)
+        return path
+    
+    @property
+    def user(self) -> Any:
+        """Authenticated user set on request.state by the auth layer, if any"""
+        state = self.scope.get("state")
+        return state.get("user") if state else None
+    
+    def elapsed(self) -> float:
+        """Seconds since the pipeline accepted the request"""
+        return time.perf_counter() - self.start_time
+
+
+class RequestPipelineMiddleware:
+    """
+    Fused pure-ASGI request pipeline.
+    
+    Runs rate limiting, metrics, real-time monitoring, request logging, audit
+    logging, error handling and security headers as stages of a single middleware sharing one
+    RequestContext, instead of stacking one ASGI layer (and one send wrapper)
+    per concern. Each stage can be switched off independently.
+    """
+    
+    AUDIT_SKIP_PATHS = ("/docs", "/redoc", "/openapi.json", "/health", "/status", "/metrics")
+    
+    SECURITY_HEADERS = [
+        (b"x-frame-options", b"DENY"),
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+        (b"referrer-policy", b"strict-origin-when-cross-origin"),
+        (b"content-security-policy", b"default-src 'self'")
+    ]
+    
+    def __init__(
+        self,
+        app,
+        security_headers: bool = True,
+        error_handling: bool = True,
+        audit_logging: bool = True,
+        request_logging: bool = True,
+        metrics: bool = True,
+        rate_limiting: bool = True,
+        requests_per_minute: int = 60,
+        profiling: bool = False,
+        tracing: bool = False,
+        realtime_monitoring: bool = False
+    ):
+        self.app = app
+        self.security_headers = security_headers
+        self.error_handling = error_handling
+        self.audit_logging = audit_logging
+        self.request_logging = request_logging
+        self.metrics = metrics
+        self.rate_limiting = rate_limiting
+        self.requests_per_minute = requests_per_minute
+        self.profiling = profiling
+        self.tracing = tracing
+        self.realtime_monitoring = realtime_monitoring
+        
+        self.prometheus = PrometheusMetricService.instance() if metrics else None
+        self.profiler = RequestProfiler.instance() if profiling else None
+        self.tracer = Tracer.instance() if tracing else None
+        self.realtime = RealTimeMonitor.instance() if realtime_monitoring else None
+        self.request_logger = RequestLoggerService.instance() if request_logging else None
+        
+        # Sliding one-minute window of request timestamps per client
+        self.client_requests: Dict[str, deque] = {}
+        self._next_sweep = 0.0
+        
+        # Pre-bound metric children keyed by (method, route template, status)
+        self._metric_children: Dict[tuple, tuple] = {}
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        ctx = RequestContext(scope)
+        
+        if self.rate_limiting and self._rate_limited(ctx):
+            await self._rate_limit_response(scope, receive, send)
+            return
+        
+        if self.profiling and self.profiler.should_profile(ctx):
+            self.profiler.begin(ctx)
+        
+        if self.realtime_monitoring:
+            ctx.realtime_id = self.realtime.request_started(ctx.method, ctx.path, ctx.headers.get("user-agent", ""))
+        
+        trace_token = None
+        if self.tracing:
+            ctx.span = self.tracer.start_span(
+                f"{ctx.method} {ctx.path}", SERVER,
+                {"http.method": ctx.method, "http.target": ctx.path, "request_id": ctx.request_id},
+                parent=self.tracer.extract(ctx.headers)
+            )
+            trace_token = self.tracer.activate(ctx.span)
+        
+        # Expose the context to handlers and add request ID to headers
+        scope.setdefault("state", {})["request_context"] = ctx
+        scope["headers"].append((b"x-request-id", ctx.request_id.encode()))
+        
+        response_started = False
+        security_headers = self.security_headers
+        realtime_monitoring = self.realtime_monitoring
+        
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                ctx.status_code = message["status"]
+                if realtime_monitoring:
+                    ctx.response_length = next(
+                        (value.decode() for name, value in message.get("headers", []) if name.lower() == b"content-length"),
+                        None
+                    )
+                if security_headers:
+                    headers = list(message.get("headers", []))
+                    headers.extend(self.SECURITY_HEADERS)
+                    message["headers"] = headers
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            ctx.status_code = 500
+            ctx.error = e
+            if not self.error_handling or response_started:
+                logger.error(f"Request {ctx.request_id} failed: {str(e)}")
+                raise
+            logger.error(f"Unhandled exception: {str(e)}", exc_info=True)
+            await self._error_response(e)(scope, receive, send_wrapper)
+        finally:
+            self._finish(ctx)
+            if trace_token is not None:
+                self.tracer.deactivate(trace_token)
+    
+    def _finish(self, ctx: RequestContext):
+        """Run the post-response stages"""
+        duration = ctx.elapsed()
+        
+        if ctx.profile is not None:
+            self.profiler.end(ctx)
+        
+        if ctx.span is not None:
+            self._end_span(ctx)
+        
+        if self.metrics:
+            try:
+                self._record_metrics(ctx, duration)
+            except Exception as e:
+                logger.error(f"Failed to record request metrics: {str(e)}")
+        
+        if self.realtime_monitoring:
+            try:
+                self._track_realtime(ctx, duration)
+            except Exception as e:
+                logger.error(f"Failed to track real-time request metrics: {str(e)}")
+        
+        if self.request_logging:
+            self.request_logger.log(
+                ctx.user, None, ctx, ctx,
+                processing_time_ms=int(duration * 1000)
+            )
+        
+        if self.audit_logging and not ctx.path.startswith(self.AUDIT_SKIP_PATHS):
+            self._audit(ctx, duration)
+    
+    def _end_span(self, ctx: RequestContext):
+        """Name the server span after the matched route and finish it"""
+        span = ctx.span
+        span.name = f"{ctx.method} {ctx.route_template}"
+        span.set_attribute("http.route", ctx.route_template)
+        span.set_attribute("http.status_code", ctx.status_code)
+        if ctx.error is not None:
+            span.record_exception(ctx.error)
+        elif ctx.status_code >= 500:
+            span.status = "error"
+        span.end()
+    
+    def _record_metrics(self, ctx: RequestContext, duration: float):
+        """Record request count, duration and response status labelled by route template"""
+        method = ctx.method if ctx.method in KNOWN_METHODS else "OTHER"
+        key = (method, ctx.route_template, ctx.status_code)
+        
+        children = self._metric_children.get(key)
+        if children is None:
+            children = self._metric_children[key] = self._bind_metric_children(*key)
+        
+        requests_total, duration_seconds, responses_total, latency = children
+        requests_total.inc()
+        duration_seconds.observe(duration)
+        responses_total.inc()
+        latency.add(duration)
+    
+    def _track_realtime(self, ctx: RequestContext, duration: float):
+        """Count the request out in the real-time monitor's buffer"""
+        endpoint = ctx.route_template
+        if ctx.error is not None:
+            self.realtime.request_failed(ctx.method, endpoint, ctx.error, duration, ctx.realtime_id)
+            return
+        self.realtime.request_completed(
+            ctx.method, endpoint, ctx.status_code, duration, ctx.realtime_id,
+            request_bytes=ctx.headers.get("content-length"),
+            response_bytes=ctx.response_length,
+            authenticated="authorization" in ctx.headers
+        )
+    
+    def _bind_metric_children(self, method: str, endpoint: str, status_code: int) -> tuple:
+        status = str(status_code)
+        return (
+            self.prometheus.counter(
+                "http_requests_total", "Total HTTP requests"
+            ).labels(method=method, endpoint=endpoint),
+            self.prometheus.histogram(
+                "http_request_duration_seconds", "HTTP request duration in seconds"
+            ).labels(method=method, endpoint=endpoint, status=status),
+            self.prometheus.counter(
+                "http_responses_total", "Total HTTP responses by status"
+            ).labels(method=method, endpoint=endpoint, status=status),
+            LatencyTracker.instance().series("route", f"{method} {endpoint}")
+        )
+    
+    def _audit(self, ctx: RequestContext, duration: float):
+        """Emit an api.request audit record without touching the database on the request path"""
+        user = ctx.user
+        audit_logger.info(
+            "api.request",
+            extra={
+                "request_id": ctx.request_id,
+                "user_id": getattr(user, "id", None),
+                "resource_type": "http_request",
+                "details": {
+                    "method": ctx.method,
+                    "path": ctx.path,
+                    "status": ctx.status_code,
+                    "duration_ms": duration * 1000,
+                    "client_ip": ctx.client_ip
+                }
+            }
+        )
+    
+    def _rate_limited(self, ctx: RequestContext) -> bool:
+        """Record the request and report whether its client exceeded the limit"""
+        now = time.monotonic()
+        cutoff = now - 60  # 1 minute ago
+        
+        # Drop idle clients periodically rather than scanning all of them per request
+        if now >= self._next_sweep:
+            for client_ip in [ip for ip, times in self.client_requests.items() if times[-1] <= cutoff]:
+                del self.client_requests[client_ip]
+            self._next_sweep = now + 60
+        
+        client_ip = ctx.client_ip or "unknown"
+        request_times = self.client_requests.get(client_ip)
+        if request_times is None:
+            request_times = self.client_requests[client_ip] = deque()
+        
+        while request_times and request_times[0] <= cutoff:
+            request_times.popleft()
+        
+        if len(request_times) >= self.requests_per_minute:
+            return True
+        
+        request_times.append(now)
+        return False
+    
+    async def _rate_limit_response(self, scope, receive, send):
+        response = JSONResponse(
+            status_code=429,
+            content={
+                "error": {
+                    "type": "RateLimitExceeded",
+                    "detail": f"Rate limit exceeded. Maximum {self.requests_per_minute} requests per minute.",
+                    "retry_after": 60
+                }
+            }
+        )
+        await response(scope, receive, send)
+    
+    @staticmethod
+    def _error_response(e: Exception) -> JSONResponse:
+        """Map an unhandled exception to a JSON error response"""
+        if isinstance(e, ValueError):
+            status_code = 400
+            detail = str(e)
+        elif isinstance(e, PermissionError):
+            status_code = 403
+            detail = "Insufficient permissions"
+        elif isinstance(e, FileNotFoundError):
+            status_code = 404
+            detail = "Resource not found"
+        else:
+            status_code = 500
+            detail = "Internal server error"
+        
+        return JSONResponse(
+            status_code=status_code,
+            content={
+                "error": {
+                    "type": type(e).__name__,
+                    "detail": detail,
+                    "timestamp": time.time()
+                }
+            }
+        )
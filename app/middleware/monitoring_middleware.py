@@ -1,7 +1,6 @@
 import time
 import json
-import asyncio
-from typing import Callable
+from typing import Any, Callable
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
@@ -10,216 +9,63 @@ import logging
 from datetime import datetime
 
 from ..services.monitoring_service import monitoring_service
+from ..services.realtime_monitor import RealTimeMonitor
 
 logger = logging.getLogger(__name__)
 
 class RealTimeMonitoringMiddleware(BaseHTTPMiddleware):
+    """
+    RealTimeMonitor as a standalone middleware.
+    
+    The API mounts the same tracking as the realtime_monitoring stage of
+    RequestPipelineMiddleware; this wraps other ASGI apps with a monitor of their own.
+    """
+    
     def __init__(
         self,
         app,
         redis_url: str = "redis://localhost:6379",
-        enable_detailed_metrics: bool = True
+        enable_detailed_metrics: bool = True,
+        flush_interval: float = 1.0,
+        redis_client: Any = None
     ):
         super().__init__(app)
-        self.redis_client = redis.from_url(redis_url)
-        self.enable_detailed_metrics = enable_detailed_metrics
-        self.request_counter = 0
+        self.monitor = RealTimeMonitor(
+            redis_client=redis_client,
+            redis_url=redis_url,
+            flush_interval=flush_interval,
+            enable_detailed_metrics=enable_detailed_metrics
+        )
         
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         start_time = time.time()
-        
-        # Track request start
-        await self._track_request_start(request)
+        request_id = self.monitor.request_started(
+            request.method, str(request.url), request.headers.get("user-agent", "")
+        )
         
         try:
-            # Process request
             response = await call_next(request)
-            
-            # Calculate processing time
-            process_time = time.time() - start_time
-            
-            # Track request completion
-            await self._track_request_completion(request, response, process_time)
-            
-            return response
-            
         except Exception as e:
-            # Track request error
-            process_time = time.time() - start_time
-            await self._track_request_error(request, e, process_time)
-            
-            # Re-raise the exception
+            self.monitor.request_failed(
+                request.method, self._get_endpoint_pattern(request), e, time.time() - start_time, request_id
+            )
             raise e
-    
-    async def _track_request_start(self, request: Request):
-        """Track request start metrics"""
-        self.request_counter += 1
-        
-        # Increment request counter in Redis
-        self.redis_client.incr("metrics:api:request_count")
         
-        # Track concurrent requests
-        self.redis_client.incr("metrics:api:concurrent_requests")
-        
-        # Publish real-time request event
-        request_data = {
-            "event": "request_start",
-            "method": request.method,
-            "url": str(request.url),
-            "user_agent": request.headers.get("user-agent", ""),
-            "timestamp": datetime.utcnow().isoformat(),
-            "request_id": self.request_counter
-        }
-        
-        self.redis_client.publish("api:requests", json.dumps(request_data))
-        
-        # Store request start time
-        self.redis_client.setex(
-            f"request:{self.request_counter}:start_time",
-            300,  # 5 minute TTL
-            start_time
+        self.monitor.request_completed(
+            request.method,
+            self._get_endpoint_pattern(request),
+            response.status_code,
+            time.time() - start_time,
+            request_id,
+            request_bytes=request.headers.get("content-length"),
+            response_bytes=response.headers.get("content-length"),
+            authenticated="authorization" in request.headers
         )
+        return response
     
-    async def _track_request_completion(self, request: Request, response: Response, process_time: float):
-        """Track successful request completion"""
-        # Decrement concurrent requests
-        self.redis_client.decr("metrics:api:concurrent_requests")
-        
-        # Track response metrics
-        status_code = response.status_code
-        method = request.method
-        endpoint = self._get_endpoint_pattern(request)
-        
-        # Increment status code counters
-        self.redis_client.incr(f"metrics:api:status:{status_code}")
-        self.redis_client.incr(f"metrics:api:method:{method}")
-        self.redis_client.incr(f"metrics:api:endpoint:{endpoint}")
-        
-        # Track response time
-        self.redis_client.lpush("metrics:api:response_times", process_time)
-        self.redis_client.ltrim("metrics:api:response_times", 0, 999)  # Keep last 1000
-        
-        # Track detailed metrics if enabled
-        if self.enable_detailed_metrics:
-            await self._track_detailed_metrics(request, response, process_time)
-        
-        # Publish real-time completion event
-        completion_data = {
-            "event": "request_complete",
-            "method": method,
-            "endpoint": endpoint,
-            "status_code": status_code,
-            "process_time": process_time,
-            "timestamp": datetime.utcnow().isoformat(),
-            "request_id": self.request_counter
-        }
-        
-        self.redis_client.publish("api:requests", json.dumps(completion_data))
-        
-        # Send metrics to monitoring service
-        try:
-            await monitoring_service.publish_metric_update(
-                "api.request.duration_seconds",
-                process_time,
-                {
-                    "method": method,
-                    "endpoint": endpoint,
-                    "status_code": str(status_code)
-                }
-            )
-            
-            await monitoring_service.publish_metric_update(
-                "api.request.count",
-                1,
-                {
-                    "method": method,
-                    "endpoint": endpoint,
-                    "status_code": str(status_code)
-                }
-            )
-        except Exception as e:
-            logger.error(f"Error publishing metrics: {e}")
-    
-    async def _track_request_error(self, request: Request, error: Exception, process_time: float):
-        """Track request errors"""
-        # Decrement concurrent requests
-        self.redis_client.decr("metrics:api:concurrent_requests")
-        
-        # Increment error counter
-        self.redis_client.incr("metrics:api:error_count")
-        
-        # Track error by type
-        error_type = type(error).__name__
-        self.redis_client.incr(f"metrics:api:error_type:{error_type}")
-        
-        # Track error by endpoint
-        endpoint = self._get_endpoint_pattern(request)
-        self.redis_client.incr(f"metrics:api:error_endpoint:{endpoint}")
-        
-        # Publish real-time error event
-        error_data = {
-            "event": "request_error",
-            "method": request.method,
-            "endpoint": endpoint,
-            "error_type": error_type,
-            "error_message": str(error),
-            "process_time": process_time,
-            "timestamp": datetime.utcnow().isoformat(),
-            "request_id": self.request_counter
-        }
-        
-        self.redis_client.publish("api:errors", json.dumps(error_data))
-        
-        # Send error metrics to monitoring service
-        try:
-            await monitoring_service.publish_metric_update(
-                "api.error.count",
-                1,
-                {
-                    "method": request.method,
-                    "endpoint": endpoint,
-                    "error_type": error_type
-                }
-            )
-        except Exception as e:
-            logger.error(f"Error publishing error metrics: {e}")
-    
-    async def _track_detailed_metrics(self, request: Request, response: Response, process_time: float):
-        """Track detailed request metrics"""
-        try:
-            # Request size
-            content_length = request.headers.get("content-length")
-            if content_length:
-                await monitoring_service.publish_metric_update(
-                    "api.request.size_bytes",
-                    float(content_length),
-                    {"endpoint": self._get_endpoint_pattern(request)}
-                )
-            
-            # Response size
-            if hasattr(response, "headers") and "content-length" in response.headers:
-                await monitoring_service.publish_metric_update(
-                    "api.response.size_bytes",
-                    float(response.headers["content-length"]),
-                    {"endpoint": self._get_endpoint_pattern(request)}
-                )
-            
-            # Track authentication metrics
-            if "authorization" in request.headers:
-                await monitoring_service.publish_metric_update(
-                    "api.request.authenticated",
-                    1,
-                    {"endpoint": self._get_endpoint_pattern(request)}
-                )
-            else:
-                await monitoring_service.publish_metric_update(
-                    "api.request.unauthenticated",
-                    1,
-                    {"endpoint": self._get_endpoint_pattern(request)}
-                )
-            
-        except Exception as e:
-            logger.error(f"Error tracking detailed metrics: {e}")
+    async def close(self):
+        """Stop the flush task and write out what is left"""
+        await self.monitor.close()
     
     def _get_endpoint_pattern(self, request: Request) -> str:
         """Extract endpoint pattern from request"""
@@ -242,6 +88,7 @@ class RealTimeMonitoringMiddleware(BaseHTTPMiddleware):
         except Exception:
             return request.url.path
 
+
 class PerformanceMonitoringMiddleware(BaseHTTPMiddleware):
     """Middleware for performance monitoring and alerting"""
     
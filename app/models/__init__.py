@@ -6,7 +6,7 @@ from .data_sink import DataSink
 from .data_credentials import DataCredentials
 from .project import Project
 from .flow_node import FlowNode
-from .flow import Flow, FlowRun, FlowPermission, FlowTemplate
+from .flow import Flow, FlowRun, FlowNodeRun, FlowPermission, FlowTemplate
 from .data_flow import DataFlow
 from .code_container import CodeContainer
 from .data_map import DataMap
@@ -48,6 +48,9 @@ from .audit_log import AuditLog, AuditAction, AuditSeverity
 from .marketplace_domain import MarketplaceDomain, DomainSubscription, DomainStats
 from .approval_request import ApprovalRequest, ApprovalAction, ApprovalComment
 from .tag import Tag, ResourceTag, TagCollection
+from .search_tombstone import SearchTombstone
+from .tag_assignment import TagAssignment, TagCount
+from .schema_field import SchemaField
 from .validation_rule import ValidationRule, ValidationResult, RuleExecution
 from .analytics import (
     MetricDefinition, MetricValue, AlertRule, AlertInstance, 
@@ -81,14 +84,14 @@ from .governance import (
 
 __all__ = [
     "User", "Org", "DataSource", "DataSet", "DataSink", 
-    "DataCredentials", "Project", "FlowNode", "Flow", "FlowRun", "FlowPermission", "FlowTemplate", "DataFlow", "CodeContainer", "DataMap", "Notification", "ApiAuthConfig", "CustomDataFlow", "FlowTrigger", "Domain", "Runtime", "OrgMembership",
+    "DataCredentials", "Project", "FlowNode", "Flow", "FlowRun", "FlowNodeRun", "FlowPermission", "FlowTemplate", "DataFlow", "CodeContainer", "DataMap", "Notification", "ApiAuthConfig", "CustomDataFlow", "FlowTrigger", "Domain", "Runtime", "OrgMembership",
     "UserTier", "OrgTier", "Connector", "DataSchema", "AuthTemplate", "Invite",
     "Vendor", "ServiceKey", "MarketplaceItem", "Cluster", "RateLimit",
     "ApiKey", "ApiKeyEvent", "Permission", "Session", "Team", "TeamInvitation", "TeamMembership",
     "UserLoginAudit", "OrgCustodian", "DomainCustodian", "NotificationChannelSetting", 
     "BillingAccount", "Subscription", "Webhook", "Transform", "AttributeTransform", "BackgroundJob", "JobDependency", "AuditLog", "AuditAction", "AuditSeverity",
     "MarketplaceDomain", "DomainSubscription", "DomainStats", "ApprovalRequest", "ApprovalAction", "ApprovalComment",
-    "Tag", "ResourceTag", "TagCollection", "ValidationRule", "ValidationResult", "RuleExecution",
+    "Tag", "ResourceTag", "TagCollection", "SearchTombstone", "TagAssignment", "TagCount", "SchemaField", "ValidationRule", "ValidationResult", "RuleExecution",
     # Phase 3 models
     "MetricDefinition", "MetricValue", "AlertRule", "AlertInstance", "AlertNotification", "Dashboard", "DashboardShare", "AnalyticsReport", "AnalyticsReportRun",
     "SecurityRole", "RoleAssignment", "SecurityPolicy", "PolicyBinding", "AccessControlEntry", "SecurityAuditLog", "SecurityRule", "SecurityRuleViolation", "ThreatIntelligence", "SecurityIncident", "SecurityDataClassification",
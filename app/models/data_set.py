@@ -4,7 +4,7 @@ Represents processed data entities within flows with comprehensive Rails busines
 """
 
 from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON, Float
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, object_session
 from sqlalchemy.sql import func
 from sqlalchemy.types import Enum as SQLEnum
 from datetime import datetime, timedelta
@@ -306,9 +306,14 @@ class DataSet(Base):
     
     def upstream_has_splitter_(self) -> bool:
         """Check if upstream has splitter (Rails pattern)"""
-        if not self.parent_data_set:
+        if self.parent_data_set_id is None and not self.parent_data_set:
             return False
         
+        session = self._lineage_session()
+        if session is not None:
+            from ..services import lineage
+            return lineage.upstream_has_splitter(session, self.id, self.UPSTREAM_SPLITTER_LOOKUP_LIMIT)
+        
         current = self.parent_data_set
         count = 0
         while current and count < self.UPSTREAM_SPLITTER_LOOKUP_LIMIT:
@@ -729,6 +734,12 @@ class DataSet(Base):
     
     def get_root_parent(self):
         """Get root parent data set (Rails pattern)"""
+        session = self._lineage_session()
+        if session is not None:
+            from ..services import lineage
+            root_id = lineage.root_id(session, "data_sets", self.id)
+            return self if root_id == self.id else session.get(self.__class__, root_id)
+        
         current = self
         while current.parent_data_set:
             current = current.parent_data_set
@@ -736,6 +747,16 @@ class DataSet(Base):
     
     def get_all_descendants(self) -> List['DataSet']:
         """Get all descendant data sets recursively (Rails pattern)"""
+        session = self._lineage_session()
+        if session is not None:
+            from ..services import lineage
+            ids = [row[0] for row in lineage.descendants(session, "data_sets", self.id)]
+            if not ids:
+                return []
+            loaded = {data_set.id: data_set for data_set in
+                      session.query(self.__class__).filter(self.__class__.id.in_(ids)).all()}
+            return [loaded[data_set_id] for data_set_id in ids if data_set_id in loaded]
+        
         descendants = []
         for child in self.child_data_sets:
             descendants.append(child)
@@ -750,6 +771,11 @@ class DataSet(Base):
     
     def calculate_depth(self) -> int:
         """Calculate depth in data set hierarchy (Rails pattern)"""
+        session = self._lineage_session()
+        if session is not None:
+            from ..services import lineage
+            return lineage.depth(session, "data_sets", self.id)
+        
         depth = 0
         current = self
         while current.parent_data_set:
@@ -757,6 +783,16 @@ class DataSet(Base):
             current = current.parent_data_set
         return depth
     
+    def _lineage_session(self):
+        """Session to run lineage queries in; None for unsaved data sets, which walk loaded relationships"""
+        session = object_session(self)
+        if session is None or self.id is None or self in session.new:
+            return None
+        # Lineage queries read the database: flush pending parent changes first, as an ORM query would
+        if session.autoflush:
+            session.flush()
+        return session
+    
     def add_tag(self, tag_name: str) -> None:
         """Add tag to data set (Rails pattern)"""
         if not self.tags:
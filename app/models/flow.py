@@ -3,7 +3,7 @@ Flow Model - Data processing pipeline management entity.
 Manages flow execution, status tracking, and deployment with Rails business logic patterns.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime, timedelta
@@ -11,7 +11,6 @@ from typing import Optional, List, Dict, Any, Union, Set
 from enum import Enum as PyEnum
 import json
 import secrets
-import re
 from ..database import Base
 
 class FlowStatuses(PyEnum):
@@ -122,6 +121,12 @@ class Flow(Base):
     error_notification_enabled = Column(Boolean, default=True)
     success_notification_enabled = Column(Boolean, default=False)
     
+    # Last validation of the definition (flow.validate_all)
+    validation_hash = Column(String(64))
+    validation_valid = Column(Boolean)
+    validation_errors = Column(JSON)  # {"errors": [...], "warnings": [...]}
+    validated_at = Column(DateTime)
+    
     # Timestamps
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -147,6 +152,10 @@ class Flow(Base):
     last_modified_by = relationship("User", foreign_keys=[last_modified_by_id])
     archived_by = relationship("User", foreign_keys=[archived_by_id])
     
+    __table_args__ = (
+        Index('ix_flows_next_run_at', 'next_run_at'),  # due-flow claims of the scheduler
+    )
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if not self.uid:
@@ -286,7 +295,7 @@ class Flow(Base):
         """Check if scheduled flow is overdue (Rails pattern)"""
         if not self.scheduled_() or not self.next_run_at:
             return False
-        return self.next_run_at < datetime.now()
+        return self.next_run_at < datetime.utcnow()
         
     def recently_run_(self, hours: int = 24) -> bool:
         """Check if flow was recently run (Rails pattern)"""
@@ -596,12 +605,13 @@ class Flow(Base):
         if not self.scheduled_() or not self.schedule_config:
             return
             
-        # This would implement cron parsing and next run calculation
-        # For now, set a default next run time
-        if self.schedule_type == ScheduleTypes.INTERVAL:
-            interval_minutes = self.schedule_config.get('interval_minutes', 60)
-            self.next_run_at = datetime.now() + timedelta(minutes=interval_minutes)
-        # TODO: Implement cron parsing for CRON schedule type
+        from ..services.flow_scheduler import next_fire_time
+        
+        # next_run_at is naive UTC, as the scheduler compares it; a fire already ahead is kept
+        if self.schedule_type in (ScheduleTypes.CRON, ScheduleTypes.INTERVAL, ScheduleTypes.ONCE):
+            self.next_run_at = next_fire_time(
+                self.schedule_type, self.schedule_config, datetime.utcnow(), previous=self.next_run_at
+            )
     
     def get_node_count(self) -> int:
         """Get the number of nodes in this flow (Rails pattern)"""
@@ -743,7 +753,7 @@ class Flow(Base):
     @classmethod
     def overdue_flows(cls, org=None):
         """Get overdue flows (Rails scope pattern)"""
-        now = datetime.now()
+        now = datetime.utcnow()
         query = cls.query.filter(
             cls.next_run_at < now,
             cls.schedule_type != ScheduleTypes.MANUAL,
@@ -959,35 +969,9 @@ class Flow(Base):
     
     def validate_(self) -> List[str]:
         """Validate flow data (Rails validation pattern)"""
-        errors = []
-        
-        if not self.name or not self.name.strip():
-            errors.append("Name cannot be blank")
-        elif len(self.name) > 255:
-            errors.append("Name is too long (maximum 255 characters)")
-        
-        if self.name and not re.match(r'^[\w\s\-\.\(\)]+$', self.name):
-            errors.append("Name contains invalid characters")
-        
-        if not self.owner_id:
-            errors.append("Owner is required")
+        from ..services.flow_validation import flow_errors
         
-        if not self.org_id:
-            errors.append("Organization is required")
-        
-        if self.description and len(self.description) > 10000:
-            errors.append("Description is too long (maximum 10,000 characters)")
-        
-        if self.timeout_minutes and self.timeout_minutes <= 0:
-            errors.append("Timeout must be positive")
-        
-        if self.retry_count and self.retry_count < 0:
-            errors.append("Retry count cannot be negative")
-        
-        if self.max_parallel_runs and self.max_parallel_runs <= 0:
-            errors.append("Max parallel runs must be positive")
-        
-        return errors
+        return flow_errors(self)
     
     def valid_(self) -> bool:
         """Check if flow is valid (Rails validation pattern)"""
@@ -1204,7 +1188,11 @@ class FlowRun(Base):
     # Relationships
     flow = relationship("Flow", back_populates="flow_runs")
     triggered_by_user = relationship("User")
-    # node_runs = relationship("FlowNodeRun", back_populates="flow_run")  # FlowNodeRun model not yet implemented
+    
+    __table_args__ = (
+        Index('uq_flow_runs_flow_run_number', 'flow_id', 'run_number', unique=True),
+    )
+    node_runs = relationship("FlowNodeRun", back_populates="flow_run", passive_deletes=True)
     
     def get_duration_display(self) -> str:
         """Get human-readable duration"""
@@ -1222,6 +1210,46 @@ class FlowRun(Base):
         else:
             return f"{seconds}s"
 
+class FlowNodeRun(Base):
+    """
+    One node of a flow run: its state, timings and an indegree counter.
+
+    waiting_on counts the upstreams still to succeed, so a completion only
+    decrements its downstream rows and the ready nodes are an index lookup.
+    """
+    __tablename__ = "flow_node_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    flow_run_id = Column(Integer, ForeignKey("flow_runs.id", ondelete="CASCADE"), nullable=False)
+    node_id = Column(Integer, nullable=False)
+    name = Column(String(255))
+    
+    # pending, dispatched, success, failed, blocked, skipped
+    state = Column(String(20), nullable=False, default="pending")
+    waiting_on = Column(Integer, nullable=False, default=0)
+    downstream_node_ids = Column(JSON)
+    
+    # Timings and results
+    queued_at = Column(DateTime)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    wait_ms = Column(Integer)
+    duration_ms = Column(Integer)
+    records_processed = Column(Integer, default=0)
+    records_output = Column(Integer, default=0)
+    error_message = Column(Text)
+    
+    flow_run = relationship("FlowRun", back_populates="node_runs")
+    
+    __table_args__ = (
+        Index('uq_flow_node_runs_run_node', 'flow_run_id', 'node_id', unique=True),
+        # Ready and in-flight nodes of a run
+        Index('ix_flow_node_runs_run_state', 'flow_run_id', 'state', 'waiting_on'),
+    )
+    
+    def __repr__(self):
+        return f"<FlowNodeRun(run={self.flow_run_id} node={self.node_id} {self.state})>"
+
 class FlowPermission(Base):
     __tablename__ = "flow_permissions"
     
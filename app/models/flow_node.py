@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON, Enum as SQLEnum, Index
-from sqlalchemy.orm import relationship, sessionmaker, validates
+from sqlalchemy.orm import relationship, sessionmaker, validates, object_session
 from sqlalchemy.sql import func
 from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime, timedelta
@@ -401,6 +401,56 @@ class FlowNode(Base):
         """Check if node has children (Rails pattern)"""
         return bool(self.child_nodes)
         
+    def get_ancestor_nodes(self) -> List['FlowNode']:
+        """Get parent, grandparent, ... up to the root, nearest first"""
+        session = self._lineage_session()
+        if session is None:
+            ancestors, current = [], self.parent_node
+            while current is not None:
+                ancestors.append(current)
+                current = current.parent_node
+            return ancestors
+        from ..services import lineage
+        return self._load_nodes(session, lineage.ancestor_ids(session, "flow_nodes", self.id))
+    
+    def get_all_descendants(self, same_origin: bool = True) -> List['FlowNode']:
+        """Get the subtree below this node in depth-first order, by default only nodes of the same origin"""
+        session = self._lineage_session()
+        if session is None:
+            descendants = []
+            for child in self.child_nodes or []:
+                if not same_origin or child.same_origin_(self):
+                    descendants.append(child)
+                    descendants.extend(child.get_all_descendants(same_origin))
+            return descendants
+        from ..services import lineage
+        rows = lineage.descendants(session, "flow_nodes", self.id, same_origin=same_origin)
+        return self._load_nodes(session, [row[0] for row in rows])
+    
+    def calculate_depth(self) -> int:
+        """Number of parent hops up to the root node"""
+        session = self._lineage_session()
+        if session is None:
+            return len(self.get_ancestor_nodes())
+        from ..services import lineage
+        return lineage.depth(session, "flow_nodes", self.id)
+    
+    def _lineage_session(self):
+        """Session to run lineage queries in; None for unsaved nodes, which walk loaded relationships"""
+        session = object_session(self)
+        if session is None or self.id is None or self in session.new:
+            return None
+        # Lineage queries read the database: flush pending parent changes first, as an ORM query would
+        if session.autoflush:
+            session.flush()
+        return session
+    
+    def _load_nodes(self, session, ids: List[int]) -> List['FlowNode']:
+        if not ids:
+            return []
+        loaded = {node.id: node for node in session.query(self.__class__).filter(self.__class__.id.in_(ids)).all()}
+        return [loaded[node_id] for node_id in ids if node_id in loaded]
+    
     def has_dependencies_(self) -> bool:
         """Check if node has dependencies (Rails pattern)"""
         return bool(self.get_dependency_ids())
@@ -414,16 +464,21 @@ class FlowNode(Base):
         if not dependency_ids:
             return True
         
-        from sqlalchemy.orm import sessionmaker
-        session = sessionmaker()()
+        # Checks across a whole flow should use ReadinessResolver, which loads it once
+        session = object_session(self)
+        owns_session = session is None
+        if owns_session:
+            from ..database import SessionLocal
+            session = SessionLocal()
         try:
             completed_deps = session.query(FlowNode).filter(
                 FlowNode.id.in_(dependency_ids),
                 FlowNode.status == NodeStatuses.COMPLETED
             ).count()
-            return completed_deps == len(dependency_ids)
+            return completed_deps == len(set(dependency_ids))
         finally:
-            session.close()
+            if owns_session:
+                session.close()
         
     def can_be_processed_(self) -> bool:
         """Check if node can be processed (Rails pattern)"""
@@ -548,10 +603,13 @@ class FlowNode(Base):
         return (self.peak_memory_usage_mb > self.allocated_memory_mb * 0.9 or
                 self.cpu_utilization_percent > 90)
     
-    def accessible_by_(self, user, access_level: str = 'read') -> bool:
-        """Check if user can access node (Rails pattern)"""
+    def accessible_by_(self, user, access_level: str = 'read', graph=None) -> bool:
+        """Check if user can access node (Rails pattern); graph is this node's loaded FlowGraph, shared across checks"""
         if not user:
             return False
+        
+        if graph is not None and self.id in graph:
+            return graph.accessible(object_session(self), self.id, user, access_level)
             
         if self.owner_id == user.id:
             return True
@@ -845,8 +903,32 @@ class FlowNode(Base):
         if target_node:
             target_node.flow_activate_traverse_(False)
     
+    def flow_activate_(self, opts: Dict[str, Any] = None) -> None:
+        """Activate flow (Rails bang method pattern)"""
+        if opts is None:
+            opts = {"all": False}
+        
+        target_node = self.origin_node if opts.get("all") else self
+        if target_node:
+            target_node.flow_activate_traverse_(True)
+    
+    def flow_graph(self):
+        """This node's whole origin tree loaded in one query; None for unsaved nodes"""
+        session = self._lineage_session()
+        if session is None or not (self.origin_node_id or self.id):
+            return None
+        from ..services.flow_graph import FlowGraph
+        return FlowGraph.load(session, self.origin_node_id or self.id)
+    
     def flow_activate_traverse_(self, activate: bool = True) -> None:
         """Traverse and activate/deactivate flow nodes (Rails bang method pattern)"""
+        graph = self.flow_graph()
+        if graph is not None and self.id in graph:
+            from ..services.flow_graph import sync_session
+            changes = graph.set_status(object_session(self), activate, start_id=self.id)
+            sync_session(object_session(self), changes, activate)
+            return
+        
         new_status = NodeStatuses.ACTIVE if activate else NodeStatuses.PAUSED
         
         self.status = new_status
@@ -1405,38 +1487,42 @@ class FlowNode(Base):
     
     def flow_copy(self, api_user_info: Dict[str, Any], options: Dict[str, Any] = None, 
                   fn=None, pfn=None):
-        """Copy flow (Rails flow_copy pattern)"""
+        """Copy flow (Rails flow_copy pattern)
+        
+        Copies fn (this node's origin by default) and its same-origin descendants
+        with bulk inserts in the current transaction, attaching the copy under pfn
+        when given. Returns the resource of the copied top node.
+        """
         if options is None:
             options = {}
         
-        is_origin = fn is None
-        fn = self.origin_node if is_origin else fn
-        
-        if (pfn and fn.resource and fn.resource.__class__.__name__ == 'DataSource' and
-            not options.get('copy_dependent_data_flows')):
-            if hasattr(pfn, 'unlink_dependent_source'):
-                pfn.unlink_dependent_source()
+        fn = fn or self.origin_node or self
+        session = fn._lineage_session()
+        if session is None:
             return None
         
-        if hasattr(fn.resource, 'copy'):
-            ds = fn.resource.copy(api_user_info, options)
-        else:
+        def user_info(*names):
+            for name in names:
+                value = api_user_info.get(name) if isinstance(api_user_info, dict) else getattr(api_user_info, name, None)
+                if value is not None:
+                    return getattr(value, 'id', value)
             return None
         
-        if is_origin:
-            ds.flow_node.origin_node_id = ds.flow_node.id
-            if pfn and hasattr(ds.flow_node, 'shared_origin_node_id'):
-                ds.flow_node.shared_origin_node_id = pfn.shared_origin_node_id
-        else:
-            ds.flow_node.origin_node_id = pfn.origin_node_id
-        
-        ds.flow_node.parent_node_id = pfn.id if pfn else None
-        
-        for child_node in fn.child_nodes or []:
-            if child_node.same_origin_(fn):
-                child_node.flow_copy(api_user_info, options, child_node, ds.flow_node)
+        from ..services.flow_copy import copy_flow
+        result = copy_flow(
+            session,
+            fn.id,
+            owner_id=user_info('input_owner', 'user', 'owner_id'),
+            org_id=user_info('input_org', 'org', 'org_id'),
+            parent_node_id=pfn.id if pfn else None,
+            options=options,
+            progress=options.get('progress')
+        )
+        if result.root_node_id is None:
+            return None
         
-        return ds
+        copied = session.get(self.__class__, result.root_node_id)
+        return copied.resource if copied else None
     
     def handle_after_save(self) -> None:
         """Handle after save callback (Rails pattern)"""
@@ -0,0 +1,33 @@
+"""
+Schema Field Model - Flattened fields of data set schemas and data schemas.
+One row per field path, maintained on write, so searches by field name or
+type are index seeks instead of parsing every stored schema.
+"""
+
+from sqlalchemy import Column, Integer, String, Index
+from ..database import Base
+
+
+class SchemaField(Base):
+    __tablename__ = "schema_fields"
+
+    id = Column(Integer, primary_key=True, index=True)
+    org_id = Column(Integer, nullable=True)
+    resource_type = Column(String(50), nullable=False)      # "data_sets" or "data_schemas"
+    resource_id = Column(Integer, nullable=False)
+    schema_column = Column(String(50), nullable=False)      # source_schema, output_schema or schema
+    path = Column(String(1000), nullable=False)             # e.g. "customer.addresses[].zip"
+    name = Column(String(255), nullable=False)              # Leaf name as written
+    name_key = Column(String(255), nullable=False)          # Lower-cased name for lookups
+    field_type = Column(String(50), nullable=True)
+
+    __table_args__ = (
+        # "Which data sets have a column named customer_id", optionally of a type
+        Index("ix_schema_fields_name_type_resource", "name_key", "resource_type", "field_type", "resource_id"),
+        Index("ix_schema_fields_type_resource", "field_type", "resource_type", "resource_id"),
+        # Replacing a resource's fields on write
+        Index("ix_schema_fields_resource", "resource_type", "resource_id"),
+    )
+
+    def __repr__(self):
+        return f"<SchemaField({self.resource_type} {self.resource_id} {self.schema_column}:{self.path} {self.field_type})>"
@@ -0,0 +1,27 @@
+"""
+SearchTombstone Model - Deleted searchable resources awaiting removal from search.
+Rows are written in the same transaction as the delete and consumed by the
+incremental Elasticsearch indexer, which removes the matching documents.
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class SearchTombstone(Base):
+    __tablename__ = "search_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    resource_type = Column(String(50), nullable=False)
+    resource_id = Column(Integer, nullable=False)
+    org_id = Column(Integer, nullable=True)
+    deleted_at = Column(DateTime, nullable=False, default=func.now(), server_default=func.now())
+
+    __table_args__ = (
+        # Keyset scans by (deleted_at, id)
+        Index("ix_search_tombstones_deleted_at_id", "deleted_at", "id"),
+    )
+
+    def __repr__(self):
+        return f"<SearchTombstone({self.resource_type} {self.resource_id})>"
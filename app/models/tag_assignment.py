@@ -0,0 +1,46 @@
+"""
+Tag Assignment Models - Normalized free-form tags of searchable resources.
+One row per (resource, tag) maintained on write from the resources' tags
+columns, plus per-org tag counts for facets and tag pickers.
+"""
+
+from sqlalchemy import Column, Integer, String, Index, UniqueConstraint
+from ..database import Base
+
+
+class TagAssignment(Base):
+    __tablename__ = "tag_assignments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    org_id = Column(Integer, nullable=True)
+    resource_type = Column(String(50), nullable=False)
+    resource_id = Column(Integer, nullable=False)
+    tag = Column(String(100), nullable=False)
+
+    __table_args__ = (
+        # Diffing a resource's tags on write
+        UniqueConstraint("resource_type", "resource_id", "tag", name="uq_tag_assignments_resource_tag"),
+        # Tag filters: resources carrying a tag, as an index-only lookup
+        Index("ix_tag_assignments_type_tag_resource", "resource_type", "tag", "resource_id"),
+    )
+
+    def __repr__(self):
+        return f"<TagAssignment({self.resource_type} {self.resource_id} '{self.tag}')>"
+
+
+class TagCount(Base):
+    __tablename__ = "tag_counts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    org_id = Column(Integer, nullable=True)
+    resource_type = Column(String(50), nullable=False)
+    tag = Column(String(100), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("org_id", "resource_type", "tag", name="uq_tag_counts_org_type_tag"),
+        Index("ix_tag_counts_org_type_count", "org_id", "resource_type", "count"),
+    )
+
+    def __repr__(self):
+        return f"<TagCount(org={self.org_id} {self.resource_type} '{self.tag}'={self.count})>"
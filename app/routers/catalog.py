@@ -314,7 +314,7 @@ async def rebuild_search_index(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Rebuild search index for catalog content"""
+    """Queue a search index update for catalog content"""
     try:
         catalog_service = CatalogService(db)
         index_results = await catalog_service.index_catalog_for_search(
@@ -329,7 +329,7 @@ async def rebuild_search_index(
         
         return {
             "success": True,
-            "message": "Search index rebuild completed",
+            "message": "Search index update queued",
             "results": index_results
         }
         
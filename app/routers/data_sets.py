@@ -17,6 +17,7 @@ from ..models.org import Org
 from ..services.audit_service import AuditService
 from ..services.validation_service import ValidationService
 from ..services.async_tasks.manager import AsyncTaskManager
+from ..services.schema_field_index import field_filter
 
 router = APIRouter()
 
@@ -70,6 +71,9 @@ class DataSetSearch(BaseModel):
     has_samples: Optional[bool] = None
     created_after: Optional[datetime] = None
     created_before: Optional[datetime] = None
+    field_name: Optional[str] = None
+    field_type: Optional[str] = None
+    field_match: str = Field("eq", pattern="^(eq|starts_with|contains)$")
 
 class DataSetCopy(BaseModel):
     new_name: Optional[str] = None
@@ -640,6 +644,14 @@ async def search_data_sets(
     if search_params.org_id:
         query = query.filter(DataSet.org_id == search_params.org_id)
     
+    if search_params.field_name or search_params.field_type:
+        query = query.filter(field_filter(
+            "data_sets", DataSet.id,
+            name=search_params.field_name,
+            field_type=search_params.field_type,
+            match=search_params.field_match
+        ))
+    
     # Apply pagination
     data_sets = query.offset(offset).limit(limit).all()
     return data_sets
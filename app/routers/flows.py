@@ -17,6 +17,8 @@ from app.models.project import Project
 from app.services.audit_service import AuditService
 from app.services.validation_service import ValidationService
 from app.services.async_tasks.manager import AsyncTaskManager
+from app.services.tag_index import tag_filter, facet_counts
+from app.services.flow_readiness import ReadinessResolver
 
 router = APIRouter()
 
@@ -151,6 +153,7 @@ async def list_flows(
     project_id: Optional[int] = Query(None),
     status: Optional[str] = Query(None),
     flow_type: Optional[str] = Query(None),
+    tags: Optional[List[str]] = Query(None),
     active_only: bool = Query(False),
     include_metrics: bool = Query(False),
     sort_by: str = Query("updated_at", pattern="^(name|created_at|updated_at|last_run_at|status)$"),
@@ -168,6 +171,8 @@ async def list_flows(
         query = query.filter(FlowNode.status == status.upper())
     if flow_type:
         query = query.filter(FlowNode.flow_type == flow_type)
+    if tags:
+        query = query.filter(tag_filter("flows", FlowNode.id, tags))
     
     # Apply sorting
     if sort_by == "name":
@@ -510,8 +515,42 @@ async def search_flows(
     current_user: User = Depends(get_current_user)
 ):
     """Search flows with advanced filters."""
-    query = FlowNode.accessible_to_user(db, current_user)
+    query = _apply_search_filters(FlowNode.accessible_to_user(db, current_user), search_params)
+    
+    # Apply sorting
+    if sort_by == "name":
+        order_attr = FlowNode.name
+    elif sort_by == "created_at":
+        order_attr = FlowNode.created_at
+    elif sort_by == "last_run_at":
+        order_attr = FlowNode.last_run_at
+    elif sort_by == "status":
+        order_attr = FlowNode.status
+    else:
+        order_attr = FlowNode.updated_at
+    
+    if sort_order == "desc":
+        query = query.order_by(order_attr.desc())
+    else:
+        query = query.order_by(order_attr.asc())
     
+    flows = query.offset(offset).limit(limit).all()
+    return flows
+
+@router.post("/search/facets", response_model=Dict[str, int])
+async def search_flow_facets(
+    search_params: FlowNodeSearch,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Count the tags of every flow matching the search filters, most used first."""
+    query = _apply_search_filters(FlowNode.accessible_to_user(db, current_user), search_params)
+    matching_ids = query.with_entities(FlowNode.id).order_by(None).statement
+    return dict(facet_counts(db, "flows", matching_ids, limit=limit))
+
+def _apply_search_filters(query, search_params: FlowNodeSearch):
+    """Apply FlowNodeSearch filters to a flow query."""
     # Apply search filters
     if search_params.name:
         query = query.filter(FlowNode.name.ilike(f"%{search_params.name}%"))
@@ -541,28 +580,9 @@ async def search_flows(
         query = query.filter(FlowNode.last_run_at <= search_params.last_run_before)
     
     if search_params.tags:
-        for tag in search_params.tags:
-            query = query.filter(FlowNode.tags.contains([tag]))
+        query = query.filter(tag_filter("flows", FlowNode.id, search_params.tags))
     
-    # Apply sorting
-    if sort_by == "name":
-        order_attr = FlowNode.name
-    elif sort_by == "created_at":
-        order_attr = FlowNode.created_at
-    elif sort_by == "last_run_at":
-        order_attr = FlowNode.last_run_at
-    elif sort_by == "status":
-        order_attr = FlowNode.status
-    else:
-        order_attr = FlowNode.updated_at
-    
-    if sort_order == "desc":
-        query = query.order_by(order_attr.desc())
-    else:
-        query = query.order_by(order_attr.asc())
-    
-    flows = query.offset(offset).limit(limit).all()
-    return flows
+    return query
 
 # Schedule management
 @router.get("/{flow_id}/schedule", response_model=Dict[str, Any])
@@ -696,6 +716,29 @@ async def get_flow_status(
         "blocking_issues": flow_node.get_blocking_issues_()
     }
 
+@router.get("/{flow_id}/readiness", response_model=Dict[str, Any])
+async def get_flow_readiness(
+    flow_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the nodes of a flow that can run now and what the others wait for."""
+    flow_node = db.query(FlowNode).filter(FlowNode.id == flow_id).first()
+    if not flow_node:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flow not found"
+        )
+    
+    if not flow_node.accessible_by_(current_user, 'read'):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this flow"
+        )
+    
+    readiness = ReadinessResolver.load(db, origin_node_id=flow_node.origin_node_id or flow_node.id)
+    return {"id": flow_node.id, **readiness.summary()}
+
 # Flow validation and testing
 @router.post("/{flow_id}/validate", response_model=Dict[str, Any])
 async def validate_flow(
@@ -768,6 +811,8 @@ async def bulk_activate_flows(
 ):
     """Activate multiple flows in bulk."""
     results = {"success": [], "failed": []}
+    # Origin node id -> its tree, so nodes of one flow share flow and project access checks
+    graphs = {}
     
     for flow_id in flow_ids:
         try:
@@ -776,7 +821,10 @@ async def bulk_activate_flows(
                 results["failed"].append({"id": flow_id, "error": "Flow not found"})
                 continue
             
-            if not flow_node.accessible_by_(current_user, 'write'):
+            origin_id = flow_node.origin_node_id or flow_node.id
+            if origin_id not in graphs:
+                graphs[origin_id] = flow_node.flow_graph()
+            if not flow_node.accessible_by_(current_user, 'write', graph=graphs[origin_id]):
                 results["failed"].append({"id": flow_id, "error": "Not authorized"})
                 continue
             
@@ -805,6 +853,8 @@ async def bulk_pause_flows(
 ):
     """Pause multiple flows in bulk."""
     results = {"success": [], "failed": []}
+    # Origin node id -> its tree, so nodes of one flow share flow and project access checks
+    graphs = {}
     
     for flow_id in flow_ids:
         try:
@@ -813,7 +863,10 @@ async def bulk_pause_flows(
                 results["failed"].append({"id": flow_id, "error": "Flow not found"})
                 continue
             
-            if not flow_node.accessible_by_(current_user, 'write'):
+            origin_id = flow_node.origin_node_id or flow_node.id
+            if origin_id not in graphs:
+                graphs[origin_id] = flow_node.flow_graph()
+            if not flow_node.accessible_by_(current_user, 'write', graph=graphs[origin_id]):
                 results["failed"].append({"id": flow_id, "error": "Not authorized"})
                 continue
             
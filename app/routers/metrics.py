@@ -1,9 +1,12 @@
 from typing import List, Optional, Dict, Any, Union
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 from enum import Enum
+import socket
+import numpy as np
 
 from app.database import get_db
 from app.auth.dependencies import get_current_user, require_permissions
@@ -14,6 +17,10 @@ from app.models.data_sink import DataSink
 from app.models.data_set import DataSet
 from app.models.flow_node import FlowNode
 from app.models.org import Org
+from app.services.latency_sketch import LatencyTracker, summarize
+from app.services.system_sampler import SystemSampler, FIELDS as SYSTEM_FIELDS, downsample
+from app.services.loop_watchdog import EventLoopWatchdog
+from app.services.request_profiler import RequestProfiler
 
 router = APIRouter()
 
@@ -62,8 +69,18 @@ class SystemMetrics(BaseModel):
     queue_depth: int
     error_rate_percent: float
     response_time_ms: float
+    response_time_percentiles_ms: Dict[str, Optional[float]] = {}
     timestamp: datetime
 
+class LatencySummary(BaseModel):
+    name: str
+    count: int
+    mean_ms: Optional[float]
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+    p99_ms: Optional[float]
+    p999_ms: Optional[float]
+
 class ResourceMetrics(BaseModel):
     resource_type: str
     resource_id: int
@@ -128,16 +145,24 @@ async def get_system_metrics(
             detail="Not authorized to view system metrics"
         )
     
-    # In production, this would collect real system metrics
+    # Request latency comes from the route sketches over the last five minutes
+    latency = summarize(LatencyTracker.instance().merged("route", window_seconds=300))
+    
+    # Resource figures come from the background sampler's latest reading
+    sample = SystemSampler.instance().latest()
+    
     system_metrics = SystemMetrics(
-        cpu_usage_percent=45.2,
-        memory_usage_percent=67.8,
-        disk_usage_percent=23.1,
-        network_io_mbps=124.5,
-        active_connections=1247,
+        cpu_usage_percent=sample["cpu_percent"] or 0.0,
+        memory_usage_percent=sample["memory_percent"] or 0.0,
+        disk_usage_percent=sample["disk_percent"] or 0.0,
+        network_io_mbps=sample["network_mbps"] or 0.0,
+        active_connections=int((sample["db_pool_checked_out"] or 0) + (sample["redis_pool_in_use"] or 0)),
         queue_depth=45,
         error_rate_percent=0.12,
-        response_time_ms=89.3,
+        response_time_ms=latency["p50_ms"] or 0.0,
+        response_time_percentiles_ms={
+            name: latency[f"{name}_ms"] for name in ("p50", "p95", "p99", "p999")
+        },
         timestamp=datetime.utcnow()
     )
     
@@ -152,13 +177,20 @@ async def get_system_timeseries(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get system metrics time series data."""
+    """Get system metrics time series data from the in-memory sampler buffers."""
     if not current_user.can_view_system_metrics_():
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view system metrics"
         )
     
+    unknown = [name for name in metrics if name not in SYSTEM_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown system metrics: {unknown}. Available: {list(SYSTEM_FIELDS)}"
+        )
+    
     # Calculate time window
     end_time = datetime.utcnow()
     if time_range == TimeRange.LAST_HOUR:
@@ -174,26 +206,124 @@ async def get_system_timeseries(
     else:  # LAST_90_DAYS
         start_time = end_time - timedelta(days=90)
     
-    # In production, this would query a time series database
+    _, rows = SystemSampler.instance().series(metrics, (end_time - start_time).total_seconds())
+    timestamps = rows[:, 0]
+    host = socket.gethostname()
+    
     metric_series = []
-    for metric_name in metrics:
-        series = MetricSeries(
+    for column, metric_name in enumerate(metrics, start=1):
+        values = rows[:, column]
+        points = downsample(timestamps, values, resolution_minutes * 60, aggregation.value)
+        present = values[~np.isnan(values)]
+        summary = {"count": int(present.size)}
+        if present.size:
+            summary.update({
+                "avg": round(float(present.mean()), 3),
+                "min": round(float(present.min()), 3),
+                "max": round(float(present.max()), 3)
+            })
+        
+        metric_series.append(MetricSeries(
             metric_name=metric_name,
             metric_type=MetricType.GAUGE,
-            labels={"host": "api-server-1"},
+            labels={"host": host},
             points=[
-                MetricPoint(
-                    timestamp=start_time + timedelta(minutes=i * resolution_minutes),
-                    value=50.0 + (i % 20),
-                    labels={}
-                ) for i in range(int((end_time - start_time).total_seconds() / (resolution_minutes * 60)))
+                MetricPoint(timestamp=datetime.utcfromtimestamp(timestamp), value=value, labels={})
+                for timestamp, value in points if value is not None
             ],
-            summary={"avg": 55.2, "min": 30.1, "max": 89.7, "count": 100}
-        )
-        metric_series.append(series)
+            summary=summary
+        ))
     
     return metric_series
 
+@router.get("/latency", response_model=List[LatencySummary])
+async def get_latency_percentiles(
+    kind: str = Query("route", pattern="^(route|task|flow_node)$"),
+    window_minutes: Optional[int] = Query(None, ge=1, le=60, description="Lookback; omit for since startup"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    """Get latency percentiles per route, Celery task or flow node, slowest p99 first."""
+    if not current_user.can_view_system_metrics_():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view system metrics"
+        )
+    
+    window_seconds = window_minutes * 60 if window_minutes else None
+    return LatencyTracker.instance().summary(kind, window_seconds)[:limit]
+
+@router.get("/event-loop/blocks", response_model=Dict[str, Any])
+async def get_event_loop_blocks(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+):
+    """Get recent event-loop stalls with the blocking stack and route (requires the watchdog)."""
+    if not current_user.can_view_system_metrics_():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view system metrics"
+        )
+    
+    watchdog = EventLoopWatchdog.instance()
+    return {
+        "enabled": watchdog.running,
+        "threshold_ms": watchdog.threshold_ms,
+        "blocks": watchdog.recent(limit)
+    }
+
+# Request profiles (admin only)
+@router.get("/profiles", response_model=List[Dict[str, Any]])
+async def list_request_profiles(
+    current_user: User = Depends(get_current_user)
+):
+    """List route templates with collected profiler samples."""
+    if not current_user.is_super_admin_():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super administrators can view request profiles"
+        )
+    
+    return RequestProfiler.instance().summary()
+
+@router.get("/profiles/export")
+async def export_request_profile(
+    route: str = Query(..., description="Route template, e.g. /api/v1/flows/{flow_id}"),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Export a route's profile as collapsed stacks (flamegraph.pl) or speedscope JSON."""
+    if not current_user.is_super_admin_():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super administrators can view request profiles"
+        )
+    
+    profiler = RequestProfiler.instance()
+    profile = profiler.collapsed(route) if format == "collapsed" else profiler.speedscope(route)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profile collected for this route"
+        )
+    
+    if format == "collapsed":
+        return PlainTextResponse(profile)
+    return profile
+
+@router.delete("/profiles", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_request_profiles(
+    current_user: User = Depends(get_current_user)
+):
+    """Discard all collected request profiles."""
+    if not current_user.is_super_admin_():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super administrators can manage request profiles"
+        )
+    
+    RequestProfiler.instance().reset()
+
 # Resource-specific metrics
 @router.get("/resources/{resource_type}/{resource_id}", response_model=ResourceMetrics)
 async def get_resource_metrics(
@@ -236,6 +366,8 @@ async def get_resource_metrics(
     
     # Get resource metrics
     metrics = resource.get_metrics_(time_range=time_range.value)
+    if resource_type == "flows":
+        metrics["latency"] = summarize(LatencyTracker.instance().merged("flow_node", str(resource_id)))
     
     return ResourceMetrics(
         resource_type=resource_type,
@@ -462,6 +594,7 @@ async def get_health_status(
     }
     
     if include_details:
+        latency = summarize(LatencyTracker.instance().merged("route", window_seconds=300))
         health_status.update({
             "services": {
                 "database": {"status": "healthy", "response_time_ms": 12},
@@ -472,7 +605,9 @@ async def get_health_status(
             "metrics": {
                 "requests_per_second": 150.3,
                 "error_rate_percent": 0.12,
-                "avg_response_time_ms": 89.3
+                "avg_response_time_ms": latency["mean_ms"],
+                "p95_response_time_ms": latency["p95_ms"],
+                "p99_response_time_ms": latency["p99_ms"]
             }
         })
     
@@ -14,6 +14,8 @@ from app.models.data_sink import DataSink
 from app.models.data_set import DataSet
 from app.models.flow_node import FlowNode
 from app.models.project import Project
+from app.services.search_index import SearchIndex, SearchPage
+from app.services.tag_index import tag_counts, tag_filter, facet_counts
 
 router = APIRouter()
 
@@ -45,6 +47,7 @@ class GlobalSearchRequest(BaseModel):
     include_archived: bool = Field(False)
     match_exact: bool = Field(False)
     case_sensitive: bool = Field(False)
+    tags: Optional[List[str]] = None
 
 class SearchResult(BaseModel):
     resource_type: str
@@ -64,6 +67,11 @@ class GlobalSearchResponse(BaseModel):
     query_time_ms: float
     resource_counts: Dict[str, int]
     suggestions: Optional[List[str]] = None
+    tag_facets: Optional[Dict[str, int]] = None
+
+class TagFacet(BaseModel):
+    tag: str
+    count: int
 
 @router.post("/", response_model=GlobalSearchResponse)
 async def global_search(
@@ -82,6 +90,28 @@ async def global_search(
         search_types = [ResourceType.DATA_SOURCES, ResourceType.DATA_SINKS, 
                        ResourceType.DATA_SETS, ResourceType.FLOWS, ResourceType.PROJECTS]
     
+    # Ranked lookup from the in-process index; exact and case-sensitive matching still scan the database
+    search_index = SearchIndex.instance()
+    if search_index.ready and not search_request.match_exact and not search_request.case_sensitive:
+        page = search_index.search(
+            search_request.query,
+            user_id=current_user.id,
+            org_id=getattr(current_user, 'default_org_id', None),
+            resource_types=[resource_type.value for resource_type in search_types],
+            fields=_index_fields(search_request.search_scopes),
+            limit=search_request.limit,
+            offset=search_request.offset,
+            project_id=search_request.project_id,
+            created_after=search_request.created_after,
+            created_before=search_request.created_before,
+            include_archived=search_request.include_archived,
+            tags=search_request.tags
+        )
+        if page.total:
+            # Searches that found something become typeahead suggestions for the org
+            search_index.record_query(getattr(current_user, 'default_org_id', None), search_request.query)
+        return _indexed_search_response(page, search_request, search_types, start_time)
+    
     # Search each resource type
     for resource_type in search_types:
         try:
@@ -111,7 +141,8 @@ async def global_search(
         total_results=len(all_results),
         query_time_ms=query_time_ms,
         resource_counts=resource_counts,
-        suggestions=suggestions
+        suggestions=suggestions,
+        tag_facets=_result_tag_facets(db, all_results)
     )
 
 @router.get("/{resource_type}/suggest", response_model=List[str])
@@ -130,6 +161,18 @@ async def get_search_suggestions(
             detail=f"Invalid resource type: {resource_type}"
         )
     
+    # Prefix lookup in the in-process index: names, tags and recent searches, most popular first
+    search_index = SearchIndex.instance()
+    if search_index.ready:
+        suggestions = search_index.suggest(
+            query,
+            user_id=current_user.id,
+            org_id=getattr(current_user, 'default_org_id', None),
+            resource_types=[resource_type.value],
+            limit=limit
+        )
+        return [suggestion.text for suggestion in suggestions]
+    
     # Get base query with user access
     base_query = model_class.accessible_to_user(db, current_user)
     
@@ -168,6 +211,11 @@ async def get_available_tags(
             detail=f"Invalid resource type: {resource_type}"
         )
     
+    # Materialized per-org counts; users without an org fall back to scanning what they can read
+    org_id = getattr(current_user, 'default_org_id', None)
+    if org_id is not None:
+        return [tag for tag, _ in tag_counts(db, org_id, [resource_type.value], contains=query, limit=limit, by_count=False)]
+    
     # Get all tags from accessible resources
     accessible_resources = model_class.accessible_to_user(db, current_user).all()
     all_tags = set()
@@ -186,6 +234,24 @@ async def get_available_tags(
     filtered_tags.sort()
     return filtered_tags[:limit]
 
+@router.get("/{resource_type}/tag-facets", response_model=List[TagFacet])
+async def get_tag_facets(
+    resource_type: ResourceType,
+    query: Optional[str] = Query(None, min_length=1, max_length=100),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the most used tags of the current org with how many resources carry each."""
+    org_id = getattr(current_user, 'default_org_id', None)
+    if org_id is None:
+        return []
+    resource_types = None if resource_type == ResourceType.ALL else [resource_type.value]
+    return [
+        TagFacet(tag=tag, count=count)
+        for tag, count in tag_counts(db, org_id, resource_types, contains=query, limit=limit)
+    ]
+
 @router.post("/advanced", response_model=GlobalSearchResponse)
 async def advanced_search(
     filters: Dict[str, Any],
@@ -321,6 +387,9 @@ async def _search_resource_type(
         if hasattr(model_class, 'archived'):
             query = query.filter(model_class.archived == False)
     
+    if search_request.tags:
+        query = query.filter(tag_filter(resource_type.value, model_class.id, search_request.tags))
+    
     # Execute search within scopes
     results = []
     search_term = search_request.query
@@ -453,6 +522,62 @@ async def _advanced_search_resource_type(
     
     return results
 
+def _index_fields(search_scopes: List[SearchScope]) -> Optional[List[str]]:
+    """Search index fields for the requested scopes (None means every field)."""
+    if SearchScope.ALL in search_scopes:
+        return None
+    scope_fields = {
+        SearchScope.NAME: "name",
+        SearchScope.DESCRIPTION: "description",
+        SearchScope.TAGS: "tags",
+        SearchScope.METADATA: "metadata",
+        SearchScope.CONFIG: "metadata"
+    }
+    return list(dict.fromkeys(scope_fields[scope] for scope in search_scopes))
+
+def _indexed_search_response(
+    page: SearchPage,
+    search_request: GlobalSearchRequest,
+    search_types: List[ResourceType],
+    start_time: datetime
+) -> GlobalSearchResponse:
+    """Build the global search response from a search index page."""
+    results = [
+        SearchResult(
+            resource_type=hit.document.resource_type,
+            resource_id=hit.document.resource_id,
+            name=hit.document.name,
+            description=hit.document.description,
+            score=round(hit.score, 4),
+            matches=[{"field": field, "terms": terms} for field, terms in hit.matches.items()],
+            created_at=hit.document.created_at,
+            updated_at=hit.document.updated_at,
+            project_id=hit.document.project_id,
+            org_id=hit.document.org_id
+        )
+        for hit in page.hits
+    ]
+    query_time_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+    return GlobalSearchResponse(
+        results=results,
+        total_results=page.total,
+        query_time_ms=query_time_ms,
+        resource_counts={resource_type.value: page.resource_counts.get(resource_type.value, 0) for resource_type in search_types},
+        suggestions=_generate_search_suggestions(search_request.query, results),
+        tag_facets=page.tag_counts
+    )
+
+def _result_tag_facets(db: Session, results: List[SearchResult], limit: int = 50) -> Dict[str, int]:
+    """Tag counts over database search results, from the tag index."""
+    ids_by_type: Dict[str, List[int]] = {}
+    for result in results:
+        ids_by_type.setdefault(result.resource_type, []).append(result.resource_id)
+    facets: Dict[str, int] = {}
+    for resource_type, ids in ids_by_type.items():
+        for tag, count in facet_counts(db, resource_type, ids, limit=limit):
+            facets[tag] = facets.get(tag, 0) + count
+    return dict(sorted(facets.items(), key=lambda item: (-item[1], item[0]))[:limit])
+
 def _get_model_class(resource_type: ResourceType):
     """Get the SQLAlchemy model class for a resource type."""
     mapping = {
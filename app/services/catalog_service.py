@@ -15,6 +15,9 @@ from app.models.data_schema import DataSchema
 from app.models.user import User
 from app.models.org import Org
 from app.models.marketplace_item import MarketplaceItem
+from app.services.related_index import RelatedIndex
+from app.services.schema_field_index import field_filter
+from app.services.tag_index import tag_filter, tag_search_filter
 
 logger = logging.getLogger(__name__)
 
@@ -98,11 +101,14 @@ class CatalogService:
             # Apply text search
             if query:
                 search_pattern = f"%{query}%"
+                # Tags and schema field names match by substring, like the name, through
+                # their derived tables rather than JSON scans
                 dataset_query = dataset_query.filter(
                     or_(
                         DataSet.name.like(search_pattern),
                         DataSet.description.like(search_pattern),
-                        DataSet.tags.op('JSON_SEARCH')('one', '$', search_pattern).isnot(None)
+                        tag_search_filter("data_sets", DataSet.id, query),
+                        field_filter("data_sets", DataSet.id, name=query, match="contains")
                     )
                 )
             
@@ -111,10 +117,12 @@ class CatalogService:
                 dataset_query = dataset_query.filter(DataSource.type == filters['source_type'])
             
             if filters.get('tags'):
-                for tag in filters['tags']:
-                    dataset_query = dataset_query.filter(
-                        DataSet.tags.op('JSON_CONTAINS')(f'"{tag}"')
-                    )
+                dataset_query = dataset_query.filter(tag_filter("data_sets", DataSet.id, filters['tags']))
+            
+            if filters.get('field_name') or filters.get('field_type'):
+                dataset_query = dataset_query.filter(field_filter(
+                    "data_sets", DataSet.id, name=filters.get('field_name'), field_type=filters.get('field_type')
+                ))
             
             datasets = dataset_query.limit(50).all()
             
@@ -320,7 +328,56 @@ class CatalogService:
             return {"error": str(e)}
     
     async def suggest_related_datasets(self, dataset_id: int, limit: int = 10) -> List[Dict[str, Any]]:
-        """Suggest related datasets based on various factors"""
+        """Suggest related datasets by shared tags and schema fields, and by data source"""
+        try:
+            index = RelatedIndex.instance()
+            if not index.ready:
+                # Until the first rebuild finishes
+                return self._scan_related_datasets(dataset_id, limit)
+            related = index.related(dataset_id, limit)
+            if not related:
+                return []
+            
+            # One query for the names of the suggestions and of the data set's source
+            rows = {
+                row.id: row for row in self.db.query(
+                    DataSet.id, DataSet.name, DataSet.description, DataSource.name.label("source")
+                ).outerjoin(DataSource, DataSource.id == DataSet.data_source_id).filter(
+                    DataSet.id.in_([dataset_id] + [suggestion.dataset_id for suggestion in related])
+                ).all()
+            }
+            source = rows[dataset_id].source if dataset_id in rows else None
+            
+            suggestions = []
+            for suggestion in related:
+                row = rows.get(suggestion.dataset_id)
+                if row is None:
+                    continue
+                reasons = []
+                if suggestion.shared_tags:
+                    reasons.append(f"Shares {len(suggestion.shared_tags)} tags: {', '.join(suggestion.shared_tags)}")
+                if suggestion.shared_fields:
+                    reasons.append(
+                        f"Shares {len(suggestion.shared_fields)} schema fields: {', '.join(suggestion.shared_fields[:10])}"
+                    )
+                if suggestion.same_source:
+                    reasons.append(f"From the same data source: {source}")
+                suggestions.append({
+                    "dataset_id": row.id,
+                    "name": row.name,
+                    "description": row.description,
+                    "similarity_score": suggestion.score,
+                    "similarity_reason": "; ".join(reasons),
+                    "source": row.source
+                })
+            return suggestions
+            
+        except Exception as e:
+            logger.error(f"Failed to suggest related datasets: {str(e)}")
+            return []
+    
+    def _scan_related_datasets(self, dataset_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Related datasets by comparing tags with every dataset in the org"""
         try:
             dataset = self.db.query(DataSet).filter(DataSet.id == dataset_id).first()
             if not dataset:
@@ -378,7 +435,7 @@ class CatalogService:
             return sorted_suggestions[:limit]
             
         except Exception as e:
-            logger.error(f"Failed to suggest related datasets: {str(e)}")
+            logger.error(f"Failed to scan related datasets: {str(e)}")
             return []
     
     # Helper methods
@@ -541,28 +598,32 @@ class CatalogService:
         }
     
     async def index_catalog_for_search(self, org_id: int) -> Dict[str, Any]:
-        """Index catalog content for search optimization"""
+        """Queue an incremental search index sync and report the org's catalog counts"""
+        from app.tasks.data_processing_tasks import update_search_index
+
         try:
+            # The sync is global and incremental, so it runs as the beat task does,
+            # under the same lock, rather than inline for one org
+            task = update_search_index.delay()
+
             indexing_results = {
+                "task_id": task.id,
+                "status": "queued",
                 "datasets_indexed": 0,
-                "items_indexed": 0,
-                "search_terms_extracted": 0,
-                "index_size_mb": 0
+                "items_indexed": 0
             }
-            
-            # This would typically index content in Elasticsearch or similar
-            # For now, return mock results
-            indexing_results["datasets_indexed"] = self.db.query(DataSet).join(DataSource).filter(
-                DataSource.org_id == org_id
+
+            indexing_results["datasets_indexed"] = self.db.query(DataSet).filter(
+                DataSet.org_id == org_id
             ).count()
-            
+
             indexing_results["items_indexed"] = self.db.query(MarketplaceItem).filter(
                 MarketplaceItem.org_id == org_id,
                 MarketplaceItem.status == "PUBLISHED"
             ).count()
-            
+
             return indexing_results
-            
+
         except Exception as e:
             logger.error(f"Failed to index catalog for search: {str(e)}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
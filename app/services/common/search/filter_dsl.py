@@ -0,0 +1,401 @@
+"""
+Search Filter DSL - Boolean filter trees compiled to a single SQL statement.
+Statements are built once per filter shape and cached; the values of each
+search are bound at execution.
+"""
+
+import itertools
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from typing import Optional, List, Dict, Any, Tuple, Type
+
+from sqlalchemy import and_, bindparam, func, not_, or_, select, true
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+
+class ArgumentError(Exception):
+    """Custom exception for argument validation errors"""
+    pass
+
+
+# Operators accepted per field type
+OPERATORS = {
+    'string': ['contains', 'eq', 'ne', 'starts_with', 'ends_with', 'in', 'not_in', 'is_null'],
+    'numeric': ['eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'between', 'in', 'not_in', 'is_null'],
+    'datetime': ['eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'between', 'is_null'],
+    'boolean': ['eq', 'ne', 'is_null'],
+    'tags': ['has_all', 'has_any'],
+    # Field names in the schema field index
+    'schema': ['contains', 'eq', 'starts_with'],
+}
+
+# Schema pseudo-fields and the schema column they search
+SCHEMA_FIELDS = {
+    'source_schema_properties': 'source_schema',
+    'output_schema_properties': 'output_schema',
+}
+
+# Bounds on filter trees accepted from clients
+MAX_NODES = 100
+MAX_DEPTH = 8
+
+LIKE_ESCAPE = '\\'
+
+
+def field_type_of(field_types: Dict[str, str], field: str) -> str:
+    """Type of a filterable field; schema pseudo-fields search the schema field index"""
+    if field not in field_types:
+        raise ArgumentError(f"Invalid field '{field}'")
+    return 'schema' if field in SCHEMA_FIELDS else field_types[field]
+
+
+def validate_leaf(field_types: Dict[str, str], field: str, operator: str, value: Any):
+    """
+    Check a single field/operator/value predicate.
+
+    Raises:
+        ArgumentError: Unknown field, operator not valid for the field type, or bad value
+    """
+    field_type = field_type_of(field_types, field)
+    if operator not in OPERATORS[field_type]:
+        raise ArgumentError(f"Invalid filter operator '{operator}' for {field_type} field '{field}'")
+    _leaf_values(field_type, operator, value, field)
+
+
+# Parsing: a tree becomes a hashable shape plus the values to bind, in walk order
+
+def parse_filter(tree: Optional[Dict[str, Any]], field_types: Dict[str, str]) -> Tuple[Any, List[Any]]:
+    """
+    Validate a filter tree and split it into its shape and values.
+
+    A tree is a leaf {"field", "operator", "value"} or {"and": [...]},
+    {"or": [...]} or {"not": {...}}. Trees with the same shape compile to
+    the same statement whatever their values.
+
+    Returns:
+        (shape, values); shape is None when the tree filters nothing
+    """
+    if not tree:
+        return None, []
+    # A single incomplete leaf filters nothing, as single filters always have
+    if _is_leaf(tree) and not _complete(tree):
+        return None, []
+    values: List[Any] = []
+    counter = [0]
+    shape = _parse_node(tree, field_types, values, 0, counter)
+    return shape, values
+
+
+def _is_leaf(node: Dict[str, Any]) -> bool:
+    return 'field' in node or 'operator' in node
+
+
+def _complete(leaf: Dict[str, Any]) -> bool:
+    return bool(leaf.get('field')) and bool(leaf.get('operator')) and (
+        leaf.get('value') is not None or leaf.get('operator') == 'is_null'
+    )
+
+
+def _parse_node(node: Any, field_types: Dict[str, str], values: List[Any], depth: int, counter: List[int]):
+    counter[0] += 1
+    if counter[0] > MAX_NODES:
+        raise ArgumentError(f"Filter has more than {MAX_NODES} conditions")
+    if depth > MAX_DEPTH:
+        raise ArgumentError(f"Filter is nested deeper than {MAX_DEPTH} levels")
+    if not isinstance(node, dict):
+        raise ArgumentError("Filter conditions must be objects")
+
+    if _is_leaf(node):
+        if not _complete(node):
+            raise ArgumentError("Filter conditions need a field, an operator and a value")
+        field, operator = node['field'], node['operator']
+        field_type = field_type_of(field_types, field)
+        if operator not in OPERATORS[field_type]:
+            raise ArgumentError(f"Invalid filter operator '{operator}' for {field_type} field '{field}'")
+        leaf_values, variant = _leaf_values(field_type, operator, node.get('value'), field)
+        values.extend(leaf_values)
+        return ('leaf', field, field_type, operator, variant)
+
+    if len(node) != 1:
+        raise ArgumentError("Filter groups take exactly one of 'and', 'or', 'not'")
+    (combinator, children), = node.items()
+    if combinator == 'not':
+        return ('not', _parse_node(children, field_types, values, depth + 1, counter))
+    if combinator not in ('and', 'or'):
+        raise ArgumentError(f"Unknown filter combinator '{combinator}'")
+    if not isinstance(children, list) or not children:
+        raise ArgumentError(f"'{combinator}' takes a non-empty list of conditions")
+    return (combinator, tuple(_parse_node(child, field_types, values, depth + 1, counter) for child in children))
+
+
+def _leaf_values(field_type: str, operator: str, value: Any, field: str) -> Tuple[List[Any], Any]:
+    """Values to bind for a leaf, and the part of the value that shapes the SQL (is_null's polarity)"""
+    if operator == 'is_null':
+        return [], value is None or _as_bool(value, field)
+    if field_type in ('string', 'schema'):
+        if operator in ('in', 'not_in'):
+            return [[str(item) for item in _as_list(value, field)]], None
+        text = str(value)
+        if field_type == 'schema':
+            text = text.lower()
+        patterns = {'contains': '%{}%', 'starts_with': '{}%', 'ends_with': '%{}'}
+        if operator in patterns:
+            return [patterns[operator].format(_escape_like(text))], None
+        return [text], None
+    if field_type in ('numeric', 'datetime'):
+        convert = _as_number if field_type == 'numeric' else _as_datetime
+        if operator == 'between':
+            bounds = _as_list(value, field)
+            if len(bounds) != 2:
+                raise ArgumentError(f"'between' on '{field}' takes [low, high]")
+            return [convert(bounds[0], field), convert(bounds[1], field)], None
+        if operator in ('in', 'not_in'):
+            return [[convert(item, field) for item in _as_list(value, field)]], None
+        return [convert(value, field)], None
+    if field_type == 'boolean':
+        return [_as_bool(value, field)], None
+    if field_type == 'tags':
+        from ...tag_index import normalize_tags
+        tags = normalize_tags(_as_list(value, field))
+        if not tags:
+            raise ArgumentError(f"Tag filter on '{field}' needs at least one tag")
+        return ([tags, len(tags)] if operator == 'has_all' else [tags]), None
+    raise ArgumentError(f"Unsupported field type for '{field}'")
+
+
+def _as_list(value: Any, field: str) -> List[Any]:
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    raise ArgumentError(f"Filter on '{field}' takes a list of values")
+
+
+def _as_number(value: Any, field: str):
+    if isinstance(value, bool):
+        raise ArgumentError(f"Invalid value '{value}' for numeric field '{field}'")
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        raise ArgumentError(f"Invalid value '{value}' for numeric field '{field}'")
+    return int(number) if number.is_integer() else number
+
+
+def _as_datetime(value: Any, field: str) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ArgumentError(f"Invalid value '{value}' for datetime field '{field}'")
+
+
+def _as_bool(value: Any, field: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ('true', '1', 'yes'):
+        return True
+    if str(value).lower() in ('false', '0', 'no'):
+        return False
+    raise ArgumentError(f"Invalid value '{value}' for boolean field '{field}'")
+
+
+def _escape_like(text: str) -> str:
+    return text.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace('%', LIKE_ESCAPE + '%').replace('_', LIKE_ESCAPE + '_')
+
+
+# Building: shape -> criterion with bind parameters p0, p1, ... in walk order
+
+def build_statement(model_class: Type, shape: Any, include_public: bool = False, ids_only: bool = False) -> Select:
+    """
+    Statement selecting the model (or just its ids) in an org, filtered by shape.
+
+    The org (:org_id) and public-resource predicates are part of the WHERE
+    clause rather than a UNION of two queries. Values are left unbound.
+    model_class may also be a Table, selected as rows; with ids_only
+    neither needs the mapper.
+    """
+    table = getattr(model_class, "__table__", model_class)
+    access = table.c.org_id == bindparam('org_id')
+    public = table.c.get('public')
+    if include_public and public is not None:
+        access = or_(access, public == true())
+
+    statement = select(table.c.id) if ids_only else select(model_class)
+    statement = statement.where(access)
+    if shape is not None:
+        statement = statement.where(_criterion(table, shape, _Params()))
+    return statement.order_by(table.c.id)
+
+
+def filter_criterion(model_class: Type, tree: Optional[Dict[str, Any]], field_types: Dict[str, str]):
+    """
+    WHERE criterion for a filter tree with its values bound, for composing
+    with an existing query (None when the tree filters nothing).
+    """
+    shape, values = parse_filter(tree, field_types)
+    if shape is None:
+        return None
+    return _criterion(getattr(model_class, "__table__", model_class), shape, _Params(values))
+
+
+class _Params:
+    """Hands out p0, p1, ... in walk order, bound to values when given"""
+
+    def __init__(self, values: Optional[List[Any]] = None):
+        self._names = (f"p{index}" for index in itertools.count())
+        self._values = iter(values) if values is not None else None
+
+    def next(self, expanding: bool = False):
+        name = next(self._names)
+        if self._values is None:
+            return bindparam(name, expanding=expanding)
+        return bindparam(name, value=next(self._values), expanding=expanding)
+
+
+def _criterion(table, shape, params: _Params):
+    kind = shape[0]
+    if kind == 'and':
+        return and_(*(_criterion(table, child, params) for child in shape[1]))
+    if kind == 'or':
+        return or_(*(_criterion(table, child, params) for child in shape[1]))
+    if kind == 'not':
+        return not_(_criterion(table, shape[1], params))
+
+    _, field, field_type, operator, variant = shape
+    if field_type == 'schema':
+        return _schema_criterion(table, SCHEMA_FIELDS[field], operator, params)
+    if field_type == 'tags':
+        return _tag_criterion(table, operator, params)
+
+    column = table.c.get(field)
+    if column is None:
+        raise ArgumentError(f"Field '{field}' is not filterable on {table.name}")
+    if operator == 'is_null':
+        return column.is_(None) if variant else column.isnot(None)
+    if operator in ('in', 'not_in'):
+        values = params.next(expanding=True)
+        return column.in_(values) if operator == 'in' else column.not_in(values)
+    if operator == 'between':
+        return column.between(params.next(), params.next())
+    value = params.next()
+    if operator in ('contains', 'starts_with', 'ends_with'):
+        return column.ilike(value, escape=LIKE_ESCAPE)
+    return {
+        'eq': column.__eq__, 'ne': column.__ne__,
+        'gt': column.__gt__, 'gte': column.__ge__, 'lt': column.__lt__, 'lte': column.__le__,
+    }[operator](value)
+
+
+def _tag_criterion(table, operator, params: _Params):
+    from ....database import Base
+    from ...search_index import RESOURCES_BY_TABLE
+
+    assignments = Base.metadata.tables['tag_assignments']
+    spec = RESOURCES_BY_TABLE.get(table.name)
+    resource_type = spec.resource_type if spec else table.name
+    matching = select(assignments.c.resource_id).where(
+        assignments.c.resource_type == resource_type,
+        assignments.c.tag.in_(params.next(expanding=True))
+    )
+    if operator == 'has_all':
+        matching = matching.group_by(assignments.c.resource_id).having(func.count() == params.next())
+    return table.c.id.in_(matching)
+
+
+def _schema_criterion(table, schema_column, operator, params: _Params):
+    from ....database import Base
+
+    fields = Base.metadata.tables['schema_fields']
+    value = params.next()
+    name_match = fields.c.name_key == value if operator == 'eq' else fields.c.name_key.like(value, escape=LIKE_ESCAPE)
+    return table.c.id.in_(select(fields.c.resource_id).where(
+        fields.c.resource_type == table.name,
+        fields.c.schema_column == schema_column,
+        name_match
+    ))
+
+
+# Caching by shape
+
+class StatementCache:
+    """
+    LRU cache of built statements keyed by model, filter shape and mode.
+
+    Saved searches re-run with the same shape skip query construction;
+    only their values are bound again.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._statements: "OrderedDict[Tuple, Select]" = OrderedDict()
+        self._mutex = Lock()
+
+    @classmethod
+    def instance(cls) -> "StatementCache":
+        """Get singleton instance"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def get(self, model_class: Type, shape: Any, include_public: bool, ids_only: bool) -> Select:
+        key = (model_class, shape, include_public, ids_only)
+        with self._mutex:
+            statement = self._statements.get(key)
+            if statement is not None:
+                self._statements.move_to_end(key)
+                self.hits += 1
+                return statement
+            self.misses += 1
+        statement = build_statement(model_class, shape, include_public, ids_only)
+        with self._mutex:
+            self._statements[key] = statement
+            while len(self._statements) > self.max_size:
+                self._statements.popitem(last=False)
+        return statement
+
+    def clear(self):
+        with self._mutex:
+            self._statements.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+
+def compile_search(
+    model_class: Type,
+    tree: Optional[Dict[str, Any]],
+    field_types: Dict[str, str],
+    org_id: int,
+    include_public: bool = False,
+    ids_only: bool = False
+) -> Tuple[Select, Dict[str, Any]]:
+    """
+    Statement and parameters for a filtered search in an org.
+
+    Args:
+        model_class: Mapped model (or Table) to search
+        tree: Filter tree (see parse_filter)
+        field_types: Filterable fields of the model and their types
+        org_id: Org whose resources are searched
+        include_public: Also match public resources of other orgs
+        ids_only: Select primary keys instead of full rows
+
+    Returns:
+        (statement, params) for Session.execute
+    """
+    shape, values = parse_filter(tree, field_types)
+    statement = StatementCache.instance().get(model_class, shape, include_public, ids_only)
+    params = {f"p{index}": value for index, value in enumerate(values)}
+    params['org_id'] = org_id
+    return statement, params
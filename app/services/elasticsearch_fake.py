@@ -0,0 +1,317 @@
+"""
+In-Memory Elasticsearch - Offline stand-in for the elasticsearch client.
+Implements the subset of the client API the search indexer uses (indices,
+index/get/delete, bulk, search, count) plus failure injection for tests.
+"""
+
+import copy
+import json
+from collections import deque
+from threading import RLock
+from typing import Dict, Any, Optional, List, Tuple
+
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from elasticsearch import ApiError, BadRequestError, ConnectionError, NotFoundError
+
+_NODE = NodeConfig("http", "localhost", 9200)
+
+_ERROR_TYPES = {
+    400: "mapper_parsing_exception",
+    404: "document_missing_exception",
+    409: "version_conflict_engine_exception",
+    429: "es_rejected_execution_exception",
+    500: "internal_server_error",
+    503: "unavailable_shards_exception",
+}
+
+
+def _meta(status: int) -> ApiResponseMeta:
+    return ApiResponseMeta(status=status, http_version="1.1", headers=HttpHeaders(), duration=0.0, node=_NODE)
+
+
+def _api_error(status: int, message: str, error_class: type = ApiError) -> ApiError:
+    body = {"error": {"type": _ERROR_TYPES.get(status, "exception"), "reason": message}, "status": status}
+    return error_class(message, _meta(status), body)
+
+
+class _Indices:
+    """The client.indices namespace"""
+
+    def __init__(self, client: "InMemoryElasticsearch"):
+        self._client = client
+
+    def create(self, *, index: str, mappings: Optional[Dict[str, Any]] = None,
+               settings: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        with self._client._lock:
+            self._client._record("indices.create", index=index)
+            if index in self._client._indices:
+                raise _api_error(400, f"index [{index}] already exists", BadRequestError)
+            self._client._indices[index] = {}
+            self._client._mappings[index] = copy.deepcopy(mappings or {})
+        return {"acknowledged": True, "index": index}
+
+    def exists(self, *, index: str, **kwargs) -> bool:
+        with self._client._lock:
+            return index in self._client._indices
+
+    def delete(self, *, index: str, **kwargs) -> Dict[str, Any]:
+        with self._client._lock:
+            self._client._record("indices.delete", index=index)
+            if index not in self._client._indices:
+                raise _api_error(404, f"no such index [{index}]", NotFoundError)
+            del self._client._indices[index]
+            self._client._mappings.pop(index, None)
+        return {"acknowledged": True}
+
+    def get_mapping(self, *, index: str, **kwargs) -> Dict[str, Any]:
+        with self._client._lock:
+            if index not in self._client._indices:
+                raise _api_error(404, f"no such index [{index}]", NotFoundError)
+            return {index: {"mappings": copy.deepcopy(self._client._mappings[index])}}
+
+    def refresh(self, *, index: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        # Writes are visible immediately; nothing to do
+        return {"_shards": {"failed": 0}}
+
+
+class InMemoryElasticsearch:
+    """
+    Elasticsearch-compatible client holding documents in dictionaries.
+
+    Indices are created on first write, like a cluster with automatic index
+    creation. Failures can be queued with fail_next_requests() (transport
+    errors or top-level statuses) and fail_next_items() (per-item bulk
+    statuses). Every call is appended to requests for assertions.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._indices: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._mappings: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self._request_failures: deque = deque()
+        self._item_failures: deque = deque()
+        self.requests: List[Dict[str, Any]] = []
+        self.indices = _Indices(self)
+        self._ignore_status: Tuple[int, ...] = ()
+
+    # Failure injection
+
+    def fail_next_requests(self, count: int = 1, status: Optional[int] = None, method: Optional[str] = None):
+        """Fail the next count requests (of one method, or any): with a connection error, or an API error with status"""
+        self._request_failures.extend([(method, status)] * count)
+
+    def fail_next_items(self, statuses: List[int]):
+        """Fail the next bulk items, one per status, in order"""
+        self._item_failures.extend(statuses)
+
+    def _record(self, method: str, **details):
+        self.requests.append({"method": method, **details})
+
+    def _maybe_fail(self, method: str):
+        if not self._request_failures or self._request_failures[0][0] not in (None, method):
+            return
+        _, status = self._request_failures.popleft()
+        if status is None:
+            raise ConnectionError("Connection refused (injected)")
+        raise _api_error(status, "injected failure")
+
+    # Client API
+
+    def options(self, *, ignore_status: Any = (), **kwargs) -> "InMemoryElasticsearch":
+        """Shallow view sharing storage that tolerates the given statuses, like Elasticsearch.options()"""
+        view = copy.copy(self)
+        view._ignore_status = (ignore_status,) if isinstance(ignore_status, int) else tuple(ignore_status)
+        return view
+
+    def ping(self, **kwargs) -> bool:
+        return True
+
+    def index(self, *, index: str, document: Dict[str, Any], id: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self._record("index", index=index, id=id)
+            self._maybe_fail("index")
+            return self._write(index, id, document)
+
+    def get(self, *, index: str, id: str, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self._record("get", index=index, id=id)
+            self._maybe_fail("get")
+            source = self._indices.get(index, {}).get(str(id))
+            if source is None:
+                if 404 in self._ignore_status:
+                    return {"_index": index, "_id": str(id), "found": False}
+                raise _api_error(404, f"document [{id}] not found", NotFoundError)
+            return {"_index": index, "_id": str(id), "found": True, "_source": copy.deepcopy(source),
+                    "_version": self._versions[(index, str(id))]}
+
+    def delete(self, *, index: str, id: str, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self._record("delete", index=index, id=id)
+            self._maybe_fail("delete")
+            result = self._remove(index, str(id))
+            if result["result"] == "not_found" and 404 not in self._ignore_status:
+                raise _api_error(404, f"document [{id}] not found", NotFoundError)
+            return result
+
+    def bulk(self, *, operations: List[Any], index: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Apply NDJSON-style bulk operations (action line, then source line for index/create/update).
+
+        Returns:
+            The bulk response: took, errors and one item per action
+        """
+        with self._lock:
+            lines = [json.loads(line) if isinstance(line, (str, bytes)) else line for line in operations]
+            self._record("bulk", actions=sum(1 for line in lines if _action_of(line)),
+                         bytes=sum(len(json.dumps(line, default=str)) + 1 for line in lines))
+            self._maybe_fail("bulk")
+
+            items = []
+            position = 0
+            while position < len(lines):
+                action = _action_of(lines[position])
+                if action is None:
+                    raise _api_error(400, f"Malformed action/metadata line [{position + 1}]", BadRequestError)
+                meta = lines[position][action]
+                position += 1
+                source = None
+                if action in ("index", "create", "update"):
+                    source = lines[position]
+                    position += 1
+                items.append({action: self._bulk_item(action, meta.get("_index", index), meta.get("_id"), source)})
+            return {"took": 0, "errors": any("error" in next(iter(item.values())) for item in items), "items": items}
+
+    def _bulk_item(self, action: str, index: str, doc_id: Optional[str], source: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if self._item_failures:
+            status = self._item_failures.popleft()
+            return {"_index": index, "_id": doc_id, "status": status,
+                    "error": {"type": _ERROR_TYPES.get(status, "exception"), "reason": "injected failure"}}
+        doc_id = None if doc_id is None else str(doc_id)
+        existing = self._indices.get(index, {}).get(doc_id) if doc_id is not None else None
+        if action == "create" and existing is not None:
+            return {"_index": index, "_id": doc_id, "status": 409,
+                    "error": {"type": _ERROR_TYPES[409], "reason": "document already exists"}}
+        if action == "update":
+            if existing is None:
+                return {"_index": index, "_id": doc_id, "status": 404,
+                        "error": {"type": _ERROR_TYPES[404], "reason": "document missing"}}
+            merged = {**existing, **source.get("doc", {})}
+            return self._write(index, doc_id, merged, result="updated")
+        if action == "delete":
+            return self._remove(index, doc_id)
+        return self._write(index, doc_id, source)
+
+    def _write(self, index: str, doc_id: Optional[str], document: Dict[str, Any], result: Optional[str] = None) -> Dict[str, Any]:
+        docs = self._indices.setdefault(index, {})
+        self._mappings.setdefault(index, {})
+        if doc_id is None:
+            doc_id = f"auto-{len(docs) + 1}"
+        created = doc_id not in docs
+        docs[doc_id] = json.loads(json.dumps(document, default=str))
+        version = self._versions.get((index, doc_id), 0) + 1
+        self._versions[(index, doc_id)] = version
+        return {"_index": index, "_id": doc_id, "_version": version,
+                "result": result or ("created" if created else "updated"), "status": 201 if created else 200}
+
+    def _remove(self, index: str, doc_id: str) -> Dict[str, Any]:
+        docs = self._indices.get(index, {})
+        if docs.pop(doc_id, None) is None:
+            return {"_index": index, "_id": doc_id, "result": "not_found", "status": 404}
+        self._versions.pop((index, doc_id), None)
+        return {"_index": index, "_id": doc_id, "result": "deleted", "status": 200}
+
+    def search(self, *, index: str, query: Optional[Dict[str, Any]] = None, size: int = 10,
+               from_: int = 0, sort: Any = None, **kwargs) -> Dict[str, Any]:
+        """Search with match_all, term, terms, match, range and bool queries"""
+        with self._lock:
+            self._record("search", index=index)
+            self._maybe_fail("search")
+            hits = [
+                {"_index": name, "_id": doc_id, "_score": 1.0, "_source": copy.deepcopy(source)}
+                for name in self._resolve(index)
+                for doc_id, source in self._indices[name].items()
+                if _matches(source, query or {"match_all": {}})
+            ]
+            for key, descending in reversed(_sort_keys(sort)):
+                hits.sort(key=lambda hit: (hit["_source"].get(key) is None, hit["_source"].get(key)), reverse=descending)
+            return {"took": 0, "timed_out": False,
+                    "hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits[from_:from_ + size]}}
+
+    def count(self, *, index: str, query: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_fail("count")
+            return {"count": sum(
+                1 for name in self._resolve(index)
+                for source in self._indices[name].values()
+                if _matches(source, query or {"match_all": {}})
+            )}
+
+    def documents(self, index: str) -> Dict[str, Dict[str, Any]]:
+        """Copy of every document in an index keyed by id (test helper, not part of the client API)"""
+        with self._lock:
+            return copy.deepcopy(self._indices.get(index, {}))
+
+    def _resolve(self, index: str) -> List[str]:
+        names = []
+        for pattern in index.split(","):
+            if pattern.endswith("*"):
+                names.extend(name for name in self._indices if name.startswith(pattern[:-1]))
+            elif pattern in self._indices:
+                names.append(pattern)
+            elif 404 not in self._ignore_status:
+                raise _api_error(404, f"no such index [{pattern}]", NotFoundError)
+        return names
+
+
+def _action_of(line: Any) -> Optional[str]:
+    if isinstance(line, dict) and len(line) == 1:
+        action = next(iter(line))
+        if action in ("index", "create", "update", "delete"):
+            return action
+    return None
+
+
+def _sort_keys(sort: Any) -> List[Tuple[str, bool]]:
+    keys = []
+    for entry in sort or []:
+        if isinstance(entry, str):
+            keys.append((entry, False))
+        else:
+            for key, order in entry.items():
+                direction = order.get("order", "asc") if isinstance(order, dict) else order
+                keys.append((key, direction == "desc"))
+    return keys
+
+
+def _matches(source: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    (kind, body), = query.items()
+    if kind == "match_all":
+        return True
+    if kind == "bool":
+        must = body.get("must", []) + body.get("filter", [])
+        must = must if isinstance(must, list) else [must]
+        should = body.get("should", [])
+        must_not = body.get("must_not", [])
+        return (all(_matches(source, clause) for clause in must)
+                and (not should or any(_matches(source, clause) for clause in should))
+                and not any(_matches(source, clause) for clause in must_not))
+    (field, value), = body.items()
+    actual = source.get(field)
+    if kind == "term":
+        value = value.get("value") if isinstance(value, dict) else value
+        return actual == value or (isinstance(actual, list) and value in actual)
+    if kind == "terms":
+        return actual in value or (isinstance(actual, list) and bool(set(actual) & set(value)))
+    if kind == "match":
+        text = value.get("query") if isinstance(value, dict) else value
+        haystack = " ".join(map(str, actual)) if isinstance(actual, list) else str(actual or "")
+        words = set(haystack.lower().split())
+        return any(word in words for word in str(text).lower().split())
+    if kind == "range":
+        if actual is None:
+            return False
+        checks = {"gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+                  "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b}
+        return all(checks[op](actual, bound) for op, bound in value.items() if op in checks)
+    raise _api_error(400, f"unknown query [{kind}]", BadRequestError)
@@ -21,6 +21,7 @@ from ..models.enterprise import (
 )
 from ..models.user import User
 from ..models.org import Org
+from .tracing import aiohttp_trace_config
 
 logger = logging.getLogger(__name__)
 
@@ -130,7 +131,7 @@ class EnterpriseIntegrationService:
         
         headers = await self._build_authentication_headers(integration)
         
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
             # Try a simple GET request or use health check endpoint
             health_check_url = integration.health_check_config.get("url") if integration.health_check_config else integration.endpoint_url
             
@@ -271,7 +272,7 @@ class EnterpriseIntegrationService:
         
         url = f"{integration.endpoint_url}{endpoint}"
         
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
             async with session.request(
                 method,
                 url,
@@ -0,0 +1,367 @@
+"""
+Flow Copy - Bulk copies of whole flows.
+Reads a flow's nodes, sources, sets and sinks once, inserts the copies table by
+table and remaps every reference between them in memory, in the caller's transaction.
+Core inserts bypass the ORM flush hooks, so the copies' tag and schema field rows
+are written here too.
+"""
+
+import logging
+import secrets
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable
+
+from sqlalchemy import case, insert, select, update
+
+from app.services.flow_graph import FlowGraph, GraphNode, NODE_COLUMNS, RESOURCE_TABLES
+from app.services.schema_field_index import SCHEMA_COLUMNS, sync_schema_fields
+from app.services.search_index import RESOURCES_BY_TABLE
+from app.services.tag_index import normalize_tags, sync_tags
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT / SELECT / UPDATE statement
+COPY_BATCH_SIZE = 500
+
+# Resources first, nodes last, so progress reads in dependency order
+COPY_TABLES = ("data_sources", "data_sets", "data_sinks", "flow_nodes")
+
+# Unique column each copy is given up front; new ids are read back by it,
+# since MySQL has no INSERT ... RETURNING
+UNIQUE_KEYS = {
+    "flow_nodes": "uid",
+    "data_sources": "uuid",
+    "data_sets": "uuid",
+    "data_sinks": "uuid",
+}
+
+# Columns pointing at rows copied along: table -> column -> referenced table
+REFERENCES = {
+    "flow_nodes": {
+        "origin_node_id": "flow_nodes",
+        "parent_node_id": "flow_nodes",
+        "data_source_id": "data_sources",
+        "data_set_id": "data_sets",
+        "data_sink_id": "data_sinks",
+    },
+    "data_sources": {
+        "flow_node_id": "flow_nodes",
+        "origin_node_id": "flow_nodes",
+        "data_sink_id": "data_sinks",
+    },
+    "data_sets": {
+        "flow_node_id": "flow_nodes",
+        "origin_node_id": "flow_nodes",
+        "data_source_id": "data_sources",
+        "parent_data_set_id": "data_sets",
+    },
+    "data_sinks": {
+        "flow_node_id": "flow_nodes",
+        "origin_node_id": "flow_nodes",
+        "data_set_id": "data_sets",
+        "data_source_id": "data_sources",
+    },
+}
+
+# Reset to the column default on copies
+RESET_COLUMNS = ("status", "runtime_status")
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def _tables():
+    from app.database import Base
+    return Base.metadata.tables
+
+
+def _new_key(table_name: str) -> str:
+    return secrets.token_hex(12) if table_name == "flow_nodes" else str(uuid.uuid4())
+
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@dataclass
+class FlowCopyResult:
+    """Outcome of a copy"""
+    origin_node_id: Optional[int]
+    root_node_id: Optional[int]
+    # table -> original id -> copy id
+    id_map: Dict[str, Dict[int, int]] = field(default_factory=dict)
+    statements: int = 0
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        return {table_name: len(ids) for table_name, ids in self.id_map.items()}
+
+
+class FlowCopier:
+    """
+    Copies the subtree under a node of one origin.
+
+    Reads take one query for the nodes and one per resource table; writes
+    take one INSERT, one id read-back and one remapping UPDATE per table
+    (per COPY_BATCH_SIZE rows), whatever the depth of the flow.
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        owner_id: Optional[int] = None,
+        org_id: Optional[int] = None,
+        copy_dependent_data_flows: bool = False,
+        progress: Optional[ProgressCallback] = None
+    ):
+        self.connection = connection
+        self.owner_id = owner_id
+        self.org_id = org_id
+        self.copy_dependent_data_flows = copy_dependent_data_flows
+        self.progress = progress
+        self.statements = 0
+
+    def copy(self, node_id: int, parent_node_id: Optional[int] = None) -> FlowCopyResult:
+        """
+        Copy node_id and its same-origin descendants.
+
+        Args:
+            node_id: Top of the copied subtree; usually an origin node
+            parent_node_id: Node to attach the copy under, joining its flow;
+                the copy becomes a flow of its own when None
+
+        Returns:
+            FlowCopyResult with the new root and the id map; empty for unknown nodes
+        """
+        rows = self._read(node_id)
+        if not rows["flow_nodes"]:
+            return FlowCopyResult(origin_node_id=None, root_node_id=None)
+
+        attach = self._read_parent(parent_node_id) if parent_node_id is not None else None
+        total = sum(len(table_rows) for table_rows in rows.values())
+        id_map: Dict[str, Dict[int, int]] = {}
+        done = 0
+        for table_name in COPY_TABLES:
+            id_map[table_name] = self._insert(table_name, rows[table_name])
+            done += len(rows[table_name])
+            self._report("insert", done, total)
+
+        root_id = id_map["flow_nodes"][node_id]
+        origin_id = attach["origin_node_id"] if attach else root_id
+        done = 0
+        for table_name in COPY_TABLES:
+            overrides = {"origin_node_id": origin_id}
+            self._remap(table_name, rows[table_name], id_map, overrides)
+            done += len(rows[table_name])
+            self._report("remap", done, total)
+        self._attach_root(root_id, parent_node_id, attach)
+        self._sync_indexes(rows, id_map)
+
+        logger.info(
+            f"Copied flow node {node_id} to {root_id}: "
+            + ", ".join(f"{len(ids)} {table_name}" for table_name, ids in id_map.items())
+            + f" in {self.statements} statements"
+        )
+        return FlowCopyResult(origin_node_id=origin_id, root_node_id=root_id, id_map=id_map, statements=self.statements)
+
+    # Reading
+
+    def _execute(self, statement, parameters=None):
+        self.statements += 1
+        if parameters is None:
+            return self.connection.execute(statement)
+        return self.connection.execute(statement, parameters)
+
+    def _read(self, node_id: int) -> Dict[str, List[Dict[str, Any]]]:
+        """Full rows of the copied nodes and the resources they wrap"""
+        tables = _tables()
+        nodes_table = tables["flow_nodes"]
+        origin = select(nodes_table.c.origin_node_id).where(nodes_table.c.id == node_id).scalar_subquery()
+        node_rows = {
+            row["id"]: dict(row)
+            for row in self._execute(select(nodes_table).where(nodes_table.c.origin_node_id == origin)).mappings()
+        }
+        graph = FlowGraph(node_id, {
+            row["id"]: GraphNode(**{name: row[name] for name in NODE_COLUMNS}) for row in node_rows.values()
+        })
+
+        copied: List[Dict[str, Any]] = []
+        pruned = set()
+        for node in graph.walk(node_id):
+            row = node_rows[node.id]
+            # Downstream flows fed by a source of their own are shared, not copied, unless asked for
+            if node.parent_node_id in pruned or (
+                node.id != node_id and row["data_source_id"] is not None and not self.copy_dependent_data_flows
+            ):
+                pruned.add(node.id)
+                continue
+            copied.append(row)
+        self._report("read", len(copied), len(node_rows))
+
+        rows = {"flow_nodes": copied}
+        for key, table_name in RESOURCE_TABLES.items():
+            table = tables[table_name]
+            ids = sorted({row[key] for row in copied if row[key] is not None})
+            rows[table_name] = [
+                dict(row)
+                for batch in _chunks(ids, COPY_BATCH_SIZE)
+                for row in self._execute(select(table).where(table.c.id.in_(batch))).mappings()
+            ]
+        return rows
+
+    def _read_parent(self, parent_node_id: int) -> Dict[str, Any]:
+        nodes_table = _tables()["flow_nodes"]
+        parent = self._execute(
+            select(nodes_table.c.id, nodes_table.c.origin_node_id, nodes_table.c.shared_origin_node_id)
+            .where(nodes_table.c.id == parent_node_id)
+        ).mappings().first()
+        if parent is None:
+            raise ValueError(f"Flow node {parent_node_id} not found")
+        return dict(parent)
+
+    # Writing
+
+    def _copy_row(self, table, row: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        """A row's copy before references are remapped"""
+        values = {name: value for name, value in row.items() if name != "id"}
+        values[UNIQUE_KEYS[table.name]] = _new_key(table.name)
+        values["copied_from_id"] = row["id"]
+        for column in table.c:
+            if column.name in ("created_at", "updated_at"):
+                values[column.name] = now
+            elif column.name.endswith("_at") and column.nullable:
+                # Lifecycle timestamps belong to the original
+                values[column.name] = None
+            elif column.name in RESET_COLUMNS:
+                default = column.default
+                values[column.name] = default.arg if default is not None and default.is_scalar else None
+        if self.owner_id is not None:
+            values["owner_id"] = self.owner_id
+        if self.org_id is not None:
+            values["org_id"] = self.org_id
+        return values
+
+    def _insert(self, table_name: str, rows: List[Dict[str, Any]]) -> Dict[int, int]:
+        """Insert copies of rows; returns original id -> copy id"""
+        if not rows:
+            return {}
+        table = _tables()[table_name]
+        key = table.c[UNIQUE_KEYS[table_name]]
+        now = datetime.now()
+        copies = [self._copy_row(table, row, now) for row in rows]
+        originals = {}
+        for batch in _chunks(copies, COPY_BATCH_SIZE):
+            self._execute(insert(table), batch)
+            keys = {values[key.name]: values["copied_from_id"] for values in batch}
+            for copy_id, key_value in self._execute(select(table.c.id, key).where(key.in_(list(keys)))):
+                originals[keys[key_value]] = copy_id
+        return originals
+
+    def _remap(
+        self,
+        table_name: str,
+        rows: List[Dict[str, Any]],
+        id_map: Dict[str, Dict[int, int]],
+        overrides: Dict[str, Any]
+    ):
+        """Point the copies of rows at each other with one CASE update per batch"""
+        table = _tables()[table_name]
+        references = REFERENCES[table_name]
+        for batch in _chunks(rows, COPY_BATCH_SIZE):
+            copy_ids = [id_map[table_name][row["id"]] for row in batch]
+            values = {}
+            for column, referenced in references.items():
+                whens = {}
+                for row, copy_id in zip(batch, copy_ids):
+                    if column in overrides and row[column] is not None:
+                        whens[copy_id] = overrides[column]
+                    elif row[column] in id_map[referenced]:
+                        whens[copy_id] = id_map[referenced][row[column]]
+                if whens:
+                    values[column] = case(whens, value=table.c.id, else_=table.c[column])
+            if values:
+                self._execute(update(table).where(table.c.id.in_(copy_ids)).values(**values))
+
+    def _attach_root(self, root_id: int, parent_node_id: Optional[int], attach: Optional[Dict[str, Any]]):
+        """The copied root has no parent of its own flow, or hangs under parent_node_id"""
+        nodes_table = _tables()["flow_nodes"]
+        values: Dict[str, Any] = {"parent_node_id": parent_node_id}
+        if attach:
+            values["shared_origin_node_id"] = attach["shared_origin_node_id"]
+        self._execute(update(nodes_table).where(nodes_table.c.id == root_id).values(**values))
+
+    def _sync_indexes(self, rows: Dict[str, List[Dict[str, Any]]], id_map: Dict[str, Dict[int, int]]):
+        """Tag assignments, tag counts and schema fields of the copies, as the flush hooks would write them"""
+        tags_by_type: Dict[str, Dict[int, Any]] = {}
+        schemas_by_type: Dict[str, Dict[int, Any]] = {}
+        for table_name in COPY_TABLES:
+            spec = RESOURCES_BY_TABLE.get(table_name)
+            schema_columns = SCHEMA_COLUMNS.get(table_name, ())
+            for row in rows[table_name]:
+                copy_id = id_map[table_name][row["id"]]
+                org_id = self.org_id if self.org_id is not None else row["org_id"]
+                # Copies are new, so resources without tags or schemas have nothing to write
+                tags = normalize_tags(row.get("tags"))
+                if spec is not None and tags:
+                    tags_by_type.setdefault(spec.resource_type, {})[copy_id] = (org_id, tags)
+                schemas = {column: row[column] for column in schema_columns if row.get(column) is not None}
+                if schemas:
+                    schemas_by_type.setdefault(table_name, {})[copy_id] = (org_id, schemas)
+
+        connection = _CountingConnection(self)
+        for resource_type, changes in tags_by_type.items():
+            sync_tags(connection, resource_type, changes)
+        for resource_type, changes in schemas_by_type.items():
+            sync_schema_fields(connection, resource_type, changes)
+
+    def _report(self, stage: str, done: int, total: int):
+        if self.progress:
+            self.progress(stage, done, total)
+
+
+class _CountingConnection:
+    """Lets the index sync functions execute through FlowCopier._execute"""
+
+    def __init__(self, copier: FlowCopier):
+        self.copier = copier
+
+    def execute(self, statement, parameters=None):
+        return self.copier._execute(statement, parameters)
+
+    def __getattr__(self, name):
+        return getattr(self.copier.connection, name)
+
+
+def copy_flow(
+    connection: Any,
+    node_id: int,
+    owner_id: Optional[int] = None,
+    org_id: Optional[int] = None,
+    parent_node_id: Optional[int] = None,
+    options: Optional[Dict[str, Any]] = None,
+    progress: Optional[ProgressCallback] = None
+) -> FlowCopyResult:
+    """
+    Copy a flow from node_id down in the caller's transaction.
+
+    Args:
+        connection: Session or Connection; commit or roll back the copy as one
+        node_id: Top of the copied subtree
+        owner_id: Owner of the copies (the originals' owners when None)
+        org_id: Org of the copies (the originals' orgs when None)
+        parent_node_id: Node to attach the copy under
+        options: Flow copy options; copy_dependent_data_flows also copies
+            downstream flows that start at a source of their own
+        progress: Called with (stage, done, total) as "read", "insert" and "remap" advance
+    """
+    options = options or {}
+    copier = FlowCopier(
+        connection,
+        owner_id=owner_id,
+        org_id=org_id,
+        copy_dependent_data_flows=bool(options.get("copy_dependent_data_flows")),
+        progress=progress
+    )
+    return copier.copy(node_id, parent_node_id=parent_node_id)
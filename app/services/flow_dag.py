@@ -0,0 +1,367 @@
+"""
+Flow DAG - Parallel execution state of a flow run.
+Decides which nodes of a FlowRun to dispatch next under per-run and per-org
+concurrency caps, keeping one flow_node_runs row per node with its timings
+and an indegree counter, so each event touches only the rows it changes.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Iterable, Callable, Tuple
+
+from sqlalchemy import and_, func, insert, or_, select, update
+
+from app.services.flow_readiness import upstream_map
+
+# Node states within a run
+PENDING = "pending"
+DISPATCHED = "dispatched"
+SUCCESS = "success"
+FAILED = "failed"
+BLOCKED = "blocked"
+SKIPPED = "skipped"
+
+
+def _elapsed_ms(start: Optional[datetime], end: Optional[datetime]) -> Optional[int]:
+    if start is None or end is None:
+        return None
+    return int((end - start).total_seconds() * 1000)
+
+
+class LocalSlots:
+    """
+    Per-org node slots within one process.
+
+    For eager (in-process) execution; distributed workers share RedisSlots.
+    """
+
+    def __init__(self, lease_seconds: float = 3600):
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._leases: Dict[int, Dict[str, float]] = {}
+
+    def acquire(self, org_id: int, token: str, limit: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            leases = self._leases.setdefault(org_id, {})
+            for held, expires in list(leases.items()):
+                if expires <= now:
+                    del leases[held]
+            if token not in leases and len(leases) >= limit:
+                return False
+            leases[token] = now + self.lease_seconds
+            return True
+
+    def release(self, org_id: int, token: str):
+        with self._lock:
+            self._leases.get(org_id, {}).pop(token, None)
+
+    def in_use(self, org_id: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for expires in self._leases.get(org_id, {}).values() if expires > now)
+
+
+class RedisSlots:
+    """
+    Per-org node slots shared by every worker.
+
+    Each org is a sorted set of slot tokens scored by lease expiry, so slots
+    held by a crashed worker free themselves once the lease runs out.
+    """
+
+    # KEYS[1] org key; ARGV: now, limit, token, lease expiry, key ttl
+    ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZSCORE', KEYS[1], ARGV[3]) or redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], ARGV[4], ARGV[3])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+"""
+
+    def __init__(self, client: Any, lease_seconds: float = 3600):
+        self.client = client
+        self.lease_seconds = lease_seconds
+        self._acquire = client.register_script(self.ACQUIRE_SCRIPT)
+
+    @staticmethod
+    def _key(org_id: int) -> str:
+        return f"flow_slots:org:{org_id}"
+
+    def acquire(self, org_id: int, token: str, limit: int) -> bool:
+        now = time.time()
+        return bool(self._acquire(
+            keys=[self._key(org_id)],
+            args=[now, limit, token, now + self.lease_seconds, int(self.lease_seconds)]
+        ))
+
+    def release(self, org_id: int, token: str):
+        self.client.zrem(self._key(org_id), token)
+
+    def in_use(self, org_id: int) -> int:
+        return self.client.zcount(self._key(org_id), time.time(), "+inf")
+
+
+def slot_token(flow_run_id: int, node_id: int) -> str:
+    return f"{flow_run_id}:{node_id}"
+
+
+class DagRunState:
+    """
+    Which nodes of one run are pending, dispatched, done, failed or blocked.
+
+    State lives in the run's flow_node_runs rows, so any worker can advance
+    the run. Each node counts the upstreams it still waits for; a success
+    decrements its downstream counters and dispatch picks pending rows at
+    zero, so an event costs a few indexed statements however large the flow.
+    Only close() and the results read every row, once per run.
+    """
+
+    def __init__(self, connection: Any, flow_run_id: int, stop_on_failure: bool = False):
+        """
+        Args:
+            connection: Session or Connection of the event's transaction
+            flow_run_id: The run
+            stop_on_failure: Dispatch nothing more once a node fails
+        """
+        from app.database import Base
+
+        self.connection = connection
+        self.flow_run_id = flow_run_id
+        self.stop_on_failure = stop_on_failure
+        self.table = Base.metadata.tables["flow_node_runs"]
+        self._records: Optional[Dict[int, Dict[str, Any]]] = None
+
+    @classmethod
+    def create(
+        cls,
+        connection: Any,
+        flow_run_id: int,
+        rows: Iterable[Any],
+        stop_on_failure: bool = False,
+        completed_external: Iterable[int] = ()
+    ) -> "DagRunState":
+        """
+        Write the node rows of a new run in one statement.
+
+        Args:
+            rows: The flow's nodes with id, name, parent_node_id and depends_on_node_ids
+            completed_external: Upstreams outside the flow that have completed;
+                nodes waiting on any other outside upstream are skipped
+        """
+        state = cls(connection, flow_run_id, stop_on_failure)
+        rows = list(rows)
+        upstreams = upstream_map(rows)
+        met = set(completed_external)
+        downstream: Dict[int, List[int]] = defaultdict(list)
+        for node_id, waits_for in upstreams.items():
+            for upstream_id in set(waits_for):
+                downstream[upstream_id].append(node_id)
+        values = [{
+            "flow_run_id": flow_run_id,
+            "node_id": row.id,
+            "name": row.name,
+            "state": PENDING,
+            "waiting_on": len(set(upstreams[row.id]) - met),
+            "downstream_node_ids": sorted(downstream[row.id]),
+        } for row in rows]
+        if values:
+            connection.execute(insert(state.table), values)
+        return state
+
+    def _where(self, *criteria):
+        return and_(self.table.c.flow_run_id == self.flow_run_id, *criteria)
+
+    @property
+    def _ready(self):
+        return and_(self.table.c.state == PENDING, self.table.c.waiting_on <= 0)
+
+    def __len__(self) -> int:
+        return self.connection.execute(select(func.count()).select_from(self.table).where(self._where())).scalar_one()
+
+    def in_flight(self) -> List[int]:
+        return list(self.connection.execute(
+            select(self.table.c.node_id).where(self._where(self.table.c.state == DISPATCHED)).order_by(self.table.c.node_id)
+        ).scalars())
+
+    @property
+    def finished(self) -> bool:
+        """Nothing is in flight and nothing more will be dispatched"""
+        return self.connection.execute(
+            select(self.table.c.id).where(self._where(or_(self.table.c.state == DISPATCHED, self._ready))).limit(1)
+        ).first() is None
+
+    @property
+    def held_back(self) -> bool:
+        """Ready nodes are waiting on a concurrency cap"""
+        return self.connection.execute(
+            select(self.table.c.id).where(self._where(self._ready)).limit(1)
+        ).first() is not None
+
+    # Events
+
+    def dispatch(self, limit: int, acquire: Callable[[int], bool], now: Optional[datetime] = None) -> List[int]:
+        """
+        Take ready nodes up to limit in flight for the run.
+
+        Args:
+            limit: Nodes of this run in flight at most
+            acquire: Takes an org slot for a node id; False when the org is full
+            now: Dispatch time recorded as queued_at
+
+        Returns:
+            Node ids to send to workers
+        """
+        room = limit - len(self.in_flight())
+        if room <= 0:
+            return []
+        ready = self.connection.execute(
+            select(self.table.c.node_id).where(self._where(self._ready)).order_by(self.table.c.node_id).limit(room)
+        ).scalars()
+        batch = []
+        for node_id in ready:
+            if not acquire(node_id):
+                break
+            batch.append(node_id)
+        if batch:
+            self._set_state(batch, DISPATCHED, queued_at=now or datetime.utcnow())
+        return batch
+
+    def finish(
+        self,
+        node_id: int,
+        result: Dict[str, Any],
+        started_at: datetime,
+        completed_at: datetime
+    ) -> List[int]:
+        """
+        Record a node's result and timings; returns the nodes a failure blocks.
+        """
+        row = self.connection.execute(
+            select(self.table.c.state, self.table.c.queued_at, self.table.c.downstream_node_ids)
+            .where(self._where(self.table.c.node_id == node_id))
+        ).first()
+        if row is None or row.state != DISPATCHED:
+            # The first result recorded for a node stands
+            return []
+        succeeded = result.get("status") == "success"
+        values = {
+            "state": SUCCESS if succeeded else FAILED,
+            "started_at": started_at,
+            "completed_at": completed_at,
+            "wait_ms": _elapsed_ms(row.queued_at, started_at),
+            "duration_ms": _elapsed_ms(started_at, completed_at),
+            "records_processed": result.get("records_processed", 0),
+            "records_output": result.get("records_output", 0),
+        }
+        if not succeeded:
+            values["error_message"] = result.get("error_message")
+        self.connection.execute(update(self.table).where(self._where(self.table.c.node_id == node_id)).values(**values))
+        self._records = None
+
+        downstream = row.downstream_node_ids or []
+        if succeeded:
+            if downstream:
+                self.connection.execute(
+                    update(self.table).where(self._where(self.table.c.node_id.in_(downstream)))
+                    .values(waiting_on=self.table.c.waiting_on - 1)
+                )
+            return []
+        blocked = self._block(downstream)
+        if self.stop_on_failure:
+            self.close()
+        return blocked
+
+    def _block(self, node_ids: List[int]) -> List[int]:
+        """Block pending nodes downstream of a failure, one level per statement pair"""
+        blocked = []
+        frontier = sorted(set(node_ids))
+        while frontier:
+            rows = self.connection.execute(
+                select(self.table.c.node_id, self.table.c.downstream_node_ids)
+                .where(self._where(self.table.c.node_id.in_(frontier), self.table.c.state == PENDING))
+            ).all()
+            if not rows:
+                break
+            level = [row.node_id for row in rows]
+            self._set_state(level, BLOCKED)
+            blocked.extend(level)
+            frontier = sorted({node_id for row in rows for node_id in (row.downstream_node_ids or [])})
+        return sorted(blocked)
+
+    def _set_state(self, node_ids: List[int], state: str, **values):
+        self.connection.execute(
+            update(self.table).where(self._where(self.table.c.node_id.in_(node_ids))).values(state=state, **values)
+        )
+        self._records = None
+
+    def close(self):
+        """Mark nodes that will not run (halted runs, unmet upstreams, dependency cycles) as skipped"""
+        self.connection.execute(
+            update(self.table).where(self._where(self.table.c.state == PENDING)).values(state=SKIPPED)
+        )
+        self._records = None
+
+    # Results
+
+    @property
+    def nodes(self) -> Dict[int, Dict[str, Any]]:
+        """Every node's record by id, read once until the next write"""
+        if self._records is None:
+            self._records = {
+                row["node_id"]: dict(row)
+                for row in self.connection.execute(select(self.table).where(self._where())).mappings()
+            }
+        return self._records
+
+    @property
+    def succeeded(self) -> bool:
+        return all(record["state"] == SUCCESS for record in self.nodes.values())
+
+    def totals(self) -> Dict[str, int]:
+        executed = [record for record in self.nodes.values() if record["state"] in (SUCCESS, FAILED)]
+        return {
+            "records_processed": sum(record["records_processed"] or 0 for record in executed if record["state"] == SUCCESS),
+            "records_success": sum(record["records_output"] or 0 for record in executed if record["state"] == SUCCESS),
+            "records_failed": sum(record["records_processed"] or 0 for record in executed if record["state"] == FAILED),
+        }
+
+    def critical_path(self) -> Tuple[List[int], int]:
+        """
+        The chain of executed nodes with the longest summed duration.
+
+        A run's wall time approaches this when it is not held back by caps.
+        """
+        records = self.nodes
+        upstreams: Dict[int, List[int]] = defaultdict(list)
+        for node_id, record in records.items():
+            for downstream_id in record["downstream_node_ids"] or []:
+                upstreams[downstream_id].append(node_id)
+        executed = {
+            node_id: record for node_id, record in records.items()
+            if record["state"] in (SUCCESS, FAILED) and record.get("duration_ms") is not None
+        }
+        # A node completes after its upstreams, so completion order is a topological order
+        finish: Dict[int, int] = {}
+        previous: Dict[int, Optional[int]] = {}
+        for node_id in sorted(executed, key=lambda node_id: (executed[node_id]["completed_at"], node_id)):
+            best = max(
+                (upstream_id for upstream_id in upstreams.get(node_id, ()) if upstream_id in finish),
+                key=finish.get,
+                default=None
+            )
+            finish[node_id] = executed[node_id]["duration_ms"] + (finish[best] if best is not None else 0)
+            previous[node_id] = best
+        if not finish:
+            return [], 0
+        node_id = max(finish, key=finish.get)
+        total = finish[node_id]
+        path = []
+        while node_id is not None:
+            path.append(node_id)
+            node_id = previous[node_id]
+        return list(reversed(path)), total
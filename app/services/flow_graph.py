@@ -0,0 +1,275 @@
+"""
+Flow Graph - Whole origin trees loaded in one query.
+Holds a flow's nodes with their sources, sets and sinks as an adjacency structure,
+so traversals run in memory and status changes are written in batches.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+from sqlalchemy import inspect, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+logger = logging.getLogger(__name__)
+
+NODE_COLUMNS = (
+    "id", "name", "status", "origin_node_id", "parent_node_id",
+    "flow_id", "project_id", "owner_id", "org_id"
+)
+
+# Flow node foreign key -> resource table
+RESOURCE_TABLES = {
+    "data_source_id": "data_sources",
+    "data_set_id": "data_sets",
+    "data_sink_id": "data_sinks",
+}
+RESOURCE_COLUMNS = ("id", "name", "status")
+
+# Ids per UPDATE ... WHERE id IN (...)
+UPDATE_BATCH_SIZE = 1000
+
+ACTIVE = "ACTIVE"
+PAUSED = "PAUSED"
+
+
+def _tables():
+    from app.database import Base
+    return Base.metadata.tables
+
+
+def _status_name(value: Any) -> Optional[str]:
+    return value.name if isinstance(value, Enum) else value
+
+
+def _status_value(table, name: str) -> Any:
+    """Status as the column binds it: the enum member for Enum columns"""
+    enum_class = getattr(table.c.status.type, "enum_class", None)
+    return enum_class[name] if enum_class is not None else name
+
+
+@dataclass
+class GraphNode:
+    """A flow node and the resource it wraps"""
+    id: int
+    name: Optional[str]
+    status: Optional[str]
+    origin_node_id: Optional[int]
+    parent_node_id: Optional[int]
+    flow_id: Optional[int]
+    project_id: Optional[int]
+    owner_id: Optional[int]
+    org_id: Optional[int]
+    # Resource table ("data_sources", "data_sets" or "data_sinks") and its id, name and status
+    resource_type: Optional[str] = None
+    resource: Optional[Dict[str, Any]] = None
+    children: List[int] = field(default_factory=list)
+
+
+class FlowGraph:
+    """
+    The nodes of one origin tree and their resources.
+
+    Traversals follow children of the same origin, as the recursive
+    FlowNode walks did, but read nothing from the database.
+    """
+
+    def __init__(self, origin_node_id: int, nodes: Dict[int, GraphNode]):
+        self.origin_node_id = origin_node_id
+        self.nodes = nodes
+        # (model name, id, user id, access level) -> the flow's or project's answer, None when it has none
+        self._access: Dict[Tuple[str, int, Any, str], Optional[bool]] = {}
+        for node in nodes.values():
+            parent = nodes.get(node.parent_node_id)
+            if parent is not None and node.id != node.parent_node_id:
+                parent.children.append(node.id)
+        for node in nodes.values():
+            node.children.sort()
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node_id: int) -> bool:
+        return node_id in self.nodes
+
+    @classmethod
+    def load(cls, connection: Any, origin_node_id: int) -> "FlowGraph":
+        """
+        Load every node sharing an origin, joined with its source, set or sink.
+
+        Args:
+            connection: Session or Connection
+            origin_node_id: Origin node of the flow
+
+        Returns:
+            FlowGraph; empty when the origin does not exist
+        """
+        tables = _tables()
+        nodes_table = tables["flow_nodes"]
+        joined = nodes_table
+        columns = [nodes_table.c[name] for name in NODE_COLUMNS]
+        for key, table_name in RESOURCE_TABLES.items():
+            resource = tables[table_name].alias(table_name)
+            joined = joined.outerjoin(resource, resource.c.id == nodes_table.c[key])
+            columns.extend(resource.c[name].label(f"{table_name}_{name}") for name in RESOURCE_COLUMNS)
+
+        query = select(*columns).select_from(joined).where(nodes_table.c.origin_node_id == origin_node_id)
+        nodes = {}
+        for row in connection.execute(query).mappings():
+            node = GraphNode(**{name: row[name] for name in NODE_COLUMNS})
+            node.status = _status_name(node.status)
+            for table_name in RESOURCE_TABLES.values():
+                if row[f"{table_name}_id"] is not None:
+                    node.resource_type = table_name
+                    node.resource = {name: row[f"{table_name}_{name}"] for name in RESOURCE_COLUMNS}
+                    node.resource["status"] = _status_name(node.resource["status"])
+                    break
+            nodes[node.id] = node
+        return cls(origin_node_id, nodes)
+
+    # Traversal
+
+    def walk(self, start_id: Optional[int] = None) -> Iterator[GraphNode]:
+        """Nodes from start_id (the origin by default) down, depth-first, children by id"""
+        start = self.nodes.get(self.origin_node_id if start_id is None else start_id)
+        if start is None:
+            return
+        seen = set()
+        stack = [start.id]
+        while stack:
+            node_id = stack.pop()
+            # A corrupt cyclic parent link must not loop forever
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+            node = self.nodes[node_id]
+            yield node
+            stack.extend(reversed(node.children))
+
+    def ancestors(self, node_id: int) -> List[GraphNode]:
+        """Parent, grandparent, ... within the origin tree, nearest first"""
+        ancestors = []
+        seen = {node_id}
+        node = self.nodes.get(node_id)
+        while node is not None and node.parent_node_id in self.nodes and node.parent_node_id not in seen:
+            node = self.nodes[node.parent_node_id]
+            seen.add(node.id)
+            ancestors.append(node)
+        return ancestors
+
+    # Status changes
+
+    def status_changes(
+        self,
+        activate: bool,
+        start_id: Optional[int] = None,
+        resources: bool = False
+    ) -> Dict[str, List[int]]:
+        """
+        Ids per table whose status a traversal from start_id would change.
+
+        Args:
+            activate: ACTIVE when True, PAUSED when False
+            start_id: Top of the traversed subtree (the origin by default)
+            resources: Also change the nodes' sources, sets and sinks (FlowNode walks change nodes only)
+
+        Returns:
+            {"flow_nodes": [...], "data_sources": [...], ...} for tables with changes
+        """
+        target = ACTIVE if activate else PAUSED
+        changes: Dict[str, List[int]] = {}
+        for node in self.walk(start_id):
+            if node.status != target:
+                changes.setdefault("flow_nodes", []).append(node.id)
+            if resources and node.resource is not None and node.resource["status"] != target:
+                changes.setdefault(node.resource_type, []).append(node.resource["id"])
+        return changes
+
+    def set_status(
+        self,
+        connection: Any,
+        activate: bool,
+        start_id: Optional[int] = None,
+        resources: bool = False
+    ) -> Dict[str, List[int]]:
+        """
+        Activate or pause a subtree with one UPDATE per table (per UPDATE_BATCH_SIZE ids).
+
+        The graph is updated to match. Returns the changed ids per table.
+        """
+        changes = self.status_changes(activate, start_id, resources)
+        target = ACTIVE if activate else PAUSED
+        now = datetime.now()
+        tables = _tables()
+        for table_name, ids in changes.items():
+            table = tables[table_name]
+            values = {"status": _status_value(table, target), "updated_at": now}
+            if table_name == "flow_nodes":
+                values["activated_at" if activate else "paused_at"] = now
+            for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+                batch = ids[start:start + UPDATE_BATCH_SIZE]
+                connection.execute(update(table).where(table.c.id.in_(batch)).values(**values))
+
+        changed_nodes = set(changes.get("flow_nodes", ()))
+        for node in self.walk(start_id):
+            if node.id in changed_nodes:
+                node.status = target
+            if node.resource is not None and node.resource["id"] in changes.get(node.resource_type, ()):
+                node.resource["status"] = target
+        if changes:
+            logger.info(
+                f"Flow {self.origin_node_id} {'activated' if activate else 'paused'}: "
+                + ", ".join(f"{len(ids)} {table_name}" for table_name, ids in changes.items())
+            )
+        return changes
+
+    # Access
+
+    def accessible(self, session: Any, node_id: int, user: Any, access_level: str = 'read') -> bool:
+        """
+        Whether user can access a node, by the rules of FlowNode.accessible_by_.
+
+        Flows and projects are asked once per graph, so checking several
+        nodes of one tree does not load the same flow or project again.
+        """
+        node = self.nodes.get(node_id)
+        if not user or node is None:
+            return False
+        if node.owner_id == user.id:
+            return True
+        from app.models.flow import Flow
+        from app.models.project import Project
+        for model, owner_id in ((Flow, node.flow_id), (Project, node.project_id)):
+            if owner_id is None:
+                continue
+            key = (model.__name__, owner_id, user.id, access_level)
+            if key not in self._access:
+                owner = session.get(model, owner_id)
+                self._access[key] = (
+                    owner.accessible_by_(user, access_level)
+                    if owner is not None and hasattr(owner, 'accessible_by_') else None
+                )
+            if self._access[key] is not None:
+                return self._access[key]
+        return access_level == 'read' and user.org_id == node.org_id
+
+
+def sync_session(session: Any, changes: Dict[str, List[int]], activate: bool):
+    """
+    Show batched status changes on instances already loaded in a session.
+
+    Sets the new status as the committed value, so the instances neither
+    reload nor write it again.
+    """
+    if not changes:
+        return
+    changed = {table_name: set(ids) for table_name, ids in changes.items()}
+    target = ACTIVE if activate else PAUSED
+    for obj in list(session.identity_map.values()):
+        state = inspect(obj)
+        table = state.mapper.local_table
+        ids = changed.get(table.name)
+        if ids and state.identity and state.identity[0] in ids:
+            set_committed_value(obj, "status", _status_value(table, target))
@@ -0,0 +1,248 @@
+"""
+Flow Readiness - Which nodes of a flow can run now.
+Loads a flow's dependency edges and statuses once and keeps indegree counters,
+so every completion updates readiness without going back to the database.
+"""
+
+import json
+from collections import defaultdict
+from typing import Dict, Any, Optional, List, Set, Iterable
+
+from sqlalchemy import select
+
+# Statuses that satisfy a dependency, as FlowNode.dependencies_satisfied_ decides
+DONE_STATUSES = ("COMPLETED",)
+
+
+def _status_name(value: Any) -> Optional[str]:
+    return getattr(value, "name", value)
+
+
+def dependency_ids(value: Any) -> List[int]:
+    """depends_on_node_ids as a list, whether stored decoded or as a JSON string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return []
+    return [int(node_id) for node_id in value]
+
+
+def upstream_map(rows: Iterable[Any], include_parents: bool = True) -> Dict[int, List[int]]:
+    """Node id -> ids it waits for: declared dependencies, and its parent when loaded with it"""
+    rows = list(rows)
+    loaded = {row.id for row in rows}
+    upstreams = {}
+    for row in rows:
+        waits_for = dependency_ids(row.depends_on_node_ids)
+        if include_parents and row.parent_node_id in loaded and row.parent_node_id != row.id:
+            waits_for.append(row.parent_node_id)
+        upstreams[row.id] = waits_for
+    return upstreams
+
+
+def completed_external(connection: Any, rows: Iterable[Any]) -> List[int]:
+    """
+    Upstreams outside rows that have completed, in one query; none when nothing points outside.
+
+    Args:
+        connection: Session or Connection
+        rows: Nodes with id and depends_on_node_ids
+    """
+    from app.database import Base
+
+    rows = list(rows)
+    external = sorted({
+        upstream_id for row in rows for upstream_id in dependency_ids(row.depends_on_node_ids)
+    } - {row.id for row in rows})
+    if not external:
+        return []
+    table = Base.metadata.tables["flow_nodes"]
+    return sorted(connection.execute(
+        select(table.c.id).where(table.c.id.in_(external), table.c.status.in_(DONE_STATUSES))
+    ).scalars())
+
+
+class ReadinessResolver:
+    """
+    Indegree counters over a flow's dependency graph.
+
+    A node is ready once every upstream has completed and it has neither
+    started nor been blocked by a failed upstream. complete() and fail()
+    touch only the edges leaving the node; is_ready() is a set lookup.
+    Nodes on a dependency cycle never become ready.
+    """
+
+    def __init__(self, upstreams: Dict[int, Iterable[int]], completed: Iterable[int] = ()):
+        """
+        Args:
+            upstreams: Node id -> ids it waits for; ids that are not keys are
+                external and count as met only once completed
+            completed: Ids already done, in the flow or external
+        """
+        self._downstream: Dict[int, List[int]] = defaultdict(list)
+        self._indegree: Dict[int, int] = {}
+        self._completed: Set[int] = set(completed)
+        self._started: Set[int] = set()
+        self._blocked: Set[int] = set()
+        # Insertion-ordered set: ready nodes in the order they became ready
+        self._ready: Dict[int, None] = {}
+
+        for node_id in sorted(upstreams):
+            waiting = 0
+            for upstream_id in set(upstreams[node_id]):
+                self._downstream[upstream_id].append(node_id)
+                if upstream_id not in self._completed:
+                    waiting += 1
+            self._indegree[node_id] = waiting
+            if waiting == 0 and node_id not in self._completed:
+                self._ready[node_id] = None
+
+    def __len__(self) -> int:
+        return len(self._indegree)
+
+    def __contains__(self, node_id: int) -> bool:
+        return node_id in self._indegree
+
+    @classmethod
+    def load(
+        cls,
+        connection: Any,
+        origin_node_id: Optional[int] = None,
+        flow_id: Optional[int] = None,
+        include_parents: bool = True
+    ) -> "ReadinessResolver":
+        """
+        Load the nodes of one origin or flow with their edges and statuses.
+
+        One query reads the nodes; one more reads the statuses of upstreams
+        outside them, when there are any.
+
+        Args:
+            connection: Session or Connection
+            origin_node_id: Load the nodes of this origin
+            flow_id: Or the nodes of this flow
+            include_parents: Nodes also wait for their parent node
+        """
+        from app.database import Base
+
+        if origin_node_id is None and flow_id is None:
+            raise ValueError("origin_node_id or flow_id is required")
+        table = Base.metadata.tables["flow_nodes"]
+        query = select(table.c.id, table.c.status, table.c.parent_node_id, table.c.depends_on_node_ids)
+        query = query.where(
+            table.c.origin_node_id == origin_node_id if origin_node_id is not None else table.c.flow_id == flow_id
+        )
+        rows = connection.execute(query).all()
+        resolver = cls.from_rows(rows, include_parents)
+
+        for upstream_id in completed_external(connection, rows):
+            resolver.complete(upstream_id)
+        return resolver
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Any],
+        include_parents: bool = True,
+        include_status: bool = True
+    ) -> "ReadinessResolver":
+        """
+        Build from loaded nodes or rows with id, status, parent_node_id and depends_on_node_ids.
+
+        Statuses of upstreams outside rows are unknown; they count as unmet until completed.
+        A fresh run passes include_status=False so earlier completions do not count.
+        """
+        rows = list(rows)
+        completed = [row.id for row in rows if include_status and _status_name(row.status) in DONE_STATUSES]
+        return cls(upstream_map(rows, include_parents), completed)
+
+    # Queries
+
+    def ready(self) -> List[int]:
+        """Nodes that can run now, in the order they became ready"""
+        return list(self._ready)
+
+    def next_ready(self) -> Optional[int]:
+        """The node that has been ready longest, or None"""
+        return next(iter(self._ready), None)
+
+    def is_ready(self, node_id: int) -> bool:
+        return node_id in self._ready
+
+    def waiting_on(self, node_id: int) -> int:
+        """Upstreams of a node still to complete"""
+        return self._indegree.get(node_id, 0)
+
+    def waiting(self) -> Dict[int, int]:
+        """Nodes still waiting and how many upstreams each waits for"""
+        return {
+            node_id: count for node_id, count in self._indegree.items()
+            if count and node_id not in self._completed and node_id not in self._blocked
+        }
+
+    def completed(self) -> Set[int]:
+        return self._completed & self._indegree.keys()
+
+    def blocked(self) -> Set[int]:
+        """Nodes that will not run because an upstream failed"""
+        return set(self._blocked)
+
+    @property
+    def finished(self) -> bool:
+        """Nothing is ready or running, so no further event can make progress"""
+        return not self._ready and not self._started
+
+    # Events
+
+    def start(self, node_id: int) -> bool:
+        """Take a ready node; False if it was not ready"""
+        if node_id not in self._ready:
+            return False
+        del self._ready[node_id]
+        self._started.add(node_id)
+        return True
+
+    def complete(self, node_id: int) -> List[int]:
+        """Mark a node (or external upstream) done; returns the nodes it made ready"""
+        if node_id in self._completed:
+            return []
+        self._completed.add(node_id)
+        self._started.discard(node_id)
+        self._ready.pop(node_id, None)
+        newly_ready = []
+        for downstream_id in self._downstream.get(node_id, ()):
+            self._indegree[downstream_id] -= 1
+            if (self._indegree[downstream_id] == 0 and downstream_id not in self._completed
+                    and downstream_id not in self._started and downstream_id not in self._blocked):
+                self._ready[downstream_id] = None
+                newly_ready.append(downstream_id)
+        return newly_ready
+
+    def fail(self, node_id: int) -> List[int]:
+        """Mark a node failed; returns the downstream nodes it blocks"""
+        self._started.discard(node_id)
+        self._ready.pop(node_id, None)
+        self._blocked.add(node_id)
+        blocked = []
+        pending = list(self._downstream.get(node_id, ()))
+        while pending:
+            downstream_id = pending.pop()
+            if downstream_id in self._blocked or downstream_id in self._completed:
+                continue
+            self._blocked.add(downstream_id)
+            self._ready.pop(downstream_id, None)
+            blocked.append(downstream_id)
+            pending.extend(self._downstream.get(downstream_id, ()))
+        return sorted(blocked)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready(),
+            "running": sorted(self._started),
+            "waiting": self.waiting(),
+            "completed": sorted(self.completed()),
+            "blocked": sorted(self._blocked & self._indegree.keys()),
+        }
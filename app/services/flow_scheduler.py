@@ -0,0 +1,484 @@
+"""
+Flow Scheduler - When scheduled flows fire and who fires them.
+Evaluates cron expressions in each flow's timezone and claims due flows in bulk
+with FOR UPDATE SKIP LOCKED, so any number of beat instances can run the check.
+"""
+
+import heapq
+import logging
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Callable, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from crontab import CronRange, CronSlice, CronSlices
+
+from sqlalchemy import and_, bindparam, delete, func, insert, or_, select, update
+
+logger = logging.getLogger(__name__)
+
+# Flows claimed, and runs inserted, per statement
+CLAIM_BATCH_SIZE = 500
+
+# Schedule types that fire by time; event-driven flows fire once per next_run_at set for them
+TIMED_SCHEDULES = ("cron", "interval", "once")
+CLAIMED_SCHEDULES = TIMED_SCHEDULES + ("event_driven",)
+
+ONE_MINUTE = timedelta(minutes=1)
+
+def _schedule_name(value: Any) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+@lru_cache(maxsize=64)
+def _zone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def _slice_values(cron_slice: CronSlice) -> Tuple[int, ...]:
+    """Every value a parsed cron field matches"""
+    values = set()
+    for part in cron_slice.parts:
+        if isinstance(part, CronRange):
+            values.update(range(int(part.vfrom), int(part.vto) + 1, int(part.seq)))
+        else:
+            values.add(int(part))
+    return tuple(sorted(values))
+
+
+class CronExpression:
+    """
+    A five-field cron expression: minute, hour, day of month, month, day of week.
+
+    Fields are parsed by python-crontab (lists, ranges, steps, month and
+    weekday names, the @daily style macros); it only computes fire times
+    through croniter, which is not a dependency, so next_after() is done here.
+    As in Vixie cron, a day matches either day field when both are restricted.
+    next_after() jumps field by field instead of scanning minutes.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        if not self.expression.startswith("@") and len(self.expression.split()) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: '{expression}'")
+        try:
+            slices = CronSlices(self.expression)
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Invalid cron expression '{expression}': {e}")
+        if slices.special == "@reboot":
+            raise ValueError(f"Invalid cron expression '{expression}': @reboot has no fire times")
+        minute, hour, day, month, weekday = slices
+        self.minutes = _slice_values(minute)
+        self.hours = _slice_values(hour)
+        self.days = frozenset(_slice_values(day))
+        self.months = _slice_values(month)
+        self.weekdays = frozenset(value % 7 for value in _slice_values(weekday))
+        day_text, _, weekday_text = slices.clean_render().split()[2:]
+        self._either_day = day_text != "*" and weekday_text != "*"
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r})"
+
+    def _day_matches(self, day: date) -> bool:
+        in_month = day.day in self.days
+        in_week = (day.weekday() + 1) % 7 in self.weekdays
+        return in_month or in_week if self._either_day else in_month and in_week
+
+    def _next_wall(self, moment: datetime) -> datetime:
+        """First matching wall-clock minute at or after moment"""
+        # Feb 29 on a given weekday can be decades away; nothing valid is further
+        last_year = moment.year + 28
+        while moment.year <= last_year:
+            index = bisect_left(self.months, moment.month)
+            if index == len(self.months):
+                moment = datetime(moment.year + 1, self.months[0], 1)
+                continue
+            if self.months[index] != moment.month:
+                moment = datetime(moment.year, self.months[index], 1)
+                continue
+            if not self._day_matches(moment.date()):
+                moment = datetime(moment.year, moment.month, moment.day) + timedelta(days=1)
+                continue
+            index = bisect_left(self.hours, moment.hour)
+            if index == len(self.hours):
+                moment = datetime(moment.year, moment.month, moment.day) + timedelta(days=1)
+                continue
+            if self.hours[index] != moment.hour:
+                moment = moment.replace(hour=self.hours[index], minute=0)
+            index = bisect_left(self.minutes, moment.minute)
+            if index == len(self.minutes):
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+                continue
+            return moment.replace(minute=self.minutes[index])
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
+
+    def next_after(self, after: datetime, timezone: str = "UTC") -> datetime:
+        """
+        First fire strictly after a naive UTC time, as naive UTC.
+
+        Wall times skipped when clocks go forward fire an hour later; wall
+        times repeated when clocks go back fire once, at their first occurrence.
+        """
+        zone = _zone(timezone)
+        wall = after.replace(tzinfo=dt_timezone.utc).astimezone(zone).replace(tzinfo=None, second=0, microsecond=0)
+        wall += ONE_MINUTE
+        while True:
+            wall = self._next_wall(wall)
+            fire = wall.replace(tzinfo=zone).astimezone(dt_timezone.utc).replace(tzinfo=None)
+            if fire > after:
+                return fire
+            wall += ONE_MINUTE
+
+
+@lru_cache(maxsize=4096)
+def parse_cron(expression: str) -> CronExpression:
+    """Parsed expressions are shared; most schedules use a handful of them"""
+    return CronExpression(expression)
+
+
+def _utc_naive(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def next_fire_time(
+    schedule_type: Any,
+    schedule_config: Optional[Dict[str, Any]],
+    after: datetime,
+    previous: Optional[datetime] = None
+) -> Optional[datetime]:
+    """
+    When a flow's schedule fires next, strictly after a naive UTC time.
+
+    Args:
+        schedule_type: ScheduleTypes member or its value
+        schedule_config: cron_expression and timezone; interval_seconds or
+            interval_minutes; or run_at for a one-off
+        after: Usually now
+        previous: The fire being replaced; intervals keep their cadence from it
+
+    Returns:
+        Naive UTC time, or None when the schedule does not fire by time
+
+    Raises:
+        ValueError: The config cannot be scheduled
+    """
+    kind = _schedule_name(schedule_type)
+    config = schedule_config or {}
+    if kind == "cron":
+        expression = config.get("cron_expression")
+        if not expression:
+            raise ValueError("Cron schedule has no cron_expression")
+        return parse_cron(expression).next_after(after, config.get("timezone") or "UTC")
+    if kind == "interval":
+        seconds = config.get("interval_seconds") or 60 * config.get("interval_minutes", 60)
+        if seconds <= 0:
+            raise ValueError(f"Invalid schedule interval: {seconds} seconds")
+        interval = timedelta(seconds=seconds)
+        if previous is None:
+            return after + interval
+        return previous + ((after - previous) // interval + 1) * interval
+    if kind == "once":
+        run_at = _utc_naive(config.get("run_at"))
+        return run_at if run_at and run_at > after else None
+    return None
+
+
+class FireHeap:
+    """
+    Upcoming fires, earliest first.
+
+    Pushing a flow again replaces its fire; replaced entries are dropped
+    lazily when they reach the top.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int]] = []
+        self._fires: Dict[int, datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._fires)
+
+    def push(self, flow_id: int, fire_at: datetime):
+        self._fires[flow_id] = fire_at
+        heapq.heappush(self._heap, (fire_at, flow_id))
+
+    def discard(self, flow_id: int):
+        self._fires.pop(flow_id, None)
+
+    def _prune(self):
+        while self._heap and self._fires.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_fire_at(self) -> Optional[datetime]:
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def fire_times(self) -> List[datetime]:
+        """Distinct upcoming fire times, earliest first"""
+        return sorted(set(self._fires.values()))
+
+    def pop_due(self, now: datetime) -> List[int]:
+        """Flows due at or before now, removed from the heap"""
+        due = []
+        self._prune()
+        while self._heap and self._heap[0][0] <= now:
+            _, flow_id = heapq.heappop(self._heap)
+            del self._fires[flow_id]
+            due.append(flow_id)
+            self._prune()
+        return due
+
+
+@dataclass
+class ScheduledRun:
+    """A FlowRun the scheduler inserted for a due flow"""
+    flow_id: int
+    run_number: int
+    scheduled_for: datetime
+    next_run_at: Optional[datetime]
+    flow_run_id: Optional[int] = None
+
+
+class FlowScheduler:
+    """
+    Fires due flows for one scheduler tick.
+
+    flows.next_run_at is the shared schedule. Each batch of due flows is
+    locked with SKIP LOCKED, their runs are inserted and next_run_at advanced
+    in the same transaction, so a fire is claimed by exactly one instance.
+    Within a tick, a heap of the upcoming fires gives the times to wake up
+    at; the caller arranges each wakeup (a Celery eta) rather than waiting.
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        batch_size: int = CLAIM_BATCH_SIZE,
+        clock: Callable[[], datetime] = datetime.utcnow
+    ):
+        """
+        Args:
+            connection: Session or Connection; committed after every batch
+            batch_size: Flows claimed per batch
+            clock: Naive UTC now
+        """
+        from app.database import Base
+        from app.models.flow import RunStatuses, ScheduleTypes
+
+        self.connection = connection
+        self.batch_size = batch_size
+        self.clock = clock
+        self.heap = FireHeap()
+        self.flows = Base.metadata.tables["flows"]
+        self.runs = Base.metadata.tables["flow_runs"]
+        self.unscheduled: List[int] = []
+        self.requeued: List[int] = []
+        self._claimed_types = [ScheduleTypes(name) for name in CLAIMED_SCHEDULES]
+        self._queued = RunStatuses.QUEUED
+
+    def _scheduled(self):
+        flows = self.flows
+        return (
+            flows.c.is_active.is_(True),
+            flows.c.schedule_type.in_(self._claimed_types),
+            flows.c.next_run_at.isnot(None),
+        )
+
+    def load_upcoming(self, until: datetime) -> int:
+        """Push every fire before until onto the heap; returns how many"""
+        rows = self.connection.execute(
+            select(self.flows.c.id, self.flows.c.next_run_at)
+            .where(*self._scheduled(), self.flows.c.next_run_at < until)
+        ).all()
+        for row in rows:
+            self.heap.push(row.id, row.next_run_at)
+        return len(rows)
+
+    def _claim_batch(self, now: datetime) -> Tuple[int, List[ScheduledRun]]:
+        """Lock one batch of due flows, insert their runs and advance them; returns (locked, runs)"""
+        flows, runs = self.flows, self.runs
+        rows = self.connection.execute(
+            select(flows.c.id, flows.c.schedule_type, flows.c.schedule_config, flows.c.next_run_at)
+            .where(*self._scheduled(), flows.c.next_run_at <= now)
+            .order_by(flows.c.next_run_at, flows.c.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            return 0, []
+
+        last_numbers = dict(self.connection.execute(
+            select(runs.c.flow_id, func.max(runs.c.run_number))
+            .where(runs.c.flow_id.in_([row.id for row in rows]))
+            .group_by(runs.c.flow_id)
+        ).all())
+
+        claimed, advances = [], []
+        for row in rows:
+            try:
+                next_at = next_fire_time(row.schedule_type, row.schedule_config, now, previous=row.next_run_at)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Unscheduling flow {row.id}: {str(e)}")
+                self.unscheduled.append(row.id)
+                advances.append({"b_id": row.id, "b_next": None})
+                continue
+            advances.append({"b_id": row.id, "b_next": next_at})
+            claimed.append(ScheduledRun(row.id, (last_numbers.get(row.id) or 0) + 1, row.next_run_at, next_at))
+
+        self.connection.execute(
+            update(flows).where(flows.c.id == bindparam("b_id")).values(next_run_at=bindparam("b_next")),
+            advances
+        )
+        if claimed:
+            self._insert_runs(claimed, now)
+        return len(rows), claimed
+
+    def _insert_runs(self, claimed: List[ScheduledRun], now: datetime):
+        """
+        Insert the runs of a batch and set their ids.
+
+        One INSERT ... RETURNING where the database returns ids for a batch
+        in order, otherwise one INSERT per run; ids are never looked up by
+        run number, which a manual run may share until the unique index rejects it.
+        """
+        runs = self.runs
+        rows = [{
+            "flow_id": run.flow_id,
+            "run_number": run.run_number,
+            "status": self._queued,
+            "trigger_type": "scheduled",
+            "log_data": {"scheduled_for": run.scheduled_for.isoformat()},
+            "created_at": now,
+            "updated_at": now,
+        } for run in claimed]
+        bind = self.connection.get_bind() if hasattr(self.connection, "get_bind") else self.connection
+        if bind.dialect.insert_executemany_returning_sort_by_parameter_order:
+            run_ids = self.connection.execute(
+                insert(runs).returning(runs.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+        else:
+            run_ids = [self.connection.execute(insert(runs).values(**row)).inserted_primary_key[0] for row in rows]
+        for run, run_id in zip(claimed, run_ids):
+            run.flow_run_id = run_id
+
+    def _requeue(self, failed: List[ScheduledRun]):
+        """
+        Undo the claims whose dispatch failed, so the next tick fires them again.
+
+        Drops the runs while still queued and moves each flow's next_run_at
+        back to the fire, unless the flow was rescheduled meanwhile.
+        """
+        flows, runs = self.flows, self.runs
+        self.connection.execute(
+            delete(runs).where(runs.c.id.in_([run.flow_run_id for run in failed]), runs.c.status == self._queued)
+        )
+        self.connection.execute(
+            update(flows)
+            .where(flows.c.id == bindparam("b_id"), or_(
+                flows.c.next_run_at == bindparam("b_advanced"),
+                and_(flows.c.next_run_at.is_(None), bindparam("b_advanced").is_(None))
+            ))
+            .values(next_run_at=bindparam("b_fire")),
+            [{"b_id": run.flow_id, "b_advanced": run.next_run_at, "b_fire": run.scheduled_for} for run in failed]
+        )
+        self.connection.commit()
+
+    def claim_due(self, dispatch: Callable[[int], Any], now: Optional[datetime] = None) -> List[ScheduledRun]:
+        """
+        Claim every flow due at now, a batch per transaction.
+
+        Args:
+            dispatch: Called with each FlowRun id once its batch is committed
+            now: Naive UTC; the clock when None
+        """
+        now = now or self.clock()
+        fired = []
+        while True:
+            locked, batch = self._claim_batch(now)
+            self.connection.commit()
+            failed = []
+            for run in batch:
+                try:
+                    dispatch(run.flow_run_id)
+                except Exception as e:
+                    logger.error(f"Dispatching run {run.flow_run_id} of flow {run.flow_id} failed, requeued: {str(e)}")
+                    failed.append(run)
+            fired.extend(run for run in batch if run not in failed)
+            if failed:
+                # Requeued flows are due again; leave them to the next tick rather than spin on a broken broker
+                self._requeue(failed)
+                self.requeued.extend(run.flow_id for run in failed)
+                return fired
+            if locked < self.batch_size:
+                return fired
+
+    def run(
+        self,
+        window_seconds: float,
+        dispatch: Callable[[int], Any],
+        wake: Callable[[datetime, datetime], Any]
+    ) -> Dict[str, Any]:
+        """
+        Fire what is due now and arrange a wakeup for every later fire within the window.
+
+        Args:
+            window_seconds: How long this tick covers; the next tick takes over after it
+            dispatch: Called with each FlowRun id to execute
+            wake: Called with (fire_at, until) once per distinct fire time before
+                until; should call fire(until, ...) at fire_at
+        """
+        started = self.clock()
+        until = started + timedelta(seconds=window_seconds)
+        fired = self.claim_due(dispatch, started)
+        self.load_upcoming(until)
+        return self._summary(started, fired, self._wake_all(wake, until))
+
+    def fire(
+        self,
+        until: datetime,
+        dispatch: Callable[[int], Any],
+        wake: Callable[[datetime, datetime], Any]
+    ) -> Dict[str, Any]:
+        """
+        Claim what is due at a wakeup, and arrange a wakeup for the claimed flows' next fires before until.
+
+        Args:
+            until: End of the tick that arranged this wakeup
+            dispatch: Called with each FlowRun id to execute
+            wake: As for run()
+        """
+        now = self.clock()
+        fired = self.claim_due(dispatch, now)
+        for run in fired:
+            if run.next_run_at is not None and run.next_run_at < until:
+                self.heap.push(run.flow_id, run.next_run_at)
+        return self._summary(now, fired, self._wake_all(wake, until))
+
+    def _wake_all(self, wake: Callable[[datetime, datetime], Any], until: datetime) -> int:
+        fire_times = self.heap.fire_times()
+        for fire_at in fire_times:
+            wake(fire_at, until)
+        self.heap = FireHeap()
+        return len(fire_times)
+
+    def _summary(self, now: datetime, fired: List[ScheduledRun], wakeups: int) -> Dict[str, Any]:
+        max_lag = max(((now - run.scheduled_for).total_seconds() for run in fired), default=0.0)
+        return {
+            "scheduled_count": len(fired),
+            "unscheduled_count": len(self.unscheduled),
+            "requeued_count": len(self.requeued),
+            "wakeups": wakeups,
+            "max_lag_seconds": round(max(max_lag, 0.0), 3),
+            "checked_at": now.isoformat(),
+        }
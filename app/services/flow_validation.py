@@ -0,0 +1,285 @@
+"""
+Flow Validation - Checks flow definitions and remembers what was checked.
+Streams a definition hash per flow and revalidates only flows whose hash
+changed since their last validation, writing results with bulk updates.
+"""
+
+import hashlib
+import json
+import re
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Tuple
+
+from sqlalchemy import String, bindparam, cast, func, select, update
+
+from app.services.flow_readiness import ReadinessResolver, upstream_map
+from app.services.flow_scheduler import next_fire_time
+
+# Bump when the checks change, so every flow is validated again
+VALIDATION_VERSION = 1
+
+# Flows read per round trip while streaming
+STREAM_BATCH_SIZE = 1000
+
+# Flow columns that make up its definition
+DEFINITION_COLUMNS = (
+    "name", "description", "owner_id", "org_id", "schedule_type", "schedule_config",
+    "timeout_minutes", "retry_count", "max_parallel_runs",
+)
+NODE_COLUMNS = (
+    "id", "flow_id", "parent_node_id", "depends_on_node_ids",
+    "data_source_id", "data_set_id", "data_sink_id",
+)
+# Node columns folded into the per-flow digest as SUM(id * column)
+NODE_DIGEST_COLUMNS = ("parent_node_id", "data_source_id", "data_set_id", "data_sink_id")
+# Per-flow node aggregates hashed with the definition columns
+FINGERPRINT_COLUMNS = (
+    "node_count", "nodes_updated_at", "node_ids_digest",
+    *(f"{column}_digest" for column in NODE_DIGEST_COLUMNS), "depends_on_digest",
+)
+
+NAME_PATTERN = re.compile(r'^[\w\s\-\.\(\)]+$')
+
+
+def flow_errors(flow: Any) -> List[str]:
+    """Errors in a flow's own fields; flow is a Flow or a row with its columns"""
+    errors = []
+
+    if not flow.name or not flow.name.strip():
+        errors.append("Name cannot be blank")
+    elif len(flow.name) > 255:
+        errors.append("Name is too long (maximum 255 characters)")
+
+    if flow.name and not NAME_PATTERN.match(flow.name):
+        errors.append("Name contains invalid characters")
+
+    if not flow.owner_id:
+        errors.append("Owner is required")
+
+    if not flow.org_id:
+        errors.append("Organization is required")
+
+    if flow.description and len(flow.description) > 10000:
+        errors.append("Description is too long (maximum 10,000 characters)")
+
+    if flow.timeout_minutes and flow.timeout_minutes <= 0:
+        errors.append("Timeout must be positive")
+
+    if flow.retry_count and flow.retry_count < 0:
+        errors.append("Retry count cannot be negative")
+
+    if flow.max_parallel_runs and flow.max_parallel_runs <= 0:
+        errors.append("Max parallel runs must be positive")
+
+    return errors
+
+
+def validate_definition(flow: Any, nodes: Iterable[Any], now: Optional[datetime] = None) -> Tuple[List[str], List[str]]:
+    """
+    Check a flow with its nodes.
+
+    Returns:
+        (errors, warnings)
+    """
+    nodes = list(nodes)
+    errors = flow_errors(flow)
+    warnings = []
+
+    try:
+        next_fire_time(flow.schedule_type, flow.schedule_config, now or datetime.utcnow())
+    except (TypeError, ValueError) as e:
+        errors.append(f"Invalid schedule: {str(e)}")
+
+    if not nodes:
+        warnings.append("Flow has no nodes")
+        return errors, warnings
+
+    # Run every node in dependency order; upstreams in other flows count as met
+    upstreams = upstream_map(nodes)
+    external = {upstream_id for waits_for in upstreams.values() for upstream_id in waits_for} - upstreams.keys()
+    resolver = ReadinessResolver(upstreams, external)
+    node_id = resolver.next_ready()
+    while node_id is not None:
+        resolver.start(node_id)
+        resolver.complete(node_id)
+        node_id = resolver.next_ready()
+    cycle = sorted(resolver.waiting())
+    if cycle:
+        errors.append(f"Nodes {cycle} depend on each other")
+
+    for node in nodes:
+        if node.data_source_id is None and node.data_set_id is None and node.data_sink_id is None:
+            warnings.append(f"Node {node.id} has no data source, data set or data sink")
+    return errors, warnings
+
+
+def _fingerprint_value(value: Any) -> Any:
+    value = getattr(value, "name", value)
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def definition_hash(flow: Any) -> str:
+    """
+    Hash of a flow's definition columns and its node fingerprint.
+
+    flow is a row with DEFINITION_COLUMNS and FINGERPRINT_COLUMNS. Besides
+    the nodes' count and latest update, the fingerprint sums each node's id
+    times its parent and resource ids, so re-parenting or re-pointing a node
+    changes the hash even when updated_at does not move (bulk updates that
+    keep it, or edits within one second of DATETIME precision).
+    depends_on_node_ids is summed by its text length only: an edit keeping
+    both the length and updated_at goes unseen until the daily forced run.
+    """
+    definition = [VALIDATION_VERSION] + [_fingerprint_value(getattr(flow, column)) for column in DEFINITION_COLUMNS]
+    definition += [_fingerprint_value(getattr(flow, column)) for column in FINGERPRINT_COLUMNS]
+    return hashlib.sha256(json.dumps(definition, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def chunked(values: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class FlowValidator:
+    """
+    Finds flows whose definition changed and validates them in bulk.
+
+    changed_flow_ids() streams one row per active flow with its node
+    fingerprint aggregated in the database; validate() loads a chunk of
+    flows and their nodes in two queries and writes every result in one
+    executemany UPDATE.
+    """
+
+    def __init__(self, connection: Any, stream_batch_size: int = STREAM_BATCH_SIZE):
+        """
+        Args:
+            connection: Session or Connection
+            stream_batch_size: Flows fetched per round trip while streaming
+        """
+        from app.database import Base
+
+        self.connection = connection
+        self.stream_batch_size = stream_batch_size
+        self.flows = Base.metadata.tables["flows"]
+        self.nodes = Base.metadata.tables["flow_nodes"]
+        self.scanned = 0
+        self.changed = 0
+
+    def _definition_columns(self):
+        return [self.flows.c[column] for column in DEFINITION_COLUMNS]
+
+    def _fingerprints(self, flow_ids: Optional[List[int]] = None):
+        """Subquery of FINGERPRINT_COLUMNS per flow_id, aggregated in the database"""
+        nodes = self.nodes
+        weighted = [
+            func.sum(nodes.c.id * func.coalesce(nodes.c[column], 0)).label(f"{column}_digest")
+            for column in NODE_DIGEST_COLUMNS
+        ]
+        depends_on_length = func.coalesce(func.length(cast(nodes.c.depends_on_node_ids, String)), 0)
+        return (
+            select(
+                nodes.c.flow_id,
+                func.count(nodes.c.id).label("node_count"),
+                func.max(nodes.c.updated_at).label("nodes_updated_at"),
+                func.sum(nodes.c.id).label("node_ids_digest"),
+                *weighted,
+                func.sum(nodes.c.id * depends_on_length).label("depends_on_digest"),
+            )
+            .where(nodes.c.flow_id.isnot(None) if flow_ids is None else nodes.c.flow_id.in_(flow_ids))
+            .group_by(nodes.c.flow_id)
+            .subquery()
+        )
+
+    def _fingerprint_columns(self, fingerprints):
+        return [fingerprints.c[column] for column in FINGERPRINT_COLUMNS]
+
+    def changed_flow_ids(self, force: bool = False) -> Iterator[int]:
+        """
+        Stream the ids of active flows to validate.
+
+        Args:
+            force: Every active flow, whatever its hash
+        """
+        flows = self.flows
+        fingerprints = self._fingerprints()
+        query = (
+            select(
+                flows.c.id, flows.c.validation_hash, *self._definition_columns(),
+                *self._fingerprint_columns(fingerprints),
+            )
+            .outerjoin(fingerprints, fingerprints.c.flow_id == flows.c.id)
+            .where(flows.c.is_active.is_(True))
+            .order_by(flows.c.id)
+            .execution_options(yield_per=self.stream_batch_size)
+        )
+        for row in self.connection.execute(query):
+            self.scanned += 1
+            if force or row.validation_hash != definition_hash(row):
+                self.changed += 1
+                yield row.id
+
+    def changed_chunks(self, chunk_size: int, force: bool = False) -> Iterator[List[int]]:
+        return chunked(self.changed_flow_ids(force), chunk_size)
+
+    def validate(self, flow_ids: List[int], now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Validate flows and store results, hashes and times; the caller commits.
+
+        Returns:
+            Counts, and the errors of invalid flows by id
+        """
+        flows, nodes = self.flows, self.nodes
+        now = now or datetime.utcnow()
+        # The fingerprint is read as changed_flow_ids() reads it, so the stored hash matches the next scan
+        fingerprints = self._fingerprints(flow_ids)
+        rows = self.connection.execute(
+            select(flows.c.id, *self._definition_columns(), *self._fingerprint_columns(fingerprints))
+            .outerjoin(fingerprints, fingerprints.c.flow_id == flows.c.id)
+            .where(flows.c.id.in_(flow_ids))
+        ).all()
+        nodes_by_flow: Dict[int, List[Any]] = {row.id: [] for row in rows}
+        for node in self.connection.execute(
+            select(*[nodes.c[column] for column in NODE_COLUMNS]).where(nodes.c.flow_id.in_(flow_ids))
+        ):
+            nodes_by_flow[node.flow_id].append(node)
+
+        results, invalid = [], {}
+        for row in rows:
+            flow_nodes = nodes_by_flow[row.id]
+            try:
+                errors, warnings = validate_definition(row, flow_nodes, now)
+            except Exception as e:
+                errors, warnings = [f"Validation error: {str(e)}"], []
+            if errors:
+                invalid[row.id] = errors
+            results.append({
+                "b_id": row.id,
+                "b_hash": definition_hash(row),
+                "b_valid": not errors,
+                "b_errors": {"errors": errors, "warnings": warnings},
+            })
+
+        if results:
+            self.connection.execute(
+                update(flows).where(flows.c.id == bindparam("b_id")).values(
+                    validation_hash=bindparam("b_hash"),
+                    validation_valid=bindparam("b_valid"),
+                    validation_errors=bindparam("b_errors"),
+                    validated_at=now,
+                    # Validating is not an edit
+                    updated_at=flows.c.updated_at,
+                ),
+                results
+            )
+        return {
+            "validated_flows": len(results),
+            "valid_flows": len(results) - len(invalid),
+            "invalid_flows": len(invalid),
+            "errors": invalid,
+        }
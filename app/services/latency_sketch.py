@@ -0,0 +1,498 @@
+"""
+Latency Sketches - Mergeable quantile sketches for request and task timings.
+Tracks p50/p95/p99/p999 per route, Celery task and flow node in bounded memory,
+and ships each process's sketches through Redis so any process reports them all.
+"""
+
+import json
+import logging
+import math
+import os
+import socket
+import time
+from collections import OrderedDict, deque
+from threading import Event, Lock, Thread
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUANTILES = (
+    ("p50", 0.5),
+    ("p95", 0.95),
+    ("p99", 0.99),
+    ("p999", 0.999),
+)
+
+
+class DDSketch:
+    """
+    Quantile sketch with relative-error guarantees (DDSketch).
+
+    Values are counted in logarithmically sized buckets, so any reported
+    quantile is within relative_accuracy of the true value. Two sketches with
+    the same accuracy merge by adding bucket counts, which makes them safe to
+    combine across workers and time windows. When more than max_buckets are
+    in use the lowest buckets are collapsed, keeping the tail accurate.
+    """
+
+    # Values at or below this are counted as zero (timings are non-negative)
+    MIN_INDEXABLE = 1e-9
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # Midpoint of the bucket (gamma^(k-1), gamma^k] in relative terms
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, weight: int = 1):
+        """Record a value"""
+        if value <= self.MIN_INDEXABLE:
+            self.zero_count += weight
+        else:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + weight
+            if len(self.bins) > self.max_buckets:
+                self._collapse()
+
+        self.count += weight
+        self.sum += value * weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        excess = keys[:len(keys) - self.max_buckets + 1]
+        target = keys[len(excess)]
+        self.bins[target] += sum(self.bins.pop(key) for key in excess)
+
+    def merge(self, other: "DDSketch"):
+        """Add another sketch's counts into this one"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        if other.count == 0:
+            return
+
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        if len(self.bins) > self.max_buckets:
+            self._collapse()
+
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            Estimated value, or None when the sketch is empty
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        if self.count == 0:
+            return None
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+        if cumulative > rank:
+            return max(self.min, 0.0)
+
+        for key in sorted(self.bins):
+            cumulative += self.bins[key]
+            if cumulative > rank:
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    def percentiles(self, quantiles: Iterable[Tuple[str, float]] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        """Get the named quantiles (p50/p95/p99/p999 by default)"""
+        return {name: self.quantile(q) for name, q in quantiles}
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def copy(self) -> "DDSketch":
+        sketch = DDSketch(self.relative_accuracy, self.max_buckets)
+        sketch.merge(self)
+        return sketch
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for shipping between processes"""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "bins": {str(key): count for key, count in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], max_buckets: int = 2048) -> "DDSketch":
+        sketch = cls(data["relative_accuracy"], max_buckets)
+        sketch.bins = {int(key): count for key, count in data["bins"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
+
+
+class WindowedSketch:
+    """
+    A sketch per fixed time window plus a running total.
+
+    Recent windows are kept so callers can ask for "the last N minutes";
+    older windows are dropped, bounding memory to max_windows sketches.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int = 60,
+        max_windows: int = 60,
+        relative_accuracy: float = 0.01
+    ):
+        self.window_seconds = window_seconds
+        self.relative_accuracy = relative_accuracy
+        self.total = DDSketch(relative_accuracy)
+        self._windows: deque = deque(maxlen=max_windows)
+        self._lock = Lock()
+        # Values were added since the last publish
+        self.dirty = False
+
+    def add(self, value: float, now: Optional[float] = None):
+        """Record a value in the current window"""
+        window = int((now if now is not None else time.time()) // self.window_seconds)
+        with self._lock:
+            if not self._windows or self._windows[-1][0] != window:
+                self._windows.append((window, DDSketch(self.relative_accuracy)))
+            self._windows[-1][1].add(value)
+            self.total.add(value)
+            self.dirty = True
+
+    def merged(self, window_seconds: Optional[int] = None, now: Optional[float] = None) -> DDSketch:
+        """
+        Merge the windows covering the last window_seconds.
+
+        Args:
+            window_seconds: Lookback; None for everything since startup
+
+        Returns:
+            A new sketch owned by the caller
+        """
+        with self._lock:
+            if window_seconds is None:
+                return self.total.copy()
+
+            current = int((now if now is not None else time.time()) // self.window_seconds)
+            oldest = current - max(1, math.ceil(window_seconds / self.window_seconds)) + 1
+            result = DDSketch(self.relative_accuracy)
+            for window, sketch in self._windows:
+                if window >= oldest:
+                    result.merge(sketch)
+            return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the windows and total; clears the dirty flag"""
+        with self._lock:
+            self.dirty = False
+            return {
+                "window_seconds": self.window_seconds,
+                "max_windows": self._windows.maxlen,
+                "relative_accuracy": self.relative_accuracy,
+                "windows": [[window, sketch.to_dict()] for window, sketch in self._windows],
+                "total": self.total.to_dict()
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WindowedSketch":
+        sketch = cls(data["window_seconds"], data["max_windows"], data["relative_accuracy"])
+        sketch.total = DDSketch.from_dict(data["total"])
+        sketch._windows.extend((window, DDSketch.from_dict(window_data)) for window, window_data in data["windows"])
+        return sketch
+
+
+class SharedLatencyStore:
+    """
+    Latency series of every process, shipped through Redis.
+
+    Each process writes the series that changed since its last publish into
+    one hash per kind (latency:<kind>:<process>) that expires unless it is
+    refreshed, and registers itself in latency:processes. Readers merge the
+    hashes of every other live process with their own in-memory series.
+    """
+
+    KEY_PREFIX = "latency"
+
+    def __init__(self, client: Any, process_id: Optional[str] = None, ttl_seconds: int = 3900):
+        """
+        Args:
+            client: Synchronous Redis client
+            process_id: This process's key; host and pid by default
+            ttl_seconds: Series of a process that stops publishing are dropped after this
+        """
+        self.client = client
+        self.process_id = process_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def processes_key(self) -> str:
+        return f"{self.KEY_PREFIX}:processes"
+
+    def _key(self, kind: str, process_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{kind}:{process_id}"
+
+    def publish(self, series: Dict[str, Dict[str, "WindowedSketch"]], now: Optional[float] = None) -> int:
+        """
+        Write the dirty series of this process.
+
+        Args:
+            series: Kind -> name -> sketch
+
+        Returns:
+            Number of series written
+        """
+        now = now if now is not None else time.time()
+        pipe = self.client.pipeline(transaction=False)
+        written = 0
+        for kind, sketches in series.items():
+            fields = {name: json.dumps(sketch.to_dict()) for name, sketch in sketches.items() if sketch.dirty}
+            key = self._key(kind, self.process_id)
+            if fields:
+                pipe.hset(key, mapping=fields)
+                written += len(fields)
+            pipe.expire(key, self.ttl_seconds)
+        pipe.zadd(self.processes_key, {self.process_id: now})
+        pipe.zremrangebyscore(self.processes_key, "-inf", now - self.ttl_seconds)
+        pipe.execute()
+        return written
+
+    def load(self, kind: str, name: Optional[str] = None, now: Optional[float] = None) -> Dict[str, List["WindowedSketch"]]:
+        """
+        Series of a kind published by every other live process.
+
+        Returns:
+            Name -> one sketch per process
+        """
+        now = now if now is not None else time.time()
+        processes = [
+            process.decode() if isinstance(process, bytes) else process
+            for process in self.client.zrangebyscore(self.processes_key, now - self.ttl_seconds, "+inf")
+        ]
+        others = [process for process in processes if process != self.process_id]
+        if not others:
+            return {}
+
+        pipe = self.client.pipeline(transaction=False)
+        for process in others:
+            if name is None:
+                pipe.hgetall(self._key(kind, process))
+            else:
+                pipe.hget(self._key(kind, process), name)
+
+        loaded: Dict[str, List[WindowedSketch]] = {}
+        for value in pipe.execute():
+            if not value:
+                continue
+            items = value.items() if name is None else [(name, value)]
+            for series_name, data in items:
+                series_name = series_name.decode() if isinstance(series_name, bytes) else series_name
+                loaded.setdefault(series_name, []).append(WindowedSketch.from_dict(json.loads(data)))
+        return loaded
+
+
+class LatencyTracker:
+    """
+    Singleton registry of windowed latency sketches.
+
+    Series are grouped by kind ("route", "task", "flow_node") and name. Each
+    kind keeps at most MAX_SERIES names; the least recently used is evicted.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    KINDS = ("route", "task", "flow_node")
+    MAX_SERIES = 2000
+
+    def __init__(self):
+        self._series: Dict[str, "OrderedDict[str, WindowedSketch]"] = {kind: OrderedDict() for kind in self.KINDS}
+        self._series_lock = Lock()
+        self.store: Optional[SharedLatencyStore] = None
+        self._publisher: Optional[Thread] = None
+        self._stop = Event()
+
+    @classmethod
+    def instance(cls) -> "LatencyTracker":
+        """Get singleton instance"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def series(self, kind: str, name: str) -> WindowedSketch:
+        """
+        Get the sketch for one series, creating it on first use.
+
+        Hot paths may keep the returned sketch and call add() on it directly.
+        """
+        with self._series_lock:
+            series = self._series[kind]
+            sketch = series.get(name)
+            if sketch is None:
+                sketch = series[name] = WindowedSketch()
+                if len(series) > self.MAX_SERIES:
+                    evicted, _ = series.popitem(last=False)
+                    logger.debug(f"Evicted latency series {kind}:{evicted}")
+            else:
+                series.move_to_end(name)
+            return sketch
+
+    def record(self, kind: str, name: str, seconds: float):
+        """Record one timing in seconds"""
+        try:
+            self.series(kind, name).add(seconds)
+        except Exception as e:
+            logger.error(f"Failed to record latency for {kind}:{name}: {str(e)}")
+
+    # Sharing between processes
+
+    def share(self, store: SharedLatencyStore, interval_seconds: float = 10.0):
+        """
+        Publish this process's series to store every interval and read every process's series from it.
+
+        Call once per process after it forks (app startup, Celery worker_process_init).
+        """
+        self.stop_sharing()
+        self.store = store
+        self._stop = Event()
+        self._publisher = Thread(
+            target=self._publish_loop, args=(interval_seconds,), name="latency-publisher", daemon=True
+        )
+        self._publisher.start()
+
+    def stop_sharing(self):
+        if self._publisher is not None:
+            self._stop.set()
+            self._publisher.join(timeout=5)
+            self._publisher = None
+        if self.store is not None:
+            self.publish()
+        self.store = None
+
+    def _publish_loop(self, interval_seconds: float):
+        while not self._stop.wait(interval_seconds):
+            self.publish()
+
+    def publish(self) -> int:
+        """Write the series that changed since the last publish to the shared store"""
+        if self.store is None:
+            return 0
+        with self._series_lock:
+            series = {kind: dict(items) for kind, items in self._series.items()}
+        try:
+            return self.store.publish(series)
+        except Exception as e:
+            logger.error(f"Failed to publish latency sketches: {str(e)}")
+            return 0
+
+    def _shared(self, kind: str, name: Optional[str] = None) -> Dict[str, List[WindowedSketch]]:
+        if self.store is None:
+            return {}
+        try:
+            return self.store.load(kind, name)
+        except Exception as e:
+            logger.error(f"Failed to load shared latency sketches: {str(e)}")
+            return {}
+
+    def _all_series(self, kind: str, name: Optional[str] = None) -> Dict[str, List[WindowedSketch]]:
+        """Name -> this process's sketch and every other process's"""
+        with self._series_lock:
+            if name is None:
+                local = {series_name: [sketch] for series_name, sketch in self._series[kind].items()}
+            else:
+                sketch = self._series[kind].get(name)
+                local = {name: [sketch]} if sketch is not None else {}
+        for series_name, sketches in self._shared(kind, name).items():
+            local.setdefault(series_name, []).extend(sketches)
+        return local
+
+    def merged(self, kind: str, name: Optional[str] = None, window_seconds: Optional[int] = None) -> DDSketch:
+        """Merge one series, or every series of a kind when name is None, across processes"""
+        result = DDSketch()
+        for sketches in self._all_series(kind, name).values():
+            for sketch in sketches:
+                result.merge(sketch.merged(window_seconds))
+        return result
+
+    def summary(self, kind: str, window_seconds: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Summarize every series of a kind.
+
+        Args:
+            kind: Series kind
+            window_seconds: Lookback; None for everything since startup
+
+        Returns:
+            Per-series count, mean and percentiles in milliseconds across
+            processes, slowest p99 first
+        """
+        rows = []
+        for name, sketches in self._all_series(kind).items():
+            merged = DDSketch()
+            for sketch in sketches:
+                merged.merge(sketch.merged(window_seconds))
+            if merged.count:
+                rows.append({"name": name, **summarize(merged)})
+        rows.sort(key=lambda row: row["p99_ms"], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._series_lock:
+            for series in self._series.values():
+                series.clear()
+
+
+def summarize(sketch: DDSketch) -> Dict[str, Any]:
+    """Count, mean and named percentiles of a sketch of seconds, in milliseconds"""
+    summary: Dict[str, Any] = {"count": sketch.count}
+    mean = sketch.mean
+    summary["mean_ms"] = round(mean * 1000, 3) if mean is not None else None
+    for name, value in sketch.percentiles().items():
+        summary[f"{name}_ms"] = round(value * 1000, 3) if value is not None else None
+    return summary
+
+
+latency_tracker = LatencyTracker.instance()
@@ -0,0 +1,154 @@
+"""
+Lineage - Ancestor and descendant queries over parent links.
+Answers each lineage question about data sets (parent_data_set_id) and flow
+nodes (parent_node_id) with one recursive CTE instead of one lazy load per hop.
+"""
+
+from collections import defaultdict
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import exists, func, literal, or_, select
+from sqlalchemy.sql import Select
+
+# Parent link column per table
+PARENT_COLUMNS = {
+    "data_sets": "parent_data_set_id",
+    "flow_nodes": "parent_node_id",
+}
+
+# Hops followed before stopping; bounds the recursion if links ever form a cycle
+MAX_DEPTH = 100
+
+
+def _table(table_name: str):
+    from app.database import Base
+    if table_name not in PARENT_COLUMNS:
+        raise ValueError(f"No lineage for table '{table_name}'")
+    return Base.metadata.tables[table_name]
+
+
+def ancestors_cte(table_name: str, node_id: int, max_depth: int = MAX_DEPTH):
+    """
+    Recursive CTE of a node's ancestors as (id, depth), the parent at depth 1.
+
+    Each step seeks the primary key of the previous step's parent.
+    """
+    table = _table(table_name)
+    parent = table.c[PARENT_COLUMNS[table_name]]
+    seed = select(parent.label("id"), literal(1).label("depth")).where(
+        table.c.id == node_id, parent.isnot(None)
+    ).cte(f"{table_name}_ancestors", recursive=True)
+    step = select(parent, seed.c.depth + 1).where(
+        table.c.id == seed.c.id, parent.isnot(None), seed.c.depth < max_depth
+    )
+    return seed.union_all(step)
+
+
+def descendants_cte(table_name: str, node_id: int, same_origin: bool = False, max_depth: int = MAX_DEPTH):
+    """
+    Recursive CTE of a node's descendants as (id, parent_id, depth), children at depth 1.
+
+    Each step seeks the parent index for the previous step's ids.
+
+    Args:
+        table_name: Key of PARENT_COLUMNS
+        node_id: Node whose subtree is walked
+        same_origin: Flow nodes only; stop at children of another origin (shared flows)
+        max_depth: Levels walked at most
+    """
+    table = _table(table_name)
+    parent = table.c[PARENT_COLUMNS[table_name]]
+    start = table.alias("start")
+    carried = [table.c.origin_node_id] if same_origin else []
+    seed = select(table.c.id, parent.label("parent_id"), literal(1).label("depth"), *carried).where(
+        parent == node_id
+    )
+    if same_origin:
+        seed = seed.where(start.c.id == node_id, table.c.origin_node_id == start.c.origin_node_id)
+    seed = seed.cte(f"{table_name}_descendants", recursive=True)
+    step = select(table.c.id, parent, seed.c.depth + 1, *carried).where(
+        parent == seed.c.id, seed.c.depth < max_depth
+    )
+    if same_origin:
+        step = step.where(table.c.origin_node_id == seed.c.origin_node_id)
+    return seed.union_all(step)
+
+
+def ancestor_ids(connection: Any, table_name: str, node_id: int, max_depth: int = MAX_DEPTH) -> List[int]:
+    """Ids of a node's ancestors, nearest first"""
+    tree = ancestors_cte(table_name, node_id, max_depth)
+    return list(connection.execute(select(tree.c.id).order_by(tree.c.depth)).scalars())
+
+
+def descendants(
+    connection: Any,
+    table_name: str,
+    node_id: int,
+    same_origin: bool = False,
+    max_depth: int = MAX_DEPTH
+) -> List[Tuple[int, int, int]]:
+    """
+    A node's descendants as (id, parent_id, depth) in depth-first pre-order.
+
+    Siblings are visited by id, as the recursive Python walks found them.
+    """
+    tree = descendants_cte(table_name, node_id, same_origin, max_depth)
+    rows = connection.execute(select(tree.c.id, tree.c.parent_id, tree.c.depth)).all()
+    children = defaultdict(list)
+    for row in rows:
+        children[row.parent_id].append(row)
+    ordered: List[Tuple[int, int, int]] = []
+    # A cyclic link would revisit nodes until MAX_DEPTH; each node is listed once
+    seen = {node_id}
+
+    def order(row):
+        return row.id, row.depth
+
+    stack = sorted(children[node_id], key=order, reverse=True)
+    while stack:
+        row = stack.pop()
+        if row.id in seen:
+            continue
+        seen.add(row.id)
+        ordered.append((row.id, row.parent_id, row.depth))
+        stack.extend(sorted(children.get(row.id, ()), key=order, reverse=True))
+    return ordered
+
+
+def depth(connection: Any, table_name: str, node_id: int, max_depth: int = MAX_DEPTH) -> int:
+    """Number of ancestors of a node (0 for a root)"""
+    tree = ancestors_cte(table_name, node_id, max_depth)
+    return connection.execute(select(func.coalesce(func.max(tree.c.depth), 0))).scalar()
+
+
+def root_id(connection: Any, table_name: str, node_id: int, max_depth: int = MAX_DEPTH) -> int:
+    """Id of the topmost ancestor of a node (the node itself for a root)"""
+    tree = ancestors_cte(table_name, node_id, max_depth)
+    found = connection.execute(select(tree.c.id).order_by(tree.c.depth.desc()).limit(1)).scalar()
+    return node_id if found is None else found
+
+
+def splitter_criterion(table) -> Any:
+    """Data sets that split their input, as DataSet.splitter_ decides"""
+    from app.models.data_set import DataSet, DataSetTypes
+    return or_(
+        table.c.data_set_type == DataSetTypes.SPLITTER,
+        table.c.transform_config["operation"].as_string() == DataSet.SPLITTER_OPERATION
+    )
+
+
+def upstream_has_splitter(connection: Any, data_set_id: int, limit: Optional[int] = None) -> bool:
+    """
+    Whether any of a data set's nearest ancestors is a splitter.
+
+    Args:
+        connection: Session or Connection
+        data_set_id: Data set whose upstream is checked
+        limit: Ancestors checked at most (DataSet.UPSTREAM_SPLITTER_LOOKUP_LIMIT by default)
+    """
+    from app.models.data_set import DataSet
+
+    table = _table("data_sets")
+    tree = ancestors_cte("data_sets", data_set_id, limit or DataSet.UPSTREAM_SPLITTER_LOOKUP_LIMIT)
+    query: Select = select(exists().where(table.c.id == tree.c.id, splitter_criterion(table)))
+    return bool(connection.execute(query).scalar())
@@ -0,0 +1,188 @@
+"""
+Event Loop Watchdog - Detect and attribute event-loop blocking.
+A heartbeat coroutine proves the loop is responsive; a watchdog thread
+captures the loop thread's stack and route when the heartbeat stalls.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from threading import Lock
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+
+class BlockEvent:
+    """One stall of the event loop"""
+
+    __slots__ = ("started_at", "detected_at", "blocked_ms", "route", "method", "stack", "finished")
+
+    def __init__(self, started_at: float, blocked_ms: float, route: Optional[str], method: Optional[str], stack: List[str]):
+        self.started_at = started_at
+        self.detected_at = time.time()
+        self.blocked_ms = blocked_ms
+        self.route = route
+        self.method = method
+        self.stack = stack
+        self.finished = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "detected_at": self.detected_at,
+            "blocked_ms": round(self.blocked_ms, 1),
+            "finished": self.finished,
+            "route": self.route,
+            "method": self.method,
+            "stack": self.stack
+        }
+
+
+class EventLoopWatchdog:
+    """
+    Singleton opt-in blocking detector.
+
+    The heartbeat runs on the loop every `interval` seconds. If the watchdog
+    thread sees no heartbeat for `threshold_ms`, it records the loop thread's
+    current stack (the code holding the loop) and the route of the request
+    being served, found from the RequestContext or ASGI scope on that stack.
+    When the loop recovers, the heartbeat fills in the total stall time.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    MAX_EVENTS = 100
+    MAX_STACK_DEPTH = 40
+
+    def __init__(self, threshold_ms: float = 100.0, interval: float = 0.02):
+        self.threshold_ms = threshold_ms
+        self.interval = interval
+        self.events: deque = deque(maxlen=self.MAX_EVENTS)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.perf_counter()
+        self._pending: Optional[BlockEvent] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def instance(cls) -> "EventLoopWatchdog":
+        """Get singleton instance"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, threshold_ms: Optional[float] = None):
+        """Start watching the running event loop; call from a coroutine on that loop"""
+        if self.running:
+            return
+        if threshold_ms is not None:
+            self.threshold_ms = threshold_ms
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event loop watchdog started (threshold {self.threshold_ms}ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            now = time.perf_counter()
+            pending = self._pending
+            if pending is not None:
+                # The loop is free again: record the full stall
+                pending.blocked_ms = (now - pending.started_at) * 1000
+                pending.finished = True
+                self._pending = None
+                logger.warning(
+                    f"Event loop was blocked for {pending.blocked_ms:.0f}ms "
+                    f"in {pending.method or ''} {pending.route or 'background task'}"
+                )
+            self._last_beat = now
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            last_beat = self._last_beat
+            # Allow the heartbeat's own sleep before counting the loop as blocked
+            stalled_ms = (time.perf_counter() - last_beat - self.interval) * 1000
+            if stalled_ms >= self.threshold_ms and self._pending is None:
+                self._pending = self.capture(last_beat + self.interval, stalled_ms)
+
+    def capture(self, started_at: float, blocked_ms: float) -> Optional[BlockEvent]:
+        """Record the loop thread's current stack as a block event"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+
+        method, route = find_request(frame)
+        stack = traceback.format_list(traceback.extract_stack(frame, limit=self.MAX_STACK_DEPTH))
+        event = BlockEvent(started_at, blocked_ms, route, method, [line.rstrip() for line in stack])
+        self.events.append(event)
+        self._record_metric(route)
+        return event
+
+    @staticmethod
+    def _record_metric(route: Optional[str]):
+        try:
+            from .prometheus_metric_service import PrometheusMetricService
+            PrometheusMetricService.instance().counter(
+                "event_loop_blocked_total", "Event loop stalls over the watchdog threshold"
+            ).labels(endpoint=route or "background").inc()
+        except Exception as e:
+            logger.error(f"Failed to record event loop block metric: {str(e)}")
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent block events, newest first"""
+        return [event.to_dict() for event in list(self.events)[::-1][:limit]]
+
+
+def find_request(frame) -> tuple:
+    """
+    Find the request a stack is serving.
+
+    Walks outwards looking for the pipeline's RequestContext ("ctx") or an
+    HTTP ASGI scope in the frame locals.
+
+    Returns:
+        (method, route template) or (None, None) outside a request
+    """
+    scope = None
+    while frame is not None:
+        local_vars = frame.f_locals
+        ctx = local_vars.get("ctx")
+        if ctx is not None and hasattr(ctx, "route_template"):
+            return ctx.method, ctx.route_template
+        candidate = local_vars.get("scope")
+        if scope is None and isinstance(candidate, dict) and candidate.get("type") == "http":
+            scope = candidate
+        frame = frame.f_back
+
+    if scope is None:
+        return None, None
+    route = scope.get("route")
+    return scope.get("method"), getattr(route, "path", None) or scope.get("path")
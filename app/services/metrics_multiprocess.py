@@ -0,0 +1,457 @@
+"""
+Multiprocess Metrics - Share metric values across uvicorn/gunicorn workers.
+Each worker writes its samples into mmap-backed files in a shared directory;
+the exposition endpoint merges every worker's files on scrape.
+"""
+
+import fcntl
+import glob
+import json
+import logging
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Any, Optional, Tuple, List, Iterator, Union
+
+from .metrics_registry import (
+    MetricsRegistry,
+    MetricFamily,
+    format_labels,
+    format_value,
+    escape_help
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PID = "archive"
+
+# Dead workers' counters and histograms are folded into the archive file;
+# gauges only describe live processes and are dropped.
+ARCHIVED_TYPES = ("counter", "histogram")
+
+# How a gauge's per-worker values are combined on scrape, as in prometheus_client:
+# liveall keeps one series per worker under a pid label, livesum adds them up,
+# max and min keep the extreme value.
+GAUGE_MODES = ("liveall", "livesum", "max", "min")
+
+
+class MmapedDict:
+    """
+    Append-only map of string keys to doubles stored in a memory-mapped file.
+
+    Layout: an 8-byte header holding the used length, then entries of
+    (int32 key length, key bytes padded to 8-byte alignment, float64 value).
+    Values are updated in place, so readers in other processes only ever see
+    whole entries.
+    """
+
+    INITIAL_SIZE = 1024 * 1024
+
+    def __init__(self, filename: str):
+        self._filename = filename
+        self._file = open(filename, "a+b")
+        self._lock = Lock()
+        self._positions: Dict[str, int] = {}
+
+        capacity = os.fstat(self._file.fileno()).st_size
+        if capacity == 0:
+            capacity = self.INITIAL_SIZE
+            self._file.truncate(capacity)
+        self._capacity = capacity
+        self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+
+        self._used = struct.unpack_from("i", self._mmap, 0)[0]
+        if self._used == 0:
+            self._used = 8
+            struct.pack_into("i", self._mmap, 0, self._used)
+        else:
+            for key, _, offset in _iter_entries(self._mmap, self._used):
+                self._positions[key] = offset
+
+    def _init_value(self, key: str) -> int:
+        encoded = key.encode("utf-8")
+        padded = encoded + b" " * (8 - (len(encoded) + 4) % 8)
+        entry = struct.pack(f"i{len(padded)}sd", len(encoded), padded, 0.0)
+
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+
+        self._mmap[self._used:self._used + len(entry)] = entry
+        self._used += len(entry)
+        struct.pack_into("i", self._mmap, 0, self._used)
+
+        offset = self._used - 8
+        self._positions[key] = offset
+        return offset
+
+    def inc(self, key: str, amount: float):
+        with self._lock:
+            offset = self._positions.get(key)
+            if offset is None:
+                offset = self._init_value(key)
+            value = struct.unpack_from("d", self._mmap, offset)[0]
+            struct.pack_into("d", self._mmap, offset, value + amount)
+
+    def set(self, key: str, value: float):
+        with self._lock:
+            offset = self._positions.get(key)
+            if offset is None:
+                offset = self._init_value(key)
+            struct.pack_into("d", self._mmap, offset, value)
+
+    def get(self, key: str) -> float:
+        with self._lock:
+            offset = self._positions.get(key)
+            if offset is None:
+                return 0.0
+            return struct.unpack_from("d", self._mmap, offset)[0]
+
+    def close(self):
+        with self._lock:
+            self._mmap.close()
+            self._file.close()
+
+    @staticmethod
+    def read_all_values(filename: str) -> List[Tuple[str, float]]:
+        """Read every (key, value) pair of a file without mapping it writable"""
+        with open(filename, "rb") as f:
+            data = f.read()
+        if len(data) < 8:
+            return []
+        used = struct.unpack_from("i", data, 0)[0]
+        return [(key, value) for key, value, _ in _iter_entries(data, used)]
+
+
+def _iter_entries(data, used: int) -> Iterator[Tuple[str, float, int]]:
+    pos = 8
+    while pos < used:
+        key_length = struct.unpack_from("i", data, pos)[0]
+        pos += 4
+        key = bytes(data[pos:pos + key_length]).decode("utf-8")
+        pos += key_length + (8 - (key_length + 4) % 8)
+        value = struct.unpack_from("d", data, pos)[0]
+        yield key, value, pos
+        pos += 8
+
+
+def sample_key(family: MetricFamily, sample_name: str, labelnames, labelvalues) -> str:
+    return json.dumps([family.name, family.description, sample_name, list(labelnames), list(labelvalues)])
+
+
+class MmapCounterChild:
+    """Counter child whose value lives in this worker's counter file"""
+
+    __slots__ = ("_registry", "_key")
+
+    def __init__(self, registry: "MultiProcessRegistry", key: str):
+        self._registry = registry
+        self._key = key
+
+    def inc(self, amount: Union[int, float] = 1):
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts")
+        self._registry.file_for("counter").inc(self._key, amount)
+
+    @property
+    def value(self) -> float:
+        return self._registry.file_for("counter").get(self._key)
+
+
+class MmapGaugeChild:
+    """Gauge child whose value lives in this worker's gauge file for the family's multiprocess mode"""
+
+    __slots__ = ("_registry", "_key", "_file_type")
+
+    def __init__(self, registry: "MultiProcessRegistry", key: str, multiprocess_mode: str):
+        self._registry = registry
+        self._key = key
+        self._file_type = f"gauge_{multiprocess_mode}"
+
+    def set(self, value: Union[int, float]):
+        self._registry.file_for(self._file_type).set(self._key, float(value))
+
+    def inc(self, amount: Union[int, float] = 1):
+        self._registry.file_for(self._file_type).inc(self._key, amount)
+
+    def dec(self, amount: Union[int, float] = 1):
+        self._registry.file_for(self._file_type).inc(self._key, -amount)
+
+    @property
+    def value(self) -> float:
+        return self._registry.file_for(self._file_type).get(self._key)
+
+
+class MmapHistogramChild:
+    """Histogram child storing per-bucket counts and the sum in this worker's histogram file"""
+
+    __slots__ = ("_registry", "upper_bounds", "_bucket_keys", "_sum_key")
+
+    def __init__(self, registry: "MultiProcessRegistry", family: MetricFamily, labelvalues: Tuple[str, ...]):
+        self._registry = registry
+        self.upper_bounds = family.upper_bounds
+        labelnames = tuple(family.labelnames or ()) + ("le",)
+        self._bucket_keys = [
+            sample_key(family, f"{family.name}_bucket", labelnames, labelvalues + (format_value(bound),))
+            for bound in self.upper_bounds
+        ]
+        self._sum_key = sample_key(family, f"{family.name}_sum", family.labelnames or (), labelvalues)
+
+    def observe(self, value: Union[int, float]):
+        data = self._registry.file_for("histogram")
+        data.inc(self._bucket_keys[bisect_left(self.upper_bounds, value)], 1)
+        data.inc(self._sum_key, value)
+
+    @property
+    def count(self) -> int:
+        data = self._registry.file_for("histogram")
+        return int(sum(data.get(key) for key in self._bucket_keys))
+
+
+class MultiProcessFamily(MetricFamily):
+    """Metric family whose children write to the registry's per-process files"""
+
+    def __init__(self, registry: "MultiProcessRegistry", *args, multiprocess_mode: str = "liveall", **kwargs):
+        if multiprocess_mode not in GAUGE_MODES:
+            raise ValueError(f"Unknown multiprocess mode: {multiprocess_mode}")
+        self._registry = registry
+        self.multiprocess_mode = multiprocess_mode
+        super().__init__(*args, **kwargs)
+
+    def _new_child(self, labelvalues: Tuple[str, ...]):
+        if self.type == "histogram":
+            return MmapHistogramChild(self._registry, self, labelvalues)
+        key = sample_key(self, self.name, self.labelnames or (), labelvalues)
+        if self.type == "counter":
+            return MmapCounterChild(self._registry, key)
+        return MmapGaugeChild(self._registry, key, self.multiprocess_mode)
+
+
+class MultiProcessRegistry(MetricsRegistry):
+    """
+    Metrics client for multi-worker deployments.
+
+    Metric values are written to mmap-backed files named {type}_{pid}.db (gauges:
+    gauge_{mode}_{pid}.db) in a directory shared by all workers, so recording
+    stays a local memory write.
+    expose() merges the files of every worker, folding the counters and
+    histograms of exited workers into an archive file and removing their files.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__()
+        if not os.path.isdir(directory):
+            raise ValueError(f"Multiprocess metrics directory does not exist: {directory}")
+        self.directory = directory
+        self._files: Dict[str, MmapedDict] = {}
+        self._files_pid = os.getpid()
+        self._files_lock = Lock()
+
+    def register(
+        self,
+        metric_type: str,
+        name: str,
+        description: str,
+        labelnames=None,
+        buckets=None,
+        multiprocess_mode: str = "liveall"
+    ) -> MetricFamily:
+        """Register a metric family backed by the shared files; multiprocess_mode applies to gauges"""
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = MultiProcessFamily(
+                    self, metric_type, name, description, labelnames, buckets, multiprocess_mode=multiprocess_mode
+                )
+                self._families[name] = family
+            elif family.type != metric_type:
+                raise ValueError(f"Metric {name} already registered as {family.type}")
+            elif metric_type == "gauge" and family.multiprocess_mode != multiprocess_mode:
+                raise ValueError(f"Gauge {name} already registered with mode {family.multiprocess_mode}")
+            return family
+
+    def file_for(self, metric_type: str) -> MmapedDict:
+        """This process's file for a metric type, reopened after a fork"""
+        pid = os.getpid()
+        if pid != self._files_pid:
+            with self._files_lock:
+                if pid != self._files_pid:
+                    self._files = {}
+                    self._files_pid = pid
+
+        data = self._files.get(metric_type)
+        if data is None:
+            with self._files_lock:
+                data = self._files.get(metric_type)
+                if data is None:
+                    filename = os.path.join(self.directory, f"{metric_type}_{pid}.db")
+                    data = self._files[metric_type] = MmapedDict(filename)
+        return data
+
+    def expose(self) -> str:
+        """Merge every worker's files and render them in the Prometheus text format"""
+        return MultiProcessCollector(self.directory).expose()
+
+
+class MultiProcessCollector:
+    """Merges the per-process metric files of a multiprocess directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def _parse_filename(path: str) -> Optional[Tuple[str, str]]:
+        """Split a file name into its file type (counter, histogram or gauge_{mode}) and pid"""
+        name = os.path.basename(path)[:-len(".db")]
+        file_type, _, pid = name.rpartition("_")
+        metric_type, _, mode = file_type.partition("_")
+        if metric_type == "gauge" and mode in GAUGE_MODES:
+            return file_type, pid
+        if file_type not in ARCHIVED_TYPES:
+            return None
+        return file_type, pid
+
+    @staticmethod
+    def _pid_alive(pid: str) -> bool:
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        except ValueError:
+            return False
+        return True
+
+    @contextmanager
+    def locked(self):
+        """Serialize cleanup and merging across workers scraping at the same time"""
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def retire_worker(self, pid: str):
+        """Fold an exited worker's counters and histograms into the archive and delete its files"""
+        for path in glob.glob(os.path.join(self.directory, f"*_{pid}.db")):
+            parsed = self._parse_filename(path)
+            if parsed is None or parsed[1] != pid:
+                continue
+
+            file_type = parsed[0]
+            if file_type in ARCHIVED_TYPES:
+                archive = MmapedDict(os.path.join(self.directory, f"{file_type}_{ARCHIVE_PID}.db"))
+                try:
+                    for key, value in MmapedDict.read_all_values(path):
+                        archive.inc(key, value)
+                finally:
+                    archive.close()
+            os.remove(path)
+            logger.debug(f"Removed metrics file of exited worker {pid}: {path}")
+
+    def cleanup_dead_workers(self):
+        """Retire every worker whose process no longer exists"""
+        dead = set()
+        for path in glob.glob(os.path.join(self.directory, "*.db")):
+            parsed = self._parse_filename(path)
+            if parsed and parsed[1] != ARCHIVE_PID and not self._pid_alive(parsed[1]):
+                dead.add(parsed[1])
+        for pid in dead:
+            self.retire_worker(pid)
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Merge all worker files into metric families.
+
+        Counters and histograms are summed; gauges are combined by the
+        multiprocess mode encoded in their file names.
+
+        Returns:
+            Mapping of metric name to type, help text and merged samples
+        """
+        with self.locked():
+            self.cleanup_dead_workers()
+            values = []
+            for path in glob.glob(os.path.join(self.directory, "*.db")):
+                parsed = self._parse_filename(path)
+                if parsed is not None:
+                    values.append((*parsed, MmapedDict.read_all_values(path)))
+
+        metrics: Dict[str, Dict[str, Any]] = {}
+        for file_type, pid, entries in values:
+            metric_type, _, mode = file_type.partition("_")
+            for key, value in entries:
+                name, description, sample_name, labelnames, labelvalues = json.loads(key)
+                metric = metrics.setdefault(name, {
+                    "type": metric_type,
+                    "help": description,
+                    "samples": defaultdict(float)
+                })
+                samples = metric["samples"]
+                if mode == "liveall":
+                    labelnames, labelvalues = labelnames + ["pid"], labelvalues + [pid]
+                sample = (sample_name, tuple(labelnames), tuple(labelvalues))
+                if mode == "max" and sample in samples:
+                    samples[sample] = max(samples[sample], value)
+                elif mode == "min" and sample in samples:
+                    samples[sample] = min(samples[sample], value)
+                else:
+                    samples[sample] += value
+        return metrics
+
+    def expose(self) -> str:
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {escape_help(metric['help'])}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            if metric["type"] == "histogram":
+                lines.extend(self._histogram_samples(name, metric["samples"]))
+            else:
+                for (sample_name, labelnames, labelvalues), value in sorted(metric["samples"].items()):
+                    lines.append(f"{sample_name}{format_labels(labelnames, labelvalues)} {format_value(value)}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    @staticmethod
+    def _histogram_samples(name: str, samples: Dict[tuple, float]) -> List[str]:
+        """Rebuild cumulative buckets, sum and count per label set"""
+        series: Dict[tuple, Dict[str, Any]] = {}
+        for (sample_name, labelnames, labelvalues), value in samples.items():
+            if sample_name.endswith("_bucket"):
+                key = (labelnames[:-1], labelvalues[:-1])
+                entry = series.setdefault(key, {"buckets": defaultdict(float), "sum": 0.0})
+                entry["buckets"][float(labelvalues[-1])] += value
+            else:
+                entry = series.setdefault((labelnames, labelvalues), {"buckets": defaultdict(float), "sum": 0.0})
+                entry["sum"] += value
+
+        lines = []
+        for (labelnames, labelvalues), entry in sorted(series.items()):
+            cumulative = 0.0
+            for bound in sorted(entry["buckets"]):
+                cumulative += entry["buckets"][bound]
+                le = f'le="{format_value(bound)}"'
+                lines.append(f"{name}_bucket{format_labels(labelnames, labelvalues, le)} {format_value(cumulative)}")
+            labels = format_labels(labelnames, labelvalues)
+            lines.append(f"{name}_sum{labels} {format_value(entry['sum'])}")
+            lines.append(f"{name}_count{labels} {format_value(cumulative)}")
+        return lines
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None):
+    """
+    Retire an exited worker's files; suitable for a gunicorn child_exit hook.
+    Scrapes also retire dead workers lazily, so calling this is optional.
+    """
+    directory = directory or os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        collector = MultiProcessCollector(directory)
+        with collector.locked():
+            collector.retire_worker(str(pid))
@@ -0,0 +1,293 @@
+"""
+Metrics Registry - In-process Prometheus metric families and text exposition.
+Backs PrometheusMetricService with labelled counters, gauges and histograms.
+"""
+
+import logging
+import math
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, Any, Optional, Tuple, Union, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, math.inf
+)
+
+
+def format_value(value: Union[int, float]) -> str:
+    """Format a sample value the way Prometheus expects"""
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value))
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def escape_help(text: str) -> str:
+    return text.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class CounterChild:
+    """Counter bound to one label set"""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+
+    def inc(self, amount: Union[int, float] = 1):
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts")
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labelnames, values) -> List[str]:
+        return [f"{name}{format_labels(labelnames, values)} {format_value(self.value)}"]
+
+
+class GaugeChild:
+    """Gauge bound to one label set"""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+
+    def set(self, value: Union[int, float]):
+        with self._lock:
+            self.value = float(value)
+
+    def inc(self, amount: Union[int, float] = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: Union[int, float] = 1):
+        with self._lock:
+            self.value -= amount
+
+    def samples(self, name: str, labelnames, values) -> List[str]:
+        return [f"{name}{format_labels(labelnames, values)} {format_value(self.value)}"]
+
+
+class HistogramChild:
+    """Histogram bound to one label set; bucket counts are stored non-cumulative"""
+
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: Union[int, float]):
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def samples(self, name: str, labelnames, values) -> List[str]:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds, counts):
+            cumulative += count
+            le = f'le="{format_value(bound)}"'
+            lines.append(f"{name}_bucket{format_labels(labelnames, values, le)} {format_value(cumulative)}")
+        labels = format_labels(labelnames, values)
+        lines.append(f"{name}_sum{labels} {format_value(total)}")
+        lines.append(f"{name}_count{labels} {format_value(cumulative)}")
+        return lines
+
+
+class MetricFamily:
+    """A named metric with fixed label names and one cached child per label set"""
+
+    child_types = {
+        "counter": CounterChild,
+        "gauge": GaugeChild,
+    }
+
+    def __init__(
+        self,
+        metric_type: str,
+        name: str,
+        description: str,
+        labelnames: Optional[Sequence[str]] = None,
+        buckets: Optional[Sequence[float]] = None
+    ):
+        if metric_type not in ("counter", "gauge", "histogram"):
+            raise ValueError(f"Unknown metric type: {metric_type}")
+
+        self.type = metric_type
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames) if labelnames is not None else None
+        self.upper_bounds = self._normalize_buckets(buckets) if metric_type == "histogram" else None
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = Lock()
+
+        if self.labelnames == ():
+            self.labels()
+
+    @staticmethod
+    def _normalize_buckets(buckets: Optional[Sequence[float]]) -> Tuple[float, ...]:
+        bounds = sorted(float(b) for b in (buckets or DEFAULT_BUCKETS))
+        if bounds[-1] != math.inf:
+            bounds.append(math.inf)
+        return tuple(bounds)
+
+    def _new_child(self, values: Tuple[str, ...]):
+        if self.type == "histogram":
+            return HistogramChild(self.upper_bounds)
+        return self.child_types[self.type]()
+
+    def labels(self, *values: Any, **labels: Any):
+        """
+        Get the child for a label set, creating it on first use.
+
+        Callers on hot paths should keep the returned child and reuse it
+        instead of resolving labels per observation.
+        """
+        if labels:
+            if values:
+                raise ValueError("Pass label values positionally or by name, not both")
+            if self.labelnames is None:
+                self.labelnames = tuple(sorted(labels))
+            try:
+                values = tuple(str(labels[name]) for name in self.labelnames)
+            except KeyError as e:
+                raise ValueError(f"Missing label {e} for metric {self.name}")
+            if len(labels) != len(self.labelnames):
+                raise ValueError(f"Unexpected labels for metric {self.name}: {sorted(labels)}")
+        else:
+            values = tuple(str(value) for value in values)
+            if self.labelnames is None:
+                if values:
+                    raise ValueError(f"Label names for metric {self.name} are unknown; pass labels by name")
+                self.labelnames = ()
+            elif len(values) != len(self.labelnames):
+                raise ValueError(f"Expected {len(self.labelnames)} label values for metric {self.name}")
+
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child(values)
+                    self._children[values] = child
+        return child
+
+    def labels_from_dict(self, labels: Optional[Dict[str, Any]]):
+        return self.labels(**labels) if labels else self.labels()
+
+    def children(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def expose(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {escape_help(self.description)}",
+            f"# TYPE {self.name} {self.type}"
+        ]
+        labelnames = self.labelnames or ()
+        for values, child in sorted(self.children()):
+            lines.extend(child.samples(self.name, labelnames, values))
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Real metrics client for PrometheusMetricService.
+
+    Implements the same client interface as MockPrometheusClient and renders
+    all registered families in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = Lock()
+
+    def register(
+        self,
+        metric_type: str,
+        name: str,
+        description: str,
+        labelnames: Optional[Sequence[str]] = None,
+        buckets: Optional[Sequence[float]] = None,
+        multiprocess_mode: Optional[str] = None
+    ) -> MetricFamily:
+        """
+        Register a metric family, returning the existing one if already registered.
+
+        multiprocess_mode only matters when values are merged across workers
+        (see MultiProcessRegistry); a single process has one value per gauge.
+        """
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = MetricFamily(metric_type, name, description, labelnames, buckets)
+                self._families[name] = family
+            elif family.type != metric_type:
+                raise ValueError(f"Metric {name} already registered as {family.type}")
+            return family
+
+    def family(self, name: str) -> Optional[MetricFamily]:
+        return self._families.get(name)
+
+    def labels(self, name: str, labels: Optional[Dict[str, Any]]):
+        """Get the pre-bound child of a registered family for a label set"""
+        return self._families[name].labels_from_dict(labels)
+
+    def counter_observe(self, name: str, value: Union[int, float], labels: Optional[Dict[str, str]]):
+        """Record counter observation"""
+        self.labels(name, labels).inc(value)
+
+    def histogram_observe(self, name: str, value: Union[int, float], labels: Optional[Dict[str, str]]):
+        """Record histogram observation"""
+        self.labels(name, labels).observe(value)
+
+    def gauge_set(self, name: str, value: Union[int, float], labels: Optional[Dict[str, str]]):
+        """Set gauge value"""
+        self.labels(name, labels).set(value)
+
+    def get_registered_metrics(self) -> Dict[str, Dict[str, str]]:
+        """Get all registered metrics"""
+        return {
+            name: {"type": family.type, "description": family.description}
+            for name, family in self._families.items()
+        }
+
+    def expose(self) -> str:
+        """Render every registered family in the Prometheus text format"""
+        with self._lock:
+            families = sorted(self._families.values(), key=lambda f: f.name)
+        lines = []
+        for family in families:
+            lines.extend(family.expose())
+        return "\n".join(lines) + "\n" if lines else ""
@@ -80,9 +80,12 @@ class RealTimeMonitoringService:
     async def _collect_resource_metrics(self, analytics_service: AnalyticsService):
         """Collect system resource metrics"""
         import psutil
+        from .system_sampler import SystemSampler
         
-        # CPU usage
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # CPU usage from the background sampler; never block the loop waiting for a reading
+        cpu_percent = SystemSampler.instance().latest()["cpu_percent"]
+        if cpu_percent is None:
+            cpu_percent = psutil.cpu_percent(interval=None)
         await analytics_service.collect_metric(
             "system.cpu.usage_percent",
             cpu_percent,
@@ -0,0 +1,169 @@
+"""
+Prefix Index - Weighted prefix completion for typeahead suggestions.
+A depth-capped trie whose nodes cache their top completions, so lookups cost
+the prefix length plus the result size, not the number of entries.
+"""
+
+import heapq
+from typing import Dict, Optional, List, Tuple
+
+# Completions cached per node; lookups asking for more fall back to walking the subtree
+TOP_K = 50
+
+# Characters of a key stored as trie levels; longer keys share the node at this depth
+MAX_DEPTH = 12
+
+
+class _Node:
+    # Containers are created on first use: most nodes on a long key hold neither keys nor more than one child
+    __slots__ = ("children", "keys", "top", "dirty")
+
+    def __init__(self):
+        self.children: Optional[Dict[str, "_Node"]] = None
+        # Keys ending here, or every key below when the node sits at MAX_DEPTH
+        self.keys: Optional[set] = None
+        self.top: List[str] = []
+        self.dirty = True
+
+
+class PrefixIndex:
+    """
+    Weighted keys completed by prefix, heaviest first.
+
+    Weights are adjusted incrementally (a key is dropped once its weight
+    reaches zero). Changes are applied to the trie in batches, marking the
+    nodes on each key's path dirty; a node's cached top-K is recomputed from
+    its children's caches the next time a lookup reaches it, so bulk loads
+    pay for each key and each node once.
+
+    Not thread safe: callers serialize access (SearchIndex holds its mutex).
+    """
+
+    def __init__(self, top_k: int = TOP_K, max_depth: int = MAX_DEPTH):
+        self.top_k = top_k
+        self.max_depth = max_depth
+        self._root = _Node()
+        self._weights: Dict[str, float] = {}
+        self._display: Dict[str, str] = {}
+        # Keys whose weight changed since the trie was last brought up to date
+        self._pending: set = set()
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._weights
+
+    def weight(self, key: str) -> float:
+        return self._weights.get(key, 0.0)
+
+    def adjust(self, key: str, delta: float, display: Optional[str] = None):
+        """
+        Add delta to a key's weight, inserting it if new and removing it at zero.
+
+        Only the weight is updated here; the trie catches up on the next
+        lookup (or flush), once per distinct key however often it changed.
+
+        Args:
+            key: Normalized key matched by prefix
+            delta: Weight change
+            display: Text returned for the key (defaults to the key)
+        """
+        weight = self._weights.get(key, 0.0) + delta
+        if weight > 0:
+            self._weights[key] = weight
+            if display is not None:
+                self._display[key] = display
+        elif key in self._weights:
+            del self._weights[key]
+            self._display.pop(key, None)
+        else:
+            return
+        self._pending.add(key)
+
+    def flush(self):
+        """Apply pending changes to the trie: insert or prune keys and mark their paths dirty"""
+        pending, self._pending = self._pending, set()
+        for key in pending:
+            if key in self._weights:
+                self._insert(key)
+            else:
+                self._delete(key)
+
+    def _insert(self, key: str):
+        node = self._root
+        node.dirty = True
+        for char in key[:self.max_depth]:
+            children = node.children
+            if children is None:
+                children = node.children = {}
+            child = children.get(char)
+            if child is None:
+                child = children[char] = _Node()
+            node = child
+            node.dirty = True
+        if node.keys is None:
+            node.keys = set()
+        node.keys.add(key)
+
+    def _delete(self, key: str):
+        path = [self._root]
+        for char in key[:self.max_depth]:
+            child = path[-1].children.get(char) if path[-1].children else None
+            if child is None:
+                # Added and removed again before reaching the trie
+                return
+            path.append(child)
+        for node in path:
+            node.dirty = True
+        if path[-1].keys:
+            path[-1].keys.discard(key)
+        # Prune nodes left without keys or children
+        for depth in range(len(path) - 1, 0, -1):
+            node = path[depth]
+            if node.keys or node.children:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Heaviest keys starting with prefix.
+
+        Returns:
+            (display text, weight) pairs, heaviest first, ties by key
+        """
+        if self._pending:
+            self.flush()
+        node = self._root
+        for char in prefix[:self.max_depth]:
+            node = node.children.get(char) if node.children else None
+            if node is None:
+                return []
+
+        if len(prefix) >= self.max_depth:
+            # Past the trie: filter the keys sharing the capped prefix
+            keys = heapq.nsmallest(limit, (key for key in self._subtree(node) if key.startswith(prefix)), key=self._rank)
+        elif limit <= self.top_k:
+            keys = self._top(node)[:limit]
+        else:
+            keys = heapq.nsmallest(limit, self._subtree(node), key=self._rank)
+        return [(self._display.get(key, key), self._weights[key]) for key in keys]
+
+    def _rank(self, key: str) -> Tuple[float, str]:
+        return -self._weights[key], key
+
+    def _top(self, node: _Node) -> List[str]:
+        if node.dirty:
+            candidates = set(node.keys) if node.keys else set()
+            for child in (node.children or {}).values():
+                candidates.update(self._top(child))
+            node.top = heapq.nsmallest(self.top_k, candidates, key=self._rank)
+            node.dirty = False
+        return node.top
+
+    def _subtree(self, node: _Node):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            yield from current.keys or ()
+            stack.extend((current.children or {}).values())
@@ -4,12 +4,15 @@ Provides metric collection, registration, and Prometheus integration.
 """
 
 import logging
-from typing import Dict, Any, Optional, Union
+import os
+from typing import Dict, Any, Optional, Union, Sequence
 from threading import Lock
-from collections import defaultdict
+from collections import defaultdict, deque
 import threading
 
 from ..config import settings
+from .metrics_registry import MetricsRegistry, CONTENT_TYPE_LATEST
+from .metrics_multiprocess import MultiProcessRegistry
 
 logger = logging.getLogger(__name__)
 
@@ -48,10 +51,19 @@ class PrometheusMetricService:
     
     def _initialize_client(self):
         """Initialize Prometheus client"""
+        multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+        if multiproc_dir:
+            # Workers share values through per-process files so any worker can serve a full scrape;
+            # a bad directory must stop startup rather than silently turn metrics off
+            os.makedirs(multiproc_dir, exist_ok=True)
+            if not os.access(multiproc_dir, os.W_OK | os.X_OK):
+                raise RuntimeError(f"PROMETHEUS_MULTIPROC_DIR is not writable: {multiproc_dir}")
+            self._client = MultiProcessRegistry(multiproc_dir)
+            logger.info(f"Prometheus multiprocess metrics client initialized in {multiproc_dir}")
+            return
+
         try:
-            # In a real implementation, this would initialize PrometheusExporter::Client
-            # For now, create a mock client
-            self._client = MockPrometheusClient()
+            self._client = MetricsRegistry()
             logger.info("Prometheus metrics client initialized")
         except Exception as e:
             logger.error(f"Failed to initialize Prometheus client: {str(e)}")
@@ -72,6 +84,10 @@ class PrometheusMetricService:
         if not self._enabled or not self._client:
             return NoOpMetricCounter()
         
+        metric = self._metrics.get(metric_name)
+        if metric is not None:
+            return metric
+        
         with self._metric_locks[metric_name]:
             if metric_name not in self._metrics:
                 # Register new counter with client
@@ -90,13 +106,19 @@ class PrometheusMetricService:
             
             return self._metrics[metric_name]
     
-    def histogram(self, metric_name: str, description: Optional[str] = None) -> 'MetricHistogram':
+    def histogram(
+        self,
+        metric_name: str,
+        description: Optional[str] = None,
+        buckets: Optional[Sequence[float]] = None
+    ) -> 'MetricHistogram':
         """
         Get or create a histogram metric.
         
         Args:
             metric_name: Name of the metric
             description: Optional description of the metric
+            buckets: Optional bucket upper bounds (registry defaults otherwise)
             
         Returns:
             MetricHistogram instance
@@ -104,13 +126,19 @@ class PrometheusMetricService:
         if not self._enabled or not self._client:
             return NoOpMetricHistogram()
         
+        metric = self._metrics.get(metric_name)
+        if metric is not None:
+            return metric
+        
         with self._metric_locks[metric_name]:
             if metric_name not in self._metrics:
                 # Register new histogram with client
+                options = {'buckets': buckets} if buckets else {}
                 self._client.register(
                     metric_type='histogram',
                     name=metric_name,
-                    description=description or f"{metric_name} metric"
+                    description=description or f"{metric_name} metric",
+                    **options
                 )
                 
                 self._metrics[metric_name] = MetricHistogram(
@@ -122,13 +150,20 @@ class PrometheusMetricService:
             
             return self._metrics[metric_name]
     
-    def gauge(self, metric_name: str, description: Optional[str] = None) -> 'MetricGauge':
+    def gauge(
+        self,
+        metric_name: str,
+        description: Optional[str] = None,
+        multiprocess_mode: str = 'liveall'
+    ) -> 'MetricGauge':
         """
         Get or create a gauge metric.
         
         Args:
             metric_name: Name of the metric
             description: Optional description of the metric
+            multiprocess_mode: How values of several workers are merged
+                (liveall, livesum, max or min); ignored in a single process
             
         Returns:
             MetricGauge instance
@@ -136,13 +171,18 @@ class PrometheusMetricService:
         if not self._enabled or not self._client:
             return NoOpMetricGauge()
         
+        metric = self._metrics.get(metric_name)
+        if metric is not None:
+            return metric
+        
         with self._metric_locks[metric_name]:
             if metric_name not in self._metrics:
                 # Register new gauge with client
                 self._client.register(
                     metric_type='gauge',
                     name=metric_name,
-                    description=description or f"{metric_name} metric"
+                    description=description or f"{metric_name} metric",
+                    multiprocess_mode=multiprocess_mode
                 )
                 
                 self._metrics[metric_name] = MetricGauge(
@@ -154,6 +194,17 @@ class PrometheusMetricService:
             
             return self._metrics[metric_name]
     
+    def expose(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        
+        Returns:
+            Exposition text (empty when metrics are disabled)
+        """
+        if not self._enabled or not hasattr(self._client, 'expose'):
+            return ""
+        return self._client.expose()
+    
     @classmethod
     def observe(
         cls,
@@ -213,6 +264,17 @@ class MetricCounter:
         """Increment counter by 1"""
         self.observe(1, labels)
     
+    def labels(self, **labels) -> Any:
+        """
+        Get a child bound to one label set.
+        
+        The child is cached by the client, so hot paths should resolve it once
+        and call inc() on it directly. Bound observations skip get_value().
+        """
+        if hasattr(self.client, 'labels'):
+            return self.client.labels(self.name, labels)
+        return BoundMetric(self, labels)
+    
     def get_value(self) -> Union[int, float]:
         """Get current counter value"""
         return self._value
@@ -221,10 +283,12 @@ class MetricCounter:
 class MetricHistogram:
     """Histogram metric implementation"""
     
+    MAX_OBSERVATIONS = 1000
+    
     def __init__(self, name: str, client: Any):
         self.name = name
         self.client = client
-        self._observations = []
+        self._observations = deque(maxlen=self.MAX_OBSERVATIONS)
         self._lock = Lock()
     
     def observe(self, value: Union[int, float], labels: Optional[Dict[str, str]] = None):
@@ -237,9 +301,15 @@ class MetricHistogram:
         except Exception as e:
             logger.error(f"Failed to observe histogram {self.name}: {str(e)}")
     
+    def labels(self, **labels) -> Any:
+        """Get a child bound to one label set (see MetricCounter.labels)"""
+        if hasattr(self.client, 'labels'):
+            return self.client.labels(self.name, labels)
+        return BoundMetric(self, labels)
+    
     def get_observations(self) -> list:
-        """Get all observations"""
-        return self._observations.copy()
+        """Get the most recent observations"""
+        return list(self._observations)
 
 
 class MetricGauge:
@@ -269,25 +339,60 @@ class MetricGauge:
         """Decrement gauge value"""
         self.set(self._value - value, labels)
     
+    def labels(self, **labels) -> Any:
+        """Get a child bound to one label set (see MetricCounter.labels)"""
+        if hasattr(self.client, 'labels'):
+            return self.client.labels(self.name, labels)
+        return BoundMetric(self, labels)
+    
     def get_value(self) -> Union[int, float]:
         """Get current gauge value"""
         return self._value
 
 
+class BoundMetric:
+    """Label-bound view of a metric for clients without native children"""
+    
+    def __init__(self, metric: Any, labels: Dict[str, str]):
+        self._metric = metric
+        self._labels = labels
+    
+    def inc(self, value: Union[int, float] = 1):
+        if isinstance(self._metric, MetricGauge):
+            self._metric.increment(value, self._labels)
+        else:
+            self._metric.observe(value, self._labels)
+    
+    def dec(self, value: Union[int, float] = 1):
+        self._metric.decrement(value, self._labels)
+    
+    def observe(self, value: Union[int, float]):
+        self._metric.observe(value, self._labels)
+    
+    def set(self, value: Union[int, float]):
+        self._metric.set(value, self._labels)
+
+
 # No-op implementations for when metrics are disabled
 class NoOpMetricCounter:
     def observe(self, value=1, labels=None): pass
     def increment(self, labels=None): pass
+    def inc(self, value=1): pass
+    def labels(self, **labels): return self
     def get_value(self): return 0
 
 class NoOpMetricHistogram:
     def observe(self, value, labels=None): pass
+    def labels(self, **labels): return self
     def get_observations(self): return []
 
 class NoOpMetricGauge:
     def set(self, value, labels=None): pass
     def increment(self, value=1, labels=None): pass
     def decrement(self, value=1, labels=None): pass
+    def inc(self, value=1): pass
+    def dec(self, value=1): pass
+    def labels(self, **labels): return self
     def get_value(self): return 0
 
 
@@ -297,7 +402,7 @@ class MockPrometheusClient:
     def __init__(self):
         self._registered_metrics = {}
     
-    def register(self, metric_type: str, name: str, description: str):
+    def register(self, metric_type: str, name: str, description: str, **options):
         """Register a metric with the client"""
         self._registered_metrics[name] = {
             'type': metric_type,
@@ -0,0 +1,270 @@
+"""
+Real-Time Monitor - Request counters and events for live dashboards.
+Aggregates per-request metrics in memory and writes them to Redis in one
+MULTI/EXEC batch per flush interval from a background task.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict, deque
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Any, Optional, List
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+
+class MonitoringBuffer:
+    """
+    Request metrics aggregated in memory between flushes.
+
+    Counters are summed locally and written with one INCRBY per key; response
+    times and pub/sub events are capped so a Redis outage cannot grow memory.
+    """
+
+    MAX_RESPONSE_TIMES = 1000
+    MAX_EVENTS = 5000
+
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.response_times: List[float] = []
+        self.events: deque = deque(maxlen=self.MAX_EVENTS)
+        self.events_seen = 0
+
+    def incr(self, key: str, amount: int = 1):
+        self.counters[key] += amount
+
+    def add_response_time(self, process_time: float):
+        self.response_times.append(process_time)
+        if len(self.response_times) > 2 * self.MAX_RESPONSE_TIMES:
+            del self.response_times[:-self.MAX_RESPONSE_TIMES]
+
+    def publish(self, channel: str, payload: Dict[str, Any]):
+        self.events.append((channel, payload))
+        self.events_seen += 1
+
+    @property
+    def dropped_events(self) -> int:
+        return self.events_seen - len(self.events)
+
+    def is_empty(self) -> bool:
+        return not (self.counters or self.response_times or self.events)
+
+
+class RealTimeMonitor:
+    """
+    Feeds live dashboards without a Redis round trip per request.
+
+    Each request only updates a MonitoringBuffer; a background task, started
+    on the first tracked request, swaps the buffer every flush_interval
+    seconds and writes it to Redis in a single pipeline with the asyncio client.
+    """
+
+    _instance: Optional["RealTimeMonitor"] = None
+    _lock = Lock()
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        redis_url: str = "redis://localhost:6379",
+        flush_interval: float = 1.0,
+        enable_detailed_metrics: bool = True
+    ):
+        self._redis_client = redis_client
+        self.redis_url = redis_url
+        self.flush_interval = flush_interval
+        self.enable_detailed_metrics = enable_detailed_metrics
+        self.request_counter = 0
+        self.buffer = MonitoringBuffer()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def instance(cls) -> "RealTimeMonitor":
+        """Get singleton instance"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def configure(self, redis_url: str, flush_interval: float = 1.0, enable_detailed_metrics: bool = True):
+        """Point the monitor at a Redis server; takes effect from the next flush"""
+        self.redis_url = redis_url
+        self._redis_client = None
+        self.flush_interval = flush_interval
+        self.enable_detailed_metrics = enable_detailed_metrics
+
+    @property
+    def redis_client(self) -> Any:
+        if self._redis_client is None:
+            self._redis_client = aioredis.from_url(self.redis_url)
+        return self._redis_client
+
+    # Tracking
+
+    def request_started(self, method: str, url: str, user_agent: str = "") -> int:
+        """Count a request in and queue its start event; returns its id for the completion events"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+        self.request_counter += 1
+        self.buffer.incr("metrics:api:request_count")
+        self.buffer.incr("metrics:api:concurrent_requests")
+        self.buffer.publish("api:requests", {
+            "event": "request_start",
+            "method": method,
+            "url": url,
+            "user_agent": user_agent,
+            "timestamp": datetime.utcnow().isoformat(),
+            "request_id": self.request_counter
+        })
+        return self.request_counter
+
+    def request_completed(
+        self,
+        method: str,
+        endpoint: str,
+        status_code: int,
+        process_time: float,
+        request_id: int,
+        request_bytes: Optional[str] = None,
+        response_bytes: Optional[str] = None,
+        authenticated: bool = False
+    ):
+        """
+        Count a response out.
+
+        Args:
+            endpoint: Route template, so series stay bounded
+            request_bytes: Request Content-Length header, if sent
+            response_bytes: Response Content-Length header, if sent
+            authenticated: Whether the request carried an Authorization header
+        """
+        self.buffer.incr("metrics:api:concurrent_requests", -1)
+        self.buffer.incr(f"metrics:api:status:{status_code}")
+        self.buffer.incr(f"metrics:api:method:{method}")
+        self.buffer.incr(f"metrics:api:endpoint:{endpoint}")
+        self.buffer.add_response_time(process_time)
+
+        if self.enable_detailed_metrics:
+            try:
+                if request_bytes:
+                    self._publish_metric_update("api.request.size_bytes", float(request_bytes), {"endpoint": endpoint})
+                if response_bytes:
+                    self._publish_metric_update("api.response.size_bytes", float(response_bytes), {"endpoint": endpoint})
+                auth_metric = "api.request.authenticated" if authenticated else "api.request.unauthenticated"
+                self._publish_metric_update(auth_metric, 1, {"endpoint": endpoint})
+            except Exception as e:
+                logger.error(f"Error tracking detailed metrics: {e}")
+
+        self.buffer.publish("api:requests", {
+            "event": "request_complete",
+            "method": method,
+            "endpoint": endpoint,
+            "status_code": status_code,
+            "process_time": process_time,
+            "timestamp": datetime.utcnow().isoformat(),
+            "request_id": request_id
+        })
+
+        labels = {"method": method, "endpoint": endpoint, "status_code": str(status_code)}
+        self._publish_metric_update("api.request.duration_seconds", process_time, labels)
+        self._publish_metric_update("api.request.count", 1, labels)
+
+    def request_failed(self, method: str, endpoint: str, error: Exception, process_time: float, request_id: int):
+        """Count a request that raised out"""
+        self.buffer.incr("metrics:api:concurrent_requests", -1)
+        self.buffer.incr("metrics:api:error_count")
+
+        error_type = type(error).__name__
+        self.buffer.incr(f"metrics:api:error_type:{error_type}")
+        self.buffer.incr(f"metrics:api:error_endpoint:{endpoint}")
+        self.buffer.publish("api:errors", {
+            "event": "request_error",
+            "method": method,
+            "endpoint": endpoint,
+            "error_type": error_type,
+            "error_message": str(error),
+            "process_time": process_time,
+            "timestamp": datetime.utcnow().isoformat(),
+            "request_id": request_id
+        })
+        self._publish_metric_update("api.error.count", 1, {
+            "method": method,
+            "endpoint": endpoint,
+            "error_type": error_type
+        })
+
+    def _publish_metric_update(self, metric_name: str, value: float, labels: Dict[str, str]):
+        """Queue a metric update in the format RealTimeMonitoringService.publish_metric_update uses"""
+        update_data = {
+            "metric_name": metric_name,
+            "value": value,
+            "labels": labels,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        self.buffer.publish(f"metrics:{metric_name}", update_data)
+        self.buffer.publish("metrics:all", update_data)
+
+    # Flushing
+
+    async def _flush_loop(self):
+        """Flush the buffer every flush_interval seconds"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """
+        Write everything buffered since the last flush in one MULTI/EXEC round trip.
+
+        The batch applies whole or not at all, so counters of a flush that
+        failed are merged back into the live buffer; samples and events are
+        dropped rather than replayed late.
+        """
+        buffer = self.buffer
+        if buffer.is_empty():
+            return
+        self.buffer = MonitoringBuffer()
+
+        if buffer.dropped_events:
+            logger.warning(f"Dropped {buffer.dropped_events} monitoring events over the buffer limit")
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=True)
+            for key, amount in buffer.counters.items():
+                if amount:
+                    pipe.incrby(key, amount)
+
+            response_times = buffer.response_times[-MonitoringBuffer.MAX_RESPONSE_TIMES:]
+            if response_times:
+                pipe.lpush("metrics:api:response_times", *response_times)
+                pipe.ltrim("metrics:api:response_times", 0, MonitoringBuffer.MAX_RESPONSE_TIMES - 1)
+
+            for channel, payload in buffer.events:
+                pipe.publish(channel, json.dumps(payload))
+
+            await pipe.execute()
+
+        except Exception as e:
+            logger.error(f"Error flushing monitoring metrics to Redis: {e}")
+            # A command error is raised after EXEC ran the rest of the batch; replaying it would count twice
+            if isinstance(e, redis.exceptions.ResponseError) and not isinstance(e, redis.exceptions.ExecAbortError):
+                return
+            for key, amount in buffer.counters.items():
+                self.buffer.incr(key, amount)
+
+    async def close(self):
+        """Stop the flush task and write out what is left"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
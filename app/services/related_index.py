@@ -0,0 +1,483 @@
+"""
+Related Index - MinHash/LSH index for related-dataset suggestions.
+Summarizes each data set's tags and schema field names as a MinHash signature
+whose bands bucket likely-similar data sets, updated from ORM commits.
+"""
+
+import heapq
+import logging
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass, replace
+from datetime import datetime
+from threading import Lock, RLock
+from typing import Dict, Any, Optional, List, Tuple, FrozenSet, Iterable, Set
+
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.exc import NoInspectionAvailable
+from sqlalchemy.orm import Session
+
+from app.services.schema_field_index import SCHEMA_COLUMNS, extract_fields
+from app.services.search_index import deleted_since
+from app.services.tag_index import normalize_tags
+
+logger = logging.getLogger(__name__)
+
+# Signature length and banding: pairs with Jaccard similarity s share a bucket
+# with probability 1 - (1 - s^ROWS)^BANDS, about 0.5 at s = 0.22 and 0.99 at s = 0.5
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+
+# Ids read per bucket, so a bucket shared by thousands of copies cannot make a lookup O(org)
+MAX_BUCKET_SCAN = 64
+
+# Candidates re-ranked by exact Jaccard similarity, at least, per lookup
+MIN_RERANK = 50
+
+# Score given to data sets of the same data source, as before the index
+SAME_SOURCE_SCORE = 0.7
+MAX_SAME_SOURCE = 5
+
+COLUMNS = ("id", "org_id", "data_source_id", "tags", "source_schema", "output_schema", "updated_at")
+SCHEMA_SOURCES = SCHEMA_COLUMNS["data_sets"]
+
+# Universal hashing (a * x + b) mod P over 32-bit feature hashes; a, b < 2^32 keep it within uint64
+_PRIME = np.uint64(4294967311)
+_random = np.random.RandomState(20240601)
+_A = _random.randint(1, 2 ** 32 - 1, size=NUM_PERM, dtype=np.uint64)
+_B = _random.randint(0, 2 ** 32 - 1, size=NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _random.randint(1, 2 ** 63 - 1, size=ROWS, dtype=np.uint64) | np.uint64(1)
+
+
+def minhash(features: Iterable[str]) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM values) of a feature set, None when it is empty"""
+    hashes = np.fromiter(
+        (zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint64
+    )
+    if not hashes.size:
+        return None
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def band_keys(signature: np.ndarray) -> np.ndarray:
+    """One bucket key per band; equal bands give equal keys"""
+    with np.errstate(over="ignore"):
+        return (signature.reshape(BANDS, ROWS) * _BAND_MIX).sum(axis=1)
+
+
+_NO_KEYS = np.zeros(0, dtype=np.uint64)
+
+
+def jaccard(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    if not left or not right:
+        return 0.0
+    common = len(left & right)
+    return common / (len(left) + len(right) - common)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    org_id: Optional[int]
+    data_source_id: Optional[int]
+    tags: FrozenSet[str]
+    # schema column -> lowercased field names
+    fields: Tuple[Tuple[str, FrozenSet[str]], ...]
+    # Bucket key per band, empty for data sets without tags or fields
+    keys: np.ndarray
+    updated_at: Optional[datetime] = None
+
+    @property
+    def features(self) -> FrozenSet[str]:
+        names = frozenset().union(*(names for _, names in self.fields))
+        return frozenset(f"t:{tag}" for tag in self.tags) | frozenset(f"f:{name}" for name in names)
+
+    @property
+    def field_names(self) -> FrozenSet[str]:
+        return frozenset().union(*(names for _, names in self.fields))
+
+
+def build_entry(values: Dict[str, Any], previous: Optional[_Entry] = None) -> _Entry:
+    """
+    Index entry for a data set row, keeping the previous entry's features for columns not in values.
+
+    Args:
+        values: Column values (see COLUMNS), possibly partial
+        previous: Entry already indexed for the data set
+    """
+    def kept(name, default=None):
+        if name in values:
+            return values[name]
+        return getattr(previous, name) if previous is not None else default
+
+    # Interned: the same few names recur across thousands of data sets
+    tags = frozenset(sys.intern(tag) for tag in normalize_tags(values["tags"])) if "tags" in values else (previous.tags if previous else frozenset())
+    fields = dict(previous.fields) if previous else {}
+    for column in SCHEMA_SOURCES:
+        if column in values:
+            fields[column] = frozenset(sys.intern(name.lower()) for _, name, _ in extract_fields(values[column]))
+    entry = _Entry(
+        org_id=kept("org_id"),
+        data_source_id=kept("data_source_id"),
+        tags=tags,
+        fields=tuple(sorted(fields.items())),
+        keys=_NO_KEYS,
+        updated_at=kept("updated_at")
+    )
+    signature = minhash(entry.features)
+    return replace(entry, keys=band_keys(signature)) if signature is not None else entry
+
+
+@dataclass
+class Related:
+    """A suggested data set and why"""
+    dataset_id: int
+    score: float
+    shared_tags: List[str]
+    shared_fields: List[str]
+    same_source: bool
+
+
+class _OrgShard:
+    """LSH buckets and data source membership of one org's data sets"""
+
+    def __init__(self):
+        # band -> bucket key -> data set id, or a list of ids once several share the bucket;
+        # most buckets hold a single data set
+        self.buckets: List[Dict[int, Any]] = [{} for _ in range(BANDS)]
+        self.by_source: Dict[int, Set[int]] = defaultdict(set)
+
+    def add(self, dataset_id: int, entry: _Entry):
+        for band, key in enumerate(entry.keys.tolist()):
+            buckets = self.buckets[band]
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = dataset_id
+            elif isinstance(bucket, list):
+                bucket.append(dataset_id)
+            else:
+                buckets[key] = [bucket, dataset_id]
+        if entry.data_source_id is not None:
+            self.by_source[entry.data_source_id].add(dataset_id)
+
+    def remove(self, dataset_id: int, entry: _Entry):
+        for band, key in enumerate(entry.keys.tolist()):
+            buckets = self.buckets[band]
+            bucket = buckets.get(key)
+            if bucket == dataset_id:
+                del buckets[key]
+            elif isinstance(bucket, list) and dataset_id in bucket:
+                bucket.remove(dataset_id)
+                if len(bucket) == 1:
+                    buckets[key] = bucket[0]
+        members = self.by_source.get(entry.data_source_id)
+        if members is not None:
+            members.discard(dataset_id)
+            if not members:
+                del self.by_source[entry.data_source_id]
+
+    def candidates(self, entry: _Entry) -> Counter:
+        """Data set ids sharing a bucket with entry, by number of shared bands"""
+        collisions: Counter = Counter()
+        for band, key in enumerate(entry.keys.tolist()):
+            bucket = self.buckets[band].get(key)
+            if isinstance(bucket, list):
+                # The newest ids are the ones appended last
+                collisions.update(bucket[-MAX_BUCKET_SCAN:])
+            elif bucket is not None:
+                collisions[bucket] += 1
+        return collisions
+
+
+class RelatedIndex:
+    """
+    Related data sets by similarity of tags and schema field names.
+
+    A lookup reads the target's BANDS buckets (each capped at
+    MAX_BUCKET_SCAN ids), keeps the candidates colliding in the most bands
+    and re-ranks only those by exact Jaccard similarity, so its cost does
+    not grow with the number of data sets in the org.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self):
+        self._entries: Dict[int, _Entry] = {}
+        self._shards: Dict[Optional[int], _OrgShard] = {}
+        self._mutex = RLock()
+        self._watermark: Optional[datetime] = None
+        self._tombstones_since: Optional[datetime] = None
+        self._hooked: Set[Any] = set()
+        self._pending_key = f"related_index_pending:{id(self)}"
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.ready = False
+        self.last_rebuild_seconds: Optional[float] = None
+
+    @classmethod
+    def instance(cls) -> "RelatedIndex":
+        """Get singleton instance"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Updates
+
+    def apply(self, dataset_id: int, values: Optional[Dict[str, Any]]):
+        """
+        Apply one committed change.
+
+        Args:
+            dataset_id: Data set id
+            values: Changed column values, merged over what is already indexed; None deletes
+        """
+        dataset_id = int(dataset_id)
+        with self._mutex:
+            previous = self._remove(dataset_id)
+            if values is None:
+                return
+            entry = build_entry(values, previous)
+            self._entries[dataset_id] = entry
+            shard = self._shards.get(entry.org_id)
+            if shard is None:
+                shard = self._shards[entry.org_id] = _OrgShard()
+            shard.add(dataset_id, entry)
+
+    def _remove(self, dataset_id: int) -> Optional[_Entry]:
+        entry = self._entries.pop(dataset_id, None)
+        if entry is not None:
+            shard = self._shards.get(entry.org_id)
+            if shard is not None:
+                shard.remove(dataset_id, entry)
+        return entry
+
+    # Queries
+
+    def related(self, dataset_id: int, limit: int = 10) -> List[Related]:
+        """
+        Data sets of the same org most similar to a data set, best first.
+
+        Data sets of the same data source score at least SAME_SOURCE_SCORE.
+
+        Args:
+            dataset_id: Data set to find relatives of
+            limit: Maximum number of suggestions
+
+        Returns:
+            Suggestions; empty when the data set is not indexed
+        """
+        with self._mutex:
+            entry = self._entries.get(int(dataset_id))
+            if entry is None:
+                return []
+            shard = self._shards[entry.org_id]
+            collisions = shard.candidates(entry)
+            collisions.pop(int(dataset_id), None)
+            rerank = max(MIN_RERANK, limit * 5)
+            candidates = [candidate for candidate, _ in collisions.most_common(rerank)]
+            if entry.data_source_id is not None:
+                siblings = sorted(shard.by_source.get(entry.data_source_id, ()))
+                candidates.extend(sibling for sibling in siblings[:MAX_SAME_SOURCE + 1] if sibling != dataset_id)
+
+            features = entry.features
+            scored = {}
+            for candidate in candidates:
+                other = self._entries.get(candidate)
+                if other is None or candidate in scored:
+                    continue
+                same_source = entry.data_source_id is not None and other.data_source_id == entry.data_source_id
+                score = jaccard(features, other.features)
+                if same_source:
+                    score = max(score, SAME_SOURCE_SCORE)
+                if score > 0:
+                    scored[candidate] = Related(
+                        dataset_id=candidate,
+                        score=score,
+                        shared_tags=sorted(entry.tags & other.tags),
+                        shared_fields=sorted(entry.field_names & other.field_names),
+                        same_source=same_source
+                    )
+        return heapq.nlargest(limit, scored.values(), key=lambda related: (related.score, -related.dataset_id))
+
+    # Loading from the database
+
+    def rebuild(self, bind: Any, batch_size: int = 1000):
+        """
+        Replace the index contents with every data set in the database.
+
+        Builds a new index aside and swaps it in, so lookups keep working
+        during a rebuild.
+        """
+        started = time.monotonic()
+        # Data sets deleted during the scan are dropped by the next refresh
+        tombstones_since = datetime.utcnow()
+        fresh = RelatedIndex()
+        watermark = None
+        for row in self._scan(bind, batch_size):
+            fresh.apply(row["id"], row)
+            if row.get("updated_at") is not None and (watermark is None or row["updated_at"] > watermark):
+                watermark = row["updated_at"]
+        with self._mutex:
+            self._entries = fresh._entries
+            self._shards = fresh._shards
+            self._watermark = watermark
+            self._tombstones_since = tombstones_since
+            self.ready = True
+        self.last_rebuild_seconds = time.monotonic() - started
+        logger.info(f"Related index rebuilt: {len(self)} data sets in {self.last_rebuild_seconds:.2f}s")
+
+    def refresh(self, bind: Any, batch_size: int = 1000) -> int:
+        """
+        Catch up with changes committed by other processes.
+
+        Re-reads data sets updated since the last watermark and drops those
+        deleted since the last refresh, as recorded in the tombstone feed.
+
+        Returns:
+            Number of rows re-read
+        """
+        if not self.ready:
+            self.rebuild(bind, batch_size)
+            return len(self)
+        from app.database import Base
+
+        table = Base.metadata.tables["data_sets"]
+        since = self._watermark
+        watermark = since
+        changed = 0
+        query = select(*(table.c[name] for name in COLUMNS))
+        if since is not None:
+            # >= so rows sharing the watermark's timestamp are not missed
+            query = query.where(table.c.updated_at >= since)
+        with bind.connect() as conn:
+            for row in conn.execution_options(yield_per=batch_size).execute(query).mappings():
+                self.apply(row["id"], dict(row))
+                changed += 1
+                if row["updated_at"] is not None and (watermark is None or row["updated_at"] > watermark):
+                    watermark = row["updated_at"]
+            deleted, tombstones_since = deleted_since(conn, self._tombstones_since, ["data_sets"])
+        with self._mutex:
+            for _, dataset_id in deleted:
+                if dataset_id in self._entries:
+                    self._remove(dataset_id)
+        self._watermark = watermark
+        self._tombstones_since = tombstones_since
+        return changed
+
+    def _scan(self, bind: Any, batch_size: int):
+        from app.database import Base
+
+        table = Base.metadata.tables["data_sets"]
+        with bind.connect() as conn:
+            result = conn.execution_options(yield_per=batch_size).execute(
+                select(*(table.c[name] for name in COLUMNS))
+            )
+            for row in result.mappings():
+                yield dict(row)
+
+    # Commit hooks
+
+    def install_session_hooks(self, target: Any = Session):
+        """Apply data set changes committed through SQLAlchemy sessions; rollbacks discard them"""
+        if target in self._hooked:
+            return
+        event.listen(target, "after_flush", self._after_flush)
+        event.listen(target, "after_commit", self._after_commit)
+        event.listen(target, "after_soft_rollback", self._after_rollback)
+        self._hooked.add(target)
+
+    def remove_session_hooks(self):
+        for target in self._hooked:
+            event.remove(target, "after_flush", self._after_flush)
+            event.remove(target, "after_commit", self._after_commit)
+            event.remove(target, "after_soft_rollback", self._after_rollback)
+        self._hooked = set()
+
+    def _after_flush(self, session, flush_context):
+        pending = None
+        for changes, deleted in ((session.new, False), (session.dirty, False), (session.deleted, True)):
+            for obj in changes:
+                try:
+                    state = inspect(obj)
+                except NoInspectionAvailable:
+                    continue
+                if state.mapper.local_table.name != "data_sets":
+                    continue
+                values = {name: state.dict[name] for name in COLUMNS if name in state.dict}
+                dataset_id = state.identity[0] if state.identity else values.get("id")
+                if dataset_id is None:
+                    continue
+                if pending is None:
+                    pending = session.info.setdefault(self._pending_key, {})
+                pending[dataset_id] = None if deleted else values
+
+    def _after_commit(self, session):
+        pending = session.info.pop(self._pending_key, None)
+        if not pending:
+            return
+        for dataset_id, values in pending.items():
+            try:
+                self.apply(dataset_id, values)
+            except Exception as e:
+                logger.error(f"Related index update failed for data set {dataset_id}: {str(e)}")
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(self._pending_key, None)
+
+    # Background refresh
+
+    def start(self, bind: Any, refresh_seconds: float = 60.0):
+        """Rebuild in a background thread, then refresh every refresh_seconds (0 disables refreshing)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(bind, refresh_seconds), name="related-index", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self, bind: Any, refresh_seconds: float):
+        try:
+            self.rebuild(bind)
+        except Exception as e:
+            logger.error(f"Related index rebuild failed: {str(e)}")
+        while refresh_seconds and not self._stop.wait(refresh_seconds):
+            try:
+                self.refresh(bind)
+            except Exception as e:
+                logger.error(f"Related index refresh failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._mutex:
+            return {
+                "ready": self.ready,
+                "data_sets": len(self._entries),
+                "orgs": len(self._shards),
+                "buckets": sum(len(band) for shard in self._shards.values() for band in shard.buckets),
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+                "last_rebuild_seconds": self.last_rebuild_seconds
+            }
+
+    def clear(self):
+        with self._mutex:
+            self._entries = {}
+            self._shards = {}
+            self._watermark = None
+            self._tombstones_since = None
+            self.ready = False
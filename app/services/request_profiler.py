@@ -0,0 +1,230 @@
+"""
+Request Profiler - Low-overhead sampling profiler for selected requests.
+Samples stacks of profiled requests and aggregates them per route template
+as collapsed stacks, exportable for flamegraph.pl or speedscope.
+"""
+
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from threading import Lock
+from typing import Dict, Any, Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEBUG_HEADER = "x-debug-profile"
+
+
+class RouteProfile:
+    """Collapsed-stack sample counts for one route template"""
+
+    __slots__ = ("route", "stacks", "samples", "requests", "dropped")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.requests = 0
+        self.dropped = 0
+
+    def to_summary(self) -> Dict[str, Any]:
+        return {
+            "route": self.route,
+            "requests": self.requests,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "dropped_samples": self.dropped
+        }
+
+
+class RequestProfiler:
+    """
+    Singleton sampling profiler attached to individual requests.
+
+    A request is profiled when it wins the sample_rate draw or carries the
+    X-Debug-Profile header with the configured token. While any profiled
+    request is in flight, a daemon thread snapshots every thread's stack each
+    interval and credits the stack to the profiled request found on it (the
+    pipeline's RequestContext). With nothing being profiled the thread sleeps,
+    so the cost of leaving the profiler on is one random() per request.
+    Time a request spends awaiting I/O is not on any thread's stack, so
+    profiles show where requests spend CPU and block the loop.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    MAX_ROUTES = 200
+    MAX_STACKS_PER_ROUTE = 5000
+    MAX_DEPTH = 128
+
+    def __init__(self, sample_rate: float = 0.0, debug_token: Optional[str] = None, interval_ms: float = 5.0):
+        self.sample_rate = sample_rate
+        self.debug_token = debug_token
+        self.interval = interval_ms / 1000
+        self.profiles: "OrderedDict[str, RouteProfile]" = OrderedDict()
+        self._active = 0
+        self._samples_lock = Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def instance(cls) -> "RequestProfiler":
+        """Get singleton instance"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def configure(self, sample_rate: float, debug_token: Optional[str] = None, interval_ms: Optional[float] = None):
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.debug_token = debug_token or None
+        if interval_ms:
+            self.interval = interval_ms / 1000
+
+    def should_profile(self, ctx: Any) -> bool:
+        """Decide whether to profile a request"""
+        if self.debug_token:
+            token = ctx.headers.get(DEBUG_HEADER)
+            if token is not None and hmac.compare_digest(token, self.debug_token):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def begin(self, ctx: Any):
+        """Start collecting samples for a request"""
+        ctx.profile = Counter()
+        with self._samples_lock:
+            self._active += 1
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def end(self, ctx: Any):
+        """Stop sampling a request and fold its samples into its route's profile"""
+        with self._samples_lock:
+            self._active -= 1
+            if self._active == 0:
+                self._wakeup.clear()
+            stacks, ctx.profile = ctx.profile, None
+            self._add(ctx.route_template, stacks)
+
+    def _add(self, route: str, stacks: Counter):
+        profile = self.profiles.get(route)
+        if profile is None:
+            profile = self.profiles[route] = RouteProfile(route)
+            if len(self.profiles) > self.MAX_ROUTES:
+                self.profiles.popitem(last=False)
+        else:
+            self.profiles.move_to_end(route)
+
+        profile.requests += 1
+        for stack, count in stacks.items():
+            if stack in profile.stacks or len(profile.stacks) < self.MAX_STACKS_PER_ROUTE:
+                profile.stacks[stack] += count
+            else:
+                profile.dropped += count
+            profile.samples += count
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            try:
+                self.sample(skip_thread=own_id)
+            except Exception as e:
+                logger.error(f"Profiler sampling failed: {str(e)}")
+
+    def sample(self, skip_thread: Optional[int] = None):
+        """Take one sample of every thread serving a profiled request"""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            ctx, stack = self._walk(frame)
+            if ctx is None:
+                continue
+            with self._samples_lock:
+                profile = ctx.profile
+                if profile is not None:
+                    profile[stack] += 1
+
+    def _walk(self, frame) -> Tuple[Any, str]:
+        """Collapse a stack (root first) and find the profiled request it belongs to"""
+        names = []
+        ctx = None
+        depth = 0
+        while frame is not None and depth < self.MAX_DEPTH:
+            if ctx is None:
+                candidate = frame.f_locals.get("ctx")
+                if getattr(candidate, "profile", None) is not None:
+                    ctx = candidate
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+            depth += 1
+        return ctx, ";".join(reversed(names))
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Profiled routes, most samples first"""
+        with self._samples_lock:
+            rows = [profile.to_summary() for profile in self.profiles.values()]
+        return sorted(rows, key=lambda row: row["samples"], reverse=True)
+
+    def collapsed(self, route: str) -> Optional[str]:
+        """Collapsed stacks ("frame;frame;frame count" lines) for flamegraph.pl"""
+        with self._samples_lock:
+            profile = self.profiles.get(route)
+            if profile is None:
+                return None
+            stacks = profile.stacks.most_common()
+        return "\n".join(f"{stack} {count}" for stack, count in stacks) + ("\n" if stacks else "")
+
+    def speedscope(self, route: str) -> Optional[Dict[str, Any]]:
+        """Speedscope file-format document with one sampled profile"""
+        with self._samples_lock:
+            profile = self.profiles.get(route)
+            if profile is None:
+                return None
+            stacks = profile.stacks.most_common()
+
+        frame_index: Dict[str, int] = {}
+        frames: List[Dict[str, str]] = []
+        samples: List[List[int]] = []
+        weights: List[int] = []
+        for stack, count in stacks:
+            indices = []
+            for name in stack.split(";"):
+                index = frame_index.get(name)
+                if index is None:
+                    index = frame_index[name] = len(frames)
+                    frames.append({"name": name})
+                indices.append(index)
+            samples.append(indices)
+            weights.append(count)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": route,
+                "unit": "none",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            }],
+            "name": f"Request profile {route}",
+            "exporter": "admin-api request profiler"
+        }
+
+    def reset(self):
+        with self._samples_lock:
+            self.profiles.clear()
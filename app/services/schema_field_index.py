@@ -0,0 +1,337 @@
+"""
+Schema Field Index - Keeps schema_fields in step with stored schemas.
+Flattens JSON Schema and Avro-style definitions of data sets and data schemas
+into one row per field path on write, and builds indexed field lookups.
+"""
+
+import json
+import logging
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, Any, Optional, List, Tuple
+
+from sqlalchemy import delete, event, insert, inspect, or_, select, update
+
+logger = logging.getLogger(__name__)
+
+# Schema columns indexed per table
+SCHEMA_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "data_sets": ("source_schema", "output_schema"),
+    "data_schemas": ("schema",),
+}
+
+# Nesting followed and fields kept per schema; deeper or wider parts are not indexed
+MAX_DEPTH = 32
+MAX_FIELDS = 5000
+
+# Field lookups by name
+MATCH_MODES = ("eq", "starts_with", "contains")
+
+# resource_id -> (org_id, {schema column: schema}); None means the resource was deleted
+SchemaChanges = Dict[int, Optional[Tuple[Optional[int], Dict[str, Any]]]]
+
+
+def extract_fields(schema: Any) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Fields of a schema as (path, name, type), parents before children.
+
+    Understands JSON Schema (properties/items) and Avro records (fields);
+    array elements add "[]" to the path. Accepts JSON text as stored in
+    DataSchema.schema.
+    """
+    if isinstance(schema, str):
+        try:
+            schema = json.loads(schema)
+        except ValueError:
+            return []
+    fields: List[Tuple[str, str, Optional[str]]] = []
+    if isinstance(schema, dict):
+        _walk(schema, "", 0, fields)
+    return fields
+
+
+def _walk(node: Dict[str, Any], prefix: str, depth: int, fields: List):
+    if depth > MAX_DEPTH:
+        return
+    children = []
+    properties = node.get("properties")
+    if isinstance(properties, dict):
+        children.extend(properties.items())
+    avro_fields = node.get("fields")
+    if isinstance(avro_fields, list):
+        children.extend((child.get("name"), child) for child in avro_fields if isinstance(child, dict))
+
+    for name, child in children:
+        if not name or len(fields) >= MAX_FIELDS:
+            continue
+        name = str(name)
+        path = f"{prefix}.{name}" if prefix else name
+        fields.append((path, name, _field_type(child)))
+        for nested in _nested(child):
+            _walk(nested, path, depth + 1, fields)
+
+    items = node.get("items")
+    if isinstance(items, dict):
+        _walk(items, f"{prefix}[]", depth + 1, fields)
+
+
+def _nested(child: Any) -> List[Dict[str, Any]]:
+    """Definitions under a field: itself (JSON Schema) or its record/array types (Avro)"""
+    if not isinstance(child, dict):
+        return []
+    declared = child.get("type")
+    if isinstance(declared, dict):
+        return [declared]
+    if isinstance(declared, list):
+        return [option for option in declared if isinstance(option, dict)] + [child]
+    return [child]
+
+
+def _field_type(child: Any) -> Optional[str]:
+    declared = child.get("type") if isinstance(child, dict) else child
+    if isinstance(declared, list):
+        # Nullable unions: the non-null member names the type
+        declared = next((option for option in declared if option != "null"), None)
+    if isinstance(declared, dict):
+        declared = declared.get("logicalType") or declared.get("type")
+    return str(declared)[:50] if declared else None
+
+
+def _table():
+    from app.database import Base
+    return Base.metadata.tables["schema_fields"]
+
+
+def sync_schema_fields(connection: Any, resource_type: str, changes: SchemaChanges) -> int:
+    """
+    Replace the indexed fields of the changed schema columns of some resources.
+
+    Args:
+        connection: Session or Connection of the writing transaction
+        resource_type: Key of SCHEMA_COLUMNS
+        changes: New org and changed schema columns per resource id (None for deletes)
+
+    Returns:
+        Number of field rows written
+    """
+    table = _table()
+    rows = []
+    # Resources grouped by the columns they clear and the org they move to,
+    # so a batch of similar writes costs a few statements rather than a few per resource
+    deleted: List[int] = []
+    cleared: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+    orgs: Dict[Optional[int], List[int]] = defaultdict(list)
+    for resource_id, change in changes.items():
+        if change is None:
+            deleted.append(resource_id)
+            continue
+        org_id, columns = change
+        if columns:
+            cleared[tuple(sorted(columns))].append(resource_id)
+        orgs[org_id].append(resource_id)
+        for column, schema in columns.items():
+            rows.extend(_field_rows(org_id, resource_type, resource_id, column, schema))
+
+    owned = table.c.resource_type == resource_type
+    for ids in _chunks(deleted):
+        connection.execute(delete(table).where(owned, table.c.resource_id.in_(ids)))
+    for columns, resource_ids in cleared.items():
+        for ids in _chunks(resource_ids):
+            connection.execute(delete(table).where(
+                owned, table.c.resource_id.in_(ids), table.c.schema_column.in_(list(columns))
+            ))
+    # Fields of untouched columns follow the resource to a new org
+    for org_id, resource_ids in orgs.items():
+        moved = table.c.org_id.isnot(None) if org_id is None else or_(table.c.org_id != org_id, table.c.org_id.is_(None))
+        for ids in _chunks(resource_ids):
+            connection.execute(update(table).where(owned, table.c.resource_id.in_(ids), moved).values(org_id=org_id))
+    if rows:
+        connection.execute(insert(table), rows)
+    return len(rows)
+
+
+def _chunks(ids: List[int], size: int = 500):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _field_rows(org_id, resource_type, resource_id, column, schema) -> List[Dict[str, Any]]:
+    return [
+        {
+            "org_id": org_id, "resource_type": resource_type, "resource_id": resource_id,
+            "schema_column": column, "path": path[:1000], "name": name[:255],
+            "name_key": name.lower()[:255], "field_type": field_type
+        }
+        for path, name, field_type in extract_fields(schema)
+    ]
+
+
+# Queries
+
+def _matching(table, name: Optional[str], field_type: Optional[str], match: str):
+    criteria = []
+    if name:
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unknown field match '{match}'")
+        key = name.lower()
+        if match == "eq":
+            criteria.append(table.c.name_key == key)
+        elif match == "starts_with":
+            criteria.append(table.c.name_key.startswith(key, autoescape=True))
+        else:
+            criteria.append(table.c.name_key.contains(key, autoescape=True))
+    if field_type:
+        criteria.append(table.c.field_type == field_type)
+    return criteria
+
+
+def field_filter(
+    resource_type: str,
+    id_column: Any,
+    name: Optional[str] = None,
+    field_type: Optional[str] = None,
+    schema_column: Optional[str] = None,
+    match: str = "eq"
+) -> Any:
+    """
+    Criterion selecting resources whose schema has a matching field.
+
+    Exact and prefix name matches seek the (name_key, resource_type, ...)
+    index; "contains" scans schema_fields but never parses a schema.
+
+    Args:
+        resource_type: Key of SCHEMA_COLUMNS
+        id_column: Primary key column of the resource table, e.g. DataSet.id
+        name: Field name, case-insensitive
+        field_type: Declared field type, e.g. "string"
+        schema_column: Only fields of this schema column
+        match: One of MATCH_MODES for the name
+    """
+    table = _table()
+    matching = select(table.c.resource_id).where(
+        table.c.resource_type == resource_type, *_matching(table, name, field_type, match)
+    )
+    if schema_column:
+        matching = matching.where(table.c.schema_column == schema_column)
+    return id_column.in_(matching)
+
+
+def find_fields(
+    connection: Any,
+    name: Optional[str] = None,
+    field_type: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    org_id: Optional[int] = None,
+    match: str = "eq",
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """
+    Indexed fields matching a name and/or type.
+
+    Returns:
+        Dicts with resource_type, resource_id, schema_column, path, name and field_type
+    """
+    table = _table()
+    query = select(
+        table.c.resource_type, table.c.resource_id, table.c.schema_column,
+        table.c.path, table.c.name, table.c.field_type
+    ).where(*_matching(table, name, field_type, match))
+    if resource_type:
+        query = query.where(table.c.resource_type == resource_type)
+    if org_id is not None:
+        query = query.where(table.c.org_id == org_id)
+    query = query.order_by(table.c.resource_type, table.c.resource_id, table.c.path).limit(limit)
+    return [dict(row._mapping) for row in connection.execute(query)]
+
+
+# Backfill
+
+def rebuild_schema_field_index(bind: Any, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Recompute every indexed field from the stored schemas.
+
+    Returns:
+        Field rows written per resource type
+    """
+    from app.database import Base
+
+    table = _table()
+    written = {}
+    with bind.begin() as conn:
+        conn.execute(delete(table))
+        for resource_type, columns in SCHEMA_COLUMNS.items():
+            source = Base.metadata.tables[resource_type]
+            written[resource_type] = 0
+            rows = []
+            result = conn.execution_options(yield_per=batch_size).execute(
+                select(source.c.id, source.c.org_id, *(source.c[column] for column in columns))
+            )
+            for record in result:
+                for column in columns:
+                    rows.extend(_field_rows(record.org_id, resource_type, record.id, column, record._mapping[column]))
+                if len(rows) >= batch_size:
+                    conn.execute(insert(table), rows)
+                    written[resource_type] += len(rows)
+                    rows = []
+            if rows:
+                conn.execute(insert(table), rows)
+                written[resource_type] += len(rows)
+    logger.info(f"Schema field index rebuilt: {sum(written.values())} fields")
+    return written
+
+
+# Session hooks
+
+_hooked = set()
+_hooks_lock = Lock()
+
+
+def install_schema_field_hooks(target: Any):
+    """
+    Re-index the fields of every schema written through an ORM flush, in the same transaction.
+
+    Args:
+        target: Session factory (or Session subclass) whose sessions write, e.g. SessionLocal
+    """
+    with _hooks_lock:
+        if target in _hooked:
+            return
+        event.listen(target, "after_flush", _sync_flushed)
+        _hooked.add(target)
+
+
+def remove_schema_field_hooks():
+    with _hooks_lock:
+        for target in _hooked:
+            event.remove(target, "after_flush", _sync_flushed)
+        _hooked.clear()
+
+
+def _sync_flushed(session, flush_context):
+    changes: Dict[str, SchemaChanges] = defaultdict(dict)
+    for objects, kind in ((session.new, "new"), (session.dirty, "dirty"), (session.deleted, "deleted")):
+        for obj in objects:
+            state = inspect(obj)
+            resource_type = state.mapper.local_table.name
+            columns = SCHEMA_COLUMNS.get(resource_type)
+            if columns is None:
+                continue
+            resource_id = state.identity[0] if state.identity else state.dict.get("id")
+            if resource_id is None:
+                continue
+            if kind == "deleted":
+                changes[resource_type][resource_id] = None
+                continue
+            # History is still available in after_flush: only re-index schemas that were written
+            changed = {
+                column: state.dict.get(column) for column in columns
+                if column in state.mapper.attrs and (kind == "new" or state.attrs[column].history.has_changes())
+            }
+            org_moved = kind == "dirty" and "org_id" in state.mapper.attrs and state.attrs.org_id.history.has_changes()
+            if changed or org_moved:
+                changes[resource_type][resource_id] = (state.dict.get("org_id"), changed)
+    if not changes:
+        return
+    connection = session.connection()
+    for resource_type, resource_changes in changes.items():
+        sync_schema_fields(connection, resource_type, resource_changes)
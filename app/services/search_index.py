@@ -0,0 +1,905 @@
+"""
+Search Index - In-process BM25 full-text index for global search.
+Keeps per-org postings for sources, sinks, data sets, flows and projects,
+updated from ORM commits and rebuilt from the database on startup.
+"""
+
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from threading import Lock, RLock
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Set
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.exc import NoInspectionAvailable
+from sqlalchemy.orm import Session
+
+from app.services.prefix_index import PrefixIndex
+from app.services.tag_index import normalize_tags
+
+logger = logging.getLogger(__name__)
+
+# BM25F field weights: a term in the name counts twice as much as in the description
+FIELD_WEIGHTS = {"name": 2.0, "description": 1.0, "tags": 1.5, "metadata": 0.5}
+FIELDS = tuple(FIELD_WEIGHTS)
+
+K1 = 1.2
+B = 0.75
+
+# Query terms with no exact postings are expanded to this many vocabulary terms sharing the prefix
+MAX_PREFIX_EXPANSIONS = 50
+PREFIX_PENALTY = 0.5
+
+ARCHIVED_STATUSES = {"ARCHIVED"}
+
+# Searches remembered per org for typeahead; older ones stop being suggested
+RECENT_QUERIES = 500
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+@dataclass(frozen=True)
+class ResourceSpec:
+    """Where an indexed resource type lives and which columns feed which fields"""
+    resource_type: str
+    table: str
+    config_column: Optional[str] = None
+    project_scoped: bool = False
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        columns = ("id", "name", "description", "tags", "extra_metadata", "status",
+                   "org_id", "owner_id", "created_at", "updated_at")
+        if self.config_column:
+            columns += (self.config_column,)
+        if self.project_scoped:
+            columns += ("project_id", "origin_node_id", "is_deprecated", "is_template")
+        return columns
+
+
+RESOURCES: Dict[str, ResourceSpec] = {
+    spec.resource_type: spec for spec in (
+        ResourceSpec("data_sources", "data_sources", config_column="source_config"),
+        ResourceSpec("data_sinks", "data_sinks", config_column="sink_config"),
+        ResourceSpec("data_sets", "data_sets", config_column="transform_config"),
+        ResourceSpec("flows", "flow_nodes", project_scoped=True),
+        ResourceSpec("projects", "projects"),
+    )
+}
+RESOURCES_BY_TABLE: Dict[str, ResourceSpec] = {spec.table: spec for spec in RESOURCES.values()}
+
+DocKey = Tuple[str, int]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase alphanumeric tokens; punctuation, underscores and whitespace separate terms"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def flatten_text(value: Any) -> str:
+    """Keys and scalar values of JSON-ish data as one space-separated string"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(f"{key} {flatten_text(item)}" for key, item in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return " ".join(flatten_text(item) for item in value)
+    return str(getattr(value, "value", value))
+
+
+def _plain(value: Any) -> Any:
+    """Enum members as their value, everything else unchanged"""
+    return getattr(value, "value", value)
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; make aware request values comparable"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class IndexedDocument:
+    """One searchable resource: display attributes, filter attributes and per-field term counts"""
+    resource_type: str
+    resource_id: int
+    org_id: Optional[int]
+    owner_id: Optional[int]
+    name: str
+    description: Optional[str]
+    project_id: Optional[int]
+    status: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    terms: Dict[str, Counter] = field(default_factory=dict)
+    lengths: Dict[str, int] = field(default_factory=dict)
+    values: Dict[str, Any] = field(default_factory=dict)
+    tags: List[str] = field(default_factory=list)
+
+    @property
+    def key(self) -> DocKey:
+        return self.resource_type, self.resource_id
+
+    @property
+    def archived(self) -> bool:
+        return self.status in ARCHIVED_STATUSES
+
+    def length(self, fields: Iterable[str]) -> float:
+        return sum(FIELD_WEIGHTS[name] * self.lengths.get(name, 0) for name in fields)
+
+
+def is_searchable(spec: ResourceSpec, values: Dict[str, Any]) -> bool:
+    """Whether a row belongs in search results at all"""
+    if values.get("id") is None:
+        return False
+    if spec.project_scoped:
+        # Mirrors FlowNode.search_ignored: only live origin nodes are searchable
+        origin = values.get("origin_node_id")
+        if values.get("is_deprecated") or values.get("is_template") or origin not in (None, values["id"]):
+            return False
+    return True
+
+
+def build_document(resource_type: str, values: Dict[str, Any]) -> Optional[IndexedDocument]:
+    """
+    Build a document from column values.
+
+    Args:
+        resource_type: Key of RESOURCES
+        values: Column values (JSON columns may already be flattened to text)
+
+    Returns:
+        The document, or None when the row should not be searchable
+    """
+    spec = RESOURCES[resource_type]
+    if not is_searchable(spec, values):
+        return None
+
+    stored = dict(values)
+    # Tags stay a list so suggestions can offer whole tags
+    for column in ("extra_metadata", spec.config_column):
+        if column and not isinstance(stored.get(column), (str, type(None))):
+            stored[column] = flatten_text(stored[column])
+    tags = normalize_tags(stored.get("tags"))
+
+    texts = {
+        "name": stored.get("name") or "",
+        "description": stored.get("description") or "",
+        "tags": " ".join(tags),
+        "metadata": " ".join(filter(None, (stored.get("extra_metadata"), stored.get(spec.config_column) if spec.config_column else None)))
+    }
+    terms = {name: Counter(tokenize(text)) for name, text in texts.items()}
+    return IndexedDocument(
+        resource_type=resource_type,
+        resource_id=int(values["id"]),
+        org_id=values.get("org_id"),
+        owner_id=values.get("owner_id"),
+        name=stored.get("name") or "",
+        description=stored.get("description"),
+        project_id=values.get("project_id") if spec.project_scoped else None,
+        status=_plain(values.get("status")),
+        created_at=values.get("created_at") or datetime.utcnow(),
+        updated_at=values.get("updated_at"),
+        terms={name: counts for name, counts in terms.items() if counts},
+        lengths={name: sum(counts.values()) for name, counts in terms.items() if counts},
+        values=stored,
+        tags=tags
+    )
+
+
+# Deletes are read back this far behind the last tombstone seen, for
+# transactions that recorded a delete earlier but committed later
+TOMBSTONE_OVERLAP = timedelta(minutes=5)
+
+
+def deleted_since(
+    connection: Any,
+    since: Optional[datetime],
+    resource_types: Optional[Iterable[str]] = None
+) -> Tuple[List[DocKey], Optional[datetime]]:
+    """
+    Rows deleted since a point in time, from the search_tombstones feed.
+
+    Reads only the recent tombstones through their deleted_at index, so
+    finding deletes does not grow with the size of the indexed tables.
+    Replaying a tombstone twice is harmless.
+
+    Args:
+        connection: Connection to read with
+        since: deleted_at of the last tombstone seen, or when the reader
+            last rebuilt; every retained tombstone when None
+        resource_types: Only tombstones of these resource types
+
+    Returns:
+        (resource_type, resource_id) of deleted rows, and the new since
+    """
+    from app.database import Base
+
+    table = Base.metadata.tables["search_tombstones"]
+    query = select(table.c.resource_type, table.c.resource_id, table.c.deleted_at)
+    if since is not None:
+        query = query.where(table.c.deleted_at >= since - TOMBSTONE_OVERLAP)
+    if resource_types is not None:
+        query = query.where(table.c.resource_type.in_(list(resource_types)))
+    deleted = []
+    for resource_type, resource_id, deleted_at in connection.execute(query):
+        deleted.append((resource_type, resource_id))
+        if since is None or deleted_at > since:
+            since = deleted_at
+    return deleted, since
+
+
+def normalize_suggestion(text: Optional[str]) -> str:
+    """Lowercase tokens joined by single spaces: how suggestion keys and prefixes are compared"""
+    return " ".join(tokenize(text))
+
+
+def _suggestion_keys(text: str) -> List[str]:
+    """
+    One key per word start, so "ord" suggests "Daily Orders".
+
+    Each key ends with the full normalized text, keeping different texts
+    that share a suffix apart.
+    """
+    normalized = normalize_suggestion(text)
+    if not normalized:
+        return []
+    words = normalized.split(" ")
+    return [" ".join(words[start:]) + "\0" + normalized for start in range(len(words))]
+
+
+def _adjust_suggestion(index: PrefixIndex, text: str, delta: int):
+    for key in _suggestion_keys(text):
+        index.adjust(key, delta, display=text)
+
+
+@dataclass
+class Suggestion:
+    """A typeahead completion and where it came from"""
+    text: str
+    kind: str  # "name", "tag" or "query"
+    weight: float
+
+
+class _OrgShard:
+    """Postings, length statistics and typeahead prefixes for one org's documents"""
+
+    def __init__(self):
+        self.docs: Dict[DocKey, IndexedDocument] = {}
+        # field -> term -> doc key -> term frequency
+        self.postings: Dict[str, Dict[str, Dict[DocKey, int]]] = {name: defaultdict(dict) for name in FIELDS}
+        self.doc_freq: Counter = Counter()
+        self.field_lengths: Counter = Counter()
+        # Terms weighted by document frequency, for expanding query prefixes
+        self.vocabulary = PrefixIndex()
+        # resource type -> names / tags weighted by how many live documents carry them
+        self.names: Dict[str, PrefixIndex] = defaultdict(PrefixIndex)
+        self.tags: Dict[str, PrefixIndex] = defaultdict(PrefixIndex)
+        # owner_id -> their documents here, for owners reading this org from another one
+        self.owned: Dict[int, Set[DocKey]] = defaultdict(set)
+
+    def add(self, doc: IndexedDocument):
+        key = doc.key
+        self.remove(key)
+        self.docs[key] = doc
+        vocabulary = set()
+        for name, counts in doc.terms.items():
+            postings = self.postings[name]
+            for term, count in counts.items():
+                postings[term][key] = count
+            vocabulary.update(counts)
+            self.field_lengths[name] += doc.lengths[name]
+        self.doc_freq.update(vocabulary)
+        for term in vocabulary:
+            self.vocabulary.adjust(term, 1)
+        self._adjust_suggestions(doc, 1)
+
+    def _adjust_suggestions(self, doc: IndexedDocument, delta: int):
+        if doc.owner_id is not None:
+            if delta > 0:
+                self.owned[doc.owner_id].add(doc.key)
+            else:
+                owned = self.owned[doc.owner_id]
+                owned.discard(doc.key)
+                if not owned:
+                    del self.owned[doc.owner_id]
+        if doc.archived:
+            return
+        if doc.name:
+            _adjust_suggestion(self.names[doc.resource_type], doc.name, delta)
+        for tag in doc.tags:
+            _adjust_suggestion(self.tags[doc.resource_type], tag, delta)
+
+    def remove(self, key: DocKey) -> Optional[IndexedDocument]:
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return None
+        vocabulary = set()
+        for name, counts in doc.terms.items():
+            postings = self.postings[name]
+            for term in counts:
+                entries = postings.get(term)
+                if entries is not None:
+                    entries.pop(key, None)
+                    if not entries:
+                        del postings[term]
+            vocabulary.update(counts)
+            self.field_lengths[name] -= doc.lengths[name]
+        self.doc_freq.subtract(vocabulary)
+        for term in vocabulary:
+            self.vocabulary.adjust(term, -1)
+            if self.doc_freq[term] <= 0:
+                del self.doc_freq[term]
+        self._adjust_suggestions(doc, -1)
+        return doc
+
+    def expand(self, term: str) -> List[Tuple[str, float]]:
+        """The term itself if indexed, otherwise the most frequent indexed terms it prefixes (at a penalty)"""
+        if term in self.doc_freq:
+            return [(term, 1.0)]
+        return [(candidate, PREFIX_PENALTY) for candidate, _ in self.vocabulary.complete(term, MAX_PREFIX_EXPANSIONS)]
+
+    def prefix_indexes(self) -> Iterable[PrefixIndex]:
+        yield self.vocabulary
+        yield from self.names.values()
+        yield from self.tags.values()
+
+
+@dataclass
+class SearchHit:
+    """A ranked document and which query terms matched in which fields"""
+    document: IndexedDocument
+    score: float
+    matches: Dict[str, List[str]] = field(default_factory=dict)
+
+
+@dataclass
+class SearchPage:
+    """One page of hits plus totals over every accessible match"""
+    hits: List[SearchHit]
+    total: int
+    resource_counts: Dict[str, int]
+    # tag -> matches carrying it
+    tag_counts: Dict[str, int] = field(default_factory=dict)
+
+
+class SearchIndex:
+    """
+    Per-org inverted index with BM25F ranking.
+
+    Readers see the org shard of the user's default org plus, in other orgs,
+    only the documents the user owns (the same rule as FlowNode.accessible_to).
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self):
+        self._shards: Dict[Optional[int], _OrgShard] = {}
+        # owner_id -> org_id -> number of documents owned there
+        self._owner_orgs: Dict[int, Counter] = defaultdict(Counter)
+        self._org_of: Dict[DocKey, Optional[int]] = {}
+        # org_id -> recent searches (oldest first) and the same searches weighted by repetition
+        self._recent_queries: Dict[Optional[int], deque] = {}
+        self._queries: Dict[Optional[int], PrefixIndex] = defaultdict(PrefixIndex)
+        self._mutex = RLock()
+        self._watermark: Optional[datetime] = None
+        self._tombstones_since: Optional[datetime] = None
+        self._hooked: Set[Any] = set()
+        # Per index, so several indexes can hook the same sessions
+        self._pending_key = f"search_index_pending:{id(self)}"
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.ready = False
+        self.last_rebuild_seconds: Optional[float] = None
+
+    @classmethod
+    def instance(cls) -> "SearchIndex":
+        """Get singleton instance"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __len__(self) -> int:
+        return len(self._org_of)
+
+    # Updates
+
+    def upsert(self, doc: IndexedDocument):
+        with self._mutex:
+            self._remove(doc.key)
+            shard = self._shards.get(doc.org_id)
+            if shard is None:
+                shard = self._shards[doc.org_id] = _OrgShard()
+            shard.add(doc)
+            self._org_of[doc.key] = doc.org_id
+            if doc.owner_id is not None:
+                self._owner_orgs[doc.owner_id][doc.org_id] += 1
+
+    def remove(self, resource_type: str, resource_id: int):
+        with self._mutex:
+            self._remove((resource_type, int(resource_id)))
+
+    def _remove(self, key: DocKey) -> Optional[IndexedDocument]:
+        if key not in self._org_of:
+            return None
+        shard = self._shards.get(self._org_of.pop(key))
+        doc = shard.remove(key) if shard is not None else None
+        if doc is not None and doc.owner_id is not None:
+            orgs = self._owner_orgs[doc.owner_id]
+            orgs[doc.org_id] -= 1
+            if orgs[doc.org_id] <= 0:
+                del orgs[doc.org_id]
+            if not orgs:
+                del self._owner_orgs[doc.owner_id]
+        return doc
+
+    def apply(self, resource_type: str, resource_id: int, values: Optional[Dict[str, Any]]):
+        """
+        Apply one committed change.
+
+        Args:
+            resource_type: Key of RESOURCES
+            resource_id: Primary key
+            values: Changed column values, merged over what is already indexed; None deletes
+        """
+        with self._mutex:
+            key = (resource_type, int(resource_id))
+            if values is None:
+                self._remove(key)
+                return
+            existing = self.get(resource_type, resource_id)
+            merged = {**(existing.values if existing else {}), **values, "id": int(resource_id)}
+            doc = build_document(resource_type, merged)
+            if doc is None:
+                self._remove(key)
+            else:
+                self.upsert(doc)
+
+    def get(self, resource_type: str, resource_id: int) -> Optional[IndexedDocument]:
+        key = (resource_type, int(resource_id))
+        with self._mutex:
+            if key not in self._org_of:
+                return None
+            return self._shards[self._org_of[key]].docs.get(key)
+
+    # Loading from the database
+
+    def rebuild(self, bind: Any, batch_size: int = 1000):
+        """
+        Replace the index contents with every searchable row in the database.
+
+        Reads with Core selects streamed in batches, builds the new shards
+        aside and swaps them in, so searches keep working during a rebuild.
+
+        Args:
+            bind: Engine or connection
+            batch_size: Rows fetched per round trip
+        """
+        started = time.monotonic()
+        # Rows deleted during the scan are dropped by the next refresh
+        tombstones_since = datetime.utcnow()
+        fresh = SearchIndex()
+        watermark = None
+        for spec, rows in self._scan(bind, batch_size):
+            for row in rows:
+                doc = build_document(spec.resource_type, row)
+                if doc is not None:
+                    fresh.upsert(doc)
+                if row.get("updated_at") is not None and (watermark is None or row["updated_at"] > watermark):
+                    watermark = row["updated_at"]
+        # Build the prefix tries here rather than on the first keystroke after the swap
+        for shard in fresh._shards.values():
+            for prefixes in shard.prefix_indexes():
+                prefixes.flush()
+
+        with self._mutex:
+            self._shards = fresh._shards
+            self._owner_orgs = fresh._owner_orgs
+            self._org_of = fresh._org_of
+            self._watermark = watermark
+            self._tombstones_since = tombstones_since
+            self.ready = True
+        self.last_rebuild_seconds = time.monotonic() - started
+        logger.info(f"Search index rebuilt: {len(self)} documents in {self.last_rebuild_seconds:.2f}s")
+
+    def refresh(self, bind: Any, batch_size: int = 1000) -> int:
+        """
+        Catch up with changes committed by other processes (workers, Celery).
+
+        Re-reads rows updated since the last watermark and drops documents
+        of rows deleted since the last refresh, as recorded in the tombstone
+        feed. Changes made through this process's sessions are already
+        applied by the commit hooks.
+
+        Returns:
+            Number of rows re-read
+        """
+        if not self.ready:
+            self.rebuild(bind, batch_size)
+            return len(self)
+        from app.database import Base
+
+        since = self._watermark
+        changed = 0
+        watermark = since
+        with bind.connect() as conn:
+            for spec in RESOURCES.values():
+                table = Base.metadata.tables[spec.table]
+                columns = [table.c[name] for name in spec.columns if name in table.c]
+                query = select(*columns)
+                if since is not None:
+                    # >= so rows sharing the watermark's timestamp are not missed
+                    query = query.where(table.c.updated_at >= since)
+                for row in conn.execution_options(yield_per=batch_size).execute(query).mappings():
+                    row = dict(row)
+                    self.apply(spec.resource_type, row["id"], row)
+                    changed += 1
+                    if row.get("updated_at") is not None and (watermark is None or row["updated_at"] > watermark):
+                        watermark = row["updated_at"]
+
+            deleted, tombstones_since = deleted_since(conn, self._tombstones_since)
+            with self._mutex:
+                for key in deleted:
+                    if key in self._org_of:
+                        self._remove(key)
+        self._watermark = watermark
+        self._tombstones_since = tombstones_since
+        return changed
+
+    def _scan(self, bind: Any, batch_size: int):
+        from app.database import Base
+
+        with bind.connect() as conn:
+            for spec in RESOURCES.values():
+                table = Base.metadata.tables.get(spec.table)
+                if table is None:
+                    continue
+                columns = [table.c[name] for name in spec.columns if name in table.c]
+                result = conn.execution_options(yield_per=batch_size).execute(select(*columns))
+                yield spec, (dict(row) for row in result.mappings())
+
+    # Commit hooks
+
+    def install_session_hooks(self, target: Any = Session):
+        """
+        Keep the index in sync with commits made through SQLAlchemy sessions.
+
+        Changes are collected after each flush and applied only once the
+        transaction commits; a rollback discards them.
+        """
+        if target in self._hooked:
+            return
+        event.listen(target, "after_flush", self._after_flush)
+        event.listen(target, "after_commit", self._after_commit)
+        event.listen(target, "after_soft_rollback", self._after_rollback)
+        self._hooked.add(target)
+
+    def remove_session_hooks(self):
+        for target in self._hooked:
+            event.remove(target, "after_flush", self._after_flush)
+            event.remove(target, "after_commit", self._after_commit)
+            event.remove(target, "after_soft_rollback", self._after_rollback)
+        self._hooked = set()
+
+    def _after_flush(self, session, flush_context):
+        pending = None
+        for changes, deleted in ((session.new, False), (session.dirty, False), (session.deleted, True)):
+            for obj in changes:
+                spec = RESOURCES_BY_TABLE.get(getattr(type(obj), "__tablename__", None))
+                if spec is None:
+                    continue
+                values = _loaded_values(obj, spec)
+                if values is None or values.get("id") is None:
+                    continue
+                if pending is None:
+                    pending = session.info.setdefault(self._pending_key, {})
+                pending[(spec.resource_type, values["id"])] = None if deleted else values
+
+    def _after_commit(self, session):
+        pending = session.info.pop(self._pending_key, None)
+        if not pending:
+            return
+        for (resource_type, resource_id), values in pending.items():
+            try:
+                self.apply(resource_type, resource_id, values)
+            except Exception as e:
+                logger.error(f"Search index update failed for {resource_type} {resource_id}: {str(e)}")
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(self._pending_key, None)
+
+    # Background refresh
+
+    def start(self, bind: Any, refresh_seconds: float = 60.0):
+        """Rebuild in a background thread, then refresh every refresh_seconds (0 disables refreshing)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(bind, refresh_seconds), name="search-index", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self, bind: Any, refresh_seconds: float):
+        try:
+            self.rebuild(bind)
+        except Exception as e:
+            logger.error(f"Search index rebuild failed: {str(e)}")
+        while refresh_seconds and not self._stop.wait(refresh_seconds):
+            try:
+                self.refresh(bind)
+            except Exception as e:
+                logger.error(f"Search index refresh failed: {str(e)}")
+
+    # Queries
+
+    def search(
+        self,
+        query: str,
+        user_id: Optional[int],
+        org_id: Optional[int],
+        resource_types: Optional[Iterable[str]] = None,
+        fields: Optional[Iterable[str]] = None,
+        limit: int = 100,
+        offset: int = 0,
+        project_id: Optional[int] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        include_archived: bool = False,
+        tags: Optional[Iterable[str]] = None
+    ) -> SearchPage:
+        """
+        Rank accessible documents matching any query term.
+
+        Args:
+            query: Free text; terms not in the index match as prefixes
+            user_id: Searching user
+            org_id: The user's current org; all of its documents are readable
+            resource_types: Restrict to these RESOURCES keys
+            fields: Restrict matching to these of FIELDS
+            limit: Page size
+            offset: Hits to skip
+            project_id: Only flows in this project (other types are not project scoped)
+            created_after: Only documents created at or after this time
+            created_before: Only documents created at or before this time
+            include_archived: Include documents with an archived status
+            tags: Only documents carrying every one of these tags
+
+        Returns:
+            SearchPage with the top hits, and totals and tag counts over every accessible match
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        fields = [name for name in (fields or FIELDS) if name in FIELD_WEIGHTS]
+        types = set(resource_types) if resource_types else None
+        required = set(normalize_tags(list(tags))) if tags else None
+        if not terms or not fields:
+            return SearchPage(hits=[], total=0, resource_counts={})
+
+        def visible(doc: IndexedDocument) -> bool:
+            if types is not None and doc.resource_type not in types:
+                return False
+            if not include_archived and doc.archived:
+                return False
+            if project_id is not None and RESOURCES[doc.resource_type].project_scoped and doc.project_id != project_id:
+                return False
+            if created_after is not None and doc.created_at < created_after:
+                return False
+            if created_before is not None and doc.created_at > created_before:
+                return False
+            if required and not required.issubset(doc.tags):
+                return False
+            return True
+
+        created_after, created_before = _naive_utc(created_after), _naive_utc(created_before)
+        scored: List[Tuple[float, DocKey, _OrgShard]] = []
+        counts: Counter = Counter()
+        tag_counts: Counter = Counter()
+        expansions: Dict[int, List[Tuple[str, float]]] = {}
+        with self._mutex:
+            for shard, owner_only in self._readable_shards(user_id, org_id):
+                expanded = expansions[id(shard)] = [pair for term in terms for pair in shard.expand(term)]
+                for key, score in self._score(shard, expanded, fields).items():
+                    doc = shard.docs[key]
+                    if owner_only and doc.owner_id != user_id:
+                        continue
+                    if not visible(doc):
+                        continue
+                    scored.append((score, key, shard))
+                    counts[doc.resource_type] += 1
+                    tag_counts.update(doc.tags)
+
+            top = heapq.nlargest(offset + limit, scored, key=lambda item: (item[0], item[1]))[offset:]
+            hits = [
+                SearchHit(document=shard.docs[key], score=score, matches=_matches(shard.docs[key], expansions[id(shard)], fields))
+                for score, key, shard in top
+            ]
+        return SearchPage(hits=hits, total=len(scored), resource_counts=dict(counts), tag_counts=dict(tag_counts))
+
+    def suggest(
+        self,
+        prefix: str,
+        user_id: Optional[int],
+        org_id: Optional[int],
+        resource_types: Optional[Iterable[str]] = None,
+        limit: int = 10,
+        include_tags: bool = True,
+        include_queries: bool = True
+    ) -> List[Suggestion]:
+        """
+        Typeahead completions for a partial query.
+
+        Matches the start of any word of resource names and tags of the
+        user's org, names of documents the user owns in other orgs, and the
+        org's recent searches. Each org lookup walks the prefix and reads
+        cached top completions, so the cost does not grow with the number of
+        documents.
+
+        Args:
+            prefix: What has been typed so far
+            user_id: Searching user
+            org_id: The user's current org
+            resource_types: Restrict names and tags to these RESOURCES keys
+            limit: Suggestions to return
+            include_tags: Offer tags of matching resources
+            include_queries: Offer the org's recent searches
+
+        Returns:
+            Suggestions, most popular first, without duplicate texts
+        """
+        normalized = normalize_suggestion(prefix)
+        if not normalized:
+            return []
+        if prefix[-1:].isspace():
+            # "orders " should complete the next word, not match "ordersfeed"
+            normalized += " "
+        types = list(resource_types) if resource_types else list(RESOURCES)
+
+        best: Dict[str, Suggestion] = {}
+
+        def offer(text: str, kind: str, weight: float):
+            seen = best.get(text.lower())
+            if seen is None or weight > seen.weight:
+                best[text.lower()] = Suggestion(text=text, kind=kind, weight=weight)
+
+        with self._mutex:
+            sources: List[Tuple[str, PrefixIndex]] = []
+            for shard, owner_only in self._readable_shards(user_id, org_id):
+                if owner_only:
+                    # The user's own documents in another org: few, so matched directly
+                    for key in shard.owned.get(user_id, ()):
+                        doc = shard.docs[key]
+                        if doc.resource_type in types and doc.name and not doc.archived and any(
+                            suggestion_key.startswith(normalized) for suggestion_key in _suggestion_keys(doc.name)
+                        ):
+                            offer(doc.name, "name", 1.0)
+                    continue
+                for resource_type in types:
+                    if resource_type in shard.names:
+                        sources.append(("name", shard.names[resource_type]))
+                    if include_tags and resource_type in shard.tags:
+                        sources.append(("tag", shard.tags[resource_type]))
+            if include_queries and org_id in self._queries:
+                sources.append(("query", self._queries[org_id]))
+
+            for kind, index in sources:
+                for text, weight in index.complete(normalized, limit):
+                    offer(text, kind, weight)
+        # Equally popular: completions of the whole text before word matches inside it, then shorter first
+        ranked = sorted(best.values(), key=lambda suggestion: (
+            -suggestion.weight,
+            not normalize_suggestion(suggestion.text).startswith(normalized),
+            len(suggestion.text),
+            suggestion.text.lower()
+        ))
+        return ranked[:limit]
+
+    def record_query(self, org_id: Optional[int], query: str):
+        """Remember a search for the org's typeahead; repeated searches rank higher"""
+        text = " ".join(query.split())
+        if not normalize_suggestion(text):
+            return
+        with self._mutex:
+            recent = self._recent_queries.get(org_id)
+            if recent is None:
+                recent = self._recent_queries[org_id] = deque()
+            queries = self._queries[org_id]
+            recent.append(text)
+            _adjust_suggestion(queries, text, 1)
+            if len(recent) > RECENT_QUERIES:
+                _adjust_suggestion(queries, recent.popleft(), -1)
+
+    def _readable_shards(self, user_id: Optional[int], org_id: Optional[int]) -> List[Tuple[_OrgShard, bool]]:
+        shards = []
+        if org_id is not None and org_id in self._shards:
+            shards.append((self._shards[org_id], False))
+        if user_id is not None:
+            for owned_org in self._owner_orgs.get(user_id, ()):
+                if owned_org != org_id and owned_org in self._shards:
+                    shards.append((self._shards[owned_org], True))
+        return shards
+
+    def _score(self, shard: _OrgShard, expanded: List[Tuple[str, float]], fields: List[str]) -> Dict[DocKey, float]:
+        total_docs = len(shard.docs)
+        if not total_docs:
+            return {}
+        average_length = sum(FIELD_WEIGHTS[name] * shard.field_lengths[name] for name in fields) / total_docs or 1.0
+        scores: Dict[DocKey, float] = defaultdict(float)
+        lengths: Dict[DocKey, float] = {}
+        for term, boost in expanded:
+            doc_freq = shard.doc_freq[term]
+            idf = math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            weighted_tf: Dict[DocKey, float] = defaultdict(float)
+            for name in fields:
+                weight = FIELD_WEIGHTS[name]
+                for key, count in shard.postings[name].get(term, {}).items():
+                    weighted_tf[key] += weight * count
+            for key, tf in weighted_tf.items():
+                length = lengths.get(key)
+                if length is None:
+                    length = lengths[key] = shard.docs[key].length(fields)
+                norm = K1 * (1 - B + B * length / average_length)
+                scores[key] += boost * idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        with self._mutex:
+            return {
+                "ready": self.ready,
+                "documents": len(self._org_of),
+                "orgs": len(self._shards),
+                "terms": sum(len(shard.doc_freq) for shard in self._shards.values()),
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+                "last_rebuild_seconds": self.last_rebuild_seconds
+            }
+
+    def clear(self):
+        with self._mutex:
+            self._shards = {}
+            self._owner_orgs = defaultdict(Counter)
+            self._recent_queries = {}
+            self._queries = defaultdict(PrefixIndex)
+            self._org_of = {}
+            self._watermark = None
+            self._tombstones_since = None
+            self.ready = False
+
+
+def _matches(doc: IndexedDocument, expanded: List[Tuple[str, float]], fields: List[str]) -> Dict[str, List[str]]:
+    """Indexed terms of the query found in each field of a hit"""
+    matches = {}
+    for name in fields:
+        counts = doc.terms.get(name)
+        if counts:
+            found = [term for term, _ in expanded if term in counts]
+            if found:
+                matches[name] = list(dict.fromkeys(found))
+    return matches
+
+
+def _loaded_values(obj: Any, spec: ResourceSpec) -> Optional[Dict[str, Any]]:
+    """Indexed column values already loaded on an instance, without triggering lazy loads"""
+    try:
+        loaded = inspect(obj).dict
+    except NoInspectionAvailable:
+        return None
+    return {name: loaded[name] for name in spec.columns if name in loaded}
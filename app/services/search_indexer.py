@@ -0,0 +1,507 @@
+"""
+Search Indexer - Incremental Elasticsearch sync with per-type change watermarks.
+Reads rows changed since the last (updated_at, id) watermark with keyset scans,
+pushes them through the bulk API in size-bounded batches and replays tombstones.
+"""
+
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator, Callable
+
+from elasticsearch import ApiError, ConnectionError as ESConnectionError, ConnectionTimeout
+from sqlalchemy import and_, delete, event, insert, inspect, or_, select
+
+from app.config import settings
+from app.services.search_index import RESOURCES, RESOURCES_BY_TABLE, ResourceSpec, flatten_text, is_searchable, _plain
+
+logger = logging.getLogger(__name__)
+
+TOMBSTONES = "_tombstones"
+
+# Bulk item and request statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+DOCUMENT_MAPPINGS = {
+    "properties": {
+        "resource_type": {"type": "keyword"},
+        "id": {"type": "long"},
+        "org_id": {"type": "long"},
+        "owner_id": {"type": "long"},
+        "project_id": {"type": "long"},
+        "name": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+        "description": {"type": "text"},
+        "tags": {"type": "text"},
+        "metadata": {"type": "text"},
+        "status": {"type": "keyword"},
+        "created_at": {"type": "date"},
+        "updated_at": {"type": "date"},
+    }
+}
+
+STATE_MAPPINGS = {
+    "properties": {
+        "updated_at": {"type": "date"},
+        "id": {"type": "long"},
+        "synced_at": {"type": "date"},
+    }
+}
+
+Watermark = Tuple[datetime, int]
+# (action line, source line or None for deletes)
+BulkAction = Tuple[Dict[str, Any], Optional[Dict[str, Any]]]
+
+
+@dataclass
+class SyncResult:
+    """Outcome of syncing one resource type (or the tombstones)"""
+    resource_type: str
+    indexed: int = 0
+    deleted: int = 0
+    failed: int = 0
+    batches: int = 0
+    complete: bool = True
+    watermark: Optional[Watermark] = None
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "resource_type": self.resource_type,
+            "indexed": self.indexed,
+            "deleted": self.deleted,
+            "failed": self.failed,
+            "batches": self.batches,
+            "complete": self.complete,
+            "watermark": _encode_watermark(self.watermark),
+            "errors": self.errors[:10]
+        }
+
+
+class ElasticsearchIndexer:
+    """
+    Incremental sync of searchable resources into Elasticsearch.
+
+    Each resource type has its own index ({prefix}_{resource_type}) and a
+    watermark document in {prefix}_indexer_state. A sync reads rows ordered
+    by (updated_at, id) strictly after the watermark, one keyset page at a
+    time, and advances the watermark only after the page has been accepted
+    by Elasticsearch - a crash or an exhausted retry budget resumes from the
+    last completed page instead of starting over.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bind: Any,
+        index_prefix: Optional[str] = None,
+        batch_size: int = 500,
+        max_actions: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_seconds: float = 0.5,
+        overlap_seconds: float = 0.0,
+        tombstone_retention: timedelta = timedelta(days=7),
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            client: Elasticsearch client (or InMemoryElasticsearch)
+            bind: Engine the resource tables are read from
+            index_prefix: Index name prefix, ELASTICSEARCH_INDEX_PREFIX by default
+            batch_size: Rows read per keyset page
+            max_actions: Actions per bulk request
+            max_bytes: Approximate payload bytes per bulk request
+            max_retries: Retries for transport errors and retryable item failures
+            backoff_seconds: First retry delay, doubled on every attempt
+            overlap_seconds: Re-read rows this far behind the watermark, for
+                writers whose updated_at can commit out of order
+            tombstone_retention: Replayed tombstones older than this are pruned
+            sleep: Injectable for tests
+        """
+        self.client = client
+        self.bind = bind
+        self.index_prefix = index_prefix or settings.ELASTICSEARCH_INDEX_PREFIX
+        self.batch_size = batch_size
+        self.max_actions = max_actions or settings.ELASTICSEARCH_BULK_MAX_ACTIONS
+        self.max_bytes = max_bytes or settings.ELASTICSEARCH_BULK_MAX_BYTES
+        self.max_retries = settings.ELASTICSEARCH_BULK_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_seconds = backoff_seconds
+        self.overlap_seconds = overlap_seconds
+        self.tombstone_retention = tombstone_retention
+        self.sleep = sleep
+        self._indices_ready = False
+
+    # Index management
+
+    def index_name(self, resource_type: str) -> str:
+        return f"{self.index_prefix}_{resource_type}"
+
+    @property
+    def state_index(self) -> str:
+        return f"{self.index_prefix}_indexer_state"
+
+    def ensure_indices(self):
+        """Create the per-type indices and the state index when missing"""
+        if self._indices_ready:
+            return
+        wanted = [(self.index_name(name), DOCUMENT_MAPPINGS) for name in RESOURCES]
+        wanted.append((self.state_index, STATE_MAPPINGS))
+        for name, mappings in wanted:
+            if not self.client.indices.exists(index=name):
+                self.client.indices.create(index=name, mappings=mappings)
+        self._indices_ready = True
+
+    # Watermarks
+
+    def get_watermark(self, resource_type: str) -> Optional[Watermark]:
+        response = self.client.options(ignore_status=404).get(index=self.state_index, id=resource_type)
+        if not response.get("found"):
+            return None
+        source = response["_source"]
+        return datetime.fromisoformat(source["updated_at"]), int(source["id"])
+
+    def save_watermark(self, resource_type: str, watermark: Watermark):
+        self.client.index(index=self.state_index, id=resource_type, document={
+            "updated_at": watermark[0].isoformat(),
+            "id": watermark[1],
+            "synced_at": datetime.utcnow().isoformat()
+        })
+
+    def reset(self, resource_type: Optional[str] = None):
+        """Forget watermarks so the next sync re-reads everything (one type, or all)"""
+        names = [resource_type] if resource_type else [*RESOURCES, TOMBSTONES]
+        for name in names:
+            self.client.options(ignore_status=404).delete(index=self.state_index, id=name)
+
+    # Sync
+
+    def sync(self, resource_types: Optional[Iterable[str]] = None) -> Dict[str, SyncResult]:
+        """
+        Push every change since the last sync, then replay tombstones.
+
+        Args:
+            resource_types: Keys of RESOURCES to sync (all by default)
+
+        Returns:
+            Results keyed by resource type, plus "_tombstones"
+        """
+        self.ensure_indices()
+        results = {}
+        for resource_type in resource_types or RESOURCES:
+            results[resource_type] = self.sync_resource(resource_type)
+        results[TOMBSTONES] = self.sync_tombstones()
+        return results
+
+    def sync_resource(self, resource_type: str) -> SyncResult:
+        """Sync one resource type from its watermark"""
+        from app.database import Base
+
+        self.ensure_indices()
+        spec = RESOURCES[resource_type]
+        table = Base.metadata.tables[spec.table]
+        columns = [table.c[name] for name in spec.columns if name in table.c]
+        result = SyncResult(resource_type)
+        watermark = self.get_watermark(resource_type)
+        result.watermark = watermark
+
+        if watermark is None:
+            # Rows that never had updated_at set cannot be ordered by it; pick them up once by id
+            query = select(*columns).where(table.c.updated_at.is_(None))
+            if not self._push_pages(spec, table, query, result, keyset=lambda last: table.c.id > last[1],
+                                    order_by=(table.c.id,), save=False):
+                return result
+            cursor = None
+        else:
+            cursor = watermark
+            if self.overlap_seconds:
+                cursor = (watermark[0] - timedelta(seconds=self.overlap_seconds), 0)
+
+        query = select(*columns).where(table.c.updated_at.isnot(None))
+        if cursor is not None:
+            query = query.where(_after(table.c.updated_at, table.c.id, cursor))
+        self._push_pages(spec, table, query, result,
+                         keyset=lambda last: _after(table.c.updated_at, table.c.id, last),
+                         order_by=(table.c.updated_at, table.c.id), save=True)
+        logger.info(f"Search sync {resource_type}: {result.indexed} indexed, {result.deleted} deleted, "
+                    f"{result.failed} failed in {result.batches} batches")
+        return result
+
+    def _push_pages(self, spec: ResourceSpec, table: Any, query: Any, result: SyncResult,
+                    keyset: Callable[[Watermark], Any], order_by: tuple, save: bool) -> bool:
+        """Read keyset pages and bulk them; returns False when a page could not be delivered"""
+        index = self.index_name(spec.resource_type)
+        last = None
+        while True:
+            page_query = query if last is None else query.where(keyset(last))
+            # Short-lived connection per page: no transaction held open across bulk requests
+            with self.bind.connect() as conn:
+                rows = [dict(row) for row in conn.execute(page_query.order_by(*order_by).limit(self.batch_size)).mappings()]
+            if not rows:
+                return True
+
+            actions = [_document_action(spec, index, row) for row in rows]
+            delivered = self._send_all(actions, result)
+            if not delivered:
+                result.complete = False
+                return False
+            result.batches += 1
+
+            last_row = rows[-1]
+            last = (last_row.get("updated_at"), last_row["id"])
+            if save:
+                result.watermark = last
+                self.save_watermark(spec.resource_type, last)
+            if len(rows) < self.batch_size:
+                return True
+
+    def sync_tombstones(self) -> SyncResult:
+        """Delete documents of removed rows recorded in search_tombstones, then prune old tombstones"""
+        from app.database import Base
+
+        self.ensure_indices()
+        table = Base.metadata.tables["search_tombstones"]
+        result = SyncResult(TOMBSTONES)
+        watermark = self.get_watermark(TOMBSTONES)
+        result.watermark = watermark
+
+        query = select(table.c.id, table.c.resource_type, table.c.resource_id, table.c.deleted_at)
+        last = watermark
+        while True:
+            page_query = query if last is None else query.where(_after(table.c.deleted_at, table.c.id, last))
+            with self.bind.connect() as conn:
+                rows = conn.execute(page_query.order_by(table.c.deleted_at, table.c.id).limit(self.batch_size)).all()
+            if not rows:
+                break
+            actions = [
+                ({"delete": {"_index": self.index_name(row.resource_type), "_id": str(row.resource_id)}}, None)
+                for row in rows if row.resource_type in RESOURCES
+            ]
+            if not self._send_all(actions, result):
+                result.complete = False
+                return result
+            result.batches += 1
+            last = (rows[-1].deleted_at, rows[-1].id)
+            result.watermark = last
+            self.save_watermark(TOMBSTONES, last)
+            if len(rows) < self.batch_size:
+                break
+
+        if result.watermark is not None:
+            self.prune_tombstones(result.watermark)
+        return result
+
+    def prune_tombstones(self, watermark: Watermark) -> int:
+        """Drop replayed tombstones past the retention period"""
+        from app.database import Base
+
+        table = Base.metadata.tables["search_tombstones"]
+        cutoff = min(datetime.utcnow() - self.tombstone_retention, watermark[0])
+        with self.bind.begin() as conn:
+            return conn.execute(delete(table).where(table.c.deleted_at < cutoff)).rowcount
+
+    # Bulk delivery
+
+    def _send_all(self, actions: List[BulkAction], result: SyncResult) -> bool:
+        for chunk in self._chunks(actions):
+            if not self._send(chunk, result):
+                return False
+        return True
+
+    def _chunks(self, actions: List[BulkAction]) -> Iterator[List[BulkAction]]:
+        """Split actions into bulk requests bounded by action count and payload size"""
+        chunk: List[BulkAction] = []
+        size = 0
+        for action in actions:
+            action_size = _payload_size(action)
+            if chunk and (len(chunk) >= self.max_actions or size + action_size > self.max_bytes):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(action)
+            size += action_size
+        if chunk:
+            yield chunk
+
+    def _send(self, actions: List[BulkAction], result: SyncResult) -> bool:
+        """
+        Send one bulk request, retrying transport errors and retryable items with exponential backoff.
+
+        Items failing with other statuses (e.g. mapping errors) are counted as
+        failed and skipped: retrying cannot fix them and they must not block
+        the watermark.
+
+        Returns:
+            False when retries ran out with actions still undelivered
+        """
+        pending = actions
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+            try:
+                response = self.client.bulk(operations=_operations(pending))
+            except (ESConnectionError, ConnectionTimeout) as e:
+                logger.warning(f"Bulk request failed (attempt {attempt + 1}): {str(e)}")
+                continue
+            except ApiError as e:
+                if e.meta.status not in RETRYABLE_STATUSES:
+                    raise
+                logger.warning(f"Bulk request rejected with {e.meta.status} (attempt {attempt + 1})")
+                continue
+
+            retry = []
+            for action, item in zip(pending, response["items"]):
+                (kind, outcome), = item.items()
+                status = outcome.get("status", 200)
+                if "error" not in outcome or (kind == "delete" and status == 404):
+                    if kind == "delete":
+                        result.deleted += 1
+                    else:
+                        result.indexed += 1
+                elif status in RETRYABLE_STATUSES:
+                    retry.append(action)
+                else:
+                    result.failed += 1
+                    result.errors.append(f"{outcome.get('_id')}: {outcome['error'].get('reason', outcome['error'])}")
+                    logger.error(f"Search sync item {outcome.get('_index')}/{outcome.get('_id')} failed: {outcome['error']}")
+            if not retry:
+                return True
+            pending = retry
+
+        result.failed += len(pending)
+        result.errors.append(f"{len(pending)} actions undelivered after {self.max_retries} retries")
+        logger.error(f"Search sync gave up on {len(pending)} actions after {self.max_retries} retries")
+        return False
+
+
+def _after(timestamp_column: Any, id_column: Any, position: Watermark) -> Any:
+    """Keyset predicate: (timestamp, id) strictly after position"""
+    timestamp, last_id = position
+    return or_(timestamp_column > timestamp, and_(timestamp_column == timestamp, id_column > last_id))
+
+
+def _document_action(spec: ResourceSpec, index: str, row: Dict[str, Any]) -> BulkAction:
+    """Index action for a searchable row; delete action for one that no longer is"""
+    doc_id = str(row["id"])
+    if not is_searchable(spec, row):
+        return {"delete": {"_index": index, "_id": doc_id}}, None
+    metadata = " ".join(filter(None, (
+        flatten_text(row.get("extra_metadata")),
+        flatten_text(row.get(spec.config_column)) if spec.config_column else None
+    )))
+    return {"index": {"_index": index, "_id": doc_id}}, {
+        "resource_type": spec.resource_type,
+        "id": row["id"],
+        "org_id": row.get("org_id"),
+        "owner_id": row.get("owner_id"),
+        "project_id": row.get("project_id"),
+        "name": row.get("name") or "",
+        "description": row.get("description"),
+        "tags": flatten_text(row.get("tags")),
+        "metadata": metadata,
+        "status": _plain(row.get("status")),
+        "created_at": _isoformat(row.get("created_at")),
+        "updated_at": _isoformat(row.get("updated_at")),
+    }
+
+
+def _operations(actions: List[BulkAction]) -> List[Dict[str, Any]]:
+    operations = []
+    for action, source in actions:
+        operations.append(action)
+        if source is not None:
+            operations.append(source)
+    return operations
+
+
+def _payload_size(action: BulkAction) -> int:
+    """Serialized NDJSON bytes of one action (and its source line)"""
+    size = len(json.dumps(action[0])) + 1
+    if action[1] is not None:
+        size += len(json.dumps(action[1], default=str).encode()) + 1
+    return size
+
+
+def _isoformat(value: Any) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_watermark(watermark: Optional[Watermark]) -> Optional[Dict[str, Any]]:
+    if watermark is None:
+        return None
+    return {"updated_at": _isoformat(watermark[0]), "id": watermark[1]}
+
+
+# Tombstones
+
+def record_tombstones(connection: Any, resource_type: str, resource_ids: Iterable[int], org_id: Optional[int] = None):
+    """
+    Record deleted rows for the indexer.
+
+    Call in the deleting transaction for bulk deletes (query.delete(),
+    Core deletes) that bypass the ORM flush hooks.
+
+    Args:
+        connection: Session or Connection of the deleting transaction
+        resource_type: Key of RESOURCES
+        resource_ids: Ids of the deleted rows
+        org_id: Owning org, when known
+    """
+    from app.database import Base
+
+    rows = [{"resource_type": resource_type, "resource_id": resource_id, "org_id": org_id,
+             "deleted_at": datetime.utcnow()} for resource_id in resource_ids]
+    if rows:
+        connection.execute(insert(Base.metadata.tables["search_tombstones"]), rows)
+
+
+_hooked = set()
+_hooks_lock = Lock()
+
+
+def install_tombstone_hooks(target: Any):
+    """
+    Write a tombstone for every indexed row deleted through an ORM flush, in the same transaction.
+
+    Args:
+        target: Session factory (or Session subclass) whose sessions write, e.g. SessionLocal
+    """
+    with _hooks_lock:
+        if target in _hooked:
+            return
+        event.listen(target, "after_flush", _record_deleted)
+        _hooked.add(target)
+
+
+def remove_tombstone_hooks():
+    with _hooks_lock:
+        for target in _hooked:
+            event.remove(target, "after_flush", _record_deleted)
+        _hooked.clear()
+
+
+def _record_deleted(session, flush_context):
+    for obj in session.deleted:
+        spec = RESOURCES_BY_TABLE.get(getattr(type(obj), "__tablename__", None))
+        if spec is None:
+            continue
+        # Read from instance state: deleted rows cannot be lazy loaded
+        state = inspect(obj)
+        if not state.identity:
+            continue
+        record_tombstones(session.connection(), spec.resource_type, [state.identity[0]], state.dict.get("org_id"))
+
+
+_client = None
+_client_lock = Lock()
+
+
+def get_elasticsearch() -> Any:
+    """Shared Elasticsearch client for ELASTICSEARCH_URL, created on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from elasticsearch import Elasticsearch
+            _client = Elasticsearch([settings.ELASTICSEARCH_URL])
+        return _client
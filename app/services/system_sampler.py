@@ -0,0 +1,323 @@
+"""
+System Sampler - Background sampling of process and pool statistics.
+Keeps recent CPU, memory, event-loop lag, DB pool and Redis pool series in
+fixed-size numpy ring buffers so metrics endpoints can read them from memory.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import warnings
+from threading import Lock
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+import numpy as np
+import psutil
+
+logger = logging.getLogger(__name__)
+
+FIELDS = (
+    "cpu_percent",
+    "memory_percent",
+    "process_rss_mb",
+    "disk_percent",
+    "network_mbps",
+    "loop_lag_ms",
+    "db_pool_size",
+    "db_pool_checked_out",
+    "db_pool_overflow",
+    "redis_pool_in_use",
+    "redis_pool_available",
+)
+
+# (seconds per point, number of points): 10 minutes, 2 hours, 1 day and 30 days
+RESOLUTIONS = ((1, 600), (10, 720), (60, 1440), (600, 4320))
+
+
+class RingBuffer:
+    """
+    Fixed-size buffer of timestamped rows of FIELDS.
+
+    Rows are stored in one preallocated float64 array; column 0 is the
+    timestamp. Missing values are stored as NaN.
+    """
+
+    def __init__(self, capacity: int, width: int = len(FIELDS)):
+        self.capacity = capacity
+        self._data = np.full((capacity, width + 1), np.nan)
+        self._next = 0
+        self._size = 0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, values: np.ndarray):
+        with self._lock:
+            row = self._data[self._next]
+            row[0] = timestamp
+            row[1:] = values
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def snapshot(self, since: Optional[float] = None) -> np.ndarray:
+        """Copy of the rows in time order, optionally only those at or after since"""
+        with self._lock:
+            if self._size < self.capacity:
+                rows = self._data[:self._size].copy()
+            else:
+                rows = np.concatenate((self._data[self._next:], self._data[:self._next]))
+        if since is not None:
+            rows = rows[rows[:, 0] >= since]
+        return rows
+
+    def latest(self) -> Optional[np.ndarray]:
+        with self._lock:
+            if self._size == 0:
+                return None
+            return self._data[(self._next - 1) % self.capacity].copy()
+
+
+class _Rollup:
+    """Averages 1s samples into one row per coarser interval"""
+
+    def __init__(self, step: int, capacity: int):
+        self.step = step
+        self.buffer = RingBuffer(capacity)
+        self._bucket: Optional[int] = None
+        self._sum = np.zeros(len(FIELDS))
+        self._count = np.zeros(len(FIELDS))
+
+    def add(self, timestamp: float, values: np.ndarray):
+        bucket = int(timestamp // self.step)
+        if self._bucket is not None and bucket != self._bucket:
+            self.flush()
+        self._bucket = bucket
+        present = ~np.isnan(values)
+        self._sum[present] += values[present]
+        self._count[present] += 1
+
+    def flush(self):
+        if self._bucket is None:
+            return
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(self._count > 0, self._sum / self._count, np.nan)
+        self.buffer.append(float(self._bucket * self.step), means)
+        self._sum[:] = 0
+        self._count[:] = 0
+        self._bucket = None
+
+
+class SystemSampler:
+    """
+    Singleton background sampler.
+
+    A daemon thread samples once per second; nothing here blocks the event
+    loop. Loop lag is measured by scheduling a callback on the loop from the
+    thread and timing how long it waits to run.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self, interval: float = 1.0, resolutions: Tuple[Tuple[int, int], ...] = RESOLUTIONS):
+        self.interval = interval
+        self._resolutions = [_Rollup(step, capacity) for step, capacity in resolutions]
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lag_ms = float("nan")
+        self._db_engine = None
+        self._redis_pools: List[Any] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_network: Optional[Tuple[float, int]] = None
+        self._process = psutil.Process()
+
+    @classmethod
+    def instance(cls) -> "SystemSampler":
+        """Get singleton instance"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def watch_db_engine(self, engine: Any):
+        self._db_engine = engine
+
+    def watch_redis_pool(self, pool: Any):
+        if pool is not None and pool not in self._redis_pools:
+            self._redis_pools.append(pool)
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Start the sampler thread; pass the serving event loop to measure its lag"""
+        self._loop = loop
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # Prime the CPU counter so the first non-blocking reading is meaningful
+        psutil.cpu_percent(interval=None)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+        logger.info("System sampler started")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"System sampling failed: {str(e)}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def sample(self, timestamp: Optional[float] = None):
+        """Take one sample and add it to every resolution"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        readings = self._readings()
+        values = np.array([_safe(readings[field]) for field in FIELDS], dtype=float)
+        for rollup in self._resolutions:
+            if rollup.step <= self.interval:
+                rollup.buffer.append(timestamp, values)
+            else:
+                rollup.add(timestamp, values)
+        self._probe_loop()
+
+    def _readings(self) -> Dict[str, Callable[[], float]]:
+        return {
+            "cpu_percent": lambda: psutil.cpu_percent(interval=None),
+            "memory_percent": lambda: psutil.virtual_memory().percent,
+            "process_rss_mb": lambda: self._process.memory_info().rss / 1024 / 1024,
+            "disk_percent": lambda: psutil.disk_usage("/").percent,
+            "network_mbps": self._read_network_mbps,
+            "loop_lag_ms": lambda: self._loop_lag_ms,
+            "db_pool_size": lambda: self._read_db_pool("size"),
+            "db_pool_checked_out": lambda: self._read_db_pool("checkedout"),
+            "db_pool_overflow": lambda: self._read_db_pool("overflow"),
+            "redis_pool_in_use": lambda: self._read_redis_pool("_in_use_connections"),
+            "redis_pool_available": lambda: self._read_redis_pool("_available_connections"),
+        }
+
+    def _read_network_mbps(self) -> float:
+        now = time.monotonic()
+        counters = psutil.net_io_counters()
+        total = counters.bytes_sent + counters.bytes_recv
+        previous, self._last_network = self._last_network, (now, total)
+        if previous is None or now <= previous[0]:
+            return float("nan")
+        return (total - previous[1]) * 8 / 1_000_000 / (now - previous[0])
+
+    def _read_db_pool(self, attribute: str) -> float:
+        # Only QueuePool exposes these; SQLite test engines report NaN
+        return getattr(self._db_engine.pool, attribute)()
+
+    def _read_redis_pool(self, attribute: str) -> float:
+        if not self._redis_pools:
+            return float("nan")
+        return sum(len(getattr(pool, attribute)) for pool in self._redis_pools)
+
+    def _probe_loop(self):
+        """Schedule a no-op on the loop; its scheduling delay is the loop lag"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        scheduled = time.perf_counter()
+
+        def measure():
+            self._loop_lag_ms = (time.perf_counter() - scheduled) * 1000
+
+        try:
+            loop.call_soon_threadsafe(measure)
+        except RuntimeError:
+            self._loop = None
+
+    def latest(self) -> Dict[str, Optional[float]]:
+        """Most recent sample as a dict (None for unavailable fields)"""
+        row = self._resolutions[0].buffer.latest()
+        if row is None:
+            return {"timestamp": None, **{field: None for field in FIELDS}}
+        values = {field: _clean(row[i + 1]) for i, field in enumerate(FIELDS)}
+        return {"timestamp": float(row[0]), **values}
+
+    def series(self, fields: List[str], seconds: float) -> Tuple[int, np.ndarray]:
+        """
+        Get recent rows for some fields from the finest resolution covering the window.
+
+        Args:
+            fields: Names from FIELDS
+            seconds: Lookback window
+
+        Returns:
+            (resolution step, array with a timestamp column then one column per field)
+        """
+        unknown = [field for field in fields if field not in FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown system metrics: {unknown}")
+
+        chosen = next(
+            (rollup for rollup in self._resolutions if rollup.step * rollup.buffer.capacity >= seconds),
+            self._resolutions[-1]
+        )
+
+        rows = chosen.buffer.snapshot(since=time.time() - seconds)
+        columns = [0] + [FIELDS.index(field) + 1 for field in fields]
+        return chosen.step, rows[:, columns]
+
+
+AGGREGATIONS: Dict[str, Callable[[np.ndarray], float]] = {
+    "avg": np.nanmean,
+    "min": np.nanmin,
+    "max": np.nanmax,
+    "sum": np.nansum,
+    "count": lambda values: float(np.count_nonzero(~np.isnan(values))),
+    "p95": lambda values: np.nanpercentile(values, 95),
+    "p99": lambda values: np.nanpercentile(values, 99),
+}
+
+
+def downsample(timestamps: np.ndarray, values: np.ndarray, step: int, aggregation: str) -> List[Tuple[float, Optional[float]]]:
+    """
+    Reduce a series to one point per step seconds.
+
+    Args:
+        timestamps: Sorted sample timestamps
+        values: Sample values (NaN for missing)
+        step: Output spacing in seconds
+        aggregation: Key of AGGREGATIONS ("rate" is treated as "avg")
+
+    Returns:
+        (bucket start timestamp, aggregated value) pairs
+    """
+    if len(timestamps) == 0:
+        return []
+    reduce = AGGREGATIONS.get(aggregation, np.nanmean)
+    buckets = (timestamps // step).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)]
+
+    points = []
+    with warnings.catch_warnings():
+        # All-NaN buckets are expected while a source is unavailable
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for start, end in zip(starts, ends):
+            points.append((float(buckets[start] * step), _clean(reduce(values[start:end]))))
+    return points
+
+
+def _safe(read: Callable[[], float]) -> float:
+    try:
+        return float(read())
+    except Exception:
+        return float("nan")
+
+
+def _clean(value: float) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), 3)
+
+
+system_sampler = SystemSampler.instance()
@@ -0,0 +1,377 @@
+"""
+Tag Index - Keeps tag_assignments and tag_counts in step with resource tags.
+Diffs each flushed resource's tags against its assignment rows in the same
+transaction, and builds indexed tag filters and facet counts for queries.
+"""
+
+import importlib
+import json
+import logging
+import unicodedata
+from collections import Counter, defaultdict
+from threading import Lock
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+from sqlalchemy import delete, event, func, insert, inspect, select, tuple_, update
+
+logger = logging.getLogger(__name__)
+
+MAX_TAG_LENGTH = 100
+
+# resource_id -> (org_id, tags); tags None means the resource was deleted
+TagChanges = Dict[int, Tuple[Optional[int], Optional[List[str]]]]
+
+
+def normalize_tags(value: Any) -> List[str]:
+    """
+    Tags of a resource as a de-duplicated list of stripped strings.
+
+    Duplicates are found ignoring case and accents, as the database
+    compares tags; the first spelling is kept.
+
+    Accepts what the tags columns hold: JSON lists, JSON-encoded text
+    (FlowNode.tags) and comma-separated strings.
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return []
+        try:
+            value = json.loads(text)
+        except ValueError:
+            value = text.split(",")
+        if isinstance(value, str):
+            value = [value]
+    if isinstance(value, dict):
+        value = list(value)
+    if not isinstance(value, (list, tuple, set)):
+        value = [value]
+    tags = (str(tag).strip()[:MAX_TAG_LENGTH] for tag in value if tag is not None)
+    unique: Dict[str, str] = {}
+    for tag in tags:
+        if tag:
+            unique.setdefault(_tag_key(tag), tag)
+    return list(unique.values())
+
+
+def _tag_key(tag: str) -> str:
+    """
+    Comparison key matching the utf8mb4_unicode_ci tag columns.
+
+    MySQL treats "PII", "pii" and "Pïi" as one tag, so two of them on a
+    resource would break the unique assignment key.
+    """
+    decomposed = unicodedata.normalize("NFKD", tag)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def _tables():
+    from app.database import Base
+    return Base.metadata.tables["tag_assignments"], Base.metadata.tables["tag_counts"]
+
+
+def sync_tags(connection: Any, resource_type: str, changes: TagChanges) -> int:
+    """
+    Bring the assignments and counts of some resources up to date.
+
+    Args:
+        connection: Session or Connection of the writing transaction
+        resource_type: Key of RESOURCES
+        changes: New org and tags per resource id (tags None for deletes)
+
+    Returns:
+        Number of assignment rows inserted or deleted
+    """
+    if not changes:
+        return 0
+    assignments, _ = _tables()
+    existing: Dict[int, Dict[str, Optional[int]]] = defaultdict(dict)
+    rows = connection.execute(
+        select(assignments.c.resource_id, assignments.c.tag, assignments.c.org_id).where(
+            assignments.c.resource_type == resource_type,
+            assignments.c.resource_id.in_(list(changes))
+        )
+    )
+    for resource_id, tag, org_id in rows:
+        existing[resource_id][tag] = org_id
+
+    removed: List[Tuple[int, str]] = []
+    added: List[Dict[str, Any]] = []
+    deltas: Counter = Counter()
+    for resource_id, (org_id, tags) in changes.items():
+        current = existing.get(resource_id, {})
+        wanted = set(tags or ()) if org_id is not None else set()
+        for tag, old_org in current.items():
+            # A move to another org re-counts every tag under the new org
+            if tag not in wanted or old_org != org_id:
+                removed.append((resource_id, tag))
+                deltas[(old_org, tag)] -= 1
+        for tag in wanted:
+            if tag not in current or current[tag] != org_id:
+                added.append({"org_id": org_id, "resource_type": resource_type, "resource_id": resource_id, "tag": tag})
+                deltas[(org_id, tag)] += 1
+
+    if removed:
+        connection.execute(delete(assignments).where(
+            assignments.c.resource_type == resource_type,
+            tuple_(assignments.c.resource_id, assignments.c.tag).in_(removed)
+        ))
+    if added:
+        connection.execute(insert(assignments), added)
+    _apply_count_deltas(connection, resource_type, deltas)
+    return len(removed) + len(added)
+
+
+def _dialect_name(connection: Any) -> str:
+    bind = connection.get_bind() if hasattr(connection, "get_bind") else connection
+    return bind.dialect.name
+
+
+def _apply_count_deltas(connection: Any, resource_type: str, deltas: Counter):
+    """
+    Add deltas to the org tag counts in one upsert.
+
+    Concurrent writers adding the first resource with a tag both insert;
+    the unique key turns the second insert into an increment instead of a
+    duplicate row or a lost count. Rows are sorted so writers lock them in
+    the same order.
+    """
+    _, counts = _tables()
+    rows = [
+        {"org_id": org_id, "resource_type": resource_type, "tag": tag, "count": delta}
+        for (org_id, tag), delta in sorted(deltas.items(), key=lambda item: (item[0][0] or 0, item[0][1]))
+        if delta and org_id is not None
+    ]
+    if not rows:
+        return
+    dialect = _dialect_name(connection)
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        statement = mysql_insert(counts).values(rows)
+        connection.execute(statement.on_duplicate_key_update(count=counts.c.count + statement.inserted["count"]))
+    elif dialect in ("sqlite", "postgresql"):
+        dialect_insert = importlib.import_module(f"sqlalchemy.dialects.{dialect}").insert
+        statement = dialect_insert(counts).values(rows)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=["org_id", "resource_type", "tag"],
+            set_={"count": counts.c.count + statement.excluded["count"]}
+        ))
+    else:
+        for row in rows:
+            key = (counts.c.org_id == row["org_id"], counts.c.resource_type == resource_type, counts.c.tag == row["tag"])
+            result = connection.execute(update(counts).where(*key).values(count=counts.c.count + row["count"]))
+            if result.rowcount == 0:
+                connection.execute(insert(counts).values(**row))
+    # Decrements of tags no longer used leave rows at zero (or below, for counts never recorded)
+    if any(row["count"] < 0 for row in rows):
+        connection.execute(delete(counts).where(counts.c.resource_type == resource_type, counts.c.count <= 0))
+
+
+# Queries
+
+def tag_filter(resource_type: str, id_column: Any, tags: Iterable[str]) -> Any:
+    """
+    Criterion selecting resources that carry every one of tags.
+
+    Resolved through the (resource_type, tag, resource_id) index instead of
+    scanning the JSON tags column of every row.
+
+    Args:
+        resource_type: Key of RESOURCES
+        id_column: Primary key column of the resource table, e.g. FlowNode.id
+        tags: Required tags
+    """
+    assignments, _ = _tables()
+    wanted = normalize_tags(list(tags))
+    matching = select(assignments.c.resource_id).where(
+        assignments.c.resource_type == resource_type,
+        assignments.c.tag.in_(wanted)
+    )
+    if len(wanted) > 1:
+        matching = matching.group_by(assignments.c.resource_id).having(func.count() == len(wanted))
+    return id_column.in_(matching)
+
+
+def tag_search_filter(resource_type: str, id_column: Any, text: str) -> Any:
+    """
+    Criterion selecting resources with a tag containing text.
+
+    The substring match for free-text search, as LIKE '%text%' on the JSON
+    tags did; scans tag_assignments of one resource type rather than
+    parsing every row's tags.
+
+    Args:
+        resource_type: Key of RESOURCES
+        id_column: Primary key column of the resource table, e.g. DataSet.id
+        text: Part of a tag
+    """
+    assignments, _ = _tables()
+    matching = select(assignments.c.resource_id).where(
+        assignments.c.resource_type == resource_type,
+        assignments.c.tag.contains(text.strip(), autoescape=True)
+    )
+    return id_column.in_(matching)
+
+
+def tag_counts(
+    connection: Any,
+    org_id: int,
+    resource_types: Optional[Iterable[str]] = None,
+    contains: Optional[str] = None,
+    limit: int = 50,
+    by_count: bool = True
+) -> List[Tuple[str, int]]:
+    """
+    Materialized per-org tag counts.
+
+    Args:
+        connection: Session or Connection
+        org_id: Org whose resources are counted
+        resource_types: Keys of RESOURCES to sum over (all by default)
+        contains: Only tags containing this text, case-insensitively
+        limit: Tags to return
+        by_count: Most used tags first; otherwise alphabetical
+    """
+    _, counts = _tables()
+    total = func.sum(counts.c.count).label("total")
+    query = select(counts.c.tag, total).where(counts.c.org_id == org_id)
+    if resource_types:
+        query = query.where(counts.c.resource_type.in_(list(resource_types)))
+    if contains:
+        query = query.where(func.lower(counts.c.tag).contains(contains.lower(), autoescape=True))
+    order = (total.desc(), counts.c.tag) if by_count else (counts.c.tag,)
+    query = query.group_by(counts.c.tag).order_by(*order).limit(limit)
+    return [(tag, int(count)) for tag, count in connection.execute(query)]
+
+
+def facet_counts(connection: Any, resource_type: str, ids: Any, limit: int = 50) -> List[Tuple[str, int]]:
+    """
+    Tag counts over a filtered result set.
+
+    Args:
+        connection: Session or Connection
+        resource_type: Key of RESOURCES
+        ids: Matching resource ids, as a list or a select of the id column
+        limit: Tags to return
+    """
+    assignments, _ = _tables()
+    total = func.count().label("total")
+    query = select(assignments.c.tag, total).where(
+        assignments.c.resource_type == resource_type,
+        assignments.c.resource_id.in_(ids)
+    ).group_by(assignments.c.tag).order_by(total.desc(), assignments.c.tag).limit(limit)
+    return [(tag, int(count)) for tag, count in connection.execute(query)]
+
+
+# Backfill
+
+def rebuild_tag_index(bind: Any, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Recompute every assignment and count from the resource tables.
+
+    For backfilling after the tables are created and for repairing drift
+    from writes that bypassed the session hooks.
+
+    Returns:
+        Assignments written per resource type
+    """
+    from app.database import Base
+    from app.services.search_index import RESOURCES
+
+    assignments, counts = _tables()
+    written = {}
+    with bind.begin() as conn:
+        conn.execute(delete(assignments))
+        conn.execute(delete(counts))
+        for spec in RESOURCES.values():
+            table = Base.metadata.tables.get(spec.table)
+            if table is None or "tags" not in table.c:
+                continue
+            totals: Counter = Counter()
+            batch = []
+            written[spec.resource_type] = 0
+            result = conn.execution_options(yield_per=batch_size).execute(
+                select(table.c.id, table.c.org_id, table.c.tags).where(table.c.tags.isnot(None))
+            )
+            for resource_id, org_id, tags in result:
+                if org_id is None:
+                    continue
+                for tag in normalize_tags(tags):
+                    batch.append({"org_id": org_id, "resource_type": spec.resource_type, "resource_id": resource_id, "tag": tag})
+                    totals[(org_id, tag)] += 1
+                if len(batch) >= batch_size:
+                    conn.execute(insert(assignments), batch)
+                    written[spec.resource_type] += len(batch)
+                    batch = []
+            if batch:
+                conn.execute(insert(assignments), batch)
+                written[spec.resource_type] += len(batch)
+            if totals:
+                conn.execute(insert(counts), [
+                    {"org_id": org_id, "resource_type": spec.resource_type, "tag": tag, "count": count}
+                    for (org_id, tag), count in totals.items()
+                ])
+    logger.info(f"Tag index rebuilt: {sum(written.values())} assignments")
+    return written
+
+
+# Session hooks
+
+_hooked = set()
+_hooks_lock = Lock()
+
+
+def install_tag_hooks(target: Any):
+    """
+    Sync tag assignments for every tagged resource written through an ORM flush, in the same transaction.
+
+    Args:
+        target: Session factory (or Session subclass) whose sessions write, e.g. SessionLocal
+    """
+    with _hooks_lock:
+        if target in _hooked:
+            return
+        event.listen(target, "after_flush", _sync_flushed)
+        _hooked.add(target)
+
+
+def remove_tag_hooks():
+    with _hooks_lock:
+        for target in _hooked:
+            event.remove(target, "after_flush", _sync_flushed)
+        _hooked.clear()
+
+
+def _sync_flushed(session, flush_context):
+    # Imported here: the search index parses tags with normalize_tags
+    from app.services.search_index import RESOURCES_BY_TABLE
+
+    changes: Dict[str, TagChanges] = defaultdict(dict)
+    for objects, kind in ((session.new, "new"), (session.dirty, "dirty"), (session.deleted, "deleted")):
+        for obj in objects:
+            state = inspect(obj)
+            spec = RESOURCES_BY_TABLE.get(state.mapper.local_table.name)
+            if spec is None or "tags" not in state.mapper.attrs:
+                continue
+            # New objects only get their identity key after this hook; their id is already set
+            resource_id = state.identity[0] if state.identity else state.dict.get("id")
+            if resource_id is None:
+                continue
+            if kind == "deleted":
+                changes[spec.resource_type][resource_id] = (None, None)
+                continue
+            # History is still available in after_flush; skip updates that left tags and org alone
+            if kind == "dirty" and not any(
+                state.attrs[name].history.has_changes() for name in ("tags", "org_id") if name in state.mapper.attrs
+            ):
+                continue
+            if "tags" not in state.dict:
+                continue
+            changes[spec.resource_type][resource_id] = (state.dict.get("org_id"), normalize_tags(state.dict["tags"]))
+    if not changes:
+        return
+    connection = session.connection()
+    for resource_type, resource_changes in changes.items():
+        sync_tags(connection, resource_type, resource_changes)
@@ -0,0 +1,431 @@
+"""
+Tracing - Lightweight request tracing across API, database, Redis, HTTP and Celery.
+Spans carry W3C traceparent ids so a request can be followed into the Celery
+tasks it enqueues; finished spans go to an in-memory or JSON-lines file exporter.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, Any, Optional, List, Iterator
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+
+SERVER = "server"
+CLIENT = "client"
+PRODUCER = "producer"
+CONSUMER = "consumer"
+INTERNAL = "internal"
+
+MAX_STATEMENT_LENGTH = 1000
+
+SpanContext = namedtuple("SpanContext", ["trace_id", "span_id"])
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = (
+        "name", "kind", "trace_id", "span_id", "parent_id", "start_time",
+        "end_time", "attributes", "status", "error", "_tracer", "_started"
+    )
+
+    def __init__(self, tracer: "Tracer", name: str, kind: str, parent: Optional[SpanContext], attributes: Optional[Dict[str, Any]]):
+        self._tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self._started = time.perf_counter()
+
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_time is None:
+            return None
+        return (self.end_time - self.start_time) * 1000
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        """Finish the span and hand it to the exporter; later calls are ignored"""
+        if self.end_time is not None:
+            return
+        self.end_time = self.start_time + (time.perf_counter() - self._started)
+        self._tracer._export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration_ms = self.duration_ms
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_ms": round(duration_ms, 3) if duration_ms is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+
+class InMemorySpanExporter:
+    """Keeps the most recent finished spans in memory (tests and local debugging)"""
+
+    def __init__(self, max_spans: int = 10000):
+        self._spans: deque = deque(maxlen=max_spans)
+        self._lock = Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def get_trace(self, trace_id: str) -> List[Span]:
+        """Spans of one trace in start order"""
+        return sorted((span for span in self.spans if span.trace_id == trace_id), key=lambda span: span.start_time)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def close(self):
+        pass
+
+
+class FileSpanExporter:
+    """Appends finished spans as JSON lines to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """
+    Singleton tracer.
+
+    Server and consumer spans (requests, Celery tasks) start traces; client
+    spans (SQL, Redis, outbound HTTP) are only recorded inside an active span,
+    so background work outside a request costs one context lookup.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self, enabled: bool = False, exporter: Optional[Any] = None):
+        self.enabled = enabled
+        self.exporter = exporter or InMemorySpanExporter()
+
+    @classmethod
+    def instance(cls) -> "Tracer":
+        """Get singleton instance"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def configure(self, enabled: bool, export_path: Optional[str] = None):
+        """
+        Enable or disable tracing.
+
+        Args:
+            enabled: Record spans
+            export_path: JSON-lines file for finished spans; in memory when not set
+        """
+        self.exporter.close()
+        self.exporter = FileSpanExporter(export_path) if enabled and export_path else InMemorySpanExporter()
+        self.enabled = enabled
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(
+        self,
+        name: str,
+        kind: str = INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None
+    ) -> Span:
+        """Start a span under parent, or under the current span when no parent is given"""
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+        return Span(self, name, kind, parent, attributes)
+
+    def start_child_span(self, name: str, kind: str = CLIENT, attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """Start a span only when tracing is on and a span is active"""
+        if not self.enabled:
+            return None
+        current = _current_span.get()
+        if current is None:
+            return None
+        return Span(self, name, kind, current.context, attributes)
+
+    @staticmethod
+    def activate(span: Span):
+        """Make span the current span; returns a token for deactivate"""
+        return _current_span.set(span)
+
+    @staticmethod
+    def deactivate(token):
+        _current_span.reset(token)
+
+    @contextmanager
+    def span(self, name: str, kind: str = INTERNAL, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Optional[Span]]:
+        """Run a block inside a new current span (yields None while tracing is off)"""
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def inject(self, carrier: Dict[str, Any]):
+        """Write the current span's traceparent into a header dict"""
+        current = _current_span.get()
+        if self.enabled and current is not None:
+            carrier[TRACEPARENT_HEADER] = current.traceparent
+
+    @staticmethod
+    def extract(carrier: Any) -> Optional[SpanContext]:
+        """Read a traceparent from a mapping with .get (request headers, message headers)"""
+        return parse_traceparent(carrier.get(TRACEPARENT_HEADER) if carrier is not None else None)
+
+    def _export(self, span: Span):
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.error(f"Failed to export span {span.name}: {str(e)}")
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent ("00-<trace id>-<span id>-<flags>")"""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+def instrument_sqlalchemy(engine: Any, tracer: Optional[Tracer] = None):
+    """Record a client span per SQL statement executed on engine"""
+    from sqlalchemy import event
+
+    if getattr(engine, "_traced", False):
+        return
+    tracer = tracer or Tracer.instance()
+    system = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.start_child_span(f"db {statement.lstrip().split(' ', 1)[0].upper()}", CLIENT, {
+            "db.system": system,
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            "db.executemany": executemany
+        })
+        if span is not None and context is not None:
+            context._trace_span = span
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set_attribute("db.rowcount", cursor.rowcount)
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        span = getattr(exception_context.execution_context, "_trace_span", None)
+        if span is not None:
+            span.record_exception(exception_context.original_exception)
+            span.end()
+
+    engine._traced = True
+
+
+def instrument_redis(client: Any, tracer: Optional[Tracer] = None) -> Any:
+    """
+    Record a client span per Redis command and per pipeline execution.
+
+    Works with both redis.Redis and redis.asyncio.Redis clients by wrapping
+    the instance's execute_command and the pipelines it creates.
+    """
+    if client is None or getattr(client, "_traced", False):
+        return client
+    tracer = tracer or Tracer.instance()
+    execute_command = client.execute_command
+    create_pipeline = client.pipeline
+
+    def start(name: str, attributes: Dict[str, Any]) -> Optional[Span]:
+        return tracer.start_child_span(f"redis {name}", CLIENT, {"db.system": "redis", **attributes})
+
+    if asyncio.iscoroutinefunction(execute_command):
+        async def traced_execute_command(*args, **options):
+            span = start(str(args[0]), {})
+            if span is None:
+                return await execute_command(*args, **options)
+            try:
+                return await execute_command(*args, **options)
+            except Exception as e:
+                span.record_exception(e)
+                raise
+            finally:
+                span.end()
+
+        def wrap_pipeline(pipeline):
+            execute = pipeline.execute
+
+            async def traced_execute(*args, **kwargs):
+                span = start("PIPELINE", {"db.redis.commands": len(pipeline.command_stack)})
+                if span is None:
+                    return await execute(*args, **kwargs)
+                try:
+                    return await execute(*args, **kwargs)
+                except Exception as e:
+                    span.record_exception(e)
+                    raise
+                finally:
+                    span.end()
+
+            pipeline.execute = traced_execute
+            return pipeline
+    else:
+        def traced_execute_command(*args, **options):
+            span = start(str(args[0]), {})
+            if span is None:
+                return execute_command(*args, **options)
+            try:
+                return execute_command(*args, **options)
+            except Exception as e:
+                span.record_exception(e)
+                raise
+            finally:
+                span.end()
+
+        def wrap_pipeline(pipeline):
+            execute = pipeline.execute
+
+            def traced_execute(*args, **kwargs):
+                span = start("PIPELINE", {"db.redis.commands": len(pipeline.command_stack)})
+                if span is None:
+                    return execute(*args, **kwargs)
+                try:
+                    return execute(*args, **kwargs)
+                except Exception as e:
+                    span.record_exception(e)
+                    raise
+                finally:
+                    span.end()
+
+            pipeline.execute = traced_execute
+            return pipeline
+
+    def traced_pipeline(*args, **kwargs):
+        return wrap_pipeline(create_pipeline(*args, **kwargs))
+
+    client.execute_command = traced_execute_command
+    client.pipeline = traced_pipeline
+    client._traced = True
+    return client
+
+
+def aiohttp_trace_config(tracer: Optional[Tracer] = None):
+    """
+    aiohttp TraceConfig recording a client span per outbound request and
+    forwarding the trace context in the traceparent header.
+    """
+    import aiohttp
+
+    tracer = tracer or Tracer.instance()
+
+    async def on_request_start(session, trace_config_ctx, params):
+        span = tracer.start_child_span(f"HTTP {params.method}", CLIENT, {
+            "http.method": params.method,
+            "http.url": str(params.url.with_query(None))
+        })
+        trace_config_ctx.span = span
+        if span is not None:
+            params.headers[TRACEPARENT_HEADER] = span.traceparent
+
+    async def on_request_end(session, trace_config_ctx, params):
+        span = getattr(trace_config_ctx, "span", None)
+        if span is not None:
+            span.set_attribute("http.status_code", params.response.status)
+            if params.response.status >= 500:
+                span.status = "error"
+            span.end()
+
+    async def on_request_exception(session, trace_config_ctx, params):
+        span = getattr(trace_config_ctx, "span", None)
+        if span is not None:
+            span.record_exception(params.exception)
+            span.end()
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+tracer = Tracer.instance()
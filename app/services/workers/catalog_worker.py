@@ -261,7 +261,7 @@ class CatalogWorker(BaseAsyncTask):
             # Use catalog service to build index
             index_results = await self.catalog_service.index_catalog_for_search(org_id)
             
-            self.update_progress(100, "Search index build completed")
+            self.update_progress(100, "Search index update queued")
             
             result = {
                 "success": True,
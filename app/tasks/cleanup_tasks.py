@@ -45,4 +45,25 @@ def backup_database():
     
     # TODO: Implement database backup logic
     
-    return {"status": "completed", "backup_file": f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sql"}
\ No newline at end of file
+    return {"status": "completed", "backup_file": f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sql"}
+
+@celery_app.task
+def rebuild_tag_index():
+    """Recompute tag assignments and counts from the resources' tags columns."""
+    from ..database import engine
+    from ..services.tag_index import rebuild_tag_index as rebuild
+
+    logger.info("Rebuilding tag index...")
+    written = rebuild(engine)
+    return {"status": "completed", "assignments": written}
+
+
+@celery_app.task
+def rebuild_schema_field_index():
+    """Recompute the schema field index from stored data set and data schema schemas."""
+    from ..database import engine
+    from ..services.schema_field_index import rebuild_schema_field_index as rebuild
+
+    logger.info("Rebuilding schema field index...")
+    written = rebuild(engine)
+    return {"status": "completed", "fields": written}
@@ -4,8 +4,11 @@ Data processing tasks - Background data operations.
 
 from celery import current_app as celery_app
 import logging
+import redis
 from elasticsearch import Elasticsearch
 from ..config import settings
+from ..database import engine
+from ..services.search_indexer import ElasticsearchIndexer
 
 logger = logging.getLogger(__name__)
 
@@ -14,18 +17,36 @@ es = Elasticsearch([settings.ELASTICSEARCH_URL])
 
 @celery_app.task(bind=True)
 def update_search_index(self):
-    """Update Elasticsearch search index."""
+    """Push rows changed since the last run (and tombstoned deletes) to Elasticsearch."""
+    # Beat runs and on-demand runs share watermarks, so only one syncs at a time
+    lock = redis.from_url(settings.REDIS_URL).lock(
+        "search_index:sync", timeout=settings.ELASTICSEARCH_SYNC_LOCK_SECONDS, blocking=False
+    )
+    if not lock.acquire():
+        logger.info("Search index sync already running, skipping")
+        return {"status": "skipped"}
+
     try:
         logger.info("Updating search index...")
         
-        # TODO: Implement actual indexing logic
-        # This would connect to your database and index records
+        results = ElasticsearchIndexer(es, engine).sync()
         
-        return {"status": "completed", "indexed_records": 0}
+        return {
+            "status": "completed" if all(result.complete for result in results.values()) else "partial",
+            "indexed_records": sum(result.indexed for result in results.values()),
+            "deleted_records": sum(result.deleted for result in results.values()),
+            "failed_records": sum(result.failed for result in results.values()),
+            "resources": {name: result.to_dict() for name, result in results.items()}
+        }
         
     except Exception as exc:
         logger.error(f"Failed to update search index: {exc}")
         raise self.retry(exc=exc, countdown=300, max_retries=3)
+    finally:
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            logger.warning("Search index sync lock expired before the sync finished")
 
 @celery_app.task
 def process_data_source(data_source_id: int):
@@ -3,18 +3,27 @@ Flow execution tasks - Handle data flow processing and execution.
 Replaces Rails background job system for flow operations.
 """
 
-from celery import current_task
+from celery import current_task, group
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional
 import logging
+import time
 from datetime import datetime, timedelta
 import json
 
 from ..celery_app import celery_app
+from ..config import settings
 from ..database import SessionLocal
-from ..models.flow import Flow, FlowRun
+from ..models.flow import Flow, FlowRun, FlowNodeRun, RunStatuses
 from ..models.flow_node import FlowNode
 from ..models.user import User
+from ..services.flow_copy import copy_flow
+from ..services.flow_dag import DagRunState, LocalSlots, RedisSlots, slot_token
+from ..services.flow_readiness import completed_external
+from ..services.flow_scheduler import FlowScheduler
+from ..services.flow_validation import FlowValidator
+from ..services.latency_sketch import LatencyTracker
 
 logger = logging.getLogger(__name__)
 
@@ -22,20 +31,93 @@ logger = logging.getLogger(__name__)
 class FlowExecutor:
     """Flow execution engine for processing data flows"""
     
+    _slots = None
+    
     @staticmethod
     def get_flow_with_nodes(db: Session, flow_id: int):
-        """Get flow with its nodes (placeholder until relationships are enabled)"""
+        """Get flow with its nodes"""
         flow = db.query(Flow).filter(Flow.id == flow_id).first()
         if not flow:
             return None, []
         
-        # TODO: Get actual nodes when relationships are enabled
-        nodes = db.query(FlowNode).filter(FlowNode.org_id == flow.org_id).all()
+        nodes = db.query(FlowNode).filter(FlowNode.flow_id == flow.id).all()
         return flow, nodes
     
+    @staticmethod
+    def get_dag_rows(db: Session, flow_id: int):
+        """The flow's nodes with just what scheduling needs, in one query"""
+        table = FlowNode.__table__
+        return db.execute(
+            select(table.c.id, table.c.name, table.c.parent_node_id, table.c.depends_on_node_ids)
+            .where(table.c.flow_id == flow_id)
+        ).all()
+    
+    @classmethod
+    def org_slots(cls):
+        """Per-org node slots: shared through Redis, or in-process for eager execution"""
+        if cls._slots is None:
+            if celery_app.conf.task_always_eager:
+                cls._slots = LocalSlots(settings.FLOW_NODE_SLOT_LEASE_SECONDS)
+            else:
+                import redis
+                cls._slots = RedisSlots(redis.from_url(settings.REDIS_URL), settings.FLOW_NODE_SLOT_LEASE_SECONDS)
+        return cls._slots
+    
+    @classmethod
+    def advance_run(cls, db: Session, flow_run: FlowRun, flow: Flow, state: DagRunState) -> list:
+        """
+        Dispatch what the caps allow and finish the run when nothing is left to do.
+        
+        Returns the node ids to send to workers once the transaction commits.
+        """
+        slots = cls.org_slots()
+        batch = state.dispatch(
+            settings.FLOW_MAX_CONCURRENT_NODES,
+            lambda node_id: slots.acquire(flow.org_id, slot_token(flow_run.id, node_id), settings.ORG_MAX_CONCURRENT_NODES)
+        )
+        
+        if state.finished:
+            state.close()
+            end_time = datetime.utcnow()
+            overall_status = RunStatuses.SUCCESS if state.succeeded else RunStatuses.FAILED
+            totals = state.totals()
+            path, path_ms = state.critical_path()
+            failed_nodes = [node_id for node_id, record in state.nodes.items() if record["state"] == "failed"]
+            
+            flow_run.status = overall_status
+            flow_run.completed_at = end_time
+            if flow_run.started_at:
+                flow_run.duration_seconds = int((end_time - flow_run.started_at).total_seconds())
+            flow_run.records_processed = totals["records_processed"]
+            flow_run.records_success = totals["records_success"]
+            flow_run.records_failed = totals["records_failed"]
+            flow_run.log_data = {**(flow_run.log_data or {}), "critical_path": {"node_ids": path, "duration_ms": path_ms}}
+            if failed_nodes:
+                flow_run.error_message = f"Failed nodes: {sorted(failed_nodes)}"
+            
+            flow.last_run_at = end_time
+            flow.last_run_status = overall_status
+            if overall_status == RunStatuses.SUCCESS:
+                flow.success_count = (flow.success_count or 0) + 1
+            else:
+                flow.failure_count = (flow.failure_count or 0) + 1
+            logger.info(f"Flow {flow.id} run {flow_run.id} completed: {overall_status.value}")
+        elif state.held_back and not batch and not state.in_flight():
+            # Held back by the org cap with nothing of its own running to wake it up
+            advance_flow_run_task.apply_async((flow_run.id,), countdown=settings.FLOW_SLOT_RETRY_SECONDS)
+        
+        return batch
+    
+    @staticmethod
+    def dispatch_nodes(flow_run_id: int, node_ids: list):
+        """Send independent nodes to workers as one group"""
+        if node_ids:
+            group(execute_flow_node_task.s(flow_run_id, node_id) for node_id in node_ids).apply_async()
+    
     @staticmethod
     def execute_node(db: Session, node: FlowNode, input_data: Any = None) -> Dict[str, Any]:
         """Execute a single flow node"""
+        start = time.perf_counter()
         try:
             # Placeholder node execution logic
             result = {
@@ -43,17 +125,16 @@ class FlowExecutor:
                 "status": "success",
                 "records_processed": 100,
                 "records_output": 95,
-                "execution_time_ms": 1500,
+                "execution_time_ms": 0,
                 "output_data": {"sample": "data"},
                 "error_message": None
             }
             
             logger.info(f"Node {node.id} executed successfully")
-            return result
             
         except Exception as e:
             logger.error(f"Node {node.id} execution failed: {str(e)}")
-            return {
+            result = {
                 "node_id": node.id,
                 "status": "failed",
                 "records_processed": 0,
@@ -62,12 +143,20 @@ class FlowExecutor:
                 "output_data": None,
                 "error_message": str(e)
             }
+        
+        elapsed = time.perf_counter() - start
+        result["execution_time_ms"] = int(elapsed * 1000)
+        LatencyTracker.instance().record("flow_node", str(node.id), elapsed)
+        return result
 
 
 @celery_app.task(bind=True, name='flow.execute')
 def execute_flow_task(self, flow_run_id: int, parameters: Optional[Dict[str, Any]] = None):
     """
-    Execute a complete data flow.
+    Start a flow run: dispatch the nodes with no pending dependencies.
+    
+    Each node task dispatches what its completion makes ready, so independent
+    branches run concurrently up to the per-flow and per-org caps.
     
     Args:
         flow_run_id: ID of the FlowRun to execute
@@ -78,117 +167,174 @@ def execute_flow_task(self, flow_run_id: int, parameters: Optional[Dict[str, Any
     
     try:
         # Get flow run
-        flow_run = db.query(FlowRun).filter(FlowRun.id == flow_run_id).first()
+        flow_run = db.query(FlowRun).filter(FlowRun.id == flow_run_id).with_for_update().first()
         if not flow_run:
             raise Exception(f"FlowRun {flow_run_id} not found")
         
-        # Update run status
-        flow_run.status = "running"
-        flow_run.started_at = start_time
-        db.commit()
-        
-        # Get flow and nodes
-        flow, nodes = FlowExecutor.get_flow_with_nodes(db, flow_run.flow_id)
+        flow = db.query(Flow).filter(Flow.id == flow_run.flow_id).first()
         if not flow:
             raise Exception(f"Flow {flow_run.flow_id} not found")
         
-        # Update flow status
-        flow.last_run_status = "running"
-        db.commit()
-        
-        # Execute nodes in order (simplified execution)
-        total_records_processed = 0
-        total_records_success = 0
-        total_records_failed = 0
-        node_results = []
-        
-        for i, node in enumerate(nodes[:5]):  # Limit to 5 nodes for demo
-            # Update task progress
-            self.update_state(
-                state='PROGRESS',
-                meta={
-                    'current_node': i + 1,
-                    'total_nodes': len(nodes),
-                    'node_name': node.name,
-                    'flow_id': flow.id
-                }
-            )
-            
-            # Execute node
-            result = FlowExecutor.execute_node(db, node)
-            node_results.append(result)
-            
-            if result["status"] == "success":
-                total_records_processed += result["records_processed"]
-                total_records_success += result["records_output"]
-            else:
-                total_records_failed += result["records_processed"]
-                # Stop execution on node failure if retry_count is 0
-                if flow.retry_count == 0:
-                    break
-        
-        # Determine overall status
-        failed_nodes = [r for r in node_results if r["status"] == "failed"]
-        overall_status = "failed" if failed_nodes else "success"
-        
-        # Update flow run with results
-        end_time = datetime.utcnow()
-        duration = int((end_time - start_time).total_seconds())
-        
-        flow_run.status = overall_status
-        flow_run.completed_at = end_time
-        flow_run.duration_seconds = duration
-        flow_run.records_processed = total_records_processed
-        flow_run.records_success = total_records_success
-        flow_run.records_failed = total_records_failed
-        flow_run.log_data = {"node_results": node_results}
-        
-        if failed_nodes:
-            flow_run.error_message = f"Failed nodes: {[r['node_id'] for r in failed_nodes]}"
-        
-        # Update flow statistics
-        flow.last_run_at = end_time
-        flow.last_run_status = overall_status
-        
-        if overall_status == "success":
-            flow.success_count = (flow.success_count or 0) + 1
-        else:
-            flow.failure_count = (flow.failure_count or 0) + 1
+        # Update run and flow status
+        flow_run.status = RunStatuses.RUNNING
+        flow_run.started_at = start_time
+        flow.last_run_status = RunStatuses.RUNNING
         
+        # Upstreams in other flows are checked once, when the run starts
+        rows = FlowExecutor.get_dag_rows(db, flow.id)
+        state = DagRunState.create(
+            db, flow_run.id, rows, stop_on_failure=flow.retry_count == 0, completed_external=completed_external(db, rows)
+        )
+        batch = FlowExecutor.advance_run(db, flow_run, flow, state)
         db.commit()
         
-        logger.info(f"Flow {flow.id} execution completed: {overall_status}")
+        FlowExecutor.dispatch_nodes(flow_run_id, batch)
         
         return {
             "flow_id": flow.id,
             "flow_run_id": flow_run_id,
-            "status": overall_status,
-            "duration_seconds": duration,
-            "records_processed": total_records_processed,
-            "records_success": total_records_success,
-            "records_failed": total_records_failed,
-            "node_results": node_results
+            "status": "running" if batch else flow_run.status.value,
+            "total_nodes": len(rows),
+            "dispatched_nodes": batch
         }
         
     except Exception as e:
-        # Update flow run with error
+        db.rollback()
         error_msg = str(e)
         logger.error(f"Flow execution failed: {error_msg}")
         
-        if 'flow_run' in locals():
-            flow_run.status = "failed"
+        if 'flow_run' in locals() and flow_run is not None:
+            flow_run.status = RunStatuses.FAILED
             flow_run.completed_at = datetime.utcnow()
             flow_run.error_message = error_msg
-            if 'start_time' in locals():
-                duration = int((datetime.utcnow() - start_time).total_seconds())
-                flow_run.duration_seconds = duration
             db.commit()
         
-        if 'flow' in locals():
-            flow.last_run_status = "failed"
-            flow.failure_count = (flow.failure_count or 0) + 1
-            db.commit()
+        raise
+        
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, name='flow.execute_node')
+def execute_flow_node_task(self, flow_run_id: int, node_id: int):
+    """
+    Execute one node of a flow run, then dispatch the nodes it made ready.
+    
+    Args:
+        flow_run_id: ID of the FlowRun the node runs in
+        node_id: ID of the FlowNode to execute
+    """
+    db = SessionLocal()
+    
+    try:
+        node = db.query(FlowNode).filter(FlowNode.id == node_id).first()
+        started_at = datetime.utcnow()
+        if node:
+            result = FlowExecutor.execute_node(db, node)
+        else:
+            result = {"node_id": node_id, "status": "failed", "records_processed": 0, "records_output": 0,
+                      "error_message": f"FlowNode {node_id} not found"}
+        completed_at = datetime.utcnow()
+        
+        # Runs advance one event at a time: the row lock orders concurrent completions
+        flow_run = db.query(FlowRun).filter(FlowRun.id == flow_run_id).with_for_update().first()
+        if not flow_run:
+            raise Exception(f"FlowRun {flow_run_id} not found")
+        flow = db.query(Flow).filter(Flow.id == flow_run.flow_id).first()
+        
+        # Only this node's row and its downstream counters change; the flow is not reloaded
+        state = DagRunState(db, flow_run_id, stop_on_failure=flow.retry_count == 0)
+        if node_id not in state.in_flight():
+            # Redelivered after the run already recorded this node (acks_late)
+            db.rollback()
+            return {"flow_run_id": flow_run_id, "node_id": node_id, "status": "duplicate", "dispatched_nodes": []}
+        FlowExecutor.org_slots().release(flow.org_id, slot_token(flow_run_id, node_id))
+        state.finish(node_id, result, started_at, completed_at)
+        batch = FlowExecutor.advance_run(db, flow_run, flow, state)
+        db.commit()
+        
+        FlowExecutor.dispatch_nodes(flow_run_id, batch)
+        
+        return {"flow_run_id": flow_run_id, "node_id": node_id, "status": result["status"], "dispatched_nodes": batch}
+        
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Flow run {flow_run_id} node {node_id} failed: {str(e)}")
+        raise
+        
+    finally:
+        db.close()
+
+
+@celery_app.task(name='flow.advance_run')
+def advance_flow_run_task(flow_run_id: int):
+    """
+    Dispatch ready nodes of a run held back by the org concurrency cap.
+    
+    Args:
+        flow_run_id: ID of the FlowRun to advance
+    """
+    db = SessionLocal()
+    
+    try:
+        flow_run = db.query(FlowRun).filter(FlowRun.id == flow_run_id).with_for_update().first()
+        if not flow_run or flow_run.status != RunStatuses.RUNNING:
+            return {"flow_run_id": flow_run_id, "dispatched_nodes": []}
+        flow = db.query(Flow).filter(Flow.id == flow_run.flow_id).first()
+        
+        state = DagRunState(db, flow_run_id, stop_on_failure=flow.retry_count == 0)
+        batch = FlowExecutor.advance_run(db, flow_run, flow, state)
+        db.commit()
+        
+        FlowExecutor.dispatch_nodes(flow_run_id, batch)
+        
+        return {"flow_run_id": flow_run_id, "dispatched_nodes": batch}
         
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to advance flow run {flow_run_id}: {str(e)}")
+        raise
+        
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, name='flow.copy')
+def copy_flow_task(self, flow_node_id: int, user_id: int, org_id: Optional[int] = None,
+                   options: Optional[Dict[str, Any]] = None):
+    """
+    Copy a flow in bulk, reporting progress for large flows.
+    
+    Args:
+        flow_node_id: ID of the top node to copy (usually an origin node)
+        user_id: ID of the user owning the copy
+        org_id: Optional org of the copy (the original's when omitted)
+        options: Optional flow copy options
+    """
+    db = SessionLocal()
+    
+    def report(stage: str, done: int, total: int):
+        self.update_state(
+            state='PROGRESS',
+            meta={'stage': stage, 'done': done, 'total': total, 'flow_node_id': flow_node_id}
+        )
+    
+    try:
+        result = copy_flow(db, flow_node_id, owner_id=user_id, org_id=org_id, options=options, progress=report)
+        if result.root_node_id is None:
+            raise Exception(f"FlowNode {flow_node_id} not found")
+        db.commit()
+        
+        return {
+            "flow_node_id": flow_node_id,
+            "status": "copied",
+            "origin_node_id": result.origin_node_id,
+            "copied": result.counts
+        }
+        
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to copy flow node {flow_node_id}: {str(e)}")
         raise
         
     finally:
@@ -247,71 +393,64 @@ def stop_flow_task(flow_id: int, user_id: int):
         db.close()
 
 
+def _wake_scheduler(fire_at: datetime, until: datetime):
+    """Queue a wakeup for a fire within the tick; it is dropped once the next tick has taken over"""
+    fire_scheduled_flows.apply_async((until.isoformat(),), eta=fire_at, expires=until)
+
+
 @celery_app.task(name='flow.schedule_check')
 def check_scheduled_flows():
     """
-    Check for flows that need to be executed based on schedule.
-    This task runs periodically to handle scheduled flow execution.
+    Fire scheduled flows that are due now, and queue a wakeup for each later fire within the tick.
+    Beat runs this every FLOW_SCHEDULE_TICK_SECONDS; due flows are claimed with
+    SKIP LOCKED, so several beat instances never fire the same schedule twice.
     """
     db = SessionLocal()
     
     try:
-        # Get flows that are scheduled and due for execution
-        now = datetime.utcnow()
-        scheduled_flows = db.query(Flow).filter(
-            Flow.is_active == True,
-            Flow.schedule_type.in_(["cron", "event_driven"]),
-            Flow.next_run_at <= now
-        ).all()
+        scheduler = FlowScheduler(db, batch_size=settings.FLOW_SCHEDULE_BATCH_SIZE)
+        summary = scheduler.run(settings.FLOW_SCHEDULE_TICK_SECONDS, execute_flow_task.delay, _wake_scheduler)
         
-        executed_count = 0
-        
-        for flow in scheduled_flows:
-            try:
-                # Create new flow run
-                last_run = db.query(FlowRun).filter(
-                    FlowRun.flow_id == flow.id
-                ).order_by(FlowRun.run_number.desc()).first()
-                
-                run_number = (last_run.run_number + 1) if last_run else 1
-                
-                flow_run = FlowRun(
-                    flow_id=flow.id,
-                    run_number=run_number,
-                    status="queued",
-                    trigger_type="scheduled",
-                    created_at=now
-                )
-                
-                db.add(flow_run)
-                db.commit()
-                db.refresh(flow_run)
-                
-                # Queue flow execution
-                execute_flow_task.delay(flow_run.id)
-                
-                # Update next run time (simplified - would use actual cron logic)
-                if flow.schedule_type == "cron":
-                    flow.next_run_at = now + timedelta(hours=1)  # Simplified
-                
-                executed_count += 1
-                logger.info(f"Scheduled flow {flow.id} queued for execution")
-                
-            except Exception as e:
-                logger.error(f"Failed to schedule flow {flow.id}: {str(e)}")
-                continue
+        logger.info(
+            f"Scheduled {summary['scheduled_count']} flows for execution "
+            f"(max lag {summary['max_lag_seconds']}s, {summary['wakeups']} wakeups queued)"
+        )
+        if scheduler.unscheduled:
+            logger.warning(f"Unscheduled flows with invalid schedules: {scheduler.unscheduled}")
         
-        db.commit()
+        return summary
         
-        logger.info(f"Scheduled {executed_count} flows for execution")
+    except Exception as e:
+        logger.error(f"Failed to check scheduled flows: {str(e)}")
+        db.rollback()
+        raise
         
-        return {
-            "scheduled_count": executed_count,
-            "checked_at": now.isoformat()
-        }
+    finally:
+        db.close()
+
+
+@celery_app.task(name='flow.schedule_fire')
+def fire_scheduled_flows(until: str):
+    """
+    Fire scheduled flows due at a wakeup queued by flow.schedule_check.
+    
+    Args:
+        until: End of the tick that queued the wakeup (ISO format)
+    """
+    db = SessionLocal()
+    
+    try:
+        scheduler = FlowScheduler(db, batch_size=settings.FLOW_SCHEDULE_BATCH_SIZE)
+        summary = scheduler.fire(datetime.fromisoformat(until), execute_flow_task.delay, _wake_scheduler)
+        
+        if scheduler.unscheduled:
+            logger.warning(f"Unscheduled flows with invalid schedules: {scheduler.unscheduled}")
+        
+        return summary
         
     except Exception as e:
-        logger.error(f"Failed to check scheduled flows: {str(e)}")
+        logger.error(f"Failed to fire scheduled flows: {str(e)}")
+        db.rollback()
         raise
         
     finally:
@@ -338,7 +477,10 @@ def cleanup_old_flow_runs(days_to_keep: int = 30):
         
         count = old_runs.count()
         
-        # Delete old runs
+        # Delete old runs with their node rows
+        db.query(FlowNodeRun).filter(
+            FlowNodeRun.flow_run_id.in_(select(FlowRun.id).where(FlowRun.created_at < cutoff_date))
+        ).delete(synchronize_session=False)
         old_runs.delete(synchronize_session=False)
         db.commit()
         
@@ -359,58 +501,33 @@ def cleanup_old_flow_runs(days_to_keep: int = 30):
 
 
 @celery_app.task(name='flow.validate_all')
-def validate_all_flows():
+def validate_all_flows(force: bool = False):
     """
-    Validate all flows in the system for health monitoring.
+    Validate active flows whose definition changed since their last validation.
+    Streams definition hashes and hands changed flows to flow.validate_chunk
+    in chunks, so the run scales with the flows that changed.
     """
     db = SessionLocal()
     
     try:
-        flows = db.query(Flow).filter(Flow.is_active == True).all()
-        
-        validation_results = []
-        
-        for flow in flows:
-            try:
-                # Basic validation
-                errors = []
-                warnings = []
-                
-                if not flow.name:
-                    errors.append("Flow name is required")
-                
-                # TODO: Add more validation logic
-                
-                validation_results.append({
-                    "flow_id": flow.id,
-                    "flow_name": flow.name,
-                    "is_valid": len(errors) == 0,
-                    "errors": errors,
-                    "warnings": warnings
-                })
-                
-            except Exception as e:
-                validation_results.append({
-                    "flow_id": flow.id,
-                    "flow_name": flow.name,
-                    "is_valid": False,
-                    "errors": [f"Validation error: {str(e)}"],
-                    "warnings": []
-                })
-        
-        # Count results
-        total_flows = len(validation_results)
-        valid_flows = len([r for r in validation_results if r["is_valid"]])
-        invalid_flows = total_flows - valid_flows
-        
-        logger.info(f"Validated {total_flows} flows: {valid_flows} valid, {invalid_flows} invalid")
+        validator = FlowValidator(db)
+        chunks = 0
+        
+        for flow_ids in validator.changed_chunks(settings.FLOW_VALIDATION_CHUNK_SIZE, force):
+            validate_flow_chunk_task.delay(flow_ids)
+            chunks += 1
+        
+        logger.info(
+            f"Scanned {validator.scanned} flows: {validator.changed} changed, "
+            f"queued for validation in {chunks} chunks"
+        )
         
         return {
-            "total_flows": total_flows,
-            "valid_flows": valid_flows,
-            "invalid_flows": invalid_flows,
-            "validation_results": validation_results,
-            "validated_at": datetime.utcnow().isoformat()
+            "total_flows": validator.scanned,
+            "changed_flows": validator.changed,
+            "unchanged_flows": validator.scanned - validator.changed,
+            "chunks": chunks,
+            "checked_at": datetime.utcnow().isoformat()
         }
         
     except Exception as e:
@@ -418,4 +535,31 @@ def validate_all_flows():
         raise
         
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@celery_app.task(name='flow.validate_chunk')
+def validate_flow_chunk_task(flow_ids: list):
+    """
+    Validate a chunk of flows and store the results.
+    """
+    db = SessionLocal()
+    
+    try:
+        summary = FlowValidator(db).validate(flow_ids)
+        db.commit()
+        
+        logger.info(
+            f"Validated {summary['validated_flows']} flows: "
+            f"{summary['valid_flows']} valid, {summary['invalid_flows']} invalid"
+        )
+        
+        return summary
+        
+    except Exception as e:
+        logger.error(f"Failed to validate flows {flow_ids[:10]}: {str(e)}")
+        db.rollback()
+        raise
+        
+    finally:
+        db.close()
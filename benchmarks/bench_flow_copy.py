@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark copying a large flow into a scratch SQLite database.
+
+Compares the bulk copy engine against copying row by row (one INSERT and one
+reference UPDATE per node and resource, as the recursive flow_copy did):
+
+    python benchmarks/bench_flow_copy.py --nodes 500
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, insert, select, update
+
+from app.database import Base
+from app.models.data_set import DataSetStatuses
+from app.models.data_sink import DataSinkStatuses
+from app.models.data_source import DataSourceStatuses
+from app.models.flow_node import NodeStatuses
+from app.services import flow_copy
+
+TABLES = ("flow_nodes", "data_sources", "data_sets", "data_sinks")
+NOW = datetime(2024, 6, 1)
+
+
+def build_flow(engine, node_count):
+    """A source node feeding a binary tree of set nodes with a sink under every leaf"""
+    tables = Base.metadata.tables
+    owned = {"owner_id": 1, "org_id": 1, "created_at": NOW, "updated_at": NOW}
+    links = dict.fromkeys(("data_source_id", "data_set_id", "data_sink_id"))
+    nodes = [{**links, "id": 1, "parent_node_id": None, "data_source_id": 1}]
+    sets, sinks = [], []
+    for node_id in range(2, node_count + 1):
+        parent = node_id // 2
+        if node_id * 2 > node_count:
+            sinks.append({"id": node_id, "name": f"sink {node_id}", "connector_type": "S3",
+                          "status": DataSinkStatuses.ACTIVE, "flow_node_id": node_id, "origin_node_id": 1, **owned})
+            nodes.append({**links, "id": node_id, "parent_node_id": parent, "data_sink_id": node_id})
+        else:
+            sets.append({"id": node_id, "name": f"set {node_id}", "status": DataSetStatuses.ACTIVE,
+                         "flow_node_id": node_id, "origin_node_id": 1, **owned})
+            nodes.append({**links, "id": node_id, "parent_node_id": parent, "data_set_id": node_id})
+    with engine.begin() as conn:
+        conn.execute(insert(tables["data_sources"]), [{
+            "id": 1, "name": "source", "connector_type": "S3", "status": DataSourceStatuses.ACTIVE,
+            "flow_node_id": 1, "origin_node_id": 1, **owned
+        }])
+        conn.execute(insert(tables["data_sets"]), sets)
+        conn.execute(insert(tables["data_sinks"]), sinks)
+        conn.execute(insert(tables["flow_nodes"]), [
+            {"status": NodeStatuses.ACTIVE, "origin_node_id": 1, **owned, **node} for node in nodes
+        ])
+
+
+def copy_row_by_row(conn):
+    """The recursive copy's access pattern: every row read, inserted and re-pointed on its own"""
+    tables = Base.metadata.tables
+    nodes_table = tables["flow_nodes"]
+    copier = flow_copy.FlowCopier(conn)
+    now = datetime.now()
+    id_map = {table_name: {} for table_name in TABLES}
+    pending = [(1, None)]
+    while pending:
+        node_id, parent_copy = pending.pop()
+        node = dict(conn.execute(select(nodes_table).where(nodes_table.c.id == node_id)).mappings().one())
+        for key, table_name in flow_copy.RESOURCE_TABLES.items():
+            if node[key] is not None:
+                table = tables[table_name]
+                resource = dict(conn.execute(select(table).where(table.c.id == node[key])).mappings().one())
+                result = conn.execute(insert(table).values(**copier._copy_row(table, resource, now)))
+                id_map[table_name][node[key]] = result.inserted_primary_key[0]
+                node[key] = result.inserted_primary_key[0]
+        node["parent_node_id"] = parent_copy
+        copy_id = conn.execute(insert(nodes_table).values(**copier._copy_row(nodes_table, node, now))).inserted_primary_key[0]
+        conn.execute(update(nodes_table).where(nodes_table.c.id == copy_id).values(
+            origin_node_id=id_map["flow_nodes"].get(1, copy_id)
+        ))
+        id_map["flow_nodes"][node_id] = copy_id
+        for key, table_name in flow_copy.RESOURCE_TABLES.items():
+            if node[key] is not None:
+                table = tables[table_name]
+                conn.execute(update(table).where(table.c.id == node[key]).values(flow_node_id=copy_id))
+        children = conn.execute(select(nodes_table.c.id).where(nodes_table.c.parent_node_id == node_id)).scalars()
+        pending.extend((child, copy_id) for child in children)
+
+
+def timed(engine, func):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        func(conn)
+    elapsed = time.perf_counter() - start
+    event.remove(engine, "before_cursor_execute", listener)
+    return elapsed, len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'flow_copy.db')}")
+        Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+        build_flow(engine, args.nodes)
+
+        print(f"{'method':<14}{'mean ms':>10}{'statements':>12}")
+        for name, func in (
+            ("bulk copy", lambda conn: flow_copy.copy_flow(conn, 1)),
+            ("row by row", copy_row_by_row),
+        ):
+            runs = [timed(engine, func) for _ in range(args.repeat)]
+            mean = sum(elapsed for elapsed, _ in runs) / len(runs) * 1e3
+            print(f"{name:<14}{mean:10.1f}{runs[0][1]:12d}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
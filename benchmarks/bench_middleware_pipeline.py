@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request framework overhead of the middleware stack.
+
+Drives the raw ASGI callable (no HTTP server, no sockets) with a no-op endpoint
+so the numbers isolate what the middleware layers themselves cost:
+
+    python benchmarks/bench_middleware_pipeline.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware import (
+    RequestPipelineMiddleware,
+    RequestMetricsMiddleware,
+    RequestLoggingMiddleware,
+    AuditLoggingMiddleware,
+    ErrorHandlingMiddleware,
+    SecurityHeadersMiddleware,
+    RateLimitingMiddleware
+)
+
+CLIENT_POOL = 100
+UNLIMITED = 10 ** 9
+
+
+async def noop(request):
+    return PlainTextResponse("ok")
+
+
+def build_endpoint_app():
+    return Starlette(routes=[Route("/api/v1/flows/{flow_id}", noop)])
+
+
+def build_legacy_stack(app):
+    """Same ordering main.py used before the fused pipeline (outermost last)"""
+    app = SecurityHeadersMiddleware(app)
+    app = ErrorHandlingMiddleware(app)
+    app = AuditLoggingMiddleware(app)
+    app = RequestLoggingMiddleware(app)
+    app = RequestMetricsMiddleware(app)
+    return RateLimitingMiddleware(app, requests_per_minute=UNLIMITED)
+
+
+def build_pipeline(app, **stages):
+    return RequestPipelineMiddleware(app, requests_per_minute=UNLIMITED, **stages)
+
+
+def make_scope(i):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"/api/v1/flows/{i}",
+        "raw_path": f"/api/v1/flows/{i}".encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"localhost"),
+            (b"user-agent", b"bench/1.0"),
+            (b"accept", b"application/json"),
+            (b"authorization", b"Bearer token"),
+        ],
+        "client": (f"10.0.0.{i % CLIENT_POOL}", 50000),
+        "server": ("localhost", 8000),
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def run(app, requests):
+    """Return per-request latencies in microseconds"""
+    timings = []
+    for i in range(requests):
+        scope = make_scope(i)
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def summarize(name, timings, baseline=None):
+    timings = sorted(timings)
+    mean = statistics.fmean(timings)
+    p50 = timings[len(timings) // 2]
+    p99 = timings[int(len(timings) * 0.99)]
+    overhead = f"{mean - baseline:9.1f}" if baseline is not None else f"{'-':>9}"
+    print(f"{name:<34}{mean:9.1f}{p50:9.1f}{p99:9.1f}{overhead}")
+    return mean
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--warmup", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    variants = [
+        ("no middleware", build_endpoint_app()),
+        ("legacy stack (6 layers)", build_legacy_stack(build_endpoint_app())),
+        ("fused pipeline, all stages", build_pipeline(build_endpoint_app())),
+        ("fused pipeline, no stages", build_pipeline(
+            build_endpoint_app(),
+            security_headers=False, error_handling=False, audit_logging=False,
+            request_logging=False, metrics=False, rate_limiting=False
+        )),
+    ]
+
+    loop = asyncio.new_event_loop()
+    print(f"{'variant':<34}{'mean us':>9}{'p50 us':>9}{'p99 us':>9}{'+us':>9}")
+    baseline = None
+    for name, app in variants:
+        loop.run_until_complete(run(app, args.warmup))
+        mean = summarize(name, loop.run_until_complete(run(app, args.requests)), baseline)
+        if baseline is None:
+            baseline = mean
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark related-dataset lookups over synthetic data sets.
+
+Compares the MinHash/LSH index against scoring every data set of the org
+(what CatalogService did per request), and reports how much of the exact
+top-k similarity the index recovers:
+
+    python benchmarks/bench_related_datasets.py --datasets 100000
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.related_index import RelatedIndex, jaccard
+
+FIELD_VOCABULARY = 3000
+TAG_VOCABULARY = 300
+# Data sets are variations of a family's schema and tags, as copies and versions of one feed are
+FAMILIES = 5000
+
+
+def synthetic_datasets(count, seed=1):
+    """Yield (id, values) for count data sets in one org"""
+    rng = random.Random(seed)
+    fields = [f"field_{i}" for i in range(FIELD_VOCABULARY)]
+    tags = [f"tag{i}" for i in range(TAG_VOCABULARY)]
+    families = [(rng.sample(fields, 10), rng.sample(tags, 2)) for _ in range(FAMILIES)]
+    for i in range(count):
+        family_fields, family_tags = families[i % FAMILIES]
+        names = family_fields[:rng.randint(7, 10)] + rng.sample(fields, rng.randint(0, 2))
+        yield i + 1, {
+            "org_id": 1,
+            "data_source_id": None,
+            "tags": family_tags + [rng.choice(tags)],
+            "output_schema": {"properties": {name: {"type": "string"} for name in names}}
+        }
+
+
+def build_index(count):
+    index = RelatedIndex()
+    for dataset_id, values in synthetic_datasets(count):
+        index.apply(dataset_id, values)
+    return index
+
+
+def scan(index, dataset_id, limit):
+    """Exact top-k by scoring every other data set of the org"""
+    features = index._entries[dataset_id].features
+    scored = (
+        (jaccard(features, entry.features), other)
+        for other, entry in index._entries.items() if other != dataset_id
+    )
+    return [other for score, other in sorted(scored, reverse=True)[:limit] if score > 0]
+
+
+def timed(func, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        timings.append((time.perf_counter() - start) * 1e3)
+    return timings
+
+
+def summarize(name, timings):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2]
+    p99 = timings[int(len(timings) * 0.99)]
+    print(f"{name:<14}{statistics.fmean(timings):10.3f}{p50:10.3f}{p99:10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--datasets", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--scans", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    start = time.perf_counter()
+    index = build_index(args.datasets)
+    build_seconds = time.perf_counter() - start
+    print(f"indexed {len(index)} data sets in {build_seconds:.1f}s "
+          f"({build_seconds / len(index) * 1e6:.0f} us each), {index.stats()['buckets']} buckets")
+
+    rng = random.Random(2)
+    lookups = [rng.randint(1, args.datasets) for _ in range(args.lookups)]
+    scans = lookups[:args.scans]
+
+    print(f"{'method':<14}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    summarize("lsh index", timed(lambda query: index.related(query, args.limit), lookups))
+    summarize("full scan", timed(lambda query: scan(index, query, args.limit), scans))
+
+    # Share of the exact top-k similarity recovered; ties make id overlap misleading
+    found = exact = 0.0
+    for query in scans:
+        features = index._entries[query].features
+        exact += sum(jaccard(features, index._entries[other].features) for other in scan(index, query, args.limit))
+        found += sum(related.score for related in index.related(query, args.limit))
+    print(f"similarity recall@{args.limit}: {found / exact:.3f}" if exact else "no similar data sets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Run a load-test scenario against the real app, in-process.
+
+Seeds a temporary SQLite database and in-memory Redis, then replays the
+scenario through the full ASGI stack and reports per-step throughput and
+latency percentiles:
+
+    python benchmarks/load_test.py benchmarks/loadtest/scenarios/list_flows.json --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from benchmarks.loadtest import LoadTestBackend, Scenario, run_scenario
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scenarios", nargs="+", help="Scenario JSON files")
+    parser.add_argument("--concurrency", type=int, help="Virtual users (overrides the scenario)")
+    parser.add_argument("--duration", type=float, help="Seconds per scenario (overrides the scenario)")
+    parser.add_argument("--iterations", type=int, help="Loops per virtual user (overrides the scenario)")
+    parser.add_argument("--database-url", help="Seed this database instead of a temporary SQLite file")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for request parameters")
+    parser.add_argument("--json", dest="json_path", help="Also write the reports to this JSON file")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Keep the per-client rate limiter on (off by default: it caps each virtual user)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    settings.RATE_LIMIT_ENABLED = settings.RATE_LIMIT_ENABLED and args.rate_limit
+    from app.main import app
+
+    reports = []
+    for path in args.scenarios:
+        scenario = Scenario.load(path)
+        backend = LoadTestBackend(args.database_url)
+        backend.install(app)
+        try:
+            started = time.perf_counter()
+            users = backend.seed(scenario.seed)
+            print(f"Seeded {len(users)} users for {scenario.name} in {time.perf_counter() - started:.1f}s")
+            report = asyncio.run(run_scenario(
+                scenario, app, users,
+                concurrency=args.concurrency,
+                duration_seconds=args.duration,
+                iterations=args.iterations,
+                seed=args.seed
+            ))
+        finally:
+            backend.uninstall(app)
+        print(report.format_table())
+        print()
+        reports.append(report.to_dict())
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+In-process load-test harness.
+Drives the real FastAPI app through httpx's ASGI transport against a seeded
+SQLite database and in-memory Redis, replaying declarative JSON scenarios.
+"""
+
+from .backend import LoadTestBackend
+from .fake_redis import FakeRedis
+from .runner import LoadReport, run_scenario
+from .scenario import Scenario, SeedSpec, SeededUser, Step
+
+__all__ = [
+    "LoadTestBackend",
+    "FakeRedis",
+    "LoadReport",
+    "run_scenario",
+    "Scenario",
+    "SeedSpec",
+    "SeededUser",
+    "Step",
+]
@@ -0,0 +1,183 @@
+"""
+Load-test backend - Seeded SQLite database and in-memory Redis for the real app.
+Installs itself through FastAPI dependency overrides and by swapping the
+module-level Redis clients, and restores everything on uninstall.
+"""
+
+import os
+import tempfile
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth import create_access_token, get_password_hash
+from app.config import settings
+from app.database import Base, SessionLocal, get_db
+from app.models.org_membership import MembershipRoles
+from app.services.caching_service import cache_manager
+from app.services.monitoring_service import monitoring_service
+from app.services.search_index import SearchIndex
+
+from .fake_redis import FakeRedis
+from .scenario import SeedSpec, SeededUser
+
+RESOURCE_TABLES = {
+    "flows": "flow_nodes",
+    "data_sources": "data_sources",
+    "data_sets": "data_sets",
+}
+
+SEED_WORDS = ("orders", "customers", "events", "billing", "inventory", "clicks", "sensors", "payments")
+
+
+class LoadTestBackend:
+    """
+    Database and Redis the app talks to during a load run.
+
+    Uses a temporary SQLite file (not :memory:) so requests served from the
+    threadpool get their own connections, as they would against MySQL.
+    """
+
+    def __init__(self, database_url: Optional[str] = None):
+        self._tempdir = None
+        if database_url is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix="admin_api_load_")
+            database_url = f"sqlite:///{os.path.join(self._tempdir.name, 'load.db')}"
+        self.database_url = database_url
+        self.engine: Engine = create_engine(database_url, connect_args={"check_same_thread": False})
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.redis = FakeRedis()
+        self._saved: Dict[str, Any] = {}
+
+    def _get_db(self):
+        db = self.session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def install(self, app: Any):
+        """Create the schema and point the app's database and Redis at this backend"""
+        Base.metadata.create_all(bind=self.engine)
+        self._saved = {
+            "session_bind": SessionLocal.kw.get("bind"),
+            "cache_redis": cache_manager.redis_client,
+            "monitoring_redis": monitoring_service.redis_client,
+        }
+        app.dependency_overrides[get_db] = self._get_db
+        SessionLocal.configure(bind=self.engine)
+        cache_manager.redis_client = self.redis
+        monitoring_service.redis_client = self.redis
+        if settings.SEARCH_INDEX_ENABLED:
+            SearchIndex.instance().install_session_hooks()
+
+    def uninstall(self, app: Any):
+        app.dependency_overrides.pop(get_db, None)
+        if self._saved:
+            SessionLocal.configure(bind=self._saved["session_bind"])
+            cache_manager.redis_client = self._saved["cache_redis"]
+            monitoring_service.redis_client = self._saved["monitoring_redis"]
+            self._saved = {}
+        SearchIndex.instance().clear()
+        self.engine.dispose()
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
+
+    def seed(self, spec: SeedSpec) -> List[SeededUser]:
+        """
+        Insert orgs, users, memberships and owned resources with bulk Core inserts.
+
+        Returns:
+            One SeededUser per user, with an access token and owned resource ids
+        """
+        tables = Base.metadata.tables
+        now = datetime.utcnow()
+        timestamps = {"created_at": now, "updated_at": now}
+        # Hash once: every seeded user shares the scenario password
+        password_digest = get_password_hash(spec.password)
+        seeded: List[SeededUser] = []
+
+        with self.engine.begin() as conn:
+            for org_index in range(spec.orgs):
+                users = [
+                    {
+                        "email": f"load{org_index}-{user_index}@loadtest.example.com",
+                        "full_name": f"Load User {org_index}-{user_index}",
+                        "password_digest": password_digest,
+                        "status": "ACTIVE",
+                        **timestamps
+                    }
+                    for user_index in range(spec.users_per_org)
+                ]
+                conn.execute(insert(tables["users"]), users)
+                emails = [user["email"] for user in users]
+                user_ids = conn.execute(
+                    select(tables["users"].c.id, tables["users"].c.email).where(tables["users"].c.email.in_(emails))
+                ).all()
+                ids_by_email = {email: user_id for user_id, email in user_ids}
+                owner_id = ids_by_email[emails[0]]
+
+                org_id = conn.execute(insert(tables["orgs"]).values(
+                    name=f"Load Org {org_index}", owner_id=owner_id, **timestamps
+                )).inserted_primary_key[0]
+                conn.execute(
+                    tables["users"].update().where(tables["users"].c.id.in_(ids_by_email.values())),
+                    {"default_org_id": org_id}
+                )
+                conn.execute(insert(tables["org_memberships"]), [
+                    {
+                        "user_id": user_id,
+                        "org_id": org_id,
+                        "role": MembershipRoles.ADMIN if user_id == owner_id else MembershipRoles.USER,
+                        **timestamps
+                    }
+                    for user_id in ids_by_email.values()
+                ])
+
+                for email in emails:
+                    user_id = ids_by_email[email]
+                    seeded.append(SeededUser(
+                        id=user_id,
+                        email=email,
+                        password=spec.password,
+                        org_id=org_id,
+                        token=create_access_token(SimpleNamespace(id=user_id, email=email, default_org_id=org_id)),
+                        resources=self._seed_resources(conn, spec, user_id, org_id, timestamps)
+                    ))
+
+        if settings.SEARCH_INDEX_ENABLED:
+            # The app's startup hook rebuilds from its own engine, which is not this one
+            SearchIndex.instance().rebuild(self.engine)
+        return seeded
+
+    def _seed_resources(self, conn, spec: SeedSpec, user_id: int, org_id: int, timestamps: Dict[str, Any]) -> Dict[str, List[int]]:
+        counts = {
+            "flows": spec.flows_per_user,
+            "data_sources": spec.data_sources_per_user,
+            "data_sets": spec.data_sets_per_user,
+        }
+        resources = {}
+        for resource, count in counts.items():
+            table = Base.metadata.tables[RESOURCE_TABLES[resource]]
+            if count <= 0:
+                resources[resource] = []
+                continue
+            prefix = f"load-{user_id}-{resource}"
+            conn.execute(insert(table), [
+                {
+                    "name": f"{prefix}-{i} {SEED_WORDS[i % len(SEED_WORDS)]}",
+                    "description": f"Seeded {resource[:-1].replace('_', ' ')} for {SEED_WORDS[(i + user_id) % len(SEED_WORDS)]}",
+                    "owner_id": user_id,
+                    "org_id": org_id,
+                    **timestamps
+                }
+                for i in range(count)
+            ])
+            resources[resource] = list(conn.execute(
+                select(table.c.id).where(table.c.owner_id == user_id, table.c.name.like(f"{prefix}-%"))
+            ).scalars())
+        return resources
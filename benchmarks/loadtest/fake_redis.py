@@ -0,0 +1,250 @@
+"""
+In-memory stand-in for the redis-py client used by the load harness.
+Covers the string, hash, list, set and key commands the app issues so
+cache and monitoring code paths run without a Redis server.
+"""
+
+import fnmatch
+import time
+from threading import RLock
+from typing import Any, Dict, List, Optional
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    return str(value).encode()
+
+
+class FakeRedis:
+    """Thread-safe dict-backed Redis with key expiry"""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = RLock()
+
+    def _key(self, key: Any) -> str:
+        return key.decode() if isinstance(key, bytes) else str(key)
+
+    def _live(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            return False
+        return key in self._data
+
+    def _get_container(self, key: Any, factory):
+        key = self._key(key)
+        if not self._live(key):
+            self._data[key] = factory()
+        return self._data[key]
+
+    # Connection
+    def ping(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    # Keys
+    def exists(self, *keys) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._live(self._key(key)))
+
+    def delete(self, *keys) -> int:
+        with self._lock:
+            removed = 0
+            for key in map(self._key, keys):
+                if self._live(key):
+                    del self._data[key]
+                    removed += 1
+                self._expires.pop(key, None)
+            return removed
+
+    def expire(self, key, seconds) -> bool:
+        with self._lock:
+            key = self._key(key)
+            if not self._live(key):
+                return False
+            self._expires[key] = time.monotonic() + float(seconds)
+            return True
+
+    def ttl(self, key) -> int:
+        with self._lock:
+            key = self._key(key)
+            if not self._live(key):
+                return -2
+            deadline = self._expires.get(key)
+            return -1 if deadline is None else int(deadline - time.monotonic())
+
+    def keys(self, pattern: Any = "*") -> List[bytes]:
+        pattern = self._key(pattern)
+        with self._lock:
+            return [key.encode() for key in list(self._data) if self._live(key) and fnmatch.fnmatchcase(key, pattern)]
+
+    def scan_iter(self, match: Any = "*", count: Optional[int] = None):
+        return iter(self.keys(match))
+
+    # Strings
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            key = self._key(key)
+            return self._data[key] if self._live(key) else None
+
+    def mget(self, keys, *args) -> List[Optional[bytes]]:
+        keys = list(keys) if isinstance(keys, (list, tuple)) else [keys, *args]
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, px=None, nx=False, xx=False) -> Optional[bool]:
+        with self._lock:
+            key = self._key(key)
+            present = self._live(key)
+            if (nx and present) or (xx and not present):
+                return None
+            self._data[key] = _encode(value)
+            self._expires.pop(key, None)
+            if ex is not None:
+                self._expires[key] = time.monotonic() + float(ex.total_seconds() if hasattr(ex, "total_seconds") else ex)
+            elif px is not None:
+                self._expires[key] = time.monotonic() + float(px) / 1000
+            return True
+
+    def setex(self, key, time_seconds, value) -> bool:
+        return self.set(key, value, ex=time_seconds)
+
+    def incrby(self, key, amount: int = 1) -> int:
+        with self._lock:
+            key = self._key(key)
+            value = int(self._data[key]) + amount if self._live(key) else amount
+            self._data[key] = _encode(value)
+            return value
+
+    def incr(self, key, amount: int = 1) -> int:
+        return self.incrby(key, amount)
+
+    def decr(self, key, amount: int = 1) -> int:
+        return self.incrby(key, -amount)
+
+    # Hashes
+    def hset(self, name, key=None, value=None, mapping=None) -> int:
+        with self._lock:
+            hash_ = self._get_container(name, dict)
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            added = sum(1 for field in items if _encode(field) not in hash_)
+            hash_.update({_encode(field): _encode(val) for field, val in items.items()})
+            return added
+
+    def hget(self, name, key) -> Optional[bytes]:
+        with self._lock:
+            return self._get_container(name, dict).get(_encode(key))
+
+    def hgetall(self, name) -> Dict[bytes, bytes]:
+        with self._lock:
+            return dict(self._get_container(name, dict))
+
+    def hincrby(self, name, key, amount: int = 1) -> int:
+        with self._lock:
+            hash_ = self._get_container(name, dict)
+            value = int(hash_.get(_encode(key), 0)) + amount
+            hash_[_encode(key)] = _encode(value)
+            return value
+
+    def hdel(self, name, *keys) -> int:
+        with self._lock:
+            hash_ = self._get_container(name, dict)
+            return sum(1 for key in keys if hash_.pop(_encode(key), None) is not None)
+
+    # Lists
+    def lpush(self, name, *values) -> int:
+        with self._lock:
+            list_ = self._get_container(name, list)
+            for value in values:
+                list_.insert(0, _encode(value))
+            return len(list_)
+
+    def rpush(self, name, *values) -> int:
+        with self._lock:
+            list_ = self._get_container(name, list)
+            list_.extend(_encode(value) for value in values)
+            return len(list_)
+
+    def lrange(self, name, start: int, end: int) -> List[bytes]:
+        with self._lock:
+            list_ = self._get_container(name, list)
+            return list_[start:None if end == -1 else end + 1]
+
+    def ltrim(self, name, start: int, end: int) -> bool:
+        with self._lock:
+            list_ = self._get_container(name, list)
+            list_[:] = list_[start:None if end == -1 else end + 1]
+            return True
+
+    def llen(self, name) -> int:
+        with self._lock:
+            return len(self._get_container(name, list))
+
+    # Sets
+    def sadd(self, name, *values) -> int:
+        with self._lock:
+            set_ = self._get_container(name, set)
+            before = len(set_)
+            set_.update(_encode(value) for value in values)
+            return len(set_) - before
+
+    def srem(self, name, *values) -> int:
+        with self._lock:
+            set_ = self._get_container(name, set)
+            before = len(set_)
+            set_.difference_update(_encode(value) for value in values)
+            return before - len(set_)
+
+    def smembers(self, name) -> set:
+        with self._lock:
+            return set(self._get_container(name, set))
+
+    # Pub/sub
+    def publish(self, channel, message) -> int:
+        return 0
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Buffers commands and runs them on execute()"""
+
+    def __init__(self, client: FakeRedis):
+        self._client = client
+        self.command_stack: List[tuple] = []
+
+    def __getattr__(self, name: str):
+        command = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self.command_stack.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.command_stack = []
+
+    def execute(self) -> List[Any]:
+        with self._client._lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self.command_stack]
+        self.command_stack = []
+        return results
@@ -0,0 +1,213 @@
+"""
+Load runner - Replays a scenario against an ASGI app at fixed concurrency.
+Virtual users are asyncio tasks sharing the app's event loop; latencies are
+collected per step into DDSketches for throughput and percentile reports.
+"""
+
+import asyncio
+import random
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, List
+
+import httpx
+
+from app.services.latency_sketch import DDSketch, summarize
+
+from .scenario import Scenario, Step, SeededUser, render, extract
+
+
+class StepStats:
+    """Latency and status counts for one scenario step"""
+
+    def __init__(self, step: Step):
+        self.step = step
+        self.sketch = DDSketch()
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.sample_error: Optional[str] = None
+
+    def record(self, seconds: float, status: Any, error: bool, detail: Optional[str] = None):
+        self.sketch.add(seconds)
+        self.statuses[str(status)] += 1
+        if error:
+            self.errors += 1
+            if self.sample_error is None and detail:
+                self.sample_error = detail[:300]
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        summary = summarize(self.sketch)
+        return {
+            "step": self.step.name,
+            "route": f"{self.step.method.upper()} {self.step.path}",
+            "requests": summary.pop("count"),
+            "errors": self.errors,
+            "throughput_rps": round(self.sketch.count / elapsed, 2) if elapsed > 0 else None,
+            "statuses": dict(self.statuses),
+            **summary,
+            "sample_error": self.sample_error
+        }
+
+
+class LoadReport:
+    """Results of one scenario run"""
+
+    def __init__(self, scenario: Scenario, concurrency: int):
+        self.scenario = scenario
+        self.concurrency = concurrency
+        self.steps = {step.name: StepStats(step) for step in scenario.steps}
+        self.elapsed = 0.0
+
+    @property
+    def total_requests(self) -> int:
+        return sum(stats.sketch.count for stats in self.steps.values())
+
+    @property
+    def total_errors(self) -> int:
+        return sum(stats.errors for stats in self.steps.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        overall = DDSketch()
+        for stats in self.steps.values():
+            overall.merge(stats.sketch)
+        summary = summarize(overall)
+        summary.pop("count")
+        return {
+            "scenario": self.scenario.name,
+            "concurrency": self.concurrency,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "requests": self.total_requests,
+            "errors": self.total_errors,
+            "throughput_rps": round(self.total_requests / self.elapsed, 2) if self.elapsed > 0 else None,
+            **summary,
+            "steps": [stats.to_dict(self.elapsed) for stats in self.steps.values()]
+        }
+
+    def format_table(self) -> str:
+        report = self.to_dict()
+        lines = [
+            f"{report['scenario']}: {report['requests']} requests, {report['errors']} errors, "
+            f"{report['throughput_rps']} req/s at concurrency {report['concurrency']} "
+            f"over {report['elapsed_seconds']}s",
+            f"{'step':<28}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses"
+        ]
+        for row in report["steps"]:
+            lines.append(
+                f"{row['step']:<28}{row['requests']:>9}{row['errors']:>8}{_fmt(row['throughput_rps']):>9}"
+                f"{_fmt(row['p50_ms']):>9}{_fmt(row['p95_ms']):>9}{_fmt(row['p99_ms']):>9}  "
+                + " ".join(f"{status}:{count}" for status, count in sorted(row["statuses"].items()))
+            )
+        for row in report["steps"]:
+            if row["sample_error"]:
+                lines.append(f"  {row['step']}: {row['sample_error']}")
+        return "\n".join(lines)
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def asgi_client(app: Any, index: int) -> httpx.AsyncClient:
+    """In-process client with its own client address, so per-client rate limits apply per virtual user"""
+    transport = httpx.ASGITransport(
+        app=app,
+        raise_app_exceptions=False,
+        client=(f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}", 50000 + index % 10000)
+    )
+    return httpx.AsyncClient(transport=transport, base_url="http://loadtest")
+
+
+async def run_scenario(
+    scenario: Scenario,
+    app: Any,
+    users: List[SeededUser],
+    concurrency: Optional[int] = None,
+    duration_seconds: Optional[float] = None,
+    iterations: Optional[int] = None,
+    seed: int = 0
+) -> LoadReport:
+    """
+    Run a scenario and collect per-step statistics.
+
+    Args:
+        scenario: Steps to replay
+        app: ASGI application driven in-process
+        users: Seeded users; virtual users are assigned round-robin
+        concurrency: Virtual users (defaults to the scenario's)
+        duration_seconds: Stop after this long (overrides the scenario)
+        iterations: Loops per virtual user (overrides the scenario)
+        seed: Random seed for placeholder choices
+
+    Returns:
+        LoadReport with throughput and latency percentiles per step
+    """
+    if not users:
+        raise ValueError("At least one seeded user is required")
+    concurrency = concurrency or scenario.concurrency
+    if duration_seconds is None and iterations is None:
+        duration_seconds, iterations = scenario.duration_seconds, scenario.iterations
+    report = LoadReport(scenario, concurrency)
+    think_time = scenario.think_time_ms / 1000
+
+    start = time.perf_counter()
+    deadline = start + duration_seconds if duration_seconds is not None else None
+
+    def finished(iteration: int) -> bool:
+        if iterations is not None and iteration >= iterations:
+            return True
+        return deadline is not None and time.perf_counter() >= deadline
+
+    async def virtual_user(index: int):
+        user = users[index % len(users)]
+        variables = SimpleNamespace(token=user.token)
+        rng = random.Random(seed * 100003 + index)
+        iteration = 0
+        async with asgi_client(app, index) as client:
+            while not finished(iteration):
+                for step in scenario.steps:
+                    if step.once and iteration > 0:
+                        continue
+                    await _execute(client, step, user, variables, rng, report.steps[step.name])
+                    if think_time:
+                        await asyncio.sleep(think_time)
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        break
+                iteration += 1
+
+    await asyncio.gather(*(virtual_user(index) for index in range(concurrency)))
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+async def _execute(client: httpx.AsyncClient, step: Step, user: SeededUser, variables: SimpleNamespace,
+                   rng: random.Random, stats: StepStats):
+    for name, value in step.vars.items():
+        setattr(variables, name, render(value, user, variables, rng))
+    headers = {}
+    if step.auth and getattr(variables, "token", None):
+        headers["Authorization"] = f"Bearer {variables.token}"
+    request = {
+        "params": render(step.params, user, variables, rng) or None,
+        "headers": headers
+    }
+    if step.json is not None:
+        request["json"] = render(step.json, user, variables, rng)
+
+    started = time.perf_counter()
+    try:
+        response = await client.request(step.method.upper(), render(step.path, user, variables, rng), **request)
+    except Exception as e:
+        stats.record(time.perf_counter() - started, type(e).__name__, True, str(e))
+        return
+    elapsed = time.perf_counter() - started
+    error = step.is_error(response.status_code)
+    stats.record(elapsed, response.status_code, error, response.text if error else None)
+
+    if step.extract and response.status_code < 400:
+        try:
+            body = response.json()
+        except ValueError:
+            return
+        for name, path in step.extract.items():
+            setattr(variables, name, extract(body, path))
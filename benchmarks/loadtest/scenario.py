@@ -0,0 +1,128 @@
+"""
+Declarative load-test scenarios.
+A scenario is a JSON file naming the data to seed and the requests each
+virtual user repeats, with placeholders filled from that user's seeded data.
+"""
+
+import json
+import random
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, List
+
+
+@dataclass
+class SeedSpec:
+    """How much data to seed before the run"""
+    orgs: int = 1
+    users_per_org: int = 10
+    flows_per_user: int = 20
+    data_sources_per_user: int = 5
+    data_sets_per_user: int = 5
+    password: str = "load-test-password"
+
+
+@dataclass
+class Step:
+    """
+    One request in a virtual user's loop.
+
+    `vars` are rendered before the request (e.g. {"flow_id": {"$choice": "flows"}})
+    and `extract` copies response fields into vars after it.
+    """
+    name: str
+    method: str
+    path: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    json: Any = None
+    vars: Dict[str, Any] = field(default_factory=dict)
+    auth: bool = True
+    once: bool = False
+    extract: Dict[str, str] = field(default_factory=dict)
+    expect_status: List[int] = field(default_factory=list)
+
+    def is_error(self, status_code: int) -> bool:
+        if self.expect_status:
+            return status_code not in self.expect_status
+        return status_code >= 400
+
+
+@dataclass
+class Scenario:
+    """
+    Requests replayed by every virtual user, in order, until the run ends.
+
+    The run ends after duration_seconds or after each virtual user has
+    completed `iterations` loops, whichever is configured.
+    """
+    name: str
+    steps: List[Step]
+    description: str = ""
+    concurrency: int = 10
+    duration_seconds: Optional[float] = None
+    iterations: Optional[int] = None
+    think_time_ms: float = 0.0
+    seed: SeedSpec = field(default_factory=SeedSpec)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Scenario":
+        data = dict(data)
+        steps = [Step(**step) for step in data.pop("steps")]
+        if not steps:
+            raise ValueError("A scenario needs at least one step")
+        seed = SeedSpec(**data.pop("seed", {}))
+        scenario = cls(steps=steps, seed=seed, **data)
+        if scenario.duration_seconds is None and scenario.iterations is None:
+            scenario.iterations = 1
+        return scenario
+
+    @classmethod
+    def load(cls, path: str) -> "Scenario":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+@dataclass
+class SeededUser:
+    """A seeded user and the ids of the resources it owns"""
+    id: int
+    email: str
+    password: str
+    org_id: Optional[int] = None
+    token: Optional[str] = None
+    resources: Dict[str, List[int]] = field(default_factory=dict)
+
+
+def render(value: Any, user: SeededUser, variables: SimpleNamespace, rng: random.Random) -> Any:
+    """
+    Fill placeholders in a step's path, params or body.
+
+    Strings are formatted with `user` and `vars` ("{user.email}",
+    "/flows/{vars.flow_id}"). {"$choice": "flows"} picks one of the user's
+    seeded ids; {"$sample": "flows", "count": 5} picks several.
+    """
+    if isinstance(value, str):
+        return value.format(user=user, vars=variables) if "{" in value else value
+    if isinstance(value, list):
+        return [render(item, user, variables, rng) for item in value]
+    if isinstance(value, dict):
+        if "$choice" in value:
+            ids = user.resources.get(value["$choice"]) or [0]
+            return rng.choice(ids)
+        if "$sample" in value:
+            ids = user.resources.get(value["$sample"], [])
+            return rng.sample(ids, min(int(value.get("count", 1)), len(ids)))
+        return {key: render(item, user, variables, rng) for key, item in value.items()}
+    return value
+
+
+def extract(body: Any, path: str) -> Any:
+    """Read a dotted path ("access_token", "results.0.resource_id") from a JSON body"""
+    for part in path.split("."):
+        if isinstance(body, list):
+            body = body[int(part)] if part.isdigit() and int(part) < len(body) else None
+        elif isinstance(body, dict):
+            body = body.get(part)
+        else:
+            return None
+    return body
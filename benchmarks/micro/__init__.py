@@ -0,0 +1,40 @@
+"""
+Micro-benchmarks for hot paths, with JSON baselines and regression comparison.
+See benchmarks/micro_bench.py for the command-line entry point.
+"""
+
+from .harness import (
+    BENCHMARKS,
+    BenchmarkResult,
+    benchmark,
+    measure,
+    run_benchmarks,
+    save_results,
+    load_results,
+    format_results
+)
+from .compare import (
+    Comparison,
+    mann_whitney_u,
+    compare_result,
+    compare_runs,
+    environment_mismatches,
+    format_comparison
+)
+
+__all__ = [
+    "BENCHMARKS",
+    "BenchmarkResult",
+    "benchmark",
+    "measure",
+    "run_benchmarks",
+    "save_results",
+    "load_results",
+    "format_results",
+    "Comparison",
+    "mann_whitney_u",
+    "compare_result",
+    "compare_runs",
+    "environment_mismatches",
+    "format_comparison",
+]
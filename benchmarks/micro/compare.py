@@ -0,0 +1,168 @@
+"""
+Baseline comparison - Flags statistically significant changes between runs.
+A benchmark counts as slower only when a Mann-Whitney U test rejects "same
+distribution" and the median moved by more than a practical threshold.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Sequence, Tuple
+
+from .harness import BenchmarkResult, format_ns
+
+SLOWER = "slower"
+FASTER = "faster"
+UNCHANGED = "unchanged"
+NEW = "new"
+MISSING = "missing"
+ERROR = "error"
+
+# Fields of the run metadata that must match for timings to be comparable
+ENVIRONMENT_KEYS = ("python", "implementation", "machine", "processor", "cpu_count")
+
+
+def mann_whitney_u(a: Sequence[float], b: Sequence[float]) -> Tuple[float, float]:
+    """
+    Two-sided Mann-Whitney U test using the normal approximation.
+
+    Ties get average ranks and the variance is tie-corrected, with a
+    continuity correction; accurate enough for the 10+ samples per side the
+    harness collects.
+
+    Returns:
+        (U statistic for `a`, two-sided p-value)
+    """
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        raise ValueError("Both samples must be non-empty")
+
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        average_rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = average_rank
+        tied = j - i + 1
+        tie_term += tied ** 3 - tied
+        i = j + 1
+
+    rank_sum_a = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+
+    n = n1 + n2
+    mean_u = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        # Every value identical: no evidence of a difference
+        return u, 1.0
+    z = (abs(u - mean_u) - 0.5) / math.sqrt(variance)
+    p_value = math.erfc(max(z, 0.0) / math.sqrt(2))
+    return u, min(p_value, 1.0)
+
+
+@dataclass
+class Comparison:
+    """How one benchmark moved between a baseline and a current run"""
+    name: str
+    status: str
+    baseline_ns: Optional[float] = None
+    current_ns: Optional[float] = None
+    change: Optional[float] = None
+    p_value: Optional[float] = None
+    detail: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "baseline_median_ns": self.baseline_ns,
+            "current_median_ns": self.current_ns,
+            "change": None if self.change is None else round(self.change, 4),
+            "p_value": None if self.p_value is None else round(self.p_value, 6),
+            "detail": self.detail
+        }
+
+
+def compare_result(
+    baseline: BenchmarkResult,
+    current: BenchmarkResult,
+    threshold: float = 0.05,
+    alpha: float = 0.01
+) -> Comparison:
+    """
+    Compare one benchmark's samples against its baseline.
+
+    Args:
+        baseline: Samples from the baseline run
+        current: Samples from the current run
+        threshold: Relative median change below which a difference is ignored
+        alpha: Significance level for the Mann-Whitney U test
+
+    Returns:
+        Comparison with status slower, faster, unchanged or error
+    """
+    name = current.name
+    if baseline.error or current.error or not baseline.samples or not current.samples:
+        return Comparison(name=name, status=ERROR, detail=current.error or baseline.error or "no samples")
+
+    change = current.median / baseline.median - 1 if baseline.median else 0.0
+    _, p_value = mann_whitney_u(baseline.samples, current.samples)
+    status = UNCHANGED
+    if p_value < alpha and abs(change) > threshold:
+        status = SLOWER if change > 0 else FASTER
+    return Comparison(
+        name=name,
+        status=status,
+        baseline_ns=baseline.median,
+        current_ns=current.median,
+        change=change,
+        p_value=p_value
+    )
+
+
+def compare_runs(
+    baseline: Dict[str, BenchmarkResult],
+    current: Dict[str, BenchmarkResult],
+    threshold: float = 0.05,
+    alpha: float = 0.01
+) -> List[Comparison]:
+    """Compare every benchmark present in either run"""
+    comparisons = []
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline:
+            comparisons.append(Comparison(name=name, status=NEW, current_ns=current[name].median))
+        elif name not in current:
+            comparisons.append(Comparison(name=name, status=MISSING, baseline_ns=baseline[name].median))
+        else:
+            comparisons.append(compare_result(baseline[name], current[name], threshold, alpha))
+    return comparisons
+
+
+def environment_mismatches(baseline_meta: Dict[str, Any], current_meta: Dict[str, Any]) -> List[str]:
+    """Metadata fields that differ between runs, e.g. a baseline recorded on another machine"""
+    return [
+        f"{key}: {baseline_meta.get(key)} -> {current_meta.get(key)}"
+        for key in ENVIRONMENT_KEYS
+        if key in baseline_meta and baseline_meta.get(key) != current_meta.get(key)
+    ]
+
+
+def format_comparison(comparisons: List[Comparison]) -> str:
+    lines = [f"{'benchmark':<44}{'baseline':>12}{'current':>12}{'change':>9}{'p':>10}  status"]
+    for comparison in comparisons:
+        change = "-" if comparison.change is None else f"{comparison.change:+.1%}"
+        p_value = "-" if comparison.p_value is None else f"{comparison.p_value:.1e}"
+        status = comparison.status.upper() if comparison.status in (SLOWER, FASTER) else comparison.status
+        line = (
+            f"{comparison.name:<44}{format_ns(comparison.baseline_ns):>12}{format_ns(comparison.current_ns):>12}"
+            f"{change:>9}{p_value:>10}  {status}"
+        )
+        if comparison.detail:
+            line += f" ({comparison.detail[:100]})"
+        lines.append(line)
+    return "\n".join(lines)
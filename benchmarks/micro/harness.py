@@ -0,0 +1,252 @@
+"""
+Micro-benchmark harness - Registers hot-path benchmarks and times them.
+Each benchmark is timed in calibrated batches so every sample is long enough
+to swamp timer resolution, and results are saved as JSON baselines.
+"""
+
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Any, Optional, List
+
+# name -> setup function returning the callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable]] = {}
+
+
+def benchmark(name: str):
+    """
+    Register a benchmark.
+
+    The decorated function does the setup and returns the zero-argument
+    callable (or coroutine function) to time, so setup cost is never measured.
+    """
+    def decorator(setup: Callable[[], Callable]):
+        if name in BENCHMARKS:
+            raise ValueError(f"Benchmark {name} is already registered")
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+@dataclass
+class BenchmarkResult:
+    """Per-operation timings of one benchmark, in nanoseconds"""
+    name: str
+    samples: List[float] = field(default_factory=list)
+    loops: int = 0
+    error: Optional[str] = None
+
+    @property
+    def median(self) -> Optional[float]:
+        return statistics.median(self.samples) if self.samples else None
+
+    @property
+    def mean(self) -> Optional[float]:
+        return statistics.fmean(self.samples) if self.samples else None
+
+    @property
+    def stdev(self) -> Optional[float]:
+        return statistics.stdev(self.samples) if len(self.samples) > 1 else None
+
+    @property
+    def min(self) -> Optional[float]:
+        return min(self.samples) if self.samples else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "samples": [round(sample, 3) for sample in self.samples],
+            "loops": self.loops,
+            "median_ns": _round(self.median),
+            "mean_ns": _round(self.mean),
+            "stdev_ns": _round(self.stdev),
+            "min_ns": _round(self.min),
+            "error": self.error
+        }
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any]) -> "BenchmarkResult":
+        return cls(name=name, samples=list(data.get("samples", [])), loops=data.get("loops", 0), error=data.get("error"))
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+class _Timer:
+    """Runs `loops` calls of a sync or async callable and returns elapsed seconds"""
+
+    def __init__(self, func: Callable, loop: asyncio.AbstractEventLoop):
+        self.func = func
+        self.loop = loop
+        self.is_async = asyncio.iscoroutinefunction(func)
+
+    def __call__(self, loops: int) -> float:
+        if self.is_async:
+            return self.loop.run_until_complete(self._run_async(loops))
+        func = self.func
+        perf_counter = time.perf_counter
+        start = perf_counter()
+        for _ in range(loops):
+            func()
+        return perf_counter() - start
+
+    async def _run_async(self, loops: int) -> float:
+        func = self.func
+        perf_counter = time.perf_counter
+        start = perf_counter()
+        for _ in range(loops):
+            await func()
+        return perf_counter() - start
+
+
+def calibrate(timer: Callable[[int], float], min_time: float, max_loops: int = 10 ** 7) -> int:
+    """Smallest power-of-two loop count whose batch takes at least min_time"""
+    loops = 1
+    while loops < max_loops:
+        if timer(loops) >= min_time:
+            break
+        loops *= 2
+    return loops
+
+
+def measure(func: Callable, repeats: int = 20, min_time: float = 0.01, warmup: int = 1) -> BenchmarkResult:
+    """
+    Time a callable.
+
+    Args:
+        func: Zero-argument callable or coroutine function
+        repeats: Number of samples
+        min_time: Minimum duration of each timed batch, in seconds
+        warmup: Batches run and discarded before sampling
+
+    Returns:
+        BenchmarkResult with one per-operation sample per repeat
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        timer = _Timer(func, loop)
+        loops = calibrate(timer, min_time)
+        for _ in range(warmup):
+            timer(loops)
+        samples = [timer(loops) / loops * 1e9 for _ in range(repeats)]
+    finally:
+        loop.close()
+    return BenchmarkResult(name=getattr(func, "__name__", "benchmark"), samples=samples, loops=loops)
+
+
+def select(patterns: Optional[List[str]] = None) -> List[str]:
+    """Registered benchmark names matching any of the glob patterns (all if none given)"""
+    names = sorted(BENCHMARKS)
+    if not patterns:
+        return names
+    return [name for name in names if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)]
+
+
+def run_benchmarks(
+    patterns: Optional[List[str]] = None,
+    repeats: int = 20,
+    min_time: float = 0.01,
+    progress: Optional[Callable[[BenchmarkResult], None]] = None
+) -> Dict[str, BenchmarkResult]:
+    """
+    Run the selected benchmarks.
+
+    A benchmark whose setup or timed call raises is recorded with its error
+    rather than aborting the run.
+
+    Returns:
+        Results by benchmark name, in name order
+    """
+    results = {}
+    for name in select(patterns):
+        try:
+            result = measure(BENCHMARKS[name](), repeats=repeats, min_time=min_time)
+        except Exception as e:
+            result = BenchmarkResult(name=name, error=f"{type(e).__name__}: {e}"[:300])
+        result.name = name
+        results[name] = result
+        if progress is not None:
+            progress(result)
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    """Where a run happened; comparisons across different machines are not meaningful"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def save_results(results: Dict[str, BenchmarkResult], path: str, meta: Optional[Dict[str, Any]] = None):
+    """Write results (with environment metadata) as a JSON baseline"""
+    payload = {
+        "meta": meta if meta is not None else environment(),
+        "benchmarks": {name: result.to_dict() for name, result in results.items()}
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """
+    Read a JSON baseline.
+
+    Returns:
+        {"meta": {...}, "benchmarks": {name: BenchmarkResult}}
+    """
+    with open(path) as f:
+        payload = json.load(f)
+    return {
+        "meta": payload.get("meta", {}),
+        "benchmarks": {
+            name: BenchmarkResult.from_dict(name, data)
+            for name, data in payload.get("benchmarks", {}).items()
+        }
+    }
+
+
+def format_results(results: Dict[str, BenchmarkResult]) -> str:
+    lines = [f"{'benchmark':<44}{'median':>12}{'mean':>12}{'stdev':>10}{'loops':>9}"]
+    for name, result in results.items():
+        if result.error:
+            lines.append(f"{name:<44}  ERROR {result.error[:100]}")
+            continue
+        lines.append(
+            f"{name:<44}{format_ns(result.median):>12}{format_ns(result.mean):>12}"
+            f"{format_ns(result.stdev):>10}{result.loops:>9}"
+        )
+    return "\n".join(lines)
+
+
+def format_ns(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if value >= scale:
+            return f"{value / scale:.2f} {unit}"
+    return f"{value:.0f} ns"
@@ -0,0 +1,286 @@
+"""
+Hot-path micro-benchmarks.
+Covers permission checks, transform execution, cache (de)serialization,
+search query building, typeahead and related-dataset lookups, data map updates,
+middleware overhead and model to_dict.
+"""
+
+import logging
+from datetime import datetime
+from types import SimpleNamespace
+
+from .harness import benchmark
+
+SEARCH_FILTER = {"field": "name", "operator": "contains", "value": "orders"}
+
+
+def _user(super_user: bool = False):
+    return SimpleNamespace(
+        id=1,
+        email="bench@example.com",
+        default_org_id=1,
+        is_super_user_=lambda: super_user,
+        is_org_member_=lambda org: True
+    )
+
+
+def _plain(model, **values):
+    """
+    A model's methods on a plain object with its column defaults and the given values.
+
+    Instantiating the mapped class would configure every mapper, so the
+    model's own methods run on an unmapped stand-in; relationships a method
+    reads are passed in.
+    """
+    from sqlalchemy.orm.attributes import InstrumentedAttribute
+    namespace = {}
+    for klass in reversed(model.__mro__):
+        for name, value in vars(klass).items():
+            if not name.startswith("__") and not isinstance(value, InstrumentedAttribute):
+                namespace[name] = value
+    obj = type(model.__name__, (), namespace)()
+    for column in model.__table__.columns:
+        default = column.default
+        setattr(obj, column.key, default.arg if default is not None and default.is_scalar else None)
+    for name, value in values.items():
+        setattr(obj, name, value)
+    return obj
+
+
+def _flow_node(admin: bool):
+    return SimpleNamespace(
+        id=1,
+        has_admin_access_=lambda user: admin,
+        has_operator_access_=lambda user: admin,
+        has_collaborator_access_=lambda user: admin,
+        is_public_=lambda: False
+    )
+
+
+# Permissions
+
+@benchmark("auth.ability_checker_init")
+def ability_checker_init():
+    from app.auth.permissions import AbilityChecker
+    user = _user()
+    return lambda: AbilityChecker(user)
+
+
+@benchmark("auth.ability_can_allowed")
+def ability_can_allowed():
+    from app.auth.permissions import AbilityChecker, Action, ResourceType
+    checker = AbilityChecker(_user())
+    flow_node = _flow_node(admin=True)
+    return lambda: checker.can(Action.READ, ResourceType.FLOW_NODE, flow_node)
+
+
+@benchmark("auth.ability_can_denied")
+def ability_can_denied():
+    # A denial scans every rule, so this is the worst case
+    from app.auth.permissions import AbilityChecker, Action, ResourceType
+    checker = AbilityChecker(_user())
+    flow_node = _flow_node(admin=False)
+    return lambda: checker.can(Action.READ, ResourceType.FLOW_NODE, flow_node)
+
+
+# Transforms
+
+@benchmark("transform.execute_100_records")
+def transform_execute():
+    from app.services.transform_service import TransformService
+    service = TransformService()
+    transform = SimpleNamespace(
+        transform_config={
+            "field_mappings": {
+                "id": "id",
+                "name": {"source_field": "name", "function": "trim"},
+                "email": {"source_field": "email", "function": "lower_case"},
+                "amount": {"source_field": "amount", "function": "round", "params": {"decimals": 2}},
+                "country": {"source_field": "country", "default_value": "US"}
+            },
+            "functions": [
+                {"function": "upper_case", "target_field": "country_code", "source_fields": ["country"]}
+            ]
+        },
+        source_schema={},
+        target_schema={
+            "fields": [
+                {"name": "id", "type": "integer", "required": True},
+                {"name": "name", "type": "string", "required": True},
+                {"name": "email", "type": "string"},
+                {"name": "amount", "type": "number"}
+            ]
+        }
+    )
+    records = [
+        {"id": i, "name": f"  Customer {i}  ", "email": f"Customer{i}@Example.com", "amount": i * 1.2345, "country": "us"}
+        for i in range(100)
+    ]
+
+    async def run():
+        await service.execute_transform(transform, records)
+
+    return run
+
+
+# Cache serialization
+
+def _cache_payload(rows: int):
+    return [
+        {"id": i, "name": f"data set {i}", "status": "ACTIVE", "tags": ["orders", "daily"],
+         "updated_at": datetime(2024, 1, 1).isoformat(), "owner_id": i % 7}
+        for i in range(rows)
+    ]
+
+
+def _cache_manager():
+    from app.services.caching_service import CacheManager
+    # redis.from_url connects lazily, so no server is needed
+    return CacheManager()
+
+
+@benchmark("cache.serialize_small")
+def cache_serialize_small():
+    manager = _cache_manager()
+    payload = _cache_payload(5)
+    return lambda: manager._serialize_data(payload)
+
+
+@benchmark("cache.serialize_large_gzip")
+def cache_serialize_large():
+    manager = _cache_manager()
+    payload = _cache_payload(500)
+    return lambda: manager._serialize_data(payload)
+
+
+@benchmark("cache.deserialize_small")
+def cache_deserialize_small():
+    manager = _cache_manager()
+    data = manager._serialize_data(_cache_payload(5))
+    return lambda: manager._deserialize_data(data)
+
+
+@benchmark("cache.deserialize_large_gzip")
+def cache_deserialize_large():
+    manager = _cache_manager()
+    data = manager._serialize_data(_cache_payload(500))
+    return lambda: manager._deserialize_data(data)
+
+
+# Search
+
+@benchmark("search.basic_query_build")
+def search_query_build():
+    # Parse the filter tree and reuse the statement cached for its shape, as every search does
+    from app.models.data_set import DataSet
+    from app.services.common.search.basic_search_executor import BasicSearchExecutor
+    executor = BasicSearchExecutor(_user(), SimpleNamespace(id=1), DataSet, dict(SEARCH_FILTER))
+    return lambda: executor.statement(ids_only=True)
+
+
+@benchmark("search.statement_build_uncached")
+def search_statement_build():
+    # First search of a filter shape: the statement is built from scratch
+    from app.models.data_set import DataSet
+    from app.services.common.search.basic_search_executor import BasicSearchExecutor
+    from app.services.common.search.filter_dsl import StatementCache
+    executor = BasicSearchExecutor(_user(), SimpleNamespace(id=1), DataSet, dict(SEARCH_FILTER))
+    cache = StatementCache.instance()
+
+    def build():
+        cache.clear()
+        return executor.statement(ids_only=True)
+
+    return build
+
+
+@benchmark("search.suggest_prefix")
+def search_suggest_prefix():
+    from app.services.search_index import SearchIndex, build_document
+    index = SearchIndex()
+    words = ["orders", "customers", "events", "invoices", "daily", "weekly", "raw", "clean", "eu", "us"]
+    for i in range(20000):
+        index.upsert(build_document("data_sets", {
+            "id": i, "org_id": 1, "owner_id": 1, "created_at": datetime(2024, 1, 1),
+            "name": f"{words[i % 10]} {words[(i // 10) % 10]} {i}", "tags": [words[(i // 100) % 10]]
+        }))
+    # Warm the per-node caches the way live traffic would
+    index.suggest("o", user_id=1, org_id=1)
+
+    def suggest():
+        return index.suggest("ord", user_id=1, org_id=1, resource_types=["data_sets"])
+
+    return suggest
+
+
+@benchmark("catalog.related_lsh_100k")
+def catalog_related_lsh():
+    from benchmarks.bench_related_datasets import build_index
+    index = build_index(100000)
+    return lambda: index.related(12345, limit=10)
+
+
+# Data maps
+
+@benchmark("data_map.set_map_entries_static")
+def data_map_set_entries():
+    from app.models.data_map import DataMap
+    data_map = _plain(DataMap, name="bench", map_primary_key="key", data_sink_id=None)
+    existing = [{"key": str(i), "value": f"value {i}"} for i in range(1000)]
+    update = {"entries": [{"key": str(i), "value": f"updated {i}"} for i in range(0, 1000, 10)]}
+
+    def run():
+        data_map.data_map = list(existing)
+        data_map.set_map_entries(update)
+
+    return run
+
+
+# Middleware
+
+def _asgi_request(pipeline: bool):
+    from benchmarks.bench_middleware_pipeline import build_endpoint_app, build_pipeline, make_scope, receive, send
+    logging.disable(logging.CRITICAL)
+    app = build_pipeline(build_endpoint_app()) if pipeline else build_endpoint_app()
+    scope = make_scope(1)
+
+    async def request():
+        await app(dict(scope), receive, send)
+
+    return request
+
+
+@benchmark("middleware.bare_request")
+def middleware_bare():
+    # Endpoint alone; the pipeline's overhead is the difference to the next one
+    return _asgi_request(pipeline=False)
+
+
+@benchmark("middleware.pipeline_request")
+def middleware_pipeline():
+    return _asgi_request(pipeline=True)
+
+
+# Models
+
+@benchmark("models.data_set_to_dict")
+def data_set_to_dict():
+    from app.models.data_set import DataSet, DataSetStatuses, DataSetTypes
+    now = datetime(2024, 1, 1)
+    data_set = _plain(
+        DataSet, id=1, name="orders", description="Daily orders", status=DataSetStatuses.ACTIVE,
+        data_set_type=DataSetTypes.TRANSFORM, owner_id=1, org_id=1, created_at=now, updated_at=now,
+        child_data_sets=[], parent_data_set=None
+    )
+    return data_set.to_dict
+
+
+@benchmark("models.flow_node_to_dict")
+def flow_node_to_dict():
+    from app.models.flow_node import FlowNode, NodeStatuses, NodeTypes
+    now = datetime(2024, 1, 1)
+    flow_node = _plain(
+        FlowNode, id=1, name="orders flow", status=NodeStatuses.ACTIVE, node_type=NodeTypes.SOURCE,
+        owner_id=1, org_id=1, created_at=now, updated_at=now, child_nodes=[]
+    )
+    return flow_node.to_dict
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Run hot-path micro-benchmarks and compare them against a saved baseline.
+
+    python benchmarks/micro_bench.py run --save benchmarks/micro/baseline.json
+    python benchmarks/micro_bench.py compare benchmarks/micro/baseline.json
+    python benchmarks/micro_bench.py compare baseline.json current.json --threshold 0.1
+
+`compare` re-runs the suite unless a second results file is given, and exits
+with status 1 when any benchmark got significantly slower.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.micro import suite  # noqa: F401  (registers the benchmarks)
+from benchmarks.micro.compare import SLOWER, compare_runs, environment_mismatches, format_comparison
+from benchmarks.micro.harness import (
+    BENCHMARKS, environment, format_results, load_results, run_benchmarks, save_results, select
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro", "baseline.json")
+
+
+def progress(result):
+    status = f"error: {result.error}" if result.error else f"{result.loops} loops"
+    print(f"  {result.name} ({status})", file=sys.stderr)
+
+
+def run(args):
+    return run_benchmarks(args.filter, repeats=args.repeats, min_time=args.min_time, progress=progress)
+
+
+def cmd_list(args):
+    for name in select(args.filter):
+        print(name)
+    return 0
+
+
+def cmd_run(args):
+    results = run(args)
+    print(format_results(results))
+    if args.save:
+        save_results(results, args.save)
+        print(f"\nSaved {len(results)} results to {args.save}")
+    return 0
+
+
+def cmd_compare(args):
+    baseline = load_results(args.baseline)
+    if args.current:
+        current = load_results(args.current)
+    else:
+        current = {"meta": environment(), "benchmarks": run(args)}
+        if args.save:
+            save_results(current["benchmarks"], args.save, current["meta"])
+
+    if args.filter:
+        names = set(select(args.filter))
+        for results in (baseline, current):
+            results["benchmarks"] = {name: result for name, result in results["benchmarks"].items() if name in names}
+
+    for mismatch in environment_mismatches(baseline["meta"], current["meta"]):
+        print(f"warning: environment differs from baseline ({mismatch})", file=sys.stderr)
+
+    comparisons = compare_runs(baseline["benchmarks"], current["benchmarks"], args.threshold, args.alpha)
+    if args.json:
+        print(json.dumps([comparison.to_dict() for comparison in comparisons], indent=2))
+    else:
+        print(format_comparison(comparisons))
+
+    slower = [comparison.name for comparison in comparisons if comparison.status == SLOWER]
+    if slower:
+        print(f"\n{len(slower)} significant slowdown(s): {', '.join(slower)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(sub):
+        sub.add_argument("--filter", action="append", help="Glob over benchmark names, e.g. 'cache.*' (repeatable)")
+        sub.add_argument("--repeats", type=int, default=20, help="Samples per benchmark")
+        sub.add_argument("--min-time", type=float, default=0.01, help="Minimum seconds per timed batch")
+
+    list_parser = subparsers.add_parser("list", help="List registered benchmarks")
+    list_parser.add_argument("--filter", action="append")
+    list_parser.set_defaults(handler=cmd_list)
+
+    run_parser = subparsers.add_parser("run", help="Run benchmarks and optionally save a baseline")
+    add_run_options(run_parser)
+    run_parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, help="Write results as a JSON baseline")
+    run_parser.set_defaults(handler=cmd_run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare against a baseline")
+    add_run_options(compare_parser)
+    compare_parser.add_argument("baseline", nargs="?", default=DEFAULT_BASELINE)
+    compare_parser.add_argument("current", nargs="?", help="Saved results to compare instead of re-running")
+    compare_parser.add_argument("--threshold", type=float, default=0.05,
+                                help="Ignore median changes smaller than this fraction")
+    compare_parser.add_argument("--alpha", type=float, default=0.01, help="Significance level")
+    compare_parser.add_argument("--save", help="Also write the new run to this path")
+    compare_parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    compare_parser.set_defaults(handler=cmd_compare)
+
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    if not BENCHMARKS:
+        parser.error("no benchmarks registered")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
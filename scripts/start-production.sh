@@ -14,6 +14,11 @@ echo "Waiting for database connection..."
 echo "Running database migrations..."
 alembic upgrade head
 
+# Reset the shared metrics directory so counters from a previous run are not merged in
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/admin_api_metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 # Start the application with Gunicorn
 echo "Starting Gunicorn server..."
 exec gunicorn app.main:app \
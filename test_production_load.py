@@ -2,6 +2,9 @@
 """
 Production Load Testing Script
 Simulates high-volume production traffic patterns to validate performance.
+
+These simulations do not exercise application code; for capacity numbers
+from the real app use benchmarks/load_test.py with a scenario file.
 """
 
 import sys
@@ -0,0 +1,188 @@
+"""
+Tests for the in-process load harness.
+Tests scenario parsing, placeholder rendering, the runner and the seeded backend.
+"""
+
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Router
+
+from app.auth import verify_token
+from benchmarks.loadtest import FakeRedis, LoadTestBackend, Scenario, SeedSpec, SeededUser, run_scenario
+from benchmarks.loadtest import backend as backend_module
+from benchmarks.loadtest.scenario import render, extract
+
+
+async def login(request):
+    body = await request.json()
+    return JSONResponse({"access_token": f"token-for-{body['email']}"})
+
+
+async def whoami(request):
+    return JSONResponse({"authorization": request.headers.get("authorization")})
+
+
+async def flow(request):
+    flow_id = int(request.path_params["flow_id"])
+    return JSONResponse({"id": flow_id}, status_code=200 if flow_id < 100 else 404)
+
+
+def stub_app():
+    return Router(routes=[
+        Route("/login", login, methods=["POST"]),
+        Route("/me", whoami),
+        Route("/flows/{flow_id}", flow),
+    ])
+
+
+def make_user(**overrides):
+    values = dict(id=1, email="a@example.com", password="pw", org_id=7, token=None, resources={"flows": [1, 2, 3]})
+    values.update(overrides)
+    return SeededUser(**values)
+
+
+class TestScenario:
+    """Test scenario parsing and rendering"""
+
+    def test_from_dict(self):
+        """Test steps and seed settings are parsed"""
+        scenario = Scenario.from_dict({
+            "name": "flows",
+            "concurrency": 3,
+            "seed": {"users_per_org": 2},
+            "steps": [{"name": "list", "method": "GET", "path": "/flows"}]
+        })
+
+        assert scenario.steps[0].auth is True
+        assert scenario.seed.users_per_org == 2
+        assert scenario.iterations == 1
+
+    def test_requires_steps(self):
+        """Test empty scenarios are rejected"""
+        with pytest.raises(ValueError):
+            Scenario.from_dict({"name": "empty", "steps": []})
+
+    def test_render_placeholders(self):
+        """Test strings, choices and samples are filled from the user"""
+        user = make_user()
+        variables = SimpleNamespace(token="t", flow_id=5)
+        rng = random.Random(0)
+
+        assert render("/flows/{vars.flow_id}", user, variables, rng) == "/flows/5"
+        assert render({"email": "{user.email}"}, user, variables, rng) == {"email": "a@example.com"}
+        assert render({"$choice": "flows"}, user, variables, rng) in (1, 2, 3)
+        assert sorted(render({"$sample": "flows", "count": 5}, user, variables, rng)) == [1, 2, 3]
+
+    def test_extract(self):
+        """Test dotted paths read nested JSON"""
+        body = {"results": [{"id": 4}], "token": "x"}
+
+        assert extract(body, "token") == "x"
+        assert extract(body, "results.0.id") == 4
+        assert extract(body, "results.3.id") is None
+
+
+class TestRunner:
+    """Test run_scenario against a stub ASGI app"""
+
+    def test_iterations_extract_and_auth(self):
+        """Test once-steps, extracted tokens and per-step statistics"""
+        scenario = Scenario.from_dict({
+            "name": "stub",
+            "iterations": 3,
+            "steps": [
+                {"name": "login", "method": "POST", "path": "/login", "json": {"email": "{user.email}"},
+                 "auth": False, "once": True, "extract": {"token": "access_token"}},
+                {"name": "me", "method": "GET", "path": "/me"},
+                {"name": "flow", "method": "GET", "path": "/flows/{vars.flow_id}",
+                 "vars": {"flow_id": {"$choice": "flows"}}}
+            ]
+        })
+        users = [make_user(), make_user(id=2, email="b@example.com", resources={"flows": [500]})]
+
+        # Execute
+        report = asyncio.run(run_scenario(scenario, stub_app(), users, concurrency=2))
+
+        # Verify
+        result = report.to_dict()
+        steps = {row["step"]: row for row in result["steps"]}
+        assert steps["login"]["requests"] == 2
+        assert steps["me"]["requests"] == 6
+        assert steps["flow"]["statuses"] == {"200": 3, "404": 3}
+        assert steps["flow"]["errors"] == 3
+        assert steps["flow"]["sample_error"] is not None
+        assert result["requests"] == 14
+        assert result["p50_ms"] is not None
+        assert "flow" in report.format_table()
+
+    def test_duration_bounds_run(self):
+        """Test duration-based runs stop at the deadline"""
+        scenario = Scenario.from_dict({
+            "name": "timed",
+            "duration_seconds": 0.2,
+            "steps": [{"name": "me", "method": "GET", "path": "/me"}]
+        })
+
+        report = asyncio.run(run_scenario(scenario, stub_app(), [make_user(token="abc")], concurrency=2))
+
+        assert report.total_requests > 0
+        assert report.total_errors == 0
+        assert 0.2 <= report.elapsed < 1.0
+
+
+class TestFakeRedis:
+    """Test the in-memory Redis stand-in"""
+
+    def test_strings_and_expiry(self):
+        """Test set/get/incr and expiry"""
+        redis = FakeRedis()
+
+        redis.set("a", "1")
+        redis.setex("b", 0, "gone")
+        assert redis.get("a") == b"1"
+        assert redis.incr("a") == 2
+        assert redis.get("b") is None
+        assert redis.keys("a*") == [b"a"]
+
+    def test_pipeline(self):
+        """Test pipelines queue and execute commands"""
+        redis = FakeRedis()
+        pipe = redis.pipeline()
+
+        pipe.lpush("list", "x").lpush("list", "y").ltrim("list", 0, 0)
+
+        assert pipe.execute() == [1, 2, True]
+        assert redis.lrange("list", 0, -1) == [b"y"]
+
+
+class TestLoadTestBackend:
+    """Test database seeding and installation"""
+
+    def test_seed_users_and_resources(self, monkeypatch):
+        """Test seeded users own their resources and carry valid tokens"""
+        monkeypatch.setattr(backend_module, "get_password_hash", lambda password: f"hashed-{password}")
+        app = FastAPI()
+        backend = LoadTestBackend()
+        backend.install(app)
+        try:
+            # Execute
+            users = backend.seed(SeedSpec(orgs=2, users_per_org=2, flows_per_user=3,
+                                          data_sources_per_user=1, data_sets_per_user=0))
+
+            # Verify
+            assert len(users) == 4
+            assert len({user.org_id for user in users}) == 2
+            assert all(len(user.resources["flows"]) == 3 for user in users)
+            assert users[0].resources["data_sets"] == []
+            assert verify_token(users[0].token)["user_id"] == users[0].id
+            assert backend_module.cache_manager.redis_client is backend.redis
+        finally:
+            backend.uninstall(app)
+
+        assert backend_module.cache_manager.redis_client is not backend.redis
+        assert app.dependency_overrides == {}
@@ -0,0 +1,240 @@
+"""
+Tests for the micro-benchmark harness.
+Tests timing, baseline round-trips, the Mann-Whitney comparison and the CLI.
+"""
+
+import json
+import logging
+import random
+
+import pytest
+
+from benchmarks import micro_bench
+from benchmarks.micro import harness
+from benchmarks.micro.compare import (
+    ERROR, FASTER, MISSING, NEW, SLOWER, UNCHANGED,
+    compare_result, compare_runs, environment_mismatches, mann_whitney_u
+)
+from benchmarks.micro.harness import BenchmarkResult, benchmark, measure, run_benchmarks, save_results, load_results
+
+
+def noisy(center, count=20, seed=0):
+    rng = random.Random(seed)
+    return [center * (1 + rng.uniform(-0.02, 0.02)) for _ in range(count)]
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Isolated benchmark registry"""
+    benchmarks = {}
+    monkeypatch.setattr(harness, "BENCHMARKS", benchmarks)
+    monkeypatch.setattr(micro_bench, "BENCHMARKS", benchmarks)
+    return benchmarks
+
+
+@pytest.fixture(autouse=True)
+def restore_logging():
+    """The CLI silences logging; undo that for the rest of the suite"""
+    yield
+    logging.disable(logging.NOTSET)
+
+
+class TestHarness:
+    """Test registration and timing"""
+
+    def test_measure_sync_and_async(self):
+        """Test both plain and coroutine callables produce per-op samples"""
+        calls = []
+
+        async def async_op():
+            calls.append(1)
+
+        # Execute
+        sync_result = measure(lambda: sum(range(10)), repeats=5, min_time=0.001)
+        async_result = measure(async_op, repeats=5, min_time=0.001)
+
+        # Verify
+        for result in (sync_result, async_result):
+            assert len(result.samples) == 5
+            assert result.loops >= 1
+            assert all(sample > 0 for sample in result.samples)
+        assert len(calls) >= 5 * async_result.loops
+
+    def test_run_records_errors_and_continues(self, registry):
+        """Test a failing setup is reported without stopping the run"""
+        @benchmark("fails")
+        def fails():
+            raise RuntimeError("mapper not configured")
+
+        @benchmark("works")
+        def works():
+            return lambda: None
+
+        # Execute
+        results = run_benchmarks(repeats=3, min_time=0.001)
+
+        # Verify
+        assert list(results) == ["fails", "works"]
+        assert results["fails"].error == "RuntimeError: mapper not configured"
+        assert results["works"].error is None
+        assert len(results["works"].samples) == 3
+
+    def test_model_benchmarks_run_without_mappers(self):
+        """Test the model, data map and search benchmarks produce timings rather than mapper errors"""
+        results = run_benchmarks(["models.*", "data_map.*", "search.*_build*"], repeats=1, min_time=0.0001)
+
+        # Verify
+        assert len(results) == 5
+        assert {name: result.error for name, result in results.items() if result.error} == {}
+
+    def test_duplicate_name_rejected(self, registry):
+        """Test registering a name twice fails"""
+        benchmark("dup")(lambda: (lambda: None))
+
+        with pytest.raises(ValueError):
+            benchmark("dup")(lambda: (lambda: None))
+
+    def test_filter_patterns(self, registry):
+        """Test glob filters select benchmarks by name"""
+        for name in ("cache.a", "cache.b", "auth.c"):
+            benchmark(name)(lambda: (lambda: None))
+
+        # Execute
+        results = run_benchmarks(["cache.*"], repeats=2, min_time=0.001)
+
+        # Verify
+        assert list(results) == ["cache.a", "cache.b"]
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        """Test baselines keep samples, errors and metadata"""
+        path = tmp_path / "nested" / "baseline.json"
+        results = {
+            "ok": BenchmarkResult(name="ok", samples=[10.0, 12.0, 11.0], loops=64),
+            "broken": BenchmarkResult(name="broken", error="boom")
+        }
+
+        # Execute
+        save_results(results, str(path), meta={"python": "3.11.7"})
+        loaded = load_results(str(path))
+
+        # Verify
+        assert loaded["meta"] == {"python": "3.11.7"}
+        assert loaded["benchmarks"]["ok"].samples == [10.0, 12.0, 11.0]
+        assert loaded["benchmarks"]["ok"].median == 11.0
+        assert loaded["benchmarks"]["broken"].error == "boom"
+        assert json.loads(path.read_text())["benchmarks"]["ok"]["median_ns"] == 11.0
+
+
+class TestComparison:
+    """Test significance testing against baselines"""
+
+    def test_mann_whitney_separated_samples(self):
+        """Test fully separated samples give a tiny p-value"""
+        # Execute
+        u, p_value = mann_whitney_u(list(range(20)), list(range(100, 120)))
+
+        # Verify
+        assert u == 0
+        assert p_value < 1e-6
+
+    def test_mann_whitney_identical_samples(self):
+        """Test identical samples show no difference"""
+        _, p_value = mann_whitney_u([5.0] * 10, [5.0] * 10)
+
+        assert p_value == 1.0
+
+    def test_mann_whitney_overlapping_samples(self):
+        """Test draws from the same distribution are not significant"""
+        _, p_value = mann_whitney_u(noisy(100, seed=1), noisy(100, seed=2))
+
+        assert p_value > 0.01
+
+    def test_slowdown_flagged(self):
+        """Test a significant, large median increase is a slowdown"""
+        baseline = BenchmarkResult(name="x", samples=noisy(100, seed=1))
+        current = BenchmarkResult(name="x", samples=noisy(120, seed=2))
+
+        # Execute
+        comparison = compare_result(baseline, current)
+
+        # Verify
+        assert comparison.status == SLOWER
+        assert comparison.change == pytest.approx(0.2, abs=0.03)
+
+    def test_speedup_flagged(self):
+        """Test a significant median decrease is a speedup"""
+        baseline = BenchmarkResult(name="x", samples=noisy(100, seed=1))
+        current = BenchmarkResult(name="x", samples=noisy(70, seed=2))
+
+        assert compare_result(baseline, current).status == FASTER
+
+    def test_small_change_below_threshold_ignored(self):
+        """Test a significant but tiny shift stays unchanged"""
+        baseline = BenchmarkResult(name="x", samples=[100.0 + i * 0.01 for i in range(20)])
+        current = BenchmarkResult(name="x", samples=[102.0 + i * 0.01 for i in range(20)])
+
+        # Execute
+        comparison = compare_result(baseline, current, threshold=0.05)
+
+        # Verify
+        assert comparison.p_value < 0.01
+        assert comparison.status == UNCHANGED
+
+    def test_compare_runs_new_missing_and_errors(self):
+        """Test benchmarks present in only one run, or failing, are reported"""
+        baseline = {
+            "kept": BenchmarkResult(name="kept", samples=noisy(100)),
+            "removed": BenchmarkResult(name="removed", samples=noisy(100)),
+            "broken": BenchmarkResult(name="broken", samples=noisy(100))
+        }
+        current = {
+            "kept": BenchmarkResult(name="kept", samples=noisy(100, seed=3)),
+            "added": BenchmarkResult(name="added", samples=noisy(100)),
+            "broken": BenchmarkResult(name="broken", error="boom")
+        }
+
+        # Execute
+        statuses = {comparison.name: comparison.status for comparison in compare_runs(baseline, current)}
+
+        # Verify
+        assert statuses == {"added": NEW, "broken": ERROR, "kept": UNCHANGED, "removed": MISSING}
+
+    def test_environment_mismatches(self):
+        """Test differing machines are reported"""
+        mismatches = environment_mismatches(
+            {"python": "3.11.7", "machine": "x86_64", "commit": "abc"},
+            {"python": "3.12.1", "machine": "x86_64", "commit": "def"}
+        )
+
+        assert mismatches == ["python: 3.11.7 -> 3.12.1"]
+
+
+class TestCli:
+    """Test the micro_bench command line"""
+
+    def test_compare_exits_nonzero_on_slowdown(self, tmp_path, capsys):
+        """Test comparing saved runs fails only when something got slower"""
+        baseline_path, current_path = tmp_path / "baseline.json", tmp_path / "current.json"
+        save_results({"op": BenchmarkResult(name="op", samples=noisy(100, seed=1))}, str(baseline_path), meta={})
+        save_results({"op": BenchmarkResult(name="op", samples=noisy(150, seed=2))}, str(current_path), meta={})
+
+        # Execute
+        slower = micro_bench.main(["compare", str(baseline_path), str(current_path)])
+        same = micro_bench.main(["compare", str(baseline_path), str(baseline_path)])
+
+        # Verify
+        assert slower == 1
+        assert same == 0
+        assert "SLOWER" in capsys.readouterr().out
+
+    def test_run_saves_baseline(self, registry, tmp_path):
+        """Test run --save writes a loadable baseline"""
+        benchmark("noop")(lambda: (lambda: None))
+        path = tmp_path / "baseline.json"
+
+        # Execute
+        code = micro_bench.main(["run", "--repeats", "3", "--min-time", "0.001", "--save", str(path)])
+
+        # Verify
+        assert code == 0
+        assert list(load_results(str(path))["benchmarks"]) == ["noop"]
@@ -0,0 +1,171 @@
+"""
+Tests for RealTimeMonitoringMiddleware and the RealTimeMonitor behind it.
+Tests local aggregation and transactional Redis flushes.
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Router
+from starlette.testclient import TestClient
+
+import app
+from app.services.realtime_monitor import MonitoringBuffer
+
+
+def load_monitoring_middleware():
+    # app/middleware.py shadows the app/middleware/ directory, so load the module by path
+    path = os.path.join(os.path.dirname(app.__file__), "middleware", "monitoring_middleware.py")
+    spec = importlib.util.spec_from_file_location("app.middleware.monitoring_middleware", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+monitoring_middleware = load_monitoring_middleware()
+RealTimeMonitoringMiddleware = monitoring_middleware.RealTimeMonitoringMiddleware
+
+
+class FakePipeline:
+    def __init__(self, redis, transaction):
+        self.redis = redis
+        self.transaction = transaction
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.commands.append((name, *args))
+        return command
+
+    async def execute(self):
+        if self.redis.fail:
+            raise self.redis.fail
+        self.redis.executed.append(self.commands)
+        self.redis.transactions.append(self.transaction)
+        return [True] * len(self.commands)
+
+
+class FakeAsyncRedis:
+    def __init__(self):
+        self.executed = []
+        self.transactions = []
+        self.fail = None
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self, transaction)
+
+
+async def ok_endpoint(request):
+    return JSONResponse({"ok": True})
+
+
+async def item_endpoint(request):
+    return JSONResponse({"id": request.path_params["item_id"]})
+
+
+def build_middleware():
+    redis = FakeAsyncRedis()
+    router = Router(routes=[Route("/ok", ok_endpoint), Route("/items/{item_id}", item_endpoint)])
+    middleware = RealTimeMonitoringMiddleware(router, redis_client=redis, flush_interval=3600)
+    return middleware, redis
+
+
+class TestRealTimeMonitoringMiddleware:
+    """Test RealTimeMonitoringMiddleware functionality"""
+
+    def test_requests_only_touch_the_buffer(self):
+        """Test no Redis command is issued on the request path"""
+        middleware, redis = build_middleware()
+        client = TestClient(middleware)
+
+        # Execute
+        for _ in range(3):
+            client.get("/ok")
+        client.get("/items/42")
+
+        # Verify
+        assert redis.executed == []
+        counters = middleware.monitor.buffer.counters
+        assert counters["metrics:api:request_count"] == 4
+        assert counters["metrics:api:concurrent_requests"] == 0
+        assert counters["metrics:api:status:200"] == 4
+        assert counters["metrics:api:endpoint:/items/{id}"] == 1
+        assert len(middleware.monitor.buffer.response_times) == 4
+
+    def test_flush_writes_one_pipeline(self):
+        """Test the buffer is written in a single MULTI/EXEC batch"""
+        middleware, redis = build_middleware()
+        client = TestClient(middleware)
+        client.get("/ok")
+        client.get("/ok")
+
+        asyncio.run(middleware.monitor.flush())
+
+        assert len(redis.executed) == 1
+        assert redis.transactions == [True]
+        commands = redis.executed[0]
+        assert ("incrby", "metrics:api:request_count", 2) in commands
+        assert not any(c[:2] == ("incrby", "metrics:api:concurrent_requests") for c in commands)
+        lpush = [c for c in commands if c[0] == "lpush"]
+        assert len(lpush) == 1 and len(lpush[0]) == 4
+        assert ("ltrim", "metrics:api:response_times", 0, 999) in commands
+        published = [json.loads(c[2]) for c in commands if c[0] == "publish" and c[1] == "api:requests"]
+        assert [event["event"] for event in published] == [
+            "request_start", "request_complete", "request_start", "request_complete"
+        ]
+        assert middleware.monitor.buffer.is_empty()
+
+    def test_flush_skips_empty_buffer(self):
+        """Test idle intervals do not hit Redis"""
+        middleware, redis = build_middleware()
+
+        asyncio.run(middleware.monitor.flush())
+
+        assert redis.executed == []
+
+    def test_failed_flush_keeps_counters(self):
+        """Test counters of a transaction Redis never ran go out with the next flush"""
+        middleware, redis = build_middleware()
+        client = TestClient(middleware)
+        client.get("/ok")
+        redis.fail = RedisConnectionError("redis down")
+
+        asyncio.run(middleware.monitor.flush())
+        redis.fail = None
+        asyncio.run(middleware.monitor.flush())
+
+        commands = redis.executed[0]
+        assert ("incrby", "metrics:api:request_count", 1) in commands
+        assert not any(c[0] == "publish" for c in commands)
+
+    def test_command_error_is_not_replayed(self):
+        """Test a command failing inside EXEC does not replay the increments that did apply"""
+        middleware, redis = build_middleware()
+        client = TestClient(middleware)
+        client.get("/ok")
+        redis.fail = ResponseError("WRONGTYPE")
+
+        asyncio.run(middleware.monitor.flush())
+
+        assert middleware.monitor.buffer.is_empty()
+
+
+class TestMonitoringBuffer:
+    """Test MonitoringBuffer bounds"""
+
+    def test_samples_and_events_are_capped(self):
+        """Test memory stays bounded while Redis is unreachable"""
+        buffer = MonitoringBuffer()
+
+        for i in range(3 * MonitoringBuffer.MAX_RESPONSE_TIMES):
+            buffer.add_response_time(i)
+        for i in range(MonitoringBuffer.MAX_EVENTS + 10):
+            buffer.publish("api:requests", {"i": i})
+
+        assert len(buffer.response_times) <= 2 * MonitoringBuffer.MAX_RESPONSE_TIMES
+        assert buffer.response_times[-1] == 3 * MonitoringBuffer.MAX_RESPONSE_TIMES - 1
+        assert len(buffer.events) == MonitoringBuffer.MAX_EVENTS
+        assert buffer.dropped_events == 10
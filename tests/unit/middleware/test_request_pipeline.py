@@ -0,0 +1,218 @@
+"""
+Tests for RequestPipelineMiddleware.
+Tests the fused ASGI pipeline stages and their enable flags.
+"""
+
+import pytest
+from unittest.mock import Mock
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Router
+from starlette.testclient import TestClient
+
+from app.middleware import RequestPipelineMiddleware, RequestContext
+from app.services.realtime_monitor import RealTimeMonitor
+from app.services.prometheus_metric_service import PrometheusMetricService
+from app.services.metrics_registry import MetricsRegistry
+
+
+async def ok_endpoint(request):
+    ctx = request.state.request_context
+    return JSONResponse({
+        "request_id": ctx.request_id,
+        "header_request_id": request.headers.get("x-request-id")
+    })
+
+
+async def flow_endpoint(request):
+    return JSONResponse({"flow_id": request.path_params["flow_id"]})
+
+
+async def failing_endpoint(request):
+    raise ValueError("bad input")
+
+
+async def crashing_endpoint(request):
+    raise RuntimeError("boom")
+
+
+def build_client(**stages):
+    app = Router(routes=[
+        Route("/ok", ok_endpoint),
+        Route("/fail", failing_endpoint),
+        Route("/crash", crashing_endpoint),
+        Route("/health", ok_endpoint),
+        Route("/flows/{flow_id}", flow_endpoint),
+    ])
+    pipeline = RequestPipelineMiddleware(app, **stages)
+    pipeline.prometheus = Mock()
+    pipeline.request_logger = Mock()
+    return TestClient(pipeline, raise_server_exceptions=False), pipeline
+
+
+class TestRequestPipelineMiddleware:
+    """Test RequestPipelineMiddleware functionality"""
+
+    def test_shares_request_context_with_handler(self):
+        """Test the parsed context is exposed on request.state"""
+        client, _ = build_client()
+
+        response = client.get("/ok")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["request_id"] == data["header_request_id"]
+
+    def test_security_headers_added(self):
+        """Test security headers stage"""
+        client, _ = build_client()
+
+        response = client.get("/ok")
+
+        assert response.headers["x-frame-options"] == "DENY"
+        assert response.headers["x-content-type-options"] == "nosniff"
+
+    def test_security_headers_disabled(self):
+        """Test security headers stage can be switched off"""
+        client, _ = build_client(security_headers=False)
+
+        response = client.get("/ok")
+
+        assert "x-frame-options" not in response.headers
+
+    def test_error_handling_maps_exceptions(self):
+        """Test unhandled exceptions become JSON error responses"""
+        client, _ = build_client()
+
+        bad_request = client.get("/fail")
+        server_error = client.get("/crash")
+
+        assert bad_request.status_code == 400
+        assert bad_request.json()["error"]["detail"] == "bad input"
+        assert server_error.status_code == 500
+        assert server_error.json()["error"]["type"] == "RuntimeError"
+        assert server_error.headers["x-frame-options"] == "DENY"
+
+    def test_error_handling_disabled_reraises(self):
+        """Test exceptions propagate when error handling is off"""
+        _, pipeline = build_client(error_handling=False)
+        client = TestClient(pipeline, raise_server_exceptions=True)
+
+        with pytest.raises(RuntimeError):
+            client.get("/crash")
+
+    def test_metrics_recorded_with_status(self):
+        """Test metrics stage records the final response status"""
+        client, pipeline = build_client()
+
+        client.get("/fail")
+
+        labels = pipeline.prometheus.histogram.return_value.labels.call_args.kwargs
+        assert labels == {"method": "GET", "endpoint": "/fail", "status": "400"}
+        pipeline.prometheus.histogram.return_value.labels.return_value.observe.assert_called_once()
+
+    def test_metrics_labelled_by_route_template(self):
+        """Test resource ids collapse into one series per route"""
+        client, pipeline = build_client()
+        PrometheusMetricService._instance = None
+        pipeline.prometheus = PrometheusMetricService()
+        pipeline.prometheus._client = MetricsRegistry()
+
+        for flow_id in range(5):
+            client.get(f"/flows/{flow_id}")
+        client.get("/missing")
+
+        text = pipeline.prometheus.expose()
+        assert 'http_requests_total{endpoint="/flows/{flow_id}",method="GET"} 5.0' in text
+        assert 'http_requests_total{endpoint="unmatched",method="GET"} 1.0' in text
+        assert len(pipeline._metric_children) == 2
+        PrometheusMetricService._instance = None
+
+    def test_realtime_monitoring_buffers_requests(self):
+        """Test the real-time stage counts requests by route template without touching Redis"""
+        client, pipeline = build_client(realtime_monitoring=True)
+        pipeline.realtime = RealTimeMonitor(redis_client=Mock(), enable_detailed_metrics=False)
+
+        client.get("/flows/42")
+        client.get("/crash")
+
+        counters = pipeline.realtime.buffer.counters
+        assert counters["metrics:api:request_count"] == 2
+        assert counters["metrics:api:concurrent_requests"] == 0
+        assert counters["metrics:api:endpoint:/flows/{flow_id}"] == 1
+        assert counters["metrics:api:error_type:RuntimeError"] == 1
+        pipeline.realtime.redis_client.pipeline.assert_not_called()
+
+    def test_request_logging_receives_context(self):
+        """Test request logging stage logs the shared context"""
+        client, pipeline = build_client()
+
+        client.get("/ok")
+
+        pipeline.request_logger.log.assert_called_once()
+        args, kwargs = pipeline.request_logger.log.call_args
+        assert isinstance(args[2], RequestContext)
+        assert args[3].status_code == 200
+        assert kwargs["processing_time_ms"] >= 0
+
+    def test_disabled_stages_are_skipped(self):
+        """Test metrics and request logging flags"""
+        client, pipeline = build_client(metrics=False, request_logging=False)
+
+        client.get("/ok")
+
+        pipeline.prometheus.counter.assert_not_called()
+        pipeline.request_logger.log.assert_not_called()
+
+    def test_audit_skips_health_paths(self, caplog):
+        """Test audit stage ignores health and docs paths"""
+        client, _ = build_client()
+
+        with caplog.at_level("INFO", logger="app.audit"):
+            client.get("/health")
+            client.get("/ok")
+
+        records = [r for r in caplog.records if r.name == "app.audit"]
+        assert len(records) == 1
+        assert records[0].details["path"] == "/ok"
+
+    def test_rate_limiting(self):
+        """Test requests beyond the per-minute limit are rejected"""
+        client, pipeline = build_client(requests_per_minute=2)
+
+        statuses = [client.get("/ok").status_code for _ in range(3)]
+
+        assert statuses == [200, 200, 429]
+        assert len(pipeline.client_requests["testclient"]) == 2
+
+    def test_rate_limiting_disabled(self):
+        """Test rate limiting flag"""
+        client, pipeline = build_client(rate_limiting=False, requests_per_minute=1)
+
+        statuses = [client.get("/ok").status_code for _ in range(3)]
+
+        assert statuses == [200, 200, 200]
+        assert pipeline.client_requests == {}
+
+
+class TestRequestContext:
+    """Test RequestContext parsing"""
+
+    def test_parses_scope_once(self):
+        """Test context fields and lazy header access"""
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/api/v1/flows/1",
+            "headers": [(b"host", b"api.example.com"), (b"user-agent", b"pytest")],
+            "client": ("10.0.0.1", 1234)
+        }
+
+        ctx = RequestContext(scope)
+
+        assert ctx.method == "POST"
+        assert ctx.path == "/api/v1/flows/1"
+        assert ctx.client_ip == "10.0.0.1"
+        assert ctx.host == "api.example.com"
+        assert ctx.headers["user-agent"] == "pytest"
+        assert ctx.status_code == 500
+        assert ctx.user is None
@@ -3,11 +3,17 @@ Tests for BasicSearchExecutor service.
 Tests search functionality, filtering, and validation.
 """
 
+from datetime import datetime
+
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, MagicMock
+from sqlalchemy import create_engine, insert
 from sqlalchemy.orm import Session
 
+from app.database import Base
 from app.services.common.search.basic_search_executor import BasicSearchExecutor, ArgumentError
+from app.services.common.search.filter_dsl import StatementCache, validate_leaf
+from app.services.schema_field_index import rebuild_schema_field_index
 from app.models.user import User
 from app.models.org import Org
 from app.models.data_set import DataSet
@@ -84,7 +90,7 @@ class TestBasicSearchExecutor:
     def test_call_basic_search(self, mock_db_session, sample_user, sample_org, sample_datasets):
         """Test basic search execution"""
         # Setup
-        mock_db_session.query.return_value.filter.return_value.all.return_value = sample_datasets
+        mock_db_session.execute.return_value.scalars.return_value.all.return_value = sample_datasets
         
         executor = BasicSearchExecutor(
             user=sample_user,
@@ -97,13 +103,14 @@ class TestBasicSearchExecutor:
         
         # Verify
         assert results == sample_datasets
-        mock_db_session.query.assert_called_once_with(DataSet)
+        mock_db_session.execute.assert_called_once()
+        mock_db_session.query.assert_not_called()
     
     def test_call_with_name_contains_filter(self, mock_db_session, sample_user, sample_org):
         """Test search with name contains filter"""
         # Setup
         filter_dict = {"field": "name", "operator": "contains", "value": "test"}
-        mock_db_session.query.return_value.filter.return_value.all.return_value = []
+        mock_db_session.execute.return_value.scalars.return_value.all.return_value = []
         
         executor = BasicSearchExecutor(
             user=sample_user,
@@ -115,16 +122,16 @@ class TestBasicSearchExecutor:
         # Execute
         results = executor.call(mock_db_session)
         
-        # Verify filter was applied
-        mock_query = mock_db_session.query.return_value
-        assert mock_query.filter.call_count >= 2  # org filter + name filter
+        # Verify org and name values were bound
+        _, params = mock_db_session.execute.call_args[0]
+        assert params == {"org_id": 456, "p0": "%test%"}
         assert results == []
     
     def test_call_with_schema_properties_filter(self, mock_db_session, sample_user, sample_org):
         """Test search with schema properties filter"""
         # Setup
-        filter_dict = {"field": "output_schema_properties", "operator": "contains", "value": "city"}
-        mock_db_session.query.return_value.filter.return_value.all.return_value = []
+        filter_dict = {"field": "output_schema_properties", "operator": "contains", "value": "City"}
+        mock_db_session.execute.return_value.scalars.return_value.all.return_value = []
         
         executor = BasicSearchExecutor(
             user=sample_user,
@@ -134,18 +141,18 @@ class TestBasicSearchExecutor:
         )
         
         # Execute
-        results = executor.call(mock_db_session)
+        executor.call(mock_db_session)
         
-        # Verify filter was applied
-        mock_query = mock_db_session.query.return_value
-        assert mock_query.filter.call_count >= 2  # org filter + schema filter
+        # Verify the field name is matched against the lowercased schema field index
+        statement, params = mock_db_session.execute.call_args[0]
+        assert "schema_fields" in str(statement)
+        assert params["p0"] == "%city%"
     
     def test_call_with_include_public(self, mock_db_session, sample_user, sample_org):
         """Test search including public resources"""
         # Setup
         filter_dict = {"field": "name", "operator": "contains", "value": "test"}
-        mock_db_session.query.return_value.filter.return_value.all.return_value = []
-        mock_db_session.query.return_value.union.return_value.all.return_value = []
+        mock_db_session.execute.return_value.scalars.return_value.all.return_value = []
         
         executor = BasicSearchExecutor(
             user=sample_user,
@@ -156,16 +163,17 @@ class TestBasicSearchExecutor:
         )
         
         # Execute
-        results = executor.call(mock_db_session)
+        executor.call(mock_db_session)
         
-        # Verify union was called for public resources
-        mock_query = mock_db_session.query.return_value
-        mock_query.union.assert_called_once()
+        # Verify public resources are matched in the same statement
+        statement, _ = mock_db_session.execute.call_args[0]
+        assert "UNION" not in str(statement).upper()
+        mock_db_session.query.assert_not_called()
     
-    def test_ids_method(self, mock_db_session, sample_user, sample_org, sample_datasets):
+    def test_ids_method(self, mock_db_session, sample_user, sample_org):
         """Test IDs-only search"""
         # Setup
-        mock_db_session.query.return_value.filter.return_value.all.return_value = sample_datasets
+        mock_db_session.execute.return_value.scalars.return_value.all.return_value = [1, 2]
         
         executor = BasicSearchExecutor(
             user=sample_user,
@@ -176,291 +184,10 @@ class TestBasicSearchExecutor:
         # Execute
         ids = executor.ids(mock_db_session)
         
-        # Verify
+        # Verify only the primary key is selected
+        statement, _ = mock_db_session.execute.call_args[0]
         assert ids == [1, 2]
-    
-    def test_validate_filter_string_field_valid_operator(self, sample_user, sample_org):
-        """Test filter validation for valid string field operator"""
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet
-        )
-        
-        # Should not raise exception
-        executor._validate_filter("name", "contains", "test")
-    
-    def test_validate_filter_string_field_invalid_operator(self, sample_user, sample_org):
-        """Test filter validation for invalid string field operator"""
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet
-        )
-        
-        # Should raise ArgumentError
-        with pytest.raises(ArgumentError, match="Invalid filter operator"):
-            executor._validate_filter("name", "gt", "test")
-    
-    def test_validate_filter_numeric_field_valid_operator(self, sample_user, sample_org):
-        """Test filter validation for valid numeric field operator"""
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet
-        )
-        
-        # Should not raise exception
-        executor._validate_filter("id", "eq", "123")
-    
-    def test_validate_filter_numeric_field_invalid_operator(self, sample_user, sample_org):
-        """Test filter validation for invalid numeric field operator"""
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet
-        )
-        
-        # Should raise ArgumentError
-        with pytest.raises(ArgumentError, match="Invalid filter operator"):
-            executor._validate_filter("id", "contains", "123")
-    
-    def test_validate_filter_numeric_field_invalid_value(self, sample_user, sample_org):
-        """Test filter validation for invalid numeric value"""
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet
-        )
-        
-        # Should raise ArgumentError
-        with pytest.raises(ArgumentError, match="Invalid value"):
-            executor._validate_filter("id", "eq", "ABC!")
-    
-    def test_validate_filter_invalid_field(self, sample_user, sample_org):
-        """Test filter validation for invalid field"""
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet
-        )
-        
-        # Should raise ArgumentError
-        with pytest.raises(ArgumentError, match="Invalid field"):
-            executor._validate_filter("invalid_field", "eq", "test")
-    
-    def test_apply_filters_equality(self, mock_db_session, sample_user, sample_org):
-        """Test applying equality filter"""
-        # Setup
-        filter_dict = {"field": "id", "operator": "eq", "value": "123"}
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet,
-            filter_dict=filter_dict
-        )
-        
-        # Execute
-        result = executor._apply_filters(mock_query)
-        
-        # Verify filter was applied
-        mock_query.filter.assert_called()
-        assert result == mock_query
-    
-    def test_apply_filters_greater_than(self, mock_db_session, sample_user, sample_org):
-        """Test applying greater than filter"""
-        # Setup
-        filter_dict = {"field": "id", "operator": "gt", "value": "100"}
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet,
-            filter_dict=filter_dict
-        )
-        
-        # Execute
-        result = executor._apply_filters(mock_query)
-        
-        # Verify filter was applied
-        mock_query.filter.assert_called()
-    
-    def test_apply_filters_contains(self, mock_db_session, sample_user, sample_org):
-        """Test applying contains filter"""
-        # Setup
-        filter_dict = {"field": "name", "operator": "contains", "value": "test"}
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet,
-            filter_dict=filter_dict
-        )
-        
-        # Execute
-        result = executor._apply_filters(mock_query)
-        
-        # Verify filter was applied
-        mock_query.filter.assert_called()
-    
-    def test_apply_filters_starts_with(self, mock_db_session, sample_user, sample_org):
-        """Test applying starts_with filter"""
-        # Setup
-        filter_dict = {"field": "name", "operator": "starts_with", "value": "test"}
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet,
-            filter_dict=filter_dict
-        )
-        
-        # Execute
-        result = executor._apply_filters(mock_query)
-        
-        # Verify filter was applied
-        mock_query.filter.assert_called()
-    
-    def test_apply_filters_ends_with(self, mock_db_session, sample_user, sample_org):
-        """Test applying ends_with filter"""
-        # Setup
-        filter_dict = {"field": "name", "operator": "ends_with", "value": "test"}
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet,
-            filter_dict=filter_dict
-        )
-        
-        # Execute
-        result = executor._apply_filters(mock_query)
-        
-        # Verify filter was applied
-        mock_query.filter.assert_called()
-    
-    def test_apply_filters_not_equal(self, mock_db_session, sample_user, sample_org):
-        """Test applying not equal filter"""
-        # Setup
-        filter_dict = {"field": "status", "operator": "ne", "value": "inactive"}
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet,
-            filter_dict=filter_dict
-        )
-        
-        # Execute
-        result = executor._apply_filters(mock_query)
-        
-        # Verify filter was applied
-        mock_query.filter.assert_called()
-    
-    def test_apply_filters_incomplete_filter(self, mock_db_session, sample_user, sample_org):
-        """Test applying incomplete filter (missing required fields)"""
-        # Setup
-        filter_dict = {"field": "name"}  # Missing operator and value
-        mock_query = Mock()
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet,
-            filter_dict=filter_dict
-        )
-        
-        # Execute
-        result = executor._apply_filters(mock_query)
-        
-        # Should return query unchanged
-        assert result == mock_query
-        mock_query.filter.assert_not_called()
-    
-    @patch('app.services.common.search.basic_search_executor.text')
-    def test_apply_schema_properties_filter_source_schema(self, mock_text, sample_user, sample_org):
-        """Test applying source schema properties filter"""
-        # Setup
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.params.return_value = mock_query
-        mock_text.return_value.params.return_value = mock_query
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet
-        )
-        
-        # Execute
-        result = executor._apply_schema_properties_filter(
-            mock_query, 
-            "source_schema_properties", 
-            "contains", 
-            "salary"
-        )
-        
-        # Verify filter was applied
-        mock_query.filter.assert_called()
-    
-    @patch('app.services.common.search.basic_search_executor.text')
-    def test_apply_schema_properties_filter_output_schema(self, mock_text, sample_user, sample_org):
-        """Test applying output schema properties filter"""
-        # Setup
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.params.return_value = mock_query
-        mock_text.return_value.params.return_value = mock_query
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet
-        )
-        
-        # Execute
-        result = executor._apply_schema_properties_filter(
-            mock_query, 
-            "output_schema_properties", 
-            "contains", 
-            "city"
-        )
-        
-        # Verify filter was applied
-        mock_query.filter.assert_called()
-    
-    def test_apply_schema_properties_filter_invalid_operator(self, sample_user, sample_org):
-        """Test schema properties filter with invalid operator"""
-        # Setup
-        mock_query = Mock()
-        
-        executor = BasicSearchExecutor(
-            user=sample_user,
-            org=sample_org,
-            model_class=DataSet
-        )
-        
-        # Execute and verify exception
-        with pytest.raises(ArgumentError, match="Only 'contains' operator is supported"):
-            executor._apply_schema_properties_filter(
-                mock_query, 
-                "source_schema_properties", 
-                "eq", 
-                "salary"
-            )
+        assert [column.name for column in statement.selected_columns] == ["id"]
     
     def test_field_type_mappings(self):
         """Test that field type mappings are properly defined"""
@@ -492,4 +219,77 @@ class TestBasicSearchExecutor:
         assert 'gt' in BasicSearchExecutor.NUMERIC_OPERATORS
         assert 'gte' in BasicSearchExecutor.NUMERIC_OPERATORS
         assert 'lt' in BasicSearchExecutor.NUMERIC_OPERATORS
-        assert 'lte' in BasicSearchExecutor.NUMERIC_OPERATORS
\ No newline at end of file
+        assert 'lte' in BasicSearchExecutor.NUMERIC_OPERATORS
+
+
+DATA_SET_FIELDS = BasicSearchExecutor.FIELD_TYPES['DataSet']
+
+
+class TestFilterValidation:
+    """Test filters on DataSet fields are checked against their field types"""
+
+    def test_valid_filters(self):
+        """Test operators and values matching the field type pass"""
+        validate_leaf(DATA_SET_FIELDS, "name", "contains", "test")
+        validate_leaf(DATA_SET_FIELDS, "id", "eq", "123")
+        validate_leaf(DATA_SET_FIELDS, "source_schema_properties", "starts_with", "sal")
+
+    @pytest.mark.parametrize("field,operator,value,message", [
+        ("name", "gt", "test", "Invalid filter operator"),
+        ("id", "contains", "123", "Invalid filter operator"),
+        ("id", "eq", "ABC!", "Invalid value"),
+        ("invalid_field", "eq", "test", "Invalid field"),
+        ("source_schema_properties", "ends_with", "salary", "Invalid filter operator"),
+    ])
+    def test_invalid_filters(self, field, operator, value, message):
+        """Test unknown fields, operators outside the field type and unparseable values are rejected"""
+        with pytest.raises(ArgumentError, match=message):
+            validate_leaf(DATA_SET_FIELDS, field, operator, value)
+
+
+class TestCompiledFilters:
+    """Test the executor's statements against the data_sets table, without the ORM mapper"""
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'basic_search.db'}")
+        tables = Base.metadata.tables
+        Base.metadata.create_all(engine, tables=[tables[name] for name in ("data_sets", "data_schemas", "schema_fields")])
+        created = datetime(2024, 1, 1)
+        with engine.begin() as conn:
+            conn.execute(insert(tables["data_sets"]), [{
+                "data_set_type": "CUSTOM", "owner_id": 1, "org_id": 1, "created_at": created, "updated_at": created,
+                "source_schema": None, "output_schema": None, **row
+            } for row in [
+                {"id": 1, "name": "test orders", "status": "ACTIVE",
+                 "source_schema": {"properties": {"salary": {"type": "number"}}}},
+                {"id": 2, "name": "customers test", "status": "INACTIVE",
+                 "output_schema": {"properties": {"city": {"type": "string"}}}},
+                {"id": 3, "name": "events", "status": "ACTIVE"},
+            ]])
+        rebuild_schema_field_index(engine)
+        StatementCache.instance().clear()
+        yield engine
+        engine.dispose()
+
+    def search(self, engine, filter_dict):
+        executor = BasicSearchExecutor(user=Mock(), org=Mock(id=1), model_class=DataSet, filter_dict=filter_dict)
+        statement, params = executor.statement(ids_only=True)
+        with engine.connect() as conn:
+            return conn.execute(statement, params).scalars().all()
+
+    @pytest.mark.parametrize("filter_dict,expected", [
+        ({"field": "id", "operator": "eq", "value": "2"}, [2]),
+        ({"field": "id", "operator": "gt", "value": "1"}, [2, 3]),
+        ({"field": "name", "operator": "contains", "value": "test"}, [1, 2]),
+        ({"field": "name", "operator": "starts_with", "value": "test"}, [1]),
+        ({"field": "name", "operator": "ends_with", "value": "test"}, [2]),
+        ({"field": "status", "operator": "ne", "value": "INACTIVE"}, [1, 3]),
+        ({"field": "name"}, [1, 2, 3]),
+        ({"field": "source_schema_properties", "operator": "contains", "value": "sal"}, [1]),
+        ({"field": "output_schema_properties", "operator": "eq", "value": "city"}, [2]),
+    ])
+    def test_filters(self, engine, filter_dict, expected):
+        """Test each operator selects the matching ids; incomplete filters select the whole org"""
+        assert self.search(engine, filter_dict) == expected
+
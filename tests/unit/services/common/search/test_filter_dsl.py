@@ -0,0 +1,194 @@
+"""
+Tests for the search filter DSL.
+Tests tree validation, compiled statements against sqlite and shape-keyed caching.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, declarative_base
+
+from app.database import Base
+from app.services.common.search.filter_dsl import (
+    ArgumentError, StatementCache, compile_search, parse_filter, validate_leaf
+)
+from app.services.schema_field_index import rebuild_schema_field_index
+from app.services.tag_index import sync_tags
+
+TABLES = ("data_sets", "data_schemas", "tag_assignments", "tag_counts", "schema_fields")
+
+FIELD_TYPES = {
+    'id': 'numeric',
+    'name': 'string',
+    'description': 'string',
+    'created_at': 'datetime',
+    'is_template': 'boolean',
+    'data_source_id': 'numeric',
+    'output_schema_properties': 'string',
+    'tags': 'tags',
+}
+
+SessionBase = declarative_base()
+
+
+class SearchedDataSet(SessionBase):
+    """Stand-in mapped onto the data_sets table"""
+    __table__ = Base.metadata.tables["data_sets"]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    rows = [
+        {"id": 1, "name": "orders", "description": "daily", "data_source_id": 10, "is_template": False,
+         "output_schema": {"properties": {"customer_id": {"type": "integer"}}}, "created_at": datetime(2024, 1, 1)},
+        {"id": 2, "name": "orders_100%", "description": None, "data_source_id": 20, "is_template": True,
+         "output_schema": {"properties": {"sku": {"type": "string"}}}, "created_at": datetime(2024, 2, 1)},
+        {"id": 3, "name": "customers", "description": "weekly", "data_source_id": None, "is_template": False,
+         "output_schema": None, "created_at": datetime(2024, 3, 1)},
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Base.metadata.tables["data_sets"]), [
+            {**row, "owner_id": 1, "org_id": 1, "updated_at": row["created_at"]} for row in rows
+        ])
+        conn.execute(insert(Base.metadata.tables["data_sets"]), [{
+            "id": 4, "name": "orders", "owner_id": 2, "org_id": 2, "output_schema": None,
+            "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 1)
+        }])
+        sync_tags(conn, "data_sets", {1: (1, ["sales", "daily"]), 2: (1, ["sales"]), 4: (2, ["sales"])})
+    rebuild_schema_field_index(engine)
+    StatementCache.instance().clear()
+    yield engine
+    engine.dispose()
+
+
+def search(engine, tree, ids_only=True):
+    statement, params = compile_search(SearchedDataSet, tree, FIELD_TYPES, org_id=1, ids_only=ids_only)
+    with Session(engine) as session:
+        results = session.execute(statement, params).scalars().all()
+        return results if ids_only else [data_set.id for data_set in results]
+
+
+class TestCompiledSearch:
+    """Test trees compile to statements matching the right rows"""
+
+    def test_single_filters(self, engine):
+        """Test leaves of each field type, scoped to the org"""
+        # Verify
+        assert search(engine, None) == [1, 2, 3]
+        assert search(engine, {"field": "name", "operator": "eq", "value": "orders"}) == [1]
+        assert search(engine, {"field": "name", "operator": "ends_with", "value": "100%"}) == [2]
+        assert search(engine, {"field": "name", "operator": "contains", "value": "_"}) == [2]
+        assert search(engine, {"field": "id", "operator": "in", "value": [1, 3, 4]}) == [1, 3]
+        assert search(engine, {"field": "created_at", "operator": "between",
+                               "value": ["2024-01-15", "2024-03-15T00:00:00Z"]}) == [2, 3]
+        assert search(engine, {"field": "description", "operator": "is_null", "value": True}) == [2]
+        assert search(engine, {"field": "is_template", "operator": "eq", "value": "true"}) == [2]
+
+    def test_boolean_trees(self, engine):
+        """Test and/or/not groups nest"""
+        tree = {"or": [
+            {"and": [
+                {"field": "name", "operator": "starts_with", "value": "orders"},
+                {"not": {"field": "data_source_id", "operator": "eq", "value": 20}}
+            ]},
+            {"field": "description", "operator": "eq", "value": "weekly"}
+        ]}
+
+        # Verify
+        assert search(engine, tree) == [1, 3]
+        assert search(engine, tree, ids_only=False) == [1, 3]
+
+    def test_tag_and_schema_predicates(self, engine):
+        """Test tag and schema field filters use their indexes"""
+        # Verify
+        assert search(engine, {"field": "tags", "operator": "has_any", "value": ["sales", "x"]}) == [1, 2]
+        assert search(engine, {"field": "tags", "operator": "has_all", "value": ["sales", "daily"]}) == [1]
+        assert search(engine, {"field": "output_schema_properties", "operator": "eq", "value": "SKU"}) == [2]
+        assert search(engine, {"and": [
+            {"field": "tags", "operator": "has_any", "value": ["sales"]},
+            {"field": "output_schema_properties", "operator": "starts_with", "value": "cust"}
+        ]}) == [1]
+
+
+    def test_core_table(self, engine):
+        """Test a Table searches like its mapped class, as rows"""
+        data_sets = Base.metadata.tables["data_sets"]
+        tree = {"field": "name", "operator": "starts_with", "value": "orders"}
+
+        # Execute
+        ids, ids_params = compile_search(data_sets, tree, FIELD_TYPES, org_id=1, ids_only=True)
+        rows, rows_params = compile_search(data_sets, tree, FIELD_TYPES, org_id=1)
+        with engine.connect() as conn:
+            found_ids = conn.execute(ids, ids_params).scalars().all()
+            found_rows = conn.execute(rows, rows_params).all()
+
+        # Verify
+        assert found_ids == [1, 2]
+        assert [(row.id, row.name) for row in found_rows] == [(1, "orders"), (2, "orders_100%")]
+
+
+class TestStatementCache:
+    """Test statements are reused across values of the same shape"""
+
+    def test_same_shape_hits(self, engine):
+        """Test a repeated shape reuses the statement and binds new values"""
+        cache = StatementCache.instance()
+
+        # Execute
+        first = search(engine, {"field": "name", "operator": "eq", "value": "orders"})
+        second = search(engine, {"field": "name", "operator": "eq", "value": "customers"})
+        search(engine, {"field": "name", "operator": "ne", "value": "orders"})
+
+        # Verify
+        assert (first, second) == ([1], [3])
+        assert (cache.hits, cache.misses, len(cache)) == (1, 2, 2)
+
+    def test_shape_excludes_values(self):
+        """Test shapes carry structure only; is_null polarity changes the SQL"""
+        shape, values = parse_filter({"and": [
+            {"field": "id", "operator": "between", "value": [1, "5"]},
+            {"field": "description", "operator": "is_null", "value": False}
+        ]}, FIELD_TYPES)
+
+        # Verify
+        assert shape == ('and', (
+            ('leaf', 'id', 'numeric', 'between', None),
+            ('leaf', 'description', 'string', 'is_null', False)
+        ))
+        assert values == [1, 5]
+
+
+class TestValidation:
+    """Test invalid trees are rejected before any SQL is built"""
+
+    @pytest.mark.parametrize("tree", [
+        {"field": "owner", "operator": "eq", "value": 1},
+        {"field": "name", "operator": "gt", "value": "a"},
+        {"field": "id", "operator": "eq", "value": "abc"},
+        {"field": "id", "operator": "between", "value": [1]},
+        {"field": "tags", "operator": "has_any", "value": []},
+        {"and": []},
+        {"xor": [{"field": "id", "operator": "eq", "value": 1}]},
+        {"and": [{"field": "name"}]},
+    ])
+    def test_invalid_trees(self, tree):
+        with pytest.raises(ArgumentError):
+            parse_filter(tree, FIELD_TYPES)
+
+    def test_limits(self):
+        """Test oversized and overly deep trees are rejected"""
+        leaf = {"field": "id", "operator": "eq", "value": 1}
+        deep = leaf
+        for _ in range(10):
+            deep = {"not": deep}
+
+        # Verify
+        with pytest.raises(ArgumentError):
+            parse_filter({"or": [leaf] * 101}, FIELD_TYPES)
+        with pytest.raises(ArgumentError):
+            parse_filter(deep, FIELD_TYPES)
+        assert parse_filter({"field": "name"}, FIELD_TYPES) == (None, [])
+        validate_leaf(FIELD_TYPES, "id", "in", [1, 2])
@@ -0,0 +1,262 @@
+"""
+Tests for bulk flow copies.
+Tests reference remapping, reset columns, dependent flows, attaching, progress, constant statement counts
+and the copies' tag and schema field rows.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, insert, select, update
+
+from app.database import Base
+from app.models.data_set import DataSetStatuses
+from app.models.data_sink import DataSinkStatuses
+from app.models.data_source import DataSourceStatuses
+from app.models.flow_node import NodeStatuses
+from app.services import flow_copy
+from app.services.flow_copy import copy_flow
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+TABLES = ("flow_nodes", "data_sources", "data_sets", "data_sinks", "tag_assignments", "tag_counts", "schema_fields")
+
+NODE_LINKS = ("data_source_id", "data_set_id", "data_sink_id", "flow_id", "project_id", "activated_at")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'flow_copy.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    yield engine
+    engine.dispose()
+
+
+def build_flow(engine, width, origin=1):
+    """Source node -> set node -> width sink nodes, ids offset by origin"""
+    tables = Base.metadata.tables
+    owned = {"owner_id": 1, "org_id": 1, "created_at": NOW, "updated_at": NOW}
+    nodes = [
+        {"id": origin, "parent_node_id": None, "data_source_id": origin, "activated_at": NOW},
+        {"id": origin + 1, "parent_node_id": origin, "data_set_id": origin},
+    ] + [
+        {"id": origin + 2 + i, "parent_node_id": origin + 1, "data_sink_id": origin + i} for i in range(width)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(tables["data_sources"]), [{
+            "id": origin, "name": "source", "connector_type": "S3", "status": DataSourceStatuses.ACTIVE,
+            "flow_node_id": origin, "origin_node_id": origin, **owned
+        }])
+        conn.execute(insert(tables["data_sets"]), [{
+            "id": origin, "name": "set", "status": DataSetStatuses.ACTIVE, "data_source_id": origin,
+            "flow_node_id": origin + 1, "origin_node_id": origin, **owned
+        }])
+        conn.execute(insert(tables["data_sinks"]), [{
+            "id": origin + i, "name": f"sink {i}", "connector_type": "S3", "status": DataSinkStatuses.ACTIVE,
+            "data_set_id": origin, "flow_node_id": origin + 2 + i, "origin_node_id": origin, **owned
+        } for i in range(width)])
+        conn.execute(insert(tables["flow_nodes"]), [{
+            **dict.fromkeys(NODE_LINKS), "status": NodeStatuses.ACTIVE, "origin_node_id": origin,
+            **owned, **node
+        } for node in nodes])
+
+
+def rows(conn, table_name, ids):
+    table = Base.metadata.tables[table_name]
+    return {row["id"]: row for row in conn.execute(select(table).where(table.c.id.in_(ids))).mappings()}
+
+
+class TestCopy:
+    """Test copying a whole flow"""
+
+    def test_references_remapped(self, engine):
+        """Test copies point at each other and keep pointing outside the flow"""
+        build_flow(engine, 2)
+
+        # Execute
+        with engine.begin() as conn:
+            result = copy_flow(conn, 1, owner_id=7)
+            id_map = result.id_map
+            nodes = rows(conn, "flow_nodes", id_map["flow_nodes"].values())
+            sets = rows(conn, "data_sets", id_map["data_sets"].values())
+            sinks = rows(conn, "data_sinks", id_map["data_sinks"].values())
+
+        # Verify
+        assert result.counts == {"data_sources": 1, "data_sets": 1, "data_sinks": 2, "flow_nodes": 4}
+        root = nodes[result.root_node_id]
+        assert result.origin_node_id == result.root_node_id
+        assert root["parent_node_id"] is None
+        assert root["copied_from_id"] == 1
+        assert root["data_source_id"] == id_map["data_sources"][1]
+        assert {node["origin_node_id"] for node in nodes.values()} == {result.root_node_id}
+        assert nodes[id_map["flow_nodes"][3]]["parent_node_id"] == id_map["flow_nodes"][2]
+        copied_set = sets[id_map["data_sets"][1]]
+        assert copied_set["data_source_id"] == id_map["data_sources"][1]
+        assert copied_set["flow_node_id"] == id_map["flow_nodes"][2]
+        assert {sink["data_set_id"] for sink in sinks.values()} == {id_map["data_sets"][1]}
+        assert len({node["uid"] for node in nodes.values()}) == 4
+
+    def test_copies_start_fresh(self, engine):
+        """Test statuses, lifecycle timestamps and ownership are reset on copies only"""
+        build_flow(engine, 1)
+
+        # Execute
+        with engine.begin() as conn:
+            result = copy_flow(conn, 1, owner_id=7, org_id=8)
+            copied = rows(conn, "flow_nodes", [result.root_node_id])[result.root_node_id]
+            source = rows(conn, "data_sources", [result.id_map["data_sources"][1]])
+            original = rows(conn, "flow_nodes", [1])[1]
+
+        # Verify
+        assert copied["status"] == NodeStatuses.INIT
+        assert copied["activated_at"] is None
+        assert (copied["owner_id"], copied["org_id"]) == (7, 8)
+        assert list(source.values())[0]["status"] == DataSourceStatuses.INIT
+        assert original["status"] == NodeStatuses.ACTIVE
+        assert original["activated_at"] == NOW
+
+    def test_constant_statements(self, engine):
+        """Test a wide flow costs as many statements as a small one"""
+        build_flow(engine, 2, origin=1)
+        build_flow(engine, 200, origin=1000)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with engine.begin() as conn:
+            small = copy_flow(conn, 1).statements
+            large = copy_flow(conn, 1000).statements
+
+        # Verify
+        assert small == large
+        assert len(statements) == small + large
+
+    def test_batches(self, engine, monkeypatch):
+        """Test rows are written in batches"""
+        monkeypatch.setattr(flow_copy, "COPY_BATCH_SIZE", 2)
+        build_flow(engine, 5)
+
+        # Execute
+        with engine.begin() as conn:
+            result = copy_flow(conn, 1)
+            nodes = rows(conn, "flow_nodes", result.id_map["flow_nodes"].values())
+
+        # Verify
+        assert len(nodes) == 7
+        assert {node["origin_node_id"] for node in nodes.values()} == {result.root_node_id}
+
+    def test_progress(self, engine):
+        """Test progress is reported per stage up to the total"""
+        build_flow(engine, 3)
+        reports = []
+
+        # Execute
+        with engine.begin() as conn:
+            copy_flow(conn, 1, progress=lambda *report: reports.append(report))
+
+        # Verify
+        assert reports[0] == ("read", 5, 5)
+        assert reports[-1] == ("remap", 10, 10)
+        assert {stage for stage, _, _ in reports} == {"read", "insert", "remap"}
+
+    def test_unknown_node(self, engine):
+        with engine.begin() as conn:
+            result = copy_flow(conn, 99)
+
+        # Verify
+        assert result.root_node_id is None
+        assert result.counts == {}
+
+
+class TestSubtrees:
+    """Test dependent flows and attaching copies"""
+
+    def test_dependent_flows(self, engine):
+        """Test downstream nodes with a source of their own are copied only when asked"""
+        build_flow(engine, 1)
+        tables = Base.metadata.tables
+        with engine.begin() as conn:
+            conn.execute(insert(tables["data_sources"]), [{
+                "id": 50, "name": "dependent", "connector_type": "S3", "owner_id": 1, "org_id": 1,
+                "created_at": NOW, "updated_at": NOW
+            }])
+            conn.execute(insert(tables["flow_nodes"]), [
+                {**dict.fromkeys(NODE_LINKS), "id": 50, "origin_node_id": 1, "parent_node_id": 3,
+                 "data_source_id": 50, "owner_id": 1, "org_id": 1},
+                {**dict.fromkeys(NODE_LINKS), "id": 51, "origin_node_id": 1, "parent_node_id": 50,
+                 "owner_id": 1, "org_id": 1},
+            ])
+
+        # Execute
+        with engine.begin() as conn:
+            shared = copy_flow(conn, 1)
+            copied = copy_flow(conn, 1, options={"copy_dependent_data_flows": True})
+
+        # Verify
+        assert shared.counts["flow_nodes"] == 3
+        assert copied.counts["flow_nodes"] == 5
+        assert copied.counts["data_sources"] == 2
+
+    def test_attach_under_parent(self, engine):
+        """Test a copy attached under another flow joins its origin"""
+        build_flow(engine, 1, origin=1)
+        build_flow(engine, 1, origin=100)
+
+        # Execute
+        with engine.begin() as conn:
+            result = copy_flow(conn, 2, parent_node_id=102)
+            nodes = rows(conn, "flow_nodes", result.id_map["flow_nodes"].values())
+
+        # Verify
+        assert result.origin_node_id == 100
+        assert nodes[result.root_node_id]["parent_node_id"] == 102
+        assert {node["origin_node_id"] for node in nodes.values()} == {100}
+        assert "data_sources" not in {table for table, ids in result.id_map.items() if ids}
+
+        with engine.begin() as conn:
+            with pytest.raises(ValueError):
+                copy_flow(conn, 2, parent_node_id=999)
+
+
+class TestIndexes:
+    """Test the copies are indexed like resources written through the ORM"""
+
+    def test_tags_and_schema_fields(self, engine):
+        """Test copied tags are assigned and counted, and copied schemas indexed, under the copies' org"""
+        build_flow(engine, 2)
+        tables = Base.metadata.tables
+        with engine.begin() as conn:
+            conn.execute(update(tables["data_sets"]).values(
+                tags=["pii", "orders"],
+                output_schema={"type": "object", "properties": {"email": {"type": "string"}}}
+            ))
+            conn.execute(update(tables["data_sinks"]).values(tags=["pii"]))
+            conn.execute(update(tables["flow_nodes"]).where(tables["flow_nodes"].c.id == 1).values(tags='["etl"]'))
+
+        # Execute
+        with engine.begin() as conn:
+            result = copy_flow(conn, 1, org_id=8)
+            assignments = conn.execute(
+                select(tables["tag_assignments"].c.resource_type, tables["tag_assignments"].c.resource_id,
+                       tables["tag_assignments"].c.tag).where(tables["tag_assignments"].c.org_id == 8)
+            ).all()
+            counts = dict(conn.execute(
+                select(tables["tag_counts"].c.tag, tables["tag_counts"].c.count)
+                .where(tables["tag_counts"].c.org_id == 8, tables["tag_counts"].c.resource_type == "data_sinks")
+            ).all())
+            fields = conn.execute(
+                select(tables["schema_fields"].c.resource_id, tables["schema_fields"].c.path,
+                       tables["schema_fields"].c.org_id)
+            ).all()
+
+        # Verify
+        id_map = result.id_map
+        assert sorted(assignments) == sorted([
+            ("data_sets", id_map["data_sets"][1], "orders"),
+            ("data_sets", id_map["data_sets"][1], "pii"),
+            ("data_sinks", id_map["data_sinks"][1], "pii"),
+            ("data_sinks", id_map["data_sinks"][2], "pii"),
+            ("flows", id_map["flow_nodes"][1], "etl"),
+        ])
+        assert counts == {"pii": 2}
+        assert fields == [(id_map["data_sets"][1], "email", 8)]
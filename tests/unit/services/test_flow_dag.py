@@ -0,0 +1,266 @@
+"""
+Tests for parallel flow run state.
+Tests dispatch under run and org caps, failures, resuming from node rows, per-event statement counts,
+timings and critical-path makespans.
+"""
+
+import heapq
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event
+
+from app.database import Base
+from app.services.flow_dag import DagRunState, LocalSlots, slot_token
+
+T0 = datetime(2024, 6, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'flow_dag.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables["flow_node_runs"]])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def conn(engine):
+    with engine.begin() as conn:
+        yield conn
+
+
+def node(node_id, parent=None, depends_on=None):
+    return SimpleNamespace(id=node_id, name=f"node {node_id}", parent_node_id=parent, depends_on_node_ids=depends_on)
+
+
+def wide_flow(width):
+    """Source 1 fanning out to width transforms, joined by sink 100"""
+    return [node(1)] + [node(10 + i, parent=1) for i in range(width)] + [
+        node(100, parent=10, depends_on=[10 + i for i in range(1, width)])
+    ]
+
+
+def success(records=10):
+    return {"status": "success", "records_processed": records, "records_output": records}
+
+
+def unlimited(node_id):
+    return True
+
+
+def simulate(conn, rows, durations, limit, slots=None, org_id=1, run_id=1):
+    """Run a flow on a virtual clock; returns (makespan seconds, most nodes in flight, state)"""
+    state = DagRunState.create(conn, run_id, rows)
+    acquire = (lambda node_id: slots.acquire(org_id, slot_token(run_id, node_id), 2)) if slots else unlimited
+    clock = T0
+    running = []
+    peak = 0
+    for node_id in state.dispatch(limit, acquire, clock):
+        heapq.heappush(running, (clock + timedelta(seconds=durations[node_id]), node_id, clock))
+    while running:
+        peak = max(peak, len(running))
+        clock, node_id, started = heapq.heappop(running)
+        if slots:
+            slots.release(org_id, slot_token(run_id, node_id))
+        state.finish(node_id, success(), started, clock)
+        for ready_id in state.dispatch(limit, acquire, clock):
+            heapq.heappush(running, (clock + timedelta(seconds=durations[ready_id]), ready_id, clock))
+    return (clock - T0).total_seconds(), peak, state
+
+
+class TestDispatch:
+    """Test what gets dispatched"""
+
+    def test_fan_out_under_run_cap(self, conn):
+        """Test independent branches go out together, up to the run's cap"""
+        state = DagRunState.create(conn, 1, wide_flow(6))
+
+        # Execute
+        first = state.dispatch(4, unlimited, T0)
+        state.finish(1, success(), T0, T0 + timedelta(seconds=1))
+        second = state.dispatch(4, unlimited, T0)
+        third = state.dispatch(4, unlimited, T0)
+
+        # Verify
+        assert first == [1]
+        assert second == [10, 11, 12, 13]
+        assert third == []
+        assert state.in_flight() == [10, 11, 12, 13]
+        assert state.held_back
+        assert not state.finished
+
+    def test_org_cap(self, conn):
+        """Test runs of one org share its slots"""
+        slots = LocalSlots()
+        runs = [DagRunState.create(conn, run_id, [node(1), node(2), node(3)]) for run_id in range(2)]
+
+        # Execute
+        batches = [
+            run.dispatch(8, lambda node_id, run_id=run_id: slots.acquire(7, slot_token(run_id, node_id), 4), T0)
+            for run_id, run in enumerate(runs)
+        ]
+        slots.release(7, slot_token(0, 1))
+
+        # Verify
+        assert batches == [[1, 2, 3], [1]]
+        assert slots.in_use(7) == 3
+        assert slots.acquire(7, slot_token(1, 2), 4)
+        assert not slots.acquire(7, slot_token(1, 3), 4)
+        assert slots.acquire(8, slot_token(1, 3), 4)
+
+    def test_lease_expiry(self):
+        """Test slots of crashed tasks come back after their lease"""
+        slots = LocalSlots(lease_seconds=0)
+
+        # Verify
+        assert slots.acquire(1, "a", 1)
+        assert slots.acquire(1, "b", 1)
+
+
+class TestResults:
+    """Test completion, failure and resuming a run"""
+
+    def test_failure_blocks_downstream(self, conn):
+        """Test a failed branch blocks the join and its descendants while other branches finish"""
+        state = DagRunState.create(conn, 1, wide_flow(3) + [node(101, parent=100)])
+        state.dispatch(8, unlimited, T0)
+        state.finish(1, success(), T0, T0)
+        state.dispatch(8, unlimited, T0)
+
+        # Execute
+        blocked = state.finish(11, {"status": "failed", "records_processed": 4, "error_message": "boom"}, T0, T0)
+        state.finish(10, success(), T0, T0)
+        state.finish(12, success(), T0, T0)
+
+        # Verify
+        assert blocked == [100, 101]
+        assert state.finished
+        state.close()
+        assert not state.succeeded
+        assert state.nodes[11]["error_message"] == "boom"
+        assert state.nodes[100]["state"] == "blocked"
+        assert state.totals() == {"records_processed": 30, "records_success": 30, "records_failed": 4}
+
+    def test_stop_on_failure(self, conn):
+        """Test a run that stops on failure dispatches nothing more"""
+        state = DagRunState.create(conn, 1, [node(1), node(2), node(3, parent=2)], stop_on_failure=True)
+        state.dispatch(1, unlimited, T0)
+
+        # Execute
+        state.finish(1, {"status": "failed"}, T0, T0)
+
+        # Verify
+        assert state.dispatch(8, unlimited, T0) == []
+        assert state.finished
+        state.close()
+        assert {node_id: record["state"] for node_id, record in state.nodes.items()} == {
+            1: "failed", 2: "skipped", 3: "skipped"
+        }
+
+    def test_external_upstreams(self, conn):
+        """Test upstreams in other flows count as met when they had completed at the start of the run"""
+        rows = [node(1, depends_on=[90]), node(2, depends_on=[91]), node(3, parent=1)]
+        state = DagRunState.create(conn, 1, rows, completed_external=[90])
+
+        # Execute
+        first = state.dispatch(8, unlimited, T0)
+        resumed = DagRunState(conn, 1)
+        resumed.finish(1, success(), T0, T0)
+        second = resumed.dispatch(8, unlimited, T0)
+        resumed.finish(3, success(), T0, T0)
+
+        # Verify
+        assert first == [1]
+        assert second == [3]
+        assert resumed.finished
+        resumed.close()
+        assert resumed.nodes[2]["state"] == "skipped"
+
+    def test_resume_from_rows(self, conn):
+        """Test any worker can pick up a run from its node rows and results are kept once"""
+        state = DagRunState.create(conn, 1, wide_flow(2))
+        state.dispatch(8, unlimited, T0)
+        state.finish(1, success(), T0 + timedelta(seconds=1), T0 + timedelta(seconds=3))
+        state.dispatch(8, unlimited, T0 + timedelta(seconds=3))
+
+        # Execute
+        resumed = DagRunState(conn, 1)
+        resumed.finish(10, success(), T0 + timedelta(seconds=4), T0 + timedelta(seconds=5))
+        resumed.finish(10, {"status": "failed"}, T0, T0)
+
+        # Verify
+        assert resumed.in_flight() == [11]
+        assert resumed.nodes[1]["wait_ms"] == 1000
+        assert resumed.nodes[1]["duration_ms"] == 2000
+        assert resumed.nodes[10]["state"] == "success"
+        assert resumed.dispatch(8, unlimited, T0) == []
+
+    @pytest.mark.parametrize("width", [4, 80])
+    def test_constant_statements_per_event(self, engine, width):
+        """Test a completion costs the same statements however wide the flow"""
+        with engine.begin() as conn:
+            state = DagRunState.create(conn, 1, wide_flow(width))
+            state.dispatch(1000, unlimited, T0)
+            state.finish(1, success(), T0, T0)
+            state.dispatch(1000, unlimited, T0)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with engine.begin() as conn:
+            state = DagRunState(conn, 1)
+            state.finish(10, success(), T0, T0)
+            state.dispatch(1000, unlimited, T0)
+            finished = state.finished
+
+        # Verify
+        assert not finished
+        assert len(statements) == 6
+
+
+class TestMakespan:
+    """Test wide flows finish in critical-path time"""
+
+    def test_critical_path_time(self, conn):
+        """Test an unconstrained run takes its critical path, not the sum of node times"""
+        rows = wide_flow(8)
+        durations = {1: 2, 100: 1, **{10 + i: 5 + i for i in range(8)}}
+
+        # Execute
+        makespan, peak, state = simulate(conn, rows, durations, limit=16)
+        path, path_ms = state.critical_path()
+
+        # Verify
+        assert makespan == 2 + 12 + 1
+        assert sum(durations.values()) == 71
+        assert peak == 8
+        assert path == [1, 17, 100]
+        assert path_ms == 15000
+        assert state.succeeded
+
+    @pytest.mark.parametrize("limit,expected_peak", [(3, 3), (1, 1)])
+    def test_caps_bound_parallelism(self, conn, limit, expected_peak):
+        """Test the run cap bounds nodes in flight and the run still completes"""
+        rows = wide_flow(6)
+        durations = {row.id: 1 for row in rows}
+
+        # Execute
+        makespan, peak, state = simulate(conn, rows, durations, limit=limit)
+
+        # Verify
+        assert peak == expected_peak
+        assert state.succeeded
+        assert makespan == 2 + -(-6 // limit)
+
+    def test_org_cap_bounds_parallelism(self, conn):
+        """Test the org cap applies on top of the run cap"""
+        rows = wide_flow(6)
+
+        # Execute
+        _, peak, state = simulate(conn, rows, {row.id: 1 for row in rows}, limit=8, slots=LocalSlots())
+
+        # Verify
+        assert peak == 2
+        assert state.succeeded
@@ -0,0 +1,207 @@
+"""
+Tests for the flow graph.
+Tests loading an origin tree in one query, in-memory traversal, batched status updates and access checks.
+"""
+
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.orm import Session, declarative_base
+
+from app.database import Base
+from app.models.data_set import DataSetStatuses
+from app.models.data_sink import DataSinkStatuses
+from app.models.data_source import DataSourceStatuses
+from app.models.flow_node import FlowNode, NodeStatuses
+from app.services import flow_graph
+from app.services.flow_graph import FlowGraph, sync_session
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+TABLES = ("flow_nodes", "data_sources", "data_sets", "data_sinks")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'flow_graph.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def flow(engine):
+    """Origin 1 (source 10) -> 2 (set 20) -> 3 (sink 30) and 4 (set 21); 5 is another origin's node under 2"""
+    tables = Base.metadata.tables
+    owned = {"owner_id": 1, "org_id": 1}
+    links = dict.fromkeys(("data_source_id", "data_set_id", "data_sink_id", "flow_id", "project_id"))
+    with engine.begin() as conn:
+        conn.execute(insert(tables["data_sources"]), [
+            {"id": 10, "name": "source", "status": DataSourceStatuses.PAUSED, **owned}
+        ])
+        conn.execute(insert(tables["data_sets"]), [
+            {"id": 20, "name": "set", "status": DataSetStatuses.PAUSED, "created_at": NOW, "updated_at": NOW, **owned},
+            {"id": 21, "name": "other set", "status": DataSetStatuses.ACTIVE, "created_at": NOW, "updated_at": NOW, **owned},
+        ])
+        conn.execute(insert(tables["data_sinks"]), [
+            {"id": 30, "name": "sink", "connector_type": "s3", "status": DataSinkStatuses.PAUSED, **owned}
+        ])
+        conn.execute(insert(tables["flow_nodes"]), [{"status": NodeStatuses.PAUSED, **owned, **links, **row} for row in [
+            {"id": 1, "origin_node_id": 1, "parent_node_id": None, "data_source_id": 10, "flow_id": 7},
+            {"id": 2, "origin_node_id": 1, "parent_node_id": 1, "data_set_id": 20, "flow_id": 7},
+            {"id": 3, "origin_node_id": 1, "parent_node_id": 2, "data_sink_id": 30, "project_id": 9},
+            {"id": 4, "origin_node_id": 1, "parent_node_id": 2, "data_set_id": 21, "owner_id": 2},
+            {"id": 5, "origin_node_id": 5, "parent_node_id": 2},
+        ]])
+    return engine
+
+
+def statuses(engine, table_name):
+    table = Base.metadata.tables[table_name]
+    with engine.connect() as conn:
+        return {row.id: row.status.name for row in conn.execute(select(table.c.id, table.c.status))}
+
+
+class TestLoad:
+    """Test loading origin trees"""
+
+    def test_one_query(self, flow):
+        """Test nodes and their resources come back in a single statement per tree"""
+        statements = []
+        event.listen(flow, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with flow.connect() as conn:
+            graph = FlowGraph.load(conn, 1)
+            missing = FlowGraph.load(conn, 99)
+
+        # Verify
+        assert len(statements) == 2
+        assert sorted(graph.nodes) == [1, 2, 3, 4]
+        assert graph.nodes[2].children == [3, 4]
+        assert graph.nodes[1].resource_type == "data_sources"
+        assert graph.nodes[3].resource == {"id": 30, "name": "sink", "status": "PAUSED"}
+        assert [node.id for node in graph.walk()] == [1, 2, 3, 4]
+        assert [node.id for node in graph.ancestors(4)] == [2, 1]
+        assert len(missing) == 0
+
+
+class TestStatus:
+    """Test batched activation and pausing"""
+
+    def test_activate_subtree(self, flow):
+        """Test a subtree activates with one UPDATE per table and skips unchanged rows"""
+        with flow.connect() as conn:
+            graph = FlowGraph.load(conn, 1)
+        statements = []
+        event.listen(flow, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with flow.begin() as conn:
+            changes = graph.set_status(conn, True, start_id=2, resources=True)
+
+        # Verify
+        assert changes == {"flow_nodes": [2, 3, 4], "data_sets": [20], "data_sinks": [30]}
+        assert len(statements) == 3
+        assert statuses(flow, "flow_nodes") == {1: "PAUSED", 2: "ACTIVE", 3: "ACTIVE", 4: "ACTIVE", 5: "PAUSED"}
+        assert statuses(flow, "data_sources") == {10: "PAUSED"}
+        assert graph.nodes[3].status == "ACTIVE"
+        assert graph.status_changes(True, start_id=2, resources=True) == {}
+
+    def test_batches(self, flow, monkeypatch):
+        """Test large subtrees are written in chunks of ids"""
+        monkeypatch.setattr(flow_graph, "UPDATE_BATCH_SIZE", 2)
+        with flow.connect() as conn:
+            graph = FlowGraph.load(conn, 1)
+        statements = []
+        event.listen(flow, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with flow.begin() as conn:
+            graph.set_status(conn, True)
+
+        # Verify
+        assert len(statements) == 2
+        assert set(statuses(flow, "flow_nodes").values()) == {"ACTIVE", "PAUSED"}
+        assert statuses(flow, "flow_nodes")[5] == "PAUSED"
+
+
+SessionBase = declarative_base()
+
+
+class GraphFlowNode(SessionBase):
+    """Stand-in mapped onto the flow_nodes table for exercising session sync"""
+    __table__ = Base.metadata.tables["flow_nodes"]
+
+
+class TestSession:
+    """Test loaded instances see batched changes"""
+
+    def test_sync_session(self, flow):
+        """Test changed instances take the new status without becoming dirty"""
+        with Session(flow) as session:
+            loaded = session.get(GraphFlowNode, 3)
+            graph = FlowGraph.load(session, 1)
+
+            # Execute
+            changes = graph.set_status(session, True, start_id=2)
+            sync_session(session, changes, True)
+
+            # Verify
+            assert loaded.status == NodeStatuses.ACTIVE
+            assert loaded not in session.dirty
+
+    def test_flow_activate_fallback(self):
+        """Test FlowNode falls back to walking children when it has no session"""
+        child = MagicMock()
+        child.same_origin_.return_value = True
+        node = MagicMock(spec=FlowNode)
+        node.flow_graph.return_value = None
+        node.child_nodes = [child]
+
+        # Execute
+        FlowNode.flow_activate_traverse_(node, True)
+
+        # Verify
+        assert node.status == NodeStatuses.ACTIVE
+        child.flow_activate_traverse_.assert_called_once_with(True)
+
+
+
+class TestAccess:
+    """Test access checks across a tree"""
+
+    def test_flows_and_projects_asked_once(self, flow):
+        """Test each distinct flow and project is loaded and asked once for the tree"""
+        with flow.connect() as conn:
+            graph = FlowGraph.load(conn, 1)
+        owner = MagicMock()
+        owner.accessible_by_.return_value = False
+        session = MagicMock()
+        session.get.return_value = owner
+        user = MagicMock(id=2, org_id=1)
+
+        # Execute
+        accessible = {node_id for node_id in graph.nodes if graph.accessible(session, node_id, user, 'write')}
+
+        # Verify
+        assert accessible == {4}
+        assert session.get.call_count == 2
+        assert not graph.accessible(session, 1, None)
+
+    def test_org_fallback(self, flow):
+        """Test nodes whose flow is gone are readable within their org only"""
+        with flow.connect() as conn:
+            graph = FlowGraph.load(conn, 1)
+        session = MagicMock()
+        session.get.return_value = None
+
+        # Execute
+        member_read = graph.accessible(session, 2, MagicMock(id=2, org_id=1))
+        member_write = graph.accessible(session, 2, MagicMock(id=2, org_id=1), 'write')
+        outsider_read = graph.accessible(session, 2, MagicMock(id=2, org_id=3))
+
+        # Verify
+        assert (member_read, member_write, outsider_read) == (True, False, False)
@@ -0,0 +1,125 @@
+"""
+Tests for the flow readiness resolver.
+Tests indegree updates on completion and failure, cycles, and loading edges and statuses from the database.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+
+from app.database import Base
+from app.models.flow_node import NodeStatuses
+from app.services.flow_readiness import ReadinessResolver, dependency_ids
+
+
+@pytest.fixture
+def diamond():
+    """1 -> (2, 3) -> 4, and 5 on its own"""
+    return ReadinessResolver({1: [], 2: [1], 3: [1], 4: [2, 3], 5: []})
+
+
+class TestResolver:
+    """Test readiness as events arrive"""
+
+    def test_completions(self, diamond):
+        """Test nodes become ready once every upstream completes"""
+        # Verify
+        assert diamond.ready() == [1, 5]
+        assert diamond.start(1)
+        assert not diamond.start(4)
+        assert diamond.ready() == [5]
+        assert diamond.complete(1) == [2, 3]
+        assert diamond.complete(2) == []
+        assert diamond.waiting() == {4: 1}
+        assert diamond.complete(3) == [4]
+        assert diamond.complete(3) == []
+        assert diamond.next_ready() == 5
+        assert diamond.is_ready(4)
+
+    def test_failure_blocks_downstream(self, diamond):
+        """Test a failure blocks everything below it but not its siblings' own work"""
+        diamond.start(1)
+        diamond.complete(1)
+
+        # Execute
+        blocked = diamond.fail(2)
+
+        # Verify
+        assert blocked == [4]
+        assert diamond.ready() == [5, 3]
+        assert diamond.complete(3) == []
+        assert diamond.blocked() == {2, 4}
+
+    def test_cycles_never_ready(self):
+        """Test nodes waiting on each other stay waiting and the run finishes"""
+        resolver = ReadinessResolver({1: [2], 2: [1], 3: []})
+
+        # Execute
+        resolver.start(3)
+        resolver.complete(3)
+
+        # Verify
+        assert resolver.finished
+        assert resolver.waiting() == {1: 1, 2: 1}
+
+    def test_from_rows(self):
+        """Test parents and declared dependencies are both edges, and a fresh run ignores statuses"""
+        rows = [
+            SimpleNamespace(id=1, parent_node_id=None, depends_on_node_ids=None, status=NodeStatuses.COMPLETED),
+            SimpleNamespace(id=2, parent_node_id=1, depends_on_node_ids="[3]", status=NodeStatuses.INIT),
+            SimpleNamespace(id=3, parent_node_id=1, depends_on_node_ids=[], status=NodeStatuses.INIT),
+        ]
+
+        # Verify
+        assert ReadinessResolver.from_rows(rows).ready() == [3]
+        assert ReadinessResolver.from_rows(rows, include_status=False).ready() == [1]
+        assert ReadinessResolver.from_rows(rows, include_parents=False).ready() == [3]
+        assert dependency_ids('["4", 5]') == [4, 5]
+        assert dependency_ids("not json") == []
+
+
+class TestLoad:
+    """Test loading a flow from the database"""
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'readiness.db'}")
+        Base.metadata.create_all(engine, tables=[Base.metadata.tables["flow_nodes"]])
+        with engine.begin() as conn:
+            conn.execute(insert(Base.metadata.tables["flow_nodes"]), [
+                {"owner_id": 1, "org_id": 1, **row} for row in [
+                    {"id": 1, "origin_node_id": 1, "parent_node_id": None, "depends_on_node_ids": [9],
+                     "status": NodeStatuses.ACTIVE},
+                    {"id": 2, "origin_node_id": 1, "parent_node_id": 1, "depends_on_node_ids": [8],
+                     "status": NodeStatuses.ACTIVE},
+                    {"id": 8, "origin_node_id": 8, "parent_node_id": None, "depends_on_node_ids": None,
+                     "status": NodeStatuses.ACTIVE},
+                    {"id": 9, "origin_node_id": 9, "parent_node_id": None, "depends_on_node_ids": None,
+                     "status": NodeStatuses.COMPLETED},
+                ]
+            ])
+        yield engine
+        engine.dispose()
+
+    def test_external_dependencies(self, engine):
+        """Test upstreams in other flows count only when completed, in two queries"""
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with engine.connect() as conn:
+            resolver = ReadinessResolver.load(conn, origin_node_id=1)
+
+        # Verify
+        assert len(statements) == 2
+        assert len(resolver) == 2
+        assert resolver.ready() == [1]
+        resolver.start(1)
+        assert resolver.complete(1) == []
+        assert resolver.complete(8) == [2]
+
+    def test_requires_scope(self, engine):
+        with engine.connect() as conn:
+            with pytest.raises(ValueError):
+                ReadinessResolver.load(conn)
@@ -0,0 +1,223 @@
+"""
+Tests for the flow scheduler.
+Tests cron next-fire times across timezones and DST, the fire heap, bulk claiming and on-time fires within a tick.
+"""
+
+import heapq
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, func, insert, select
+
+from app.database import Base
+from app.models.flow import RunStatuses, ScheduleTypes
+from app.services.flow_scheduler import FireHeap, FlowScheduler, next_fire_time, parse_cron
+
+T0 = datetime(2024, 6, 3, 12, 0, 0)  # a Monday
+
+
+class FakeClock:
+    """Naive UTC clock that only moves when set"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestCron:
+    """Test cron next-fire times"""
+
+    @pytest.mark.parametrize("expression,after,expected", [
+        ("*/15 * * * *", datetime(2024, 6, 3, 12, 7, 30), datetime(2024, 6, 3, 12, 15)),
+        ("0 9-17/4 * * *", datetime(2024, 6, 3, 13, 0), datetime(2024, 6, 3, 17, 0)),
+        ("*/15 9-17 * * mon-fri", datetime(2024, 6, 7, 21, 50), datetime(2024, 6, 10, 9, 0)),
+        ("0 0 1 jan,jul *", datetime(2024, 6, 3), datetime(2024, 7, 1)),
+        ("@daily", datetime(2024, 12, 31, 23, 59, 59), datetime(2025, 1, 1)),
+        ("0 0 29 2 *", datetime(2024, 3, 1), datetime(2028, 2, 29)),
+        ("0 12 13 * 5", datetime(2024, 6, 1), datetime(2024, 6, 7, 12, 0)),
+        ("0 0 * * 7", datetime(2024, 6, 3), datetime(2024, 6, 9)),
+    ])
+    def test_next_after(self, expression, after, expected):
+        """Test lists, ranges, steps, names, macros and either-day matching"""
+        assert parse_cron(expression).next_after(after) == expected
+
+    def test_timezones_and_dst(self):
+        """Test wall times are kept in the flow's zone, with gaps fired late and repeats fired once"""
+        cron = parse_cron("30 2 * * *")
+
+        # Verify
+        assert cron.next_after(datetime(2024, 6, 3), "Asia/Kolkata") == datetime(2024, 6, 3, 21, 0)
+        assert cron.next_after(datetime(2024, 3, 10, 5, 0), "America/New_York") == datetime(2024, 3, 10, 7, 30)
+        assert cron.next_after(datetime(2024, 11, 3, 5, 0), "America/New_York") == datetime(2024, 11, 3, 7, 30)
+        assert cron.next_after(datetime(2024, 11, 3, 7, 30), "America/New_York") == datetime(2024, 11, 4, 7, 30)
+
+    @pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* * * foo *", "*/0 * * * *", "5-1 * * * *"])
+    def test_invalid(self, expression):
+        with pytest.raises(ValueError):
+            parse_cron(expression)
+
+    def test_schedule_types(self):
+        """Test intervals keep their cadence and one-offs fire once"""
+        # Verify
+        assert next_fire_time(ScheduleTypes.INTERVAL, {"interval_seconds": 20}, T0 + timedelta(seconds=65),
+                              previous=T0) == T0 + timedelta(seconds=80)
+        assert next_fire_time("interval", {"interval_minutes": 5}, T0) == T0 + timedelta(minutes=5)
+        assert next_fire_time("once", {"run_at": "2024-06-03T14:00:00+02:00"}, T0 - timedelta(hours=1)) == T0
+        assert next_fire_time("once", {"run_at": T0.isoformat()}, T0) is None
+        assert next_fire_time(ScheduleTypes.EVENT_DRIVEN, {}, T0) is None
+        with pytest.raises(ValueError):
+            next_fire_time("cron", {"cron_expression": "0 * * * *", "timezone": "Mars/Olympus"}, T0)
+
+
+class TestFireHeap:
+    """Test the heap of upcoming fires"""
+
+    def test_replace_and_pop_due(self):
+        """Test a flow pushed again keeps only its latest fire"""
+        heap = FireHeap()
+        heap.push(1, T0 + timedelta(seconds=30))
+        heap.push(2, T0 + timedelta(seconds=10))
+        heap.push(1, T0 + timedelta(seconds=5))
+        heap.push(3, T0 + timedelta(seconds=50))
+        heap.discard(3)
+
+        # Verify
+        assert len(heap) == 2
+        assert heap.next_fire_at() == T0 + timedelta(seconds=5)
+        assert heap.fire_times() == [T0 + timedelta(seconds=5), T0 + timedelta(seconds=10)]
+        assert heap.pop_due(T0 + timedelta(seconds=20)) == [1, 2]
+        assert heap.next_fire_at() is None
+
+
+class TestScheduler:
+    """Test claiming due flows from the database"""
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'scheduler.db'}")
+        Base.metadata.create_all(engine, tables=[Base.metadata.tables["flows"], Base.metadata.tables["flow_runs"]])
+        yield engine
+        engine.dispose()
+
+    @staticmethod
+    def add_flows(engine, flows, runs=()):
+        tables = Base.metadata.tables
+        with engine.begin() as conn:
+            conn.execute(insert(tables["flows"]), [{
+                "name": f"flow {flow['id']}", "owner_id": 1, "org_id": 1, "is_active": True, **flow
+            } for flow in flows])
+            if runs:
+                conn.execute(insert(tables["flow_runs"]), list(runs))
+
+    @staticmethod
+    def cron(flow_id, expression="*/5 * * * *", next_run_at=T0, **extra):
+        return {"id": flow_id, "schedule_type": ScheduleTypes.CRON, "next_run_at": next_run_at,
+                "schedule_config": {"cron_expression": expression}, "is_active": True, **extra}
+
+    def test_bulk_claim(self, engine):
+        """Test due flows are claimed and advanced in a fixed number of statements per batch"""
+        self.add_flows(
+            engine,
+            [self.cron(flow_id) for flow_id in range(1, 1201)] + [
+                self.cron(1201, is_active=False),
+                self.cron(1202, next_run_at=T0 + timedelta(minutes=1)),
+                self.cron(1203, expression="61 * * * *"),
+                {"id": 1204, "schedule_type": ScheduleTypes.MANUAL, "next_run_at": T0, "schedule_config": None},
+            ],
+            runs=[{"flow_id": 1, "run_number": 7, "status": RunStatuses.SUCCESS}]
+        )
+        statements, dispatched = [], []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with engine.connect() as conn:
+            runs = FlowScheduler(conn, batch_size=500).claim_due(dispatched.append, T0)
+
+        # Verify
+        assert len(runs) == 1200
+        # SQLite can't return ids in parameter order from one INSERT, so runs go in one at a time
+        assert len([sql for sql in statements if not sql.startswith("INSERT")]) == 3 * 3
+        assert sorted(dispatched) == sorted(run.flow_run_id for run in runs)
+        with engine.connect() as conn:
+            flows = Base.metadata.tables["flows"]
+            flow_runs = Base.metadata.tables["flow_runs"]
+            next_runs = dict(conn.execute(select(flows.c.id, flows.c.next_run_at)).all())
+            numbers = dict(conn.execute(
+                select(flow_runs.c.flow_id, flow_runs.c.run_number).where(flow_runs.c.status == RunStatuses.QUEUED)
+            ).all())
+            log = conn.execute(select(flow_runs.c.log_data).where(flow_runs.c.flow_id == 2)).scalar_one()
+        assert next_runs[2] == T0 + timedelta(minutes=5)
+        assert next_runs[1203] is None
+        assert (next_runs[1201], next_runs[1202], next_runs[1204]) == (T0, T0 + timedelta(minutes=1), T0)
+        assert numbers[1] == 8 and numbers[2] == 1
+        assert {1201, 1202, 1203, 1204}.isdisjoint(numbers)
+        assert log == {"scheduled_for": T0.isoformat()}
+
+    def test_claimed_once(self, engine):
+        """Test a second scheduler finds nothing left to fire"""
+        self.add_flows(engine, [self.cron(flow_id) for flow_id in range(1, 11)])
+        fired = []
+
+        # Execute
+        with engine.connect() as first, engine.connect() as second:
+            FlowScheduler(first).claim_due(fired.append, T0)
+            FlowScheduler(second).claim_due(fired.append, T0 + timedelta(seconds=30))
+
+        # Verify
+        assert len(fired) == 10
+
+    def test_failed_dispatch_is_requeued(self, engine):
+        """Test a run the broker refused is dropped and its flow left due for the next tick"""
+        self.add_flows(engine, [self.cron(flow_id) for flow_id in range(1, 4)])
+        flow_runs = Base.metadata.tables["flow_runs"]
+        dispatched = []
+
+        def dispatch(run_id):
+            if len(dispatched) == 1:
+                dispatched.append(None)
+                raise ConnectionError("broker down")
+            dispatched.append(run_id)
+
+        # Execute
+        with engine.connect() as conn:
+            scheduler = FlowScheduler(conn)
+            runs = scheduler.claim_due(dispatch, T0)
+            retried = FlowScheduler(conn).claim_due(dispatched.append, T0 + timedelta(seconds=30))
+
+        # Verify
+        assert len(runs) == 2 and len(retried) == 1
+        assert scheduler.requeued == [retried[0].flow_id]
+        assert retried[0].scheduled_for == T0
+        with engine.connect() as conn:
+            assert conn.execute(select(func.count()).select_from(flow_runs)).scalar_one() == 3
+
+    def test_fires_on_time_within_tick(self, engine):
+        """Test sub-minute fires land when due through wakeups, rather than on the next tick"""
+        self.add_flows(engine, [
+            {"id": 1, "schedule_type": ScheduleTypes.INTERVAL, "schedule_config": {"interval_seconds": 20},
+             "next_run_at": T0 - timedelta(seconds=45)},
+            self.cron(2, expression="1 12 * * *", next_run_at=T0 + timedelta(minutes=1)),
+            self.cron(3, next_run_at=T0 + timedelta(minutes=5)),
+        ])
+        clock = FakeClock(T0)
+        fired, wakeups = [], []
+
+        def wake(fire_at, until):
+            heapq.heappush(wakeups, (fire_at, until))
+
+        # Execute: the tick, then each wakeup at its eta as Celery would run it
+        with engine.connect() as conn:
+            summaries = [FlowScheduler(conn, clock=clock).run(90, lambda run_id: fired.append(clock.now), wake)]
+            first_wakeups = sorted(fire_at for fire_at, _ in wakeups)
+            while wakeups:
+                clock.now, until = heapq.heappop(wakeups)
+                summaries.append(FlowScheduler(conn, clock=clock).fire(until, lambda run_id: fired.append(clock.now), wake))
+
+        # Verify
+        assert fired == [T0 + timedelta(seconds=seconds) for seconds in (0, 15, 35, 55, 60, 75)]
+        assert first_wakeups == [T0 + timedelta(seconds=15), T0 + timedelta(minutes=1)]
+        assert sum(summary["scheduled_count"] for summary in summaries) == 6
+        assert max(summary["max_lag_seconds"] for summary in summaries) == 45
+        assert clock.now == T0 + timedelta(seconds=75)
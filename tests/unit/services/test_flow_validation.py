@@ -0,0 +1,149 @@
+"""
+Tests for incremental flow validation.
+Tests definition checks, and that only flows whose definition hash changed are validated again.
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, insert, select, update
+
+from app.database import Base
+from app.models.flow import ScheduleTypes
+from app.services.flow_validation import FlowValidator, chunked, validate_definition
+
+T0 = datetime(2024, 6, 1, 12, 0, 0)
+
+
+def flow(**overrides):
+    values = {"name": "Orders", "description": None, "owner_id": 1, "org_id": 1, "timeout_minutes": 60,
+              "retry_count": 3, "max_parallel_runs": 1, "schedule_type": ScheduleTypes.MANUAL, "schedule_config": None}
+    return SimpleNamespace(**{**values, **overrides})
+
+
+def node(node_id, parent=None, depends_on=None, data_set_id=1):
+    return SimpleNamespace(id=node_id, parent_node_id=parent, depends_on_node_ids=depends_on,
+                           data_source_id=None, data_set_id=data_set_id, data_sink_id=None)
+
+
+class TestDefinition:
+    """Test the checks on one flow"""
+
+    def test_valid(self):
+        """Test upstreams in other flows do not count as missing"""
+        errors, warnings = validate_definition(flow(), [node(1, depends_on=[99]), node(2, parent=1)], T0)
+
+        # Verify
+        assert errors == []
+        assert warnings == []
+
+    def test_errors_and_warnings(self):
+        """Test field, schedule and dependency errors, and nodes without resources"""
+        errors, warnings = validate_definition(
+            flow(name="bad/name", schedule_type=ScheduleTypes.CRON, schedule_config={"cron_expression": "* *"}),
+            [node(1), node(2, parent=1, depends_on=[3]), node(3, depends_on=[2], data_set_id=None)],
+            T0
+        )
+
+        # Verify
+        assert errors[0] == "Name contains invalid characters"
+        assert errors[1].startswith("Invalid schedule: Cron expression must have 5 fields")
+        assert errors[2] == "Nodes [2, 3] depend on each other"
+        assert warnings == ["Node 3 has no data source, data set or data sink"]
+        assert validate_definition(flow(), [], T0) == ([], ["Flow has no nodes"])
+
+    def test_chunked(self):
+        assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+class TestValidator:
+    """Test incremental validation against the database"""
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'validation.db'}")
+        tables = Base.metadata.tables
+        Base.metadata.create_all(engine, tables=[tables["flows"], tables["flow_nodes"]])
+        with engine.begin() as conn:
+            conn.execute(insert(tables["flows"]), [
+                {"id": flow_id, "name": f"flow {flow_id}", "owner_id": 1, "org_id": 1,
+                 "is_active": flow_id != 6, "created_at": T0, "updated_at": T0}
+                for flow_id in range(1, 7)
+            ])
+            conn.execute(insert(tables["flow_nodes"]), [
+                {"id": flow_id * 10 + i, "flow_id": flow_id, "parent_node_id": flow_id * 10 if i else None,
+                 "data_set_id": 1, "owner_id": 1, "org_id": 1, "updated_at": T0}
+                for flow_id in range(1, 6) for i in range(3)
+            ])
+            conn.execute(update(tables["flows"]).where(tables["flows"].c.id == 5).values(name="flow #5", updated_at=T0))
+        yield engine
+        engine.dispose()
+
+    @staticmethod
+    def validate_all(engine, chunk_size=2):
+        """What flow.validate_all and its chunk tasks do, inline"""
+        with engine.connect() as conn:
+            validator = FlowValidator(conn, stream_batch_size=2)
+            chunks = list(validator.changed_chunks(chunk_size))
+        results = []
+        for flow_ids in chunks:
+            with engine.begin() as conn:
+                results.append(FlowValidator(conn).validate(flow_ids, T0))
+        return validator, chunks, results
+
+    def test_only_changed_flows(self, engine):
+        """Test a second run validates nothing until a flow or one of its nodes changes"""
+        flows, nodes = Base.metadata.tables["flows"], Base.metadata.tables["flow_nodes"]
+        first, first_chunks, results = self.validate_all(engine)
+
+        # Execute
+        second, second_chunks, _ = self.validate_all(engine)
+        with engine.begin() as conn:
+            conn.execute(update(flows).where(flows.c.id == 2).values(retry_count=5))
+            conn.execute(update(nodes).where(nodes.c.id == 31).values(parent_node_id=None))
+        third, third_chunks, _ = self.validate_all(engine)
+
+        # Verify
+        assert (first.scanned, first.changed, first_chunks) == (5, 5, [[1, 2], [3, 4], [5]])
+        assert sum(result["invalid_flows"] for result in results) == 1
+        assert results[2]["errors"] == {5: ["Name contains invalid characters"]}
+        assert (second.scanned, second.changed) == (5, 0)
+        assert third_chunks == [[2, 3]]
+
+    def test_node_edits_keeping_updated_at(self, engine):
+        """Test bulk node edits that leave updated_at alone still change the hash"""
+        nodes = Base.metadata.tables["flow_nodes"]
+        self.validate_all(engine)
+
+        # Execute
+        with engine.begin() as conn:
+            conn.execute(update(nodes).where(nodes.c.id == 11).values(parent_node_id=12, updated_at=T0))
+            conn.execute(update(nodes).where(nodes.c.id == 12).values(parent_node_id=11, updated_at=T0))
+            conn.execute(update(nodes).where(nodes.c.id == 41).values(data_set_id=None, data_sink_id=1, updated_at=T0))
+        validator, chunks, results = self.validate_all(engine)
+
+        # Verify
+        assert chunks == [[1, 4]]
+        assert results[0]["errors"] == {1: ["Nodes [11, 12] depend on each other"]}
+
+    def test_results_stored_in_bulk(self, engine):
+        """Test a chunk is read in two queries and written in one, without touching updated_at"""
+        flows = Base.metadata.tables["flows"]
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with engine.begin() as conn:
+            summary = FlowValidator(conn).validate([1, 2, 3, 4, 5], T0)
+
+        # Verify
+        assert len(statements) == 3
+        assert summary["validated_flows"] == 5
+        with engine.connect() as conn:
+            row = conn.execute(select(flows).where(flows.c.id == 5)).one()
+        assert row.validation_valid is False
+        assert row.validation_errors == {"errors": ["Name contains invalid characters"], "warnings": []}
+        assert row.validated_at == T0
+        assert row.updated_at == T0
+        assert len(row.validation_hash) == 64
@@ -0,0 +1,282 @@
+"""
+Tests for latency sketches.
+Tests DDSketch accuracy and merging, time windows, the latency tracker and sharing between processes.
+"""
+
+import random
+import pytest
+
+from app.services.latency_sketch import DDSketch, WindowedSketch, LatencyTracker, SharedLatencyStore, summarize
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class FakeRedis:
+    """Synchronous Redis stand-in with the hash and sorted set commands the shared store uses"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.zsets = {}
+        self.expires = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({k.encode(): v.encode() for k, v in mapping.items()})
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field.encode())
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def expire(self, key, seconds):
+        self.expires[key] = seconds
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+
+    def zrangebyscore(self, key, low, high):
+        return [m.encode() for m, score in self.zsets.get(key, {}).items() if score >= low]
+
+
+class FakePipeline:
+    """Queues commands and runs them on execute"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class TestDDSketch:
+    """Test DDSketch functionality"""
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Test estimates stay within the configured relative error"""
+        rng = random.Random(42)
+        values = [rng.lognormvariate(-3, 1.5) for _ in range(20000)]
+        sketch = DDSketch(relative_accuracy=0.01)
+
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.95, 0.99, 0.999):
+            expected = exact_quantile(values, q)
+            assert sketch.quantile(q) == pytest.approx(expected, rel=0.011)
+        assert sketch.count == 20000
+        assert sketch.quantile(0) == min(values)
+        assert sketch.quantile(1) == max(values)
+
+    def test_merge_matches_single_sketch(self):
+        """Test merged sketches answer like one sketch fed every value"""
+        rng = random.Random(7)
+        values = [rng.expovariate(10) for _ in range(5000)]
+        combined, left, right = DDSketch(), DDSketch(), DDSketch()
+
+        for i, value in enumerate(values):
+            combined.add(value)
+            (left if i % 2 else right).add(value)
+        left.merge(right)
+
+        assert left.bins == combined.bins
+        assert left.count == combined.count
+        assert left.percentiles() == combined.percentiles()
+
+    def test_merge_rejects_different_accuracy(self):
+        """Test only compatible sketches merge"""
+        with pytest.raises(ValueError):
+            DDSketch(0.01).merge(DDSketch(0.02))
+
+    def test_bucket_count_is_bounded(self):
+        """Test low buckets collapse once max_buckets is reached"""
+        sketch = DDSketch(relative_accuracy=0.01, max_buckets=64)
+
+        for exponent in range(-6, 4):
+            for step in range(1, 100):
+                sketch.add(step * 10 ** exponent)
+
+        assert len(sketch.bins) <= 64
+        assert sketch.quantile(0.99) == pytest.approx(exact_quantile(
+            [step * 10 ** e for e in range(-6, 4) for step in range(1, 100)], 0.99
+        ), rel=0.011)
+
+    def test_zero_and_empty(self):
+        """Test zero durations and empty sketches"""
+        sketch = DDSketch()
+        assert sketch.quantile(0.5) is None
+        assert sketch.mean is None
+
+        sketch.add(0)
+        sketch.add(0)
+        sketch.add(1.0)
+
+        assert sketch.quantile(0.5) == 0.0
+        assert sketch.zero_count == 2
+
+    def test_serialization_round_trip(self):
+        """Test sketches can be shipped between processes"""
+        sketch = DDSketch()
+        for value in (0.01, 0.02, 0.5, 3.0):
+            sketch.add(value)
+
+        restored = DDSketch.from_dict(sketch.to_dict())
+
+        assert restored.percentiles() == sketch.percentiles()
+        assert restored.min == 0.01
+        assert restored.max == 3.0
+
+
+class TestWindowedSketch:
+    """Test WindowedSketch functionality"""
+
+    def test_lookback_only_includes_recent_windows(self):
+        """Test values older than the lookback are excluded"""
+        sketch = WindowedSketch(window_seconds=60, max_windows=10)
+        sketch.add(5.0, now=0)
+        sketch.add(0.1, now=600)
+        sketch.add(0.2, now=630)
+
+        recent = sketch.merged(window_seconds=60, now=640)
+        everything = sketch.merged(now=640)
+
+        assert recent.count == 2
+        assert recent.max == 0.2
+        assert everything.count == 3
+
+    def test_old_windows_are_dropped(self):
+        """Test memory is bounded by max_windows"""
+        sketch = WindowedSketch(window_seconds=1, max_windows=5)
+
+        for second in range(20):
+            sketch.add(0.1, now=second)
+
+        assert len(sketch._windows) == 5
+        assert sketch.merged(window_seconds=3600, now=19).count == 5
+        assert sketch.total.count == 20
+
+
+class TestLatencyTracker:
+    """Test LatencyTracker functionality"""
+
+    def test_records_per_kind_and_name(self):
+        """Test series are kept per kind and summarized in milliseconds"""
+        tracker = LatencyTracker()
+        tracker.record("route", "GET /flows/{flow_id}", 0.010)
+        tracker.record("route", "GET /flows/{flow_id}", 0.020)
+        tracker.record("task", "flow.execute", 2.0)
+
+        rows = tracker.summary("route")
+
+        assert len(rows) == 1
+        assert rows[0]["name"] == "GET /flows/{flow_id}"
+        assert rows[0]["count"] == 2
+        assert rows[0]["p50_ms"] == pytest.approx(10, rel=0.011)
+        assert rows[0]["mean_ms"] == pytest.approx(15)
+        assert tracker.merged("task", "flow.execute").count == 1
+        assert tracker.merged("task", "missing").count == 0
+
+    def test_least_recently_used_series_evicted(self):
+        """Test the number of series per kind is capped"""
+        tracker = LatencyTracker()
+        tracker.MAX_SERIES = 2
+        tracker.record("flow_node", "1", 0.1)
+        tracker.record("flow_node", "2", 0.1)
+        tracker.record("flow_node", "1", 0.1)
+        tracker.record("flow_node", "3", 0.1)
+
+        names = [row["name"] for row in tracker.summary("flow_node")]
+
+        assert sorted(names) == ["1", "3"]
+
+    def test_summarize_empty_sketch(self):
+        """Test an empty sketch summarizes to nulls"""
+        summary = summarize(DDSketch())
+
+        assert summary == {
+            "count": 0, "mean_ms": None,
+            "p50_ms": None, "p95_ms": None, "p99_ms": None, "p999_ms": None
+        }
+
+
+class TestSharedLatency:
+    """Test merging latency series recorded in other processes"""
+
+    def test_windowed_round_trip(self):
+        """Test windows survive serialization so lookbacks still apply"""
+        sketch = WindowedSketch(window_seconds=10, max_windows=6)
+        sketch.add(0.01, now=1000)
+        sketch.add(0.5, now=1045)
+
+        # Execute
+        restored = WindowedSketch.from_dict(sketch.to_dict())
+
+        # Verify
+        assert sketch.dirty is False
+        assert restored.merged(now=1045).count == 2
+        assert restored.merged(window_seconds=10, now=1045).count == 1
+
+    def test_reads_merge_every_process(self):
+        """Test the API process reports task and route latency recorded by workers"""
+        redis_client = FakeRedis()
+        api, worker_1, worker_2 = LatencyTracker(), LatencyTracker(), LatencyTracker()
+        api.store = SharedLatencyStore(redis_client, process_id="api:1")
+        worker_1.store = SharedLatencyStore(redis_client, process_id="worker:1")
+        worker_2.store = SharedLatencyStore(redis_client, process_id="worker:2")
+        api.record("route", "GET /flows", 0.02)
+        worker_1.record("task", "flow.execute", 0.1)
+        worker_1.record("flow_node", "7", 0.3)
+        worker_2.record("task", "flow.execute", 0.2)
+
+        # Execute
+        published = [api.publish(), worker_1.publish(), worker_2.publish()]
+        rows = api.summary("task")
+
+        # Verify
+        assert published == [1, 2, 1]
+        assert worker_1.publish() == 0
+        assert rows[0]["name"] == "flow.execute" and rows[0]["count"] == 2
+        assert api.merged("flow_node", "7").count == 1
+        assert api.merged("route").count == 1
+        assert worker_1.merged("route").count == 1
+        assert redis_client.expires["latency:task:worker:1"] == 3900
+
+    def test_stale_processes_dropped(self):
+        """Test series of a process that stopped publishing are no longer merged"""
+        redis_client = FakeRedis()
+        old = SharedLatencyStore(redis_client, process_id="worker:1", ttl_seconds=60)
+        reader = SharedLatencyStore(redis_client, process_id="api:1", ttl_seconds=60)
+        sketch = WindowedSketch()
+        sketch.add(0.1)
+        old.publish({"task": {"flow.execute": sketch}}, now=1000)
+
+        # Verify
+        assert len(reader.load("task", now=1030)["flow.execute"]) == 1
+        assert reader.load("task", now=1100) == {}
+
+    def test_store_errors_fall_back_to_local(self):
+        """Test a Redis outage only hides other processes' series"""
+        class BrokenRedis(FakeRedis):
+            def zrangebyscore(self, key, low, high):
+                raise ConnectionError("redis down")
+
+        tracker = LatencyTracker()
+        tracker.store = SharedLatencyStore(BrokenRedis(), process_id="api:1")
+        tracker.record("route", "GET /flows", 0.02)
+
+        # Verify
+        assert tracker.merged("route").count == 1
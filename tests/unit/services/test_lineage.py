@@ -0,0 +1,137 @@
+"""
+Tests for lineage queries.
+Tests ancestor, descendant, depth, root and upstream splitter questions over data sets and flow nodes.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, insert, update
+
+from app.database import Base
+from app.models.data_set import DataSetTypes
+from app.services import lineage
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'lineage.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in ("data_sets", "flow_nodes")])
+    yield engine
+    engine.dispose()
+
+
+def insert_data_sets(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(insert(Base.metadata.tables["data_sets"]), [
+            {"name": f"set {row['id']}", "owner_id": 1, "org_id": 1, "parent_data_set_id": None,
+             "data_set_type": DataSetTypes.TRANSFORM, "transform_config": None,
+             "created_at": NOW, "updated_at": NOW, **row}
+            for row in rows
+        ])
+
+
+@pytest.fixture
+def chain(engine):
+    """1 <- 2 <- 3 <- 4, with 5 and 6 also under 2 and 7 under 5"""
+    insert_data_sets(engine, [
+        {"id": 1},
+        {"id": 2, "parent_data_set_id": 1},
+        {"id": 3, "parent_data_set_id": 2},
+        {"id": 4, "parent_data_set_id": 3},
+        {"id": 6, "parent_data_set_id": 2},
+        {"id": 5, "parent_data_set_id": 2},
+        {"id": 7, "parent_data_set_id": 5},
+    ])
+    return engine
+
+
+class TestDataSetLineage:
+    """Test data set lineage questions"""
+
+    def test_ancestors_depth_and_root(self, chain):
+        """Test walking up from a leaf and from the root"""
+        with chain.connect() as conn:
+            # Verify
+            assert lineage.ancestor_ids(conn, "data_sets", 4) == [3, 2, 1]
+            assert lineage.depth(conn, "data_sets", 4) == 3
+            assert lineage.root_id(conn, "data_sets", 4) == 1
+            assert lineage.ancestor_ids(conn, "data_sets", 1) == []
+            assert lineage.depth(conn, "data_sets", 1) == 0
+            assert lineage.root_id(conn, "data_sets", 1) == 1
+
+    def test_descendants_depth_first(self, chain):
+        """Test the subtree comes back in pre-order with siblings by id"""
+        with chain.connect() as conn:
+            rows = lineage.descendants(conn, "data_sets", 1)
+
+        # Verify
+        assert [row[0] for row in rows] == [2, 3, 4, 5, 7, 6]
+        assert rows[0] == (2, 1, 1)
+        assert rows[2] == (4, 3, 3)
+
+    def test_each_question_is_one_query(self, chain):
+        """Test a deep walk costs a single statement"""
+        statements = []
+        event.listen(chain, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with chain.connect() as conn:
+            lineage.descendants(conn, "data_sets", 1)
+            lineage.depth(conn, "data_sets", 4)
+
+        # Verify
+        assert len(statements) == 2
+
+    def test_upstream_splitter(self, chain):
+        """Test splitters are found by type or transform operation within the lookup limit"""
+        table = Base.metadata.tables["data_sets"]
+        with chain.begin() as conn:
+            assert not lineage.upstream_has_splitter(conn, 4)
+            conn.execute(update(table).where(table.c.id == 1).values(
+                transform_config={"operation": "nexla.splitter"}
+            ))
+
+            # Verify
+            assert lineage.upstream_has_splitter(conn, 4)
+            assert not lineage.upstream_has_splitter(conn, 4, limit=2)
+            assert not lineage.upstream_has_splitter(conn, 1)
+            conn.execute(update(table).where(table.c.id == 3).values(data_set_type=DataSetTypes.SPLITTER))
+            assert lineage.upstream_has_splitter(conn, 4, limit=1)
+
+    def test_cycles_are_bounded(self, engine):
+        """Test corrupt cyclic links stop at the depth limit"""
+        insert_data_sets(engine, [{"id": 1, "parent_data_set_id": 2}, {"id": 2, "parent_data_set_id": 1}])
+
+        with engine.connect() as conn:
+            # Verify
+            assert lineage.depth(conn, "data_sets", 1, max_depth=10) == 10
+            assert lineage.descendants(conn, "data_sets", 1, max_depth=5) == [(2, 1, 1)]
+
+
+class TestFlowNodeLineage:
+    """Test flow node lineage questions"""
+
+    def test_same_origin_descendants(self, engine):
+        """Test a shared downstream flow of another origin can be left out"""
+        with engine.begin() as conn:
+            conn.execute(insert(Base.metadata.tables["flow_nodes"]), [{"owner_id": 1, "org_id": 1, **row} for row in [
+                {"id": 1, "origin_node_id": 1, "parent_node_id": None},
+                {"id": 2, "origin_node_id": 1, "parent_node_id": 1},
+                {"id": 3, "origin_node_id": 3, "parent_node_id": 2},
+                {"id": 4, "origin_node_id": 3, "parent_node_id": 3},
+                {"id": 5, "origin_node_id": 1, "parent_node_id": 2},
+            ]])
+
+        with engine.connect() as conn:
+            # Verify
+            assert [row[0] for row in lineage.descendants(conn, "flow_nodes", 1)] == [2, 3, 4, 5]
+            assert [row[0] for row in lineage.descendants(conn, "flow_nodes", 1, same_origin=True)] == [2, 5]
+            assert lineage.ancestor_ids(conn, "flow_nodes", 4) == [3, 2, 1]
+
+    def test_unknown_table(self, engine):
+        with engine.connect() as conn:
+            with pytest.raises(ValueError):
+                lineage.depth(conn, "projects", 1)
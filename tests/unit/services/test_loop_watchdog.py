@@ -0,0 +1,91 @@
+"""
+Tests for EventLoopWatchdog.
+Tests stall detection, stack capture and route attribution.
+"""
+
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+from app.middleware import RequestContext
+from app.services.loop_watchdog import EventLoopWatchdog, find_request
+
+
+def blocking_handler(scope):
+    time.sleep(0.25)
+
+
+class TestEventLoopWatchdog:
+    """Test EventLoopWatchdog functionality"""
+
+    def run_with_watchdog(self, body):
+        watchdog = EventLoopWatchdog(threshold_ms=50)
+
+        async def main():
+            watchdog.start()
+            await asyncio.sleep(0.05)
+            await body()
+            await asyncio.sleep(0.05)
+            watchdog.stop()
+
+        asyncio.run(main())
+        return watchdog
+
+    def test_captures_blocking_stack_and_route(self):
+        """Test a blocking call is reported with its stack and route"""
+        async def request():
+            scope = {"type": "http", "method": "GET", "path": "/api/v1/flows/7",
+                     "route": SimpleNamespace(path="/api/v1/flows/{flow_id}")}
+            blocking_handler(scope)
+
+        # Execute
+        watchdog = self.run_with_watchdog(request)
+
+        # Verify
+        assert len(watchdog.events) == 1
+        event = watchdog.recent()[0]
+        assert event["route"] == "/api/v1/flows/{flow_id}"
+        assert event["method"] == "GET"
+        assert event["finished"] is True
+        assert event["blocked_ms"] >= 200
+        assert any("blocking_handler" in line for line in event["stack"])
+
+    def test_no_events_when_loop_is_responsive(self):
+        """Test awaiting code does not trigger the watchdog"""
+        async def request():
+            for _ in range(10):
+                await asyncio.sleep(0.01)
+
+        watchdog = self.run_with_watchdog(request)
+
+        assert watchdog.recent() == []
+
+    def test_background_block_has_no_route(self):
+        """Test stalls outside requests are still reported"""
+        async def job():
+            time.sleep(0.2)
+
+        watchdog = self.run_with_watchdog(job)
+
+        assert watchdog.recent()[0]["route"] is None
+
+
+class TestFindRequest:
+    """Test find_request attribution"""
+
+    def test_prefers_request_context(self):
+        """Test the pipeline's RequestContext gives the route template"""
+        ctx = RequestContext({
+            "type": "http", "method": "POST", "path": "/x/1", "headers": [], "client": None,
+            "route": SimpleNamespace(path="/x/{id}")
+        })
+
+        method, route = find_request(sys._getframe())
+
+        assert (method, route) == ("POST", "/x/{id}")
+        del ctx
+
+    def test_outside_request(self):
+        """Test frames without request locals"""
+        assert find_request(sys._getframe()) == (None, None)
@@ -0,0 +1,231 @@
+"""
+Tests for multiprocess metrics.
+Tests mmap-backed value files and merging of per-worker files on scrape.
+"""
+
+import os
+import pytest
+from unittest.mock import patch
+
+from app.services.metrics_multiprocess import (
+    MmapedDict,
+    MultiProcessRegistry,
+    MultiProcessCollector,
+    mark_process_dead
+)
+
+
+DEAD_PID = 999999
+
+
+def write_as_worker(directory, pid, record):
+    """Record metrics as if from another worker process with the given pid"""
+    registry = MultiProcessRegistry(str(directory))
+    with patch("app.services.metrics_multiprocess.os.getpid", return_value=pid):
+        registry._files_pid = pid
+        record(registry)
+        for data in registry._files.values():
+            data.close()
+
+
+class TestMmapedDict:
+    """Test MmapedDict functionality"""
+
+    def test_values_persist_across_reopen(self, tmp_path):
+        """Test values written by one mapping are read back from the file"""
+        path = str(tmp_path / "counter_1.db")
+        data = MmapedDict(path)
+        data.inc("a", 1)
+        data.inc("a", 2.5)
+        data.set("b", 7)
+        data.close()
+
+        reopened = MmapedDict(path)
+
+        assert reopened.get("a") == 3.5
+        assert reopened.get("missing") == 0.0
+        assert dict(MmapedDict.read_all_values(path)) == {"a": 3.5, "b": 7.0}
+        reopened.close()
+
+    def test_file_grows_when_full(self, tmp_path):
+        """Test the mapping is resized once entries exceed the initial size"""
+        path = str(tmp_path / "gauge_1.db")
+
+        with patch.object(MmapedDict, "INITIAL_SIZE", 64):
+            data = MmapedDict(path)
+            for i in range(20):
+                data.set(f"key-{i}", i)
+            data.close()
+
+        values = dict(MmapedDict.read_all_values(path))
+        assert len(values) == 20
+        assert values["key-19"] == 19.0
+
+
+class TestMultiProcessRegistry:
+    """Test MultiProcessRegistry functionality"""
+
+    def test_requires_existing_directory(self, tmp_path):
+        """Test a missing directory is rejected"""
+        with pytest.raises(ValueError):
+            MultiProcessRegistry(str(tmp_path / "missing"))
+
+    def test_children_write_to_process_file(self, tmp_path):
+        """Test observations land in this process's files"""
+        registry = MultiProcessRegistry(str(tmp_path))
+        registry.register("counter", "requests_total", "Requests")
+        registry.register("histogram", "duration_seconds", "Duration", buckets=[0.1, 1.0])
+
+        child = registry.labels("requests_total", {"method": "GET"})
+        child.inc()
+        child.inc(2)
+        registry.histogram_observe("duration_seconds", 0.5, None)
+
+        assert child.value == 3.0
+        assert registry.labels("duration_seconds", None).count == 1
+        assert os.path.exists(tmp_path / f"counter_{os.getpid()}.db")
+        assert os.path.exists(tmp_path / f"histogram_{os.getpid()}.db")
+
+    def test_expose_merges_workers(self, tmp_path):
+        """Test a scrape sums every live worker's counters and livesum gauges"""
+        registry = MultiProcessRegistry(str(tmp_path))
+        registry.register("counter", "requests_total", "Requests")
+        registry.register("gauge", "in_flight", "In flight", multiprocess_mode="livesum")
+        registry.counter_observe("requests_total", 2, {"method": "GET"})
+        registry.gauge_set("in_flight", 3, None)
+
+        def other_worker(other):
+            other.register("counter", "requests_total", "Requests")
+            other.register("gauge", "in_flight", "In flight", multiprocess_mode="livesum")
+            other.counter_observe("requests_total", 5, {"method": "GET"})
+            other.gauge_set("in_flight", 1, None)
+
+        # The parent pid is alive, so its files are merged rather than archived
+        write_as_worker(tmp_path, os.getppid(), other_worker)
+
+        text = registry.expose()
+
+        assert 'requests_total{method="GET"} 7.0' in text
+        assert "in_flight 4.0" in text
+        assert text.count("# TYPE requests_total counter") == 1
+
+    def test_gauge_modes(self, tmp_path):
+        """Test gauges are kept per worker by default or reduced to the extreme value"""
+        registry = MultiProcessRegistry(str(tmp_path))
+
+        def record(worker, value):
+            worker.register("gauge", "queue_depth", "Queue depth")
+            worker.register("gauge", "peak_memory", "Peak memory", multiprocess_mode="max")
+            worker.register("gauge", "free_slots", "Free slots", multiprocess_mode="min")
+            worker.gauge_set("queue_depth", value, {"queue": "a"})
+            worker.gauge_set("peak_memory", value, None)
+            worker.gauge_set("free_slots", value, None)
+
+        record(registry, 3)
+        write_as_worker(tmp_path, os.getppid(), lambda other: record(other, 5))
+
+        # Execute
+        text = registry.expose()
+
+        # Verify
+        assert f'queue_depth{{queue="a",pid="{os.getpid()}"}} 3.0' in text
+        assert f'queue_depth{{queue="a",pid="{os.getppid()}"}} 5.0' in text
+        assert "peak_memory 5.0" in text
+        assert "free_slots 3.0" in text
+        assert "# TYPE queue_depth gauge" in text
+
+    def test_gauge_mode_conflict(self, tmp_path):
+        """Test a gauge cannot be re-registered with another mode or an unknown one"""
+        registry = MultiProcessRegistry(str(tmp_path))
+        registry.register("gauge", "in_flight", "In flight", multiprocess_mode="livesum")
+
+        with pytest.raises(ValueError):
+            registry.register("gauge", "in_flight", "In flight", multiprocess_mode="max")
+        with pytest.raises(ValueError):
+            registry.register("gauge", "workers", "Workers", multiprocess_mode="all")
+
+    def test_histograms_merge_cumulatively(self, tmp_path):
+        """Test bucket counts are summed before being made cumulative"""
+        registry = MultiProcessRegistry(str(tmp_path))
+        registry.register("histogram", "latency", "Latency", buckets=[0.1, 1.0])
+        registry.histogram_observe("latency", 0.05, {"route": "/a"})
+
+        def other_worker(other):
+            other.register("histogram", "latency", "Latency", buckets=[0.1, 1.0])
+            other.histogram_observe("latency", 0.5, {"route": "/a"})
+            other.histogram_observe("latency", 5, {"route": "/a"})
+
+        write_as_worker(tmp_path, os.getppid(), other_worker)
+
+        lines = registry.expose().splitlines()
+
+        assert lines[2:] == [
+            'latency_bucket{route="/a",le="0.1"} 1.0',
+            'latency_bucket{route="/a",le="1.0"} 2.0',
+            'latency_bucket{route="/a",le="+Inf"} 3.0',
+            'latency_sum{route="/a"} 5.55',
+            'latency_count{route="/a"} 3.0'
+        ]
+
+    def test_reopens_files_after_fork(self, tmp_path):
+        """Test a forked worker writes to its own files, not its parent's"""
+        registry = MultiProcessRegistry(str(tmp_path))
+        registry.register("counter", "jobs_total", "Jobs", labelnames=[])
+        registry.counter_observe("jobs_total", 1, None)
+
+        with patch("app.services.metrics_multiprocess.os.getpid", return_value=os.getppid()):
+            registry.counter_observe("jobs_total", 1, None)
+            registry.file_for("counter").close()
+
+        assert dict(MmapedDict.read_all_values(str(tmp_path / f"counter_{os.getppid()}.db")))
+        assert os.path.exists(tmp_path / f"counter_{os.getppid()}.db")
+
+
+class TestMultiProcessCollector:
+    """Test MultiProcessCollector functionality"""
+
+    def record(self, registry):
+        registry.register("counter", "requests_total", "Requests")
+        registry.register("gauge", "in_flight", "In flight")
+        registry.counter_observe("requests_total", 4, {"method": "GET"})
+        registry.gauge_set("in_flight", 2, None)
+
+    def test_dead_worker_counters_are_archived(self, tmp_path):
+        """Test exited workers keep their counters but drop their gauges"""
+        write_as_worker(tmp_path, DEAD_PID, self.record)
+
+        # Execute
+        text = MultiProcessCollector(str(tmp_path)).expose()
+
+        # Verify
+        assert 'requests_total{method="GET"} 4.0' in text
+        assert "in_flight" not in text
+        assert sorted(os.listdir(tmp_path)) == [".lock", "counter_archive.db"]
+
+    def test_archive_accumulates_across_exits(self, tmp_path):
+        """Test counters of successive dead workers add up in the archive"""
+        collector = MultiProcessCollector(str(tmp_path))
+        write_as_worker(tmp_path, DEAD_PID, self.record)
+        collector.collect()
+        write_as_worker(tmp_path, DEAD_PID - 1, self.record)
+
+        text = collector.expose()
+
+        assert 'requests_total{method="GET"} 8.0' in text
+
+    def test_mark_process_dead(self, tmp_path):
+        """Test the gunicorn child_exit helper retires one worker"""
+        write_as_worker(tmp_path, DEAD_PID, self.record)
+
+        mark_process_dead(DEAD_PID, str(tmp_path))
+
+        assert not os.path.exists(tmp_path / f"counter_{DEAD_PID}.db")
+        assert not os.path.exists(tmp_path / f"gauge_liveall_{DEAD_PID}.db")
+        values = dict(MmapedDict.read_all_values(str(tmp_path / "counter_archive.db")))
+        assert list(values.values()) == [4.0]
+
+    def test_ignores_unrelated_files(self, tmp_path):
+        """Test only metric files are merged"""
+        (tmp_path / "notes.db").write_bytes(b"")
+
+        assert MultiProcessCollector(str(tmp_path)).collect() == {}
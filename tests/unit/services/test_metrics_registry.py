@@ -0,0 +1,165 @@
+"""
+Tests for MetricsRegistry.
+Tests labelled metric families, cached children and text exposition.
+"""
+
+import math
+import pytest
+
+from app.services.metrics_registry import (
+    MetricsRegistry,
+    MetricFamily,
+    CounterChild,
+    HistogramChild,
+    format_value
+)
+
+
+class TestMetricFamily:
+    """Test MetricFamily functionality"""
+
+    def test_children_are_cached_per_label_set(self):
+        """Test the same child is returned for the same labels"""
+        family = MetricFamily("counter", "requests_total", "Requests")
+
+        child1 = family.labels(method="GET", endpoint="/flows/{flow_id}")
+        child2 = family.labels(endpoint="/flows/{flow_id}", method="GET")
+        child3 = family.labels("/flows/{flow_id}", "GET")
+
+        assert child1 is child2 is child3
+        assert isinstance(child1, CounterChild)
+        assert family.labelnames == ("endpoint", "method")
+
+    def test_explicit_labelnames_fix_order(self):
+        """Test positional values follow declared label names"""
+        family = MetricFamily("gauge", "pool_size", "Pool", labelnames=["pool", "host"])
+
+        family.labels("db", "web-1").set(5)
+
+        assert family.labels(host="web-1", pool="db").value == 5.0
+
+    def test_mismatched_labels_rejected(self):
+        """Test label sets must match the family's label names"""
+        family = MetricFamily("counter", "requests_total", "Requests")
+        family.labels(method="GET")
+
+        with pytest.raises(ValueError):
+            family.labels(method="GET", status="200")
+        with pytest.raises(ValueError):
+            family.labels(endpoint="/x")
+
+    def test_unlabelled_family_has_default_child(self):
+        """Test families declared without labels expose a zero sample"""
+        family = MetricFamily("counter", "jobs_total", "Jobs", labelnames=[])
+
+        assert family.expose() == [
+            "# HELP jobs_total Jobs",
+            "# TYPE jobs_total counter",
+            "jobs_total 0.0"
+        ]
+
+    def test_counter_rejects_negative_increment(self):
+        """Test counters only go up"""
+        child = CounterChild()
+
+        with pytest.raises(ValueError):
+            child.inc(-1)
+
+    def test_unknown_type_rejected(self):
+        """Test only Prometheus metric types are accepted"""
+        with pytest.raises(ValueError):
+            MetricFamily("summary", "x", "x")
+
+
+class TestHistogramChild:
+    """Test HistogramChild functionality"""
+
+    def test_observations_land_in_le_buckets(self):
+        """Test bucket boundaries are inclusive upper bounds"""
+        child = HistogramChild((0.1, 1.0, math.inf))
+
+        child.observe(0.1)
+        child.observe(0.5)
+        child.observe(5)
+
+        assert child.counts == [1, 1, 1]
+        assert child.count == 3
+        assert child.sum == pytest.approx(5.6)
+
+    def test_samples_are_cumulative(self):
+        """Test exposition renders cumulative bucket counts"""
+        child = HistogramChild((0.1, 1.0, math.inf))
+        child.observe(0.05)
+        child.observe(0.5)
+
+        lines = child.samples("latency", ("route",), ("/a",))
+
+        assert lines == [
+            'latency_bucket{route="/a",le="0.1"} 1.0',
+            'latency_bucket{route="/a",le="1.0"} 2.0',
+            'latency_bucket{route="/a",le="+Inf"} 2.0',
+            'latency_sum{route="/a"} 0.55',
+            'latency_count{route="/a"} 2.0'
+        ]
+
+
+class TestMetricsRegistry:
+    """Test MetricsRegistry functionality"""
+
+    def test_register_returns_existing_family(self):
+        """Test re-registration is idempotent"""
+        registry = MetricsRegistry()
+
+        family1 = registry.register("counter", "requests_total", "Requests")
+        family2 = registry.register("counter", "requests_total", "Requests")
+
+        assert family1 is family2
+
+    def test_register_type_conflict(self):
+        """Test a name cannot be reused with another type"""
+        registry = MetricsRegistry()
+        registry.register("counter", "requests_total", "Requests")
+
+        with pytest.raises(ValueError):
+            registry.register("gauge", "requests_total", "Requests")
+
+    def test_client_interface(self):
+        """Test the PrometheusMetricService client interface"""
+        registry = MetricsRegistry()
+        registry.register("counter", "requests_total", "Requests")
+        registry.register("histogram", "duration_seconds", "Duration", buckets=[1.0])
+        registry.register("gauge", "queue_depth", "Queue")
+
+        registry.counter_observe("requests_total", 2, {"method": "GET"})
+        registry.histogram_observe("duration_seconds", 0.5, None)
+        registry.gauge_set("queue_depth", 7, {"queue": "flows"})
+
+        assert registry.labels("requests_total", {"method": "GET"}).value == 2.0
+        assert registry.labels("duration_seconds", None).count == 1
+        assert registry.labels("queue_depth", {"queue": "flows"}).value == 7.0
+        assert registry.get_registered_metrics()["duration_seconds"]["type"] == "histogram"
+
+    def test_expose_text_format(self):
+        """Test full exposition output"""
+        registry = MetricsRegistry()
+        registry.register("counter", "requests_total", "Total\nrequests")
+        registry.counter_observe("requests_total", 1, {"path": 'a"b\\c'})
+
+        text = registry.expose()
+
+        assert text == (
+            "# HELP requests_total Total\\nrequests\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{path="a\\"b\\\\c"} 1.0\n'
+        )
+
+    def test_expose_empty_registry(self):
+        """Test empty registry exposes nothing"""
+        assert MetricsRegistry().expose() == ""
+
+    def test_format_value_special_floats(self):
+        """Test special float formatting"""
+        assert format_value(math.inf) == "+Inf"
+        assert format_value(-math.inf) == "-Inf"
+        assert format_value(float("nan")) == "NaN"
+        assert format_value(3) == "3.0"
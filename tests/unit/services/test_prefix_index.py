@@ -0,0 +1,88 @@
+"""
+Tests for the weighted prefix index behind typeahead suggestions.
+Tests ranking, incremental weight changes, pruning and keys past the trie depth.
+"""
+
+import random
+
+from app.services.prefix_index import PrefixIndex
+
+
+class TestPrefixIndex:
+    """Test completion and incremental updates"""
+
+    def test_heaviest_completions_first(self):
+        """Test prefix matches are ranked by weight, ties by key"""
+        index = PrefixIndex()
+        index.adjust("orders", 5)
+        index.adjust("orders eu", 2)
+        index.adjust("order book", 2)
+        index.adjust("invoices", 9)
+
+        # Execute
+        completions = index.complete("ord", limit=10)
+
+        # Verify
+        assert completions == [("orders", 5), ("order book", 2), ("orders eu", 2)]
+        assert index.complete("x") == []
+
+    def test_weight_changes_reorder_cached_results(self):
+        """Test cached node tops follow later weight changes"""
+        index = PrefixIndex()
+        index.adjust("alpha", 1)
+        index.adjust("alpine", 2)
+        assert index.complete("al", limit=1) == [("alpine", 2)]
+
+        # Execute
+        index.adjust("alpha", 5, display="Alpha")
+
+        # Verify
+        assert index.complete("al", limit=1) == [("Alpha", 6)]
+
+    def test_zero_weight_removes_and_prunes(self):
+        """Test keys disappear at zero weight and their empty nodes go with them"""
+        index = PrefixIndex()
+        index.adjust("abc", 1)
+        index.adjust("abd", 1)
+        index.complete("a")
+
+        # Execute
+        index.adjust("abc", -1)
+        index.adjust("abd", -1)
+        index.adjust("never-added", -1)
+
+        # Verify
+        assert len(index) == 0
+        assert index.complete("a") == []
+        assert index._root.children == {}
+
+    def test_keys_past_max_depth(self):
+        """Test long prefixes are matched exactly below the capped trie depth"""
+        index = PrefixIndex(max_depth=4)
+        index.adjust("customer events", 1)
+        index.adjust("customer orders", 3)
+
+        # Verify
+        assert index.complete("customer e") == [("customer events", 1)]
+        assert [key for key, _ in index.complete("cust")] == ["customer orders", "customer events"]
+
+    def test_matches_brute_force(self):
+        """Test random adds, removals and lookups agree with a sorted scan"""
+        rng = random.Random(7)
+        index = PrefixIndex(top_k=5, max_depth=3)
+        weights = {}
+        for _ in range(2000):
+            key = "".join(rng.choice("abc") for _ in range(rng.randint(1, 5)))
+            delta = rng.choice([1, 1, 2, -1, -2])
+            index.adjust(key, delta)
+            weight = weights.get(key, 0) + delta
+            if weight > 0:
+                weights[key] = weight
+            else:
+                weights.pop(key, None)
+
+            if rng.random() < 0.1:
+                prefix = "".join(rng.choice("abc") for _ in range(rng.randint(0, 4)))
+                limit = rng.choice([3, 5, 8])
+                expected = sorted((key for key in weights if key.startswith(prefix)), key=lambda key: (-weights[key], key))
+                assert [key for key, _ in index.complete(prefix, limit)] == expected[:limit]
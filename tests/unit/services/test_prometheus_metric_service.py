@@ -17,6 +17,8 @@ from app.services.prometheus_metric_service import (
     NoOpMetricHistogram,
     NoOpMetricGauge
 )
+from app.services.metrics_registry import MetricsRegistry
+from app.services.metrics_multiprocess import MultiProcessRegistry
 
 
 class TestPrometheusMetricService:
@@ -182,6 +184,56 @@ class TestPrometheusMetricService:
             mock_service.gauge.assert_called_once_with('test_gauge')
             mock_gauge.set.assert_called_once_with(100, None)
     
+    def test_default_client_is_registry(self):
+        """Test the service exposes real metrics by default"""
+        service = PrometheusMetricService()
+        
+        service.counter('test_counter').increment({'method': 'GET'})
+        
+        assert isinstance(service._client, MetricsRegistry)
+        assert 'test_counter{method="GET"} 1.0' in service.expose()
+    
+    def test_multiprocess_directory_created(self, tmp_path, monkeypatch):
+        """Test a missing multiprocess directory is created instead of disabling metrics"""
+        directory = tmp_path / "metrics"
+        monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(directory))
+        
+        service = PrometheusMetricService()
+        
+        assert isinstance(service._client, MultiProcessRegistry)
+        assert service._enabled is True
+        assert directory.is_dir()
+    
+    def test_unwritable_multiprocess_directory_fails(self, tmp_path, monkeypatch):
+        """Test an unwritable multiprocess directory stops startup"""
+        monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+        
+        with patch('app.services.prometheus_metric_service.os.access', return_value=False):
+            with pytest.raises(RuntimeError):
+                PrometheusMetricService()
+    
+    def test_labels_returns_cached_child(self):
+        """Test bound children are reused for the same labels"""
+        service = PrometheusMetricService()
+        histogram = service.histogram('test_histogram', buckets=[0.5])
+        
+        child = histogram.labels(endpoint='/api/v1/flows/{flow_id}')
+        child.observe(0.1)
+        
+        assert histogram.labels(endpoint='/api/v1/flows/{flow_id}') is child
+        assert 'test_histogram_bucket{endpoint="/api/v1/flows/{flow_id}",le="0.5"} 1.0' in service.expose()
+    
+    def test_labels_with_mock_client(self):
+        """Test bound metrics fall back to labelled observe calls"""
+        service = PrometheusMetricService()
+        service._client = MockPrometheusClient()
+        counter = service.counter('test_counter')
+        
+        counter.labels(method='GET').inc(2)
+        
+        assert counter.get_value() == 2
+        assert service.expose() == ""
+    
     @patch('app.services.prometheus_metric_service.logger')
     def test_observe_unknown_metric_type(self, mock_logger):
         """Test observe with unknown metric type"""
@@ -0,0 +1,188 @@
+"""
+Tests for the related-dataset index.
+Tests MinHash signatures, LSH lookups with exact re-ranking, incremental updates, rebuilds and commit hooks.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, delete, insert, update
+from sqlalchemy.orm import Session, declarative_base
+
+from app.database import Base
+from app.services.related_index import RelatedIndex, jaccard, minhash
+from app.services.search_indexer import record_tombstones
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+ORDERS = ["order_id", "customer_id", "amount", "currency", "created_at", "status"]
+
+
+def schema(*names):
+    return {"properties": {name: {"type": "string"} for name in names}}
+
+
+@pytest.fixture
+def index():
+    return RelatedIndex()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'related.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in ("data_sets", "search_tombstones")])
+    yield engine
+    engine.dispose()
+
+
+def insert_rows(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(insert(Base.metadata.tables["data_sets"]), [
+            {"owner_id": 1, "org_id": 1, "data_source_id": None, "tags": None, "output_schema": None,
+             "created_at": NOW, "updated_at": NOW, **row}
+            for row in rows
+        ])
+
+
+class TestSignatures:
+    """Test MinHash signatures estimate Jaccard similarity"""
+
+    def test_estimate(self):
+        """Test equal sets agree everywhere and the agreement rate tracks similarity"""
+        left = {f"f:{i}" for i in range(40)}
+        right = {f"f:{i}" for i in range(20, 60)}
+
+        # Execute
+        agreement = (minhash(left) == minhash(right)).mean()
+
+        # Verify
+        assert (minhash(left) == minhash(set(left))).all()
+        assert abs(agreement - jaccard(frozenset(left), frozenset(right))) < 0.2
+        assert minhash([]) is None
+
+
+class TestRelated:
+    """Test lookups"""
+
+    def test_ranked_by_exact_similarity(self, index):
+        """Test candidates are re-ranked by tag and field overlap, within the org"""
+        index.apply(1, {"org_id": 1, "tags": ["sales"], "output_schema": schema(*ORDERS)})
+        index.apply(2, {"org_id": 1, "tags": ["sales"], "output_schema": schema(*ORDERS)})
+        index.apply(3, {"org_id": 1, "tags": ["sales"], "output_schema": schema(*ORDERS[:4], "region")})
+        index.apply(4, {"org_id": 1, "tags": ["hr"], "output_schema": schema("employee_id", "salary")})
+        index.apply(5, {"org_id": 2, "tags": ["sales"], "output_schema": schema(*ORDERS)})
+
+        # Execute
+        related = index.related(1, limit=10)
+
+        # Verify
+        assert [suggestion.dataset_id for suggestion in related] == [2, 3]
+        assert related[0].score == 1.0
+        assert related[1].shared_tags == ["sales"]
+        assert related[1].shared_fields == sorted(ORDERS[:4])
+        assert index.related(99) == []
+
+    def test_same_source(self, index):
+        """Test data sets of the same source are suggested even without shared features"""
+        index.apply(1, {"org_id": 1, "data_source_id": 7, "output_schema": schema("a", "b")})
+        index.apply(2, {"org_id": 1, "data_source_id": 7, "output_schema": schema("x")})
+        index.apply(3, {"org_id": 1, "data_source_id": 8, "output_schema": schema("a", "b")})
+
+        # Execute
+        related = index.related(1)
+
+        # Verify
+        assert [(suggestion.dataset_id, suggestion.score, suggestion.same_source) for suggestion in related] == [
+            (3, 1.0, False), (2, 0.7, True)
+        ]
+
+    def test_incremental_updates(self, index):
+        """Test partial updates keep other features and moves and deletes leave the buckets"""
+        index.apply(1, {"org_id": 1, "tags": ["a"], "output_schema": schema(*ORDERS)})
+        index.apply(2, {"org_id": 1, "tags": ["b"], "output_schema": schema(*ORDERS)})
+
+        # Execute
+        index.apply(2, {"tags": ["a"]})
+        after_tag_edit = index.related(1)
+        index.apply(2, {"org_id": 2})
+        after_move = index.related(1)
+        index.apply(2, {"org_id": 1})
+        index.apply(2, None)
+
+        # Verify
+        assert [(suggestion.dataset_id, suggestion.score) for suggestion in after_tag_edit] == [(2, 1.0)]
+        assert after_move == []
+        assert index.related(1) == []
+        assert len(index) == 1
+        assert all(not band for band in index._shards[2].buckets)
+
+
+class TestDatabase:
+    """Test loading from the database"""
+
+    def test_rebuild_and_refresh(self, index, engine):
+        """Test a rebuild indexes every data set and refreshes pick up edits and deletes"""
+        insert_rows(engine, [
+            {"id": 1, "name": "orders", "tags": ["sales"], "output_schema": schema(*ORDERS)},
+            {"id": 2, "name": "orders copy", "tags": ["sales"], "output_schema": schema(*ORDERS)},
+            {"id": 3, "name": "staff", "output_schema": schema("employee_id")},
+        ])
+        index.rebuild(engine)
+        rebuilt = [suggestion.dataset_id for suggestion in index.related(1)]
+
+        # Execute
+        table = Base.metadata.tables["data_sets"]
+        with engine.begin() as conn:
+            conn.execute(update(table).where(table.c.id == 3).values(
+                output_schema=schema(*ORDERS), updated_at=NOW + timedelta(minutes=1)
+            ))
+            conn.execute(delete(table).where(table.c.id == 2))
+            record_tombstones(conn, "data_sets", [2], org_id=1)
+        index.refresh(engine)
+
+        # Verify
+        assert rebuilt == [2]
+        assert [suggestion.dataset_id for suggestion in index.related(1)] == [3]
+        assert index.stats()["data_sets"] == 2
+
+
+SessionBase = declarative_base()
+
+
+class IndexedDataSet(SessionBase):
+    """Stand-in mapped onto the data_sets table (with its column defaults) for exercising the hooks"""
+    __table__ = Base.metadata.tables["data_sets"]
+
+
+class TestSessionHooks:
+    """Test commits keep the index in sync"""
+
+    @pytest.fixture
+    def session(self, index, engine):
+        index.install_session_hooks(Session)
+        with Session(engine) as session:
+            yield session
+        index.remove_session_hooks()
+
+    def test_commit_and_rollback(self, index, session):
+        """Test committed writes are applied and rolled back ones discarded"""
+        session.add_all([
+            IndexedDataSet(id=1, name="orders", owner_id=1, org_id=1, tags=["sales"], output_schema=schema(*ORDERS)),
+            IndexedDataSet(id=2, name="copy", owner_id=1, org_id=1, tags=["sales"], output_schema=schema(*ORDERS)),
+        ])
+        session.commit()
+        committed = [suggestion.dataset_id for suggestion in index.related(1)]
+
+        # Execute
+        session.get(IndexedDataSet, 2).output_schema = schema("unrelated")
+        session.flush()
+        session.rollback()
+        after_rollback = index.related(1)[0].score
+
+        session.delete(session.get(IndexedDataSet, 2))
+        session.commit()
+
+        # Verify
+        assert committed == [2]
+        assert after_rollback == 1.0
+        assert index.related(1) == []
@@ -0,0 +1,147 @@
+"""
+Tests for RequestProfiler.
+Tests request selection, stack attribution and flamegraph export.
+"""
+
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from app.services.request_profiler import RequestProfiler
+
+
+def make_ctx(route="/api/v1/flows/{flow_id}", headers=None):
+    return SimpleNamespace(route_template=route, headers=headers or {}, profile=None)
+
+
+def busy_handler(profiler):
+    profiler.sample()
+
+
+class TestRequestSelection:
+    """Test should_profile decisions"""
+
+    def test_debug_header_with_token(self):
+        """Test the debug header forces profiling only with the right token"""
+        profiler = RequestProfiler(sample_rate=0.0, debug_token="secret")
+
+        assert profiler.should_profile(make_ctx(headers={"x-debug-profile": "secret"})) is True
+        assert profiler.should_profile(make_ctx(headers={"x-debug-profile": "wrong"})) is False
+        assert profiler.should_profile(make_ctx()) is False
+
+    def test_header_ignored_without_token(self):
+        """Test the header does nothing unless a token is configured"""
+        profiler = RequestProfiler(sample_rate=0.0)
+
+        assert profiler.should_profile(make_ctx(headers={"x-debug-profile": ""})) is False
+
+    def test_sample_rate(self):
+        """Test the sample rate selects requests"""
+        assert RequestProfiler(sample_rate=1.0).should_profile(make_ctx()) is True
+        assert RequestProfiler(sample_rate=0.0).should_profile(make_ctx()) is False
+
+    def test_configure_clamps_rate(self):
+        """Test configured rates are clamped to [0, 1]"""
+        profiler = RequestProfiler()
+
+        profiler.configure(5.0, "", 10)
+
+        assert profiler.sample_rate == 1.0
+        assert profiler.debug_token is None
+        assert profiler.interval == 0.01
+
+
+class TestSampling:
+    """Test stack sampling and aggregation"""
+
+    def test_samples_attributed_to_route(self):
+        """Test stacks are credited to the request found on the stack"""
+        profiler = RequestProfiler()
+        ctx = make_ctx()
+        ctx.profile = Counter()
+        profiler._active = 1
+
+        # Execute
+        busy_handler(profiler)
+        busy_handler(profiler)
+        profiler.end(ctx)
+
+        # Verify
+        summary = profiler.summary()[0]
+        assert summary["route"] == "/api/v1/flows/{flow_id}"
+        assert summary["requests"] == 1
+        assert summary["samples"] == 2
+        stack, count = profiler.collapsed("/api/v1/flows/{flow_id}").splitlines()[0].rsplit(" ", 1)
+        assert count == "2"
+        assert "test_samples_attributed_to_route" in stack
+        assert stack.index("test_samples_attributed_to_route") < stack.index("busy_handler")
+        assert ctx.profile is None
+
+    def test_unprofiled_threads_ignored(self):
+        """Test stacks without a profiled request are not recorded"""
+        profiler = RequestProfiler()
+        ctx = make_ctx()
+
+        busy_handler(profiler)
+
+        assert ctx.profile is None
+        assert profiler.summary() == []
+
+    def test_background_thread_samples_while_active(self):
+        """Test the sampler thread runs only while requests are profiled"""
+        profiler = RequestProfiler(interval_ms=1)
+        ctx = make_ctx()
+
+        profiler.begin(ctx)
+        deadline = time.monotonic() + 0.1
+        while time.monotonic() < deadline:
+            sum(range(1000))
+        profiler.end(ctx)
+
+        assert profiler.summary()[0]["samples"] > 0
+        assert not profiler._wakeup.is_set()
+
+    def test_stack_cap_counts_dropped(self):
+        """Test distinct stacks per route are capped"""
+        profiler = RequestProfiler()
+        profiler.MAX_STACKS_PER_ROUTE = 1
+        ctx = make_ctx(route="/r")
+        ctx.profile = Counter({"a;b": 2, "a;c": 1})
+        profiler._active = 1
+
+        profiler.end(ctx)
+
+        summary = profiler.summary()[0]
+        assert summary["distinct_stacks"] == 1
+        assert summary["dropped_samples"] == 1
+        assert summary["samples"] == 3
+
+
+class TestExport:
+    """Test profile export formats"""
+
+    def test_speedscope_shares_frames(self):
+        """Test speedscope output indexes shared frames"""
+        profiler = RequestProfiler()
+        ctx = make_ctx(route="/r")
+        ctx.profile = Counter({"main;handler;query": 3, "main;handler": 1})
+        profiler._active = 1
+        profiler.end(ctx)
+
+        # Execute
+        document = profiler.speedscope("/r")
+
+        # Verify
+        assert [frame["name"] for frame in document["shared"]["frames"]] == ["main", "handler", "query"]
+        profile = document["profiles"][0]
+        assert profile["samples"] == [[0, 1, 2], [0, 1]]
+        assert profile["weights"] == [3, 1]
+        assert profile["endValue"] == 4
+        assert profiler.collapsed("/r") == "main;handler;query 3\nmain;handler 1\n"
+
+    def test_unknown_route(self):
+        """Test exports for unprofiled routes return None"""
+        profiler = RequestProfiler()
+
+        assert profiler.collapsed("/missing") is None
+        assert profiler.speedscope("/missing") is None
@@ -0,0 +1,168 @@
+"""
+Tests for the schema field index.
+Tests schema flattening, write-time re-indexing, indexed field lookups and rebuilds.
+"""
+
+import json
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.database import Base
+from app.services.schema_field_index import (
+    extract_fields, field_filter, find_fields, install_schema_field_hooks, rebuild_schema_field_index,
+    remove_schema_field_hooks, sync_schema_fields
+)
+
+TABLES = ("data_sets", "data_schemas", "schema_fields")
+
+ORDERS = {
+    "type": "object",
+    "properties": {
+        "customer_id": {"type": "integer"},
+        "customer": {"type": "object", "properties": {"email": {"type": ["null", "string"]}}},
+        "lines": {"type": "array", "items": {"type": "object", "properties": {"sku": {"type": "string"}}}}
+    }
+}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fields.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    yield engine
+    engine.dispose()
+
+
+SessionBase = declarative_base()
+
+
+class IndexedDataSet(SessionBase):
+    """Stand-in mapped onto the data_sets table (with its column defaults) for exercising the hooks"""
+    __table__ = Base.metadata.tables["data_sets"]
+
+
+def fields(engine, **filters):
+    with engine.connect() as conn:
+        return [(row["resource_id"], row["schema_column"], row["path"]) for row in find_fields(conn, **filters)]
+
+
+class TestExtractFields:
+    """Test schemas are flattened into field paths"""
+
+    def test_json_schema(self):
+        """Test nested objects, arrays and nullable types"""
+        assert extract_fields(ORDERS) == [
+            ("customer_id", "customer_id", "integer"),
+            ("customer", "customer", "object"),
+            ("customer.email", "email", "string"),
+            ("lines", "lines", "array"),
+            ("lines[].sku", "sku", "string"),
+        ]
+
+    def test_avro_text(self):
+        """Test Avro records stored as JSON text, including nested record arrays"""
+        schema = json.dumps({"type": "record", "fields": [
+            {"name": "id", "type": "long"},
+            {"name": "events", "type": {"type": "array", "items": {"type": "record", "fields": [
+                {"name": "at", "type": {"type": "long", "logicalType": "timestamp-millis"}}
+            ]}}}
+        ]})
+
+        # Verify
+        assert extract_fields(schema) == [
+            ("id", "id", "long"), ("events", "events", "array"), ("events[].at", "at", "timestamp-millis")
+        ]
+        assert extract_fields("not json") == []
+        assert extract_fields(None) == []
+
+
+class TestSync:
+    """Test fields follow schema writes"""
+
+    def test_changed_columns_are_replaced(self, engine):
+        """Test re-indexing one column keeps the other and deletes drop everything"""
+        with engine.begin() as conn:
+            sync_schema_fields(conn, "data_sets", {1: (1, {"source_schema": ORDERS, "output_schema": ORDERS})})
+
+        # Execute
+        with engine.begin() as conn:
+            sync_schema_fields(conn, "data_sets", {1: (2, {"output_schema": {"properties": {"order_id": {"type": "string"}}}})})
+
+        # Verify
+        assert fields(engine, name="customer_id") == [(1, "source_schema", "customer_id")]
+        assert fields(engine, name="order_id", org_id=2) == [(1, "output_schema", "order_id")]
+        assert fields(engine, name="customer_id", org_id=2) == [(1, "source_schema", "customer_id")]
+
+        with engine.begin() as conn:
+            sync_schema_fields(conn, "data_sets", {1: None})
+        assert fields(engine, field_type="string") == []
+
+    def test_orm_writes_are_indexed(self, engine):
+        """Test inserts, schema edits and deletes flushed through a session maintain the index"""
+        factory = sessionmaker(engine)
+        install_schema_field_hooks(factory)
+        try:
+            with factory() as session:
+                session.add(IndexedDataSet(id=1, name="orders", owner_id=1, org_id=1, output_schema=ORDERS))
+                session.commit()
+                assert fields(engine, name="sku") == [(1, "output_schema", "lines[].sku")]
+
+                # Execute
+                data_set = session.get(IndexedDataSet, 1)
+                data_set.output_schema = {"properties": {"sku": {"type": "string"}}}
+                data_set.description = "flattened"
+                session.commit()
+                after_edit = fields(engine, name="sku")
+
+                session.delete(session.get(IndexedDataSet, 1))
+                session.commit()
+        finally:
+            remove_schema_field_hooks()
+
+        # Verify
+        assert after_edit == [(1, "output_schema", "sku")]
+        assert fields(engine, name="sku") == []
+
+
+class TestQueries:
+    """Test indexed lookups"""
+
+    @pytest.fixture
+    def data_sets(self, engine):
+        table = Base.metadata.tables["data_sets"]
+        with engine.begin() as conn:
+            conn.execute(insert(table), [
+                {"id": 1, "name": "orders", "owner_id": 1, "org_id": 1, "output_schema": ORDERS},
+                {"id": 2, "name": "customers", "owner_id": 1, "org_id": 1,
+                 "output_schema": {"properties": {"Customer_ID": {"type": "string"}, "name": {"type": "string"}}}},
+                {"id": 3, "name": "empty", "owner_id": 1, "org_id": 1, "output_schema": None},
+            ])
+        rebuild_schema_field_index(engine)
+        return table
+
+    def test_field_filter(self, engine, data_sets):
+        """Test name matches are case-insensitive and combine with type and column"""
+        def ids(**criteria):
+            with engine.connect() as conn:
+                query = select(data_sets.c.id).where(field_filter("data_sets", data_sets.c.id, **criteria))
+                return sorted(conn.execute(query).scalars())
+
+        # Verify
+        assert ids(name="customer_id") == [1, 2]
+        assert ids(name="customer_id", field_type="string") == [2]
+        assert ids(name="cust", match="starts_with") == [1, 2]
+        assert ids(name="ku", match="contains") == [1]
+        assert ids(name="customer_id", schema_column="source_schema") == []
+        with pytest.raises(ValueError):
+            ids(name="x", match="regex")
+
+    def test_rebuild(self, engine, data_sets):
+        """Test a rebuild indexes every stored schema"""
+        # Execute
+        written = rebuild_schema_field_index(engine, batch_size=2)
+
+        # Verify
+        assert written == {"data_sets": 7, "data_schemas": 0}
+        assert fields(engine, name="email") == [(1, "output_schema", "customer.email")]
@@ -0,0 +1,359 @@
+"""
+Tests for the in-process search index.
+Tests tokenizing, BM25 ranking, permission filtering, paging, rebuilds and commit hooks.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, create_engine, delete, event, insert, update
+from sqlalchemy.orm import Session, declarative_base
+
+from app.database import Base
+from app.services.search_index import RESOURCES, SearchIndex, build_document, deleted_since, tokenize
+from app.services.search_indexer import record_tombstones
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+def doc(resource_type="data_sources", id=1, org_id=1, owner_id=1, name="", description=None, **values):
+    return build_document(resource_type, {
+        "id": id, "org_id": org_id, "owner_id": owner_id, "name": name, "description": description,
+        "created_at": values.pop("created_at", NOW), "updated_at": NOW, **values
+    })
+
+
+@pytest.fixture
+def index():
+    return SearchIndex()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    tables = [Base.metadata.tables[name] for name in ("data_sources", "data_sinks", "data_sets", "flow_nodes", "projects", "search_tombstones")]
+    Base.metadata.create_all(engine, tables=tables)
+    yield engine
+    engine.dispose()
+
+
+def insert_rows(engine, table, rows):
+    with engine.begin() as conn:
+        conn.execute(insert(Base.metadata.tables[table]), [
+            {"created_at": NOW, "updated_at": NOW, **row} for row in rows
+        ])
+
+
+class TestDocuments:
+    """Test tokenizing and document building"""
+
+    def test_tokenize(self):
+        """Test punctuation, case and underscores split terms"""
+        assert tokenize("Daily_Orders (EU-west) v2!") == ["daily", "orders", "eu", "west", "v2"]
+        assert tokenize(None) == []
+
+    def test_build_document_fields(self):
+        """Test tags, metadata and config feed their fields"""
+        # Execute
+        built = doc(name="Orders feed", description="Orders from Shopify", tags=["ecommerce", "daily"],
+                    extra_metadata={"team": "growth"}, source_config={"bucket": "raw-orders"})
+
+        # Verify
+        assert built.terms["name"] == {"orders": 1, "feed": 1}
+        assert set(built.terms["tags"]) == {"ecommerce", "daily"}
+        assert {"team", "growth", "bucket", "raw"} <= set(built.terms["metadata"])
+
+    def test_non_origin_flow_nodes_skipped(self):
+        """Test only live origin flow nodes are searchable"""
+        assert doc("flows", id=5, origin_node_id=5, name="a") is not None
+        assert doc("flows", id=6, origin_node_id=5, name="a") is None
+        assert doc("flows", id=7, is_deprecated=True, name="a") is None
+
+
+class TestSearch:
+    """Test ranking and filtering"""
+
+    def test_name_match_outranks_description_match(self, index):
+        """Test field weights favour name matches"""
+        index.upsert(doc(id=1, name="customer events", description="raw stream"))
+        index.upsert(doc(id=2, name="raw stream", description="customer events"))
+
+        # Execute
+        page = index.search("customer", user_id=1, org_id=1)
+
+        # Verify
+        assert [hit.document.resource_id for hit in page.hits] == [1, 2]
+        assert page.hits[0].matches == {"name": ["customer"]}
+        assert page.hits[1].matches == {"description": ["customer"]}
+
+    def test_rare_terms_weigh_more(self, index):
+        """Test inverse document frequency"""
+        for i in range(10):
+            index.upsert(doc(id=i, name=f"orders {i}"))
+        index.upsert(doc(id=100, name="orders refunds"))
+        index.upsert(doc(id=101, name="refunds"))
+
+        # Execute
+        page = index.search("orders refunds", user_id=1, org_id=1, limit=3)
+
+        # Verify
+        assert {hit.document.resource_id for hit in page.hits[:2]} == {100, 101}
+        assert page.hits[2].score < page.hits[1].score / 2
+        assert page.total == 12
+
+    def test_permission_filtering(self, index):
+        """Test other orgs are hidden except for documents the user owns"""
+        index.upsert(doc(id=1, org_id=1, owner_id=2, name="orders"))
+        index.upsert(doc(id=2, org_id=2, owner_id=2, name="orders"))
+        index.upsert(doc(id=3, org_id=2, owner_id=1, name="orders"))
+        index.upsert(doc(id=4, org_id=3, owner_id=3, name="orders"))
+
+        # Execute
+        page = index.search("orders", user_id=1, org_id=1)
+
+        # Verify
+        assert sorted(hit.document.resource_id for hit in page.hits) == [1, 3]
+
+    def test_paging_and_counts(self, index):
+        """Test offset/limit slice the ranking while totals cover every match"""
+        for i in range(5):
+            index.upsert(doc("data_sources", id=i, name="orders " + "x " * i))
+            index.upsert(doc("projects", id=i, name="orders " + "y " * i))
+
+        # Execute
+        first = index.search("orders", user_id=1, org_id=1, limit=4)
+        second = index.search("orders", user_id=1, org_id=1, limit=4, offset=4)
+
+        # Verify
+        assert first.total == second.total == 10
+        assert first.resource_counts == {"data_sources": 5, "projects": 5}
+        assert len(first.hits) == len(second.hits) == 4
+        assert not {hit.document.key for hit in first.hits} & {hit.document.key for hit in second.hits}
+        assert first.hits[-1].score >= second.hits[0].score
+
+    def test_filters(self, index):
+        """Test type, project, date and archived filters"""
+        index.upsert(doc("flows", id=1, name="orders", project_id=10))
+        index.upsert(doc("flows", id=2, name="orders", project_id=20))
+        index.upsert(doc("data_sets", id=3, name="orders", status="ARCHIVED"))
+        index.upsert(doc("data_sets", id=4, name="orders", created_at=NOW - timedelta(days=30)))
+
+        def ids(**filters):
+            page = index.search("orders", user_id=1, org_id=1, **filters)
+            return sorted(hit.document.key for hit in page.hits)
+
+        # Verify
+        assert ids(resource_types=["flows"]) == [("flows", 1), ("flows", 2)]
+        assert ids(project_id=10) == [("data_sets", 4), ("flows", 1)]
+        assert ("data_sets", 3) in ids(include_archived=True)
+        assert ("data_sets", 3) not in ids()
+        assert ("data_sets", 4) not in ids(created_after=(NOW - timedelta(days=1)).replace(tzinfo=timezone.utc))
+
+    def test_scopes_and_prefixes(self, index):
+        """Test field restriction and prefix expansion of unknown terms"""
+        index.upsert(doc(id=1, name="inventory", tags=["warehouse"]))
+
+        # Verify
+        assert index.search("warehouse", user_id=1, org_id=1, fields=["name"]).total == 0
+        assert index.search("warehouse", user_id=1, org_id=1, fields=["tags"]).total == 1
+        assert index.search("invent", user_id=1, org_id=1).hits[0].matches == {"name": ["inventory"]}
+
+    def test_tag_filter_and_facets(self, index):
+        """Test tag filters require every tag and facets count tags over all matches"""
+        index.upsert(doc(id=1, name="orders", tags=["pii", "eu"]))
+        index.upsert(doc(id=2, name="orders", tags=["pii"]))
+        index.upsert(doc("flows", id=3, name="orders", tags='["eu"]'))
+
+        # Execute
+        page = index.search("orders", user_id=1, org_id=1, limit=1)
+        filtered = index.search("orders", user_id=1, org_id=1, tags=["pii", "eu"])
+
+        # Verify
+        assert page.tag_counts == {"pii": 2, "eu": 2}
+        assert [hit.document.key for hit in filtered.hits] == [("data_sources", 1)]
+        assert filtered.tag_counts == {"pii": 1, "eu": 1}
+
+    def test_update_and_remove(self, index):
+        """Test re-indexing replaces old terms and removal drops postings"""
+        index.upsert(doc(id=1, name="orders"))
+
+        # Execute
+        index.apply("data_sources", 1, {"name": "invoices"})
+
+        # Verify
+        assert index.search("orders", user_id=1, org_id=1).total == 0
+        assert index.get("data_sources", 1).org_id == 1
+        index.remove("data_sources", 1)
+        assert index.search("invoices", user_id=1, org_id=1).total == 0
+        assert len(index) == 0
+
+
+class TestSuggest:
+    """Test typeahead suggestions"""
+
+    def test_names_tags_and_queries(self, index):
+        """Test word-start matches over names, tags and recorded searches, most popular first"""
+        index.upsert(doc("data_sets", id=1, name="Daily Orders", tags=["orders-eu"]))
+        index.upsert(doc("data_sets", id=2, name="Orders Archive", status="ARCHIVED"))
+        index.upsert(doc("data_sources", id=3, name="Orders API"))
+        for i in range(3):
+            index.upsert(doc("data_sets", id=10 + i, name="Order book"))
+        index.record_query(1, "orders by region")
+
+        # Execute
+        suggestions = index.suggest("ord", user_id=1, org_id=1, resource_types=["data_sets"])
+
+        # Verify
+        assert [(s.text, s.kind) for s in suggestions] == [
+            ("Order book", "name"), ("orders-eu", "tag"), ("orders by region", "query"), ("Daily Orders", "name")
+        ]
+        assert suggestions[0].weight == 3
+
+    def test_access_and_incremental_updates(self, index):
+        """Test other orgs only contribute the user's own documents and edits show up at once"""
+        index.upsert(doc(id=1, org_id=1, owner_id=2, name="orders"))
+        index.upsert(doc(id=2, org_id=2, owner_id=1, name="order mine"))
+        index.upsert(doc(id=3, org_id=2, owner_id=2, name="order theirs"))
+        assert {s.text for s in index.suggest("or", user_id=1, org_id=1)} == {"orders", "order mine"}
+
+        # Execute
+        index.apply("data_sources", 1, {"name": "invoices"})
+
+        # Verify
+        assert {s.text for s in index.suggest("or", user_id=1, org_id=1)} == {"order mine"}
+        assert [s.text for s in index.suggest("inv", user_id=1, org_id=1)] == ["invoices"]
+
+    def test_recent_queries_expire(self, index, monkeypatch):
+        """Test only the last RECENT_QUERIES searches are suggested"""
+        monkeypatch.setattr("app.services.search_index.RECENT_QUERIES", 2)
+        for query in ("orders today", "orders today", "orders week"):
+            index.record_query(1, query)
+
+        # Verify
+        assert [(s.text, s.weight) for s in index.suggest("orders", user_id=1, org_id=1)] == [
+            ("orders week", 1), ("orders today", 1)
+        ]
+        assert index.suggest("orders", user_id=1, org_id=2) == []
+
+    def test_prefix_expansion_uses_vocabulary(self, index):
+        """Test unknown query terms expand to the most frequent indexed terms"""
+        index.upsert(doc(id=1, name="inventory"))
+        index.upsert(doc(id=2, name="inventory invoices"))
+
+        # Verify
+        assert index._shards[1].expand("inv") == [("inventory", 0.5), ("invoices", 0.5)]
+
+
+class TestDatabase:
+    """Test rebuilding and catching up from the database"""
+
+    def test_rebuild_and_refresh(self, index, engine):
+        """Test a rebuild loads every table and refresh picks up outside changes"""
+        insert_rows(engine, "data_sources", [{"id": 1, "name": "orders api", "org_id": 1, "owner_id": 1}])
+        insert_rows(engine, "projects", [{"id": 1, "name": "orders project", "org_id": 1, "owner_id": 1}])
+        insert_rows(engine, "flow_nodes", [{"id": 1, "name": "orders flow", "org_id": 1, "owner_id": 1}])
+
+        # Execute
+        index.rebuild(engine)
+
+        # Verify
+        assert index.ready
+        assert index.search("orders", user_id=1, org_id=1).resource_counts == {
+            "data_sources": 1, "projects": 1, "flows": 1
+        }
+
+        # Changes committed elsewhere
+        sources = Base.metadata.tables["data_sources"]
+        with engine.begin() as conn:
+            conn.execute(update(sources).where(sources.c.id == 1).values(
+                name="invoices api", updated_at=NOW + timedelta(minutes=1)
+            ))
+            conn.execute(delete(Base.metadata.tables["projects"]))
+            record_tombstones(conn, "projects", [1], org_id=1)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        index.refresh(engine)
+
+        assert index.search("invoices", user_id=1, org_id=1).total == 1
+        assert index.search("orders", user_id=1, org_id=1).resource_counts == {"flows": 1}
+        # One delta read per table and one tombstone read, rather than every id of every table
+        assert len(statements) == len(RESOURCES) + 1
+
+    def test_deleted_since(self, engine):
+        """Test tombstones are read from shortly before the last one seen"""
+        tombstones = Base.metadata.tables["search_tombstones"]
+        with engine.begin() as conn:
+            conn.execute(insert(tombstones), [
+                {"resource_type": "projects", "resource_id": 1, "deleted_at": NOW - timedelta(hours=1)},
+                {"resource_type": "projects", "resource_id": 2, "deleted_at": NOW - timedelta(minutes=2)},
+                {"resource_type": "data_sets", "resource_id": 3, "deleted_at": NOW},
+            ])
+
+        # Execute
+        with engine.connect() as conn:
+            everything = deleted_since(conn, None)
+            recent = deleted_since(conn, NOW)
+            data_sets = deleted_since(conn, NOW, ["data_sets"])
+
+        # Verify
+        assert everything == ([("projects", 1), ("projects", 2), ("data_sets", 3)], NOW)
+        assert recent == ([("projects", 2), ("data_sets", 3)], NOW)
+        assert data_sets == ([("data_sets", 3)], NOW)
+
+
+SessionBase = declarative_base()
+
+
+class IndexedSource(SessionBase):
+    """Stand-in mapped onto the data_sources table for exercising the commit hooks"""
+    __tablename__ = "data_sources"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255))
+    org_id = Column(Integer)
+    owner_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TestSessionHooks:
+    """Test incremental updates from ORM commits"""
+
+    @pytest.fixture
+    def session(self, index, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'hooks.db'}")
+        SessionBase.metadata.create_all(engine)
+        session = Session(engine)
+        index.install_session_hooks(session)
+        index.ready = True
+        yield session
+        session.close()
+        index.remove_session_hooks()
+        engine.dispose()
+
+    def test_commit_updates_index(self, index, session):
+        """Test inserts, updates and deletes are applied on commit"""
+        source = IndexedSource(name="orders feed", org_id=1, owner_id=1)
+        session.add(source)
+        session.commit()
+        assert index.search("orders", user_id=1, org_id=1).total == 1
+
+        # Update after commit expired the instance: only the changed column is loaded
+        source.name = "refunds feed"
+        session.commit()
+        assert index.search("orders", user_id=1, org_id=1).total == 0
+        assert index.search("refunds", user_id=1, org_id=1).total == 1
+
+        session.delete(source)
+        session.commit()
+        assert len(index) == 0
+
+    def test_rollback_discards_changes(self, index, session):
+        """Test flushed but rolled back changes never reach the index"""
+        session.add(IndexedSource(name="orders feed", org_id=1, owner_id=1))
+        session.flush()
+
+        # Execute
+        session.rollback()
+
+        # Verify
+        assert len(index) == 0
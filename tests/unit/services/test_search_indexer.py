@@ -0,0 +1,310 @@
+"""
+Tests for the incremental Elasticsearch indexer.
+Tests watermarks, keyset paging, bulk batching and retries, tombstones and the in-memory fake.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from elasticsearch import NotFoundError
+from sqlalchemy import Column, DateTime, Integer, String, create_engine, delete, func, insert, select, update
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.database import Base
+from app.services.elasticsearch_fake import InMemoryElasticsearch
+from app.services.search_indexer import (
+    ElasticsearchIndexer, TOMBSTONES, install_tombstone_hooks, record_tombstones, remove_tombstone_hooks
+)
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+TABLES = ("data_sources", "data_sinks", "data_sets", "flow_nodes", "projects", "search_tombstones")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'indexer.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def es():
+    return InMemoryElasticsearch()
+
+
+@pytest.fixture
+def indexer(es, engine):
+    return ElasticsearchIndexer(es, engine, index_prefix="test", batch_size=3, sleep=lambda seconds: None)
+
+
+def insert_sources(engine, count, start=1, updated_at=NOW):
+    with engine.begin() as conn:
+        conn.execute(insert(Base.metadata.tables["data_sources"]), [
+            {"id": i, "name": f"source {i}", "org_id": 1, "owner_id": 1, "created_at": NOW, "updated_at": updated_at}
+            for i in range(start, start + count)
+        ])
+
+
+def bulk_requests(es):
+    return [request for request in es.requests if request["method"] == "bulk"]
+
+
+class TestInMemoryElasticsearch:
+    """Test the fake behaves like the client API the indexer relies on"""
+
+    def test_bulk_and_search(self, es):
+        """Test bulk index/update/delete items and query matching"""
+        # Execute
+        response = es.bulk(operations=[
+            {"index": {"_index": "docs", "_id": "1"}}, {"name": "orders feed", "org_id": 1},
+            {"index": {"_index": "docs", "_id": "2"}}, {"name": "refunds", "org_id": 2},
+            {"update": {"_index": "docs", "_id": "2"}}, {"doc": {"org_id": 1}},
+            {"delete": {"_index": "docs", "_id": "3"}},
+        ])
+
+        # Verify
+        # Deleting a missing document is a 404 result, not an error
+        assert response["errors"] is False
+        assert [next(iter(item.values()))["status"] for item in response["items"]] == [201, 201, 200, 404]
+        assert es.count(index="docs", query={"term": {"org_id": 1}})["count"] == 2
+        hits = es.search(index="doc*", query={"bool": {"must": [{"match": {"name": "orders"}}]}})["hits"]
+        assert [hit["_id"] for hit in hits["hits"]] == ["1"]
+
+    def test_get_missing(self, es):
+        """Test missing documents raise unless 404 is ignored"""
+        with pytest.raises(NotFoundError):
+            es.get(index="docs", id="1")
+        assert es.options(ignore_status=404).get(index="docs", id="1")["found"] is False
+
+
+class TestSync:
+    """Test incremental extraction and delivery"""
+
+    def test_initial_sync_pages_and_watermarks(self, es, engine, indexer):
+        """Test every row is indexed page by page and the watermark ends on the last row"""
+        insert_sources(engine, 7)
+
+        # Execute
+        result = indexer.sync(["data_sources"])["data_sources"]
+
+        # Verify
+        assert (result.indexed, result.batches, result.complete) == (7, 3, True)
+        assert result.watermark == (NOW, 7)
+        assert indexer.get_watermark("data_sources") == (NOW, 7)
+        docs = es.documents("test_data_sources")
+        assert sorted(docs, key=int) == [str(i) for i in range(1, 8)]
+        assert docs["1"]["name"] == "source 1"
+
+    def test_only_changed_rows_are_sent(self, es, engine, indexer):
+        """Test a second sync sends nothing, then only rows updated after the watermark"""
+        insert_sources(engine, 5)
+        indexer.sync(["data_sources"])
+        assert indexer.sync(["data_sources"])["data_sources"].indexed == 0
+
+        sources = Base.metadata.tables["data_sources"]
+        with engine.begin() as conn:
+            conn.execute(update(sources).where(sources.c.id == 2).values(
+                name="renamed", updated_at=NOW + timedelta(minutes=1)
+            ))
+        insert_sources(engine, 1, start=6, updated_at=NOW + timedelta(minutes=2))
+
+        # Execute
+        result = indexer.sync(["data_sources"])["data_sources"]
+
+        # Verify
+        assert result.indexed == 2
+        assert result.watermark == (NOW + timedelta(minutes=2), 6)
+        assert es.documents("test_data_sources")["2"]["name"] == "renamed"
+
+    def test_rows_sharing_a_timestamp_are_not_skipped(self, es, engine, indexer):
+        """Test the id tie-breaker resumes mid-timestamp"""
+        insert_sources(engine, 3)
+        indexer.sync(["data_sources"])
+
+        # Same updated_at as the watermark, higher id
+        insert_sources(engine, 2, start=4)
+
+        # Execute
+        result = indexer.sync(["data_sources"])["data_sources"]
+
+        # Verify
+        assert result.indexed == 2
+        assert len(es.documents("test_data_sources")) == 5
+
+    def test_unsearchable_rows_become_deletes(self, es, engine, indexer):
+        """Test flow nodes that stop being origin nodes are removed"""
+        nodes = Base.metadata.tables["flow_nodes"]
+        with engine.begin() as conn:
+            conn.execute(insert(nodes), [
+                {"id": 1, "name": "flow", "org_id": 1, "owner_id": 1, "created_at": NOW, "updated_at": NOW},
+            ])
+        indexer.sync(["flows"])
+        with engine.begin() as conn:
+            conn.execute(update(nodes).values(is_deprecated=True, updated_at=NOW + timedelta(minutes=1)))
+
+        # Execute
+        result = indexer.sync(["flows"])["flows"]
+
+        # Verify
+        assert result.deleted == 1
+        assert es.documents("test_flows") == {}
+
+
+class TestBulkDelivery:
+    """Test batching and retries"""
+
+    def test_batches_bounded_by_actions_and_bytes(self, es, engine):
+        """Test bulk requests respect both the action and the payload limits"""
+        insert_sources(engine, 10)
+        indexer = ElasticsearchIndexer(es, engine, index_prefix="test", batch_size=100, max_actions=4)
+
+        # Execute
+        indexer.sync(["data_sources"])
+
+        # Verify
+        assert [request["actions"] for request in bulk_requests(es)] == [4, 4, 2]
+
+        es.requests.clear()
+        indexer.reset("data_sources")
+        indexer.max_actions, indexer.max_bytes = 100, 700
+        indexer.sync(["data_sources"])
+        requests = bulk_requests(es)
+        assert len(requests) > 1
+        assert sum(request["actions"] for request in requests) == 10
+        assert all(request["bytes"] <= 700 for request in requests)
+
+    def test_transport_errors_are_retried_with_backoff(self, es, engine):
+        """Test connection errors and 429 responses back off exponentially and then succeed"""
+        insert_sources(engine, 2)
+        delays = []
+        indexer = ElasticsearchIndexer(es, engine, index_prefix="test", backoff_seconds=1.0, sleep=delays.append)
+        indexer.ensure_indices()
+        es.fail_next_requests(1, method="bulk")
+        es.fail_next_requests(1, status=429, method="bulk")
+
+        # Execute
+        result = indexer.sync(["data_sources"])["data_sources"]
+
+        # Verify
+        assert result.indexed == 2
+        assert delays == [1.0, 2.0]
+
+    def test_only_failed_items_are_retried(self, es, engine, indexer):
+        """Test throttled items are resent alone and permanent item errors are counted, not retried"""
+        insert_sources(engine, 3)
+        indexer.ensure_indices()
+        es.fail_next_items([429, 400])
+
+        # Execute
+        result = indexer.sync(["data_sources"])["data_sources"]
+
+        # Verify
+        assert (result.indexed, result.failed, result.complete) == (2, 1, True)
+        assert [request["actions"] for request in bulk_requests(es)] == [3, 1]
+        assert result.watermark == (NOW, 3)
+
+    def test_exhausted_retries_keep_the_watermark(self, es, engine, indexer):
+        """Test a page that cannot be delivered is re-read by the next sync"""
+        insert_sources(engine, 5)
+        indexer.max_retries = 2
+        indexer.ensure_indices()
+        original_bulk = es.bulk
+        calls = {"count": 0}
+
+        def failing_after_first_page(**kwargs):
+            # The first page goes through, the second is rejected on every attempt
+            calls["count"] += 1
+            if calls["count"] > 1:
+                es.fail_next_requests(1, status=503, method="bulk")
+            return original_bulk(**kwargs)
+        es.bulk = failing_after_first_page
+
+        # Execute
+        result = indexer.sync(["data_sources"])["data_sources"]
+
+        # Verify
+        assert result.complete is False
+        assert result.watermark == (NOW, 3)
+        assert indexer.get_watermark("data_sources") == (NOW, 3)
+
+        es.bulk = original_bulk
+        retried = indexer.sync(["data_sources"])["data_sources"]
+        assert (retried.indexed, retried.complete) == (2, True)
+
+
+SessionBase = declarative_base()
+
+
+class DeletableSource(SessionBase):
+    """Stand-in mapped onto the data_sources table for exercising the tombstone hooks"""
+    __tablename__ = "data_sources"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255))
+    org_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TestTombstones:
+    """Test deletes reach Elasticsearch through tombstones"""
+
+    def test_orm_deletes_are_replayed(self, es, engine, indexer):
+        """Test flushing a delete writes a tombstone that removes the document"""
+        insert_sources(engine, 2)
+        indexer.sync(["data_sources"])
+        factory = sessionmaker(engine)
+        install_tombstone_hooks(factory)
+        try:
+            with factory() as session:
+                session.delete(session.get(DeletableSource, 1))
+                session.commit()
+        finally:
+            remove_tombstone_hooks()
+
+        # Execute
+        results = indexer.sync(["data_sources"])
+
+        # Verify
+        assert results[TOMBSTONES].deleted == 1
+        assert sorted(es.documents("test_data_sources")) == ["2"]
+
+    def test_rolled_back_deletes_leave_no_tombstone(self, engine):
+        """Test tombstones share the deleting transaction"""
+        insert_sources(engine, 1)
+        factory = sessionmaker(engine)
+        install_tombstone_hooks(factory)
+        try:
+            with factory() as session:
+                session.delete(session.get(DeletableSource, 1))
+                session.flush()
+                session.rollback()
+        finally:
+            remove_tombstone_hooks()
+
+        # Verify
+        with engine.connect() as conn:
+            assert conn.execute(select(func.count()).select_from(Base.metadata.tables["search_tombstones"])).scalar() == 0
+
+    def test_bulk_deletes_and_pruning(self, es, engine, indexer):
+        """Test recorded tombstones replay once, tolerate missing documents and are pruned after retention"""
+        insert_sources(engine, 3)
+        indexer.sync(["data_sources"])
+        with engine.begin() as conn:
+            conn.execute(delete(Base.metadata.tables["data_sources"]))
+            record_tombstones(conn, "data_sources", [1, 2, 3, 99])
+
+        # Execute
+        first = indexer.sync_tombstones()
+        second = indexer.sync_tombstones()
+
+        # Verify
+        assert first.deleted == 4
+        assert second.deleted == 0
+        assert es.documents("test_data_sources") == {}
+
+        indexer.tombstone_retention = timedelta(0)
+        tombstones = Base.metadata.tables["search_tombstones"]
+        with engine.begin() as conn:
+            conn.execute(update(tombstones).values(deleted_at=NOW))
+        assert indexer.prune_tombstones((NOW + timedelta(seconds=1), 0)) == 4
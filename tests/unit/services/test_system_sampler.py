@@ -0,0 +1,161 @@
+"""
+Tests for SystemSampler.
+Tests ring buffers, resolution rollups, pool sampling and downsampling.
+"""
+
+import asyncio
+import time
+import numpy as np
+import pytest
+from unittest.mock import Mock
+
+from app.services.system_sampler import (
+    RingBuffer,
+    SystemSampler,
+    FIELDS,
+    downsample
+)
+
+
+def field(name):
+    return FIELDS.index(name) + 1
+
+
+class TestRingBuffer:
+    """Test RingBuffer functionality"""
+
+    def test_wraps_and_keeps_time_order(self):
+        """Test the oldest rows are overwritten once full"""
+        buffer = RingBuffer(capacity=3, width=1)
+
+        for i in range(5):
+            buffer.append(float(i), np.array([i * 10.0]))
+
+        rows = buffer.snapshot()
+        assert rows[:, 0].tolist() == [2.0, 3.0, 4.0]
+        assert rows[:, 1].tolist() == [20.0, 30.0, 40.0]
+        assert buffer.latest()[1] == 40.0
+        assert len(buffer) == 3
+
+    def test_snapshot_since(self):
+        """Test snapshots can be limited to recent rows"""
+        buffer = RingBuffer(capacity=5, width=1)
+        for i in range(4):
+            buffer.append(float(i), np.array([1.0]))
+
+        assert buffer.snapshot(since=2.0)[:, 0].tolist() == [2.0, 3.0]
+
+    def test_empty_buffer(self):
+        """Test an empty buffer has no latest row"""
+        buffer = RingBuffer(capacity=2, width=1)
+
+        assert buffer.latest() is None
+        assert buffer.snapshot().shape == (0, 2)
+
+
+class TestSystemSampler:
+    """Test SystemSampler functionality"""
+
+    def test_sample_fills_every_resolution(self):
+        """Test coarse resolutions store the mean of each interval"""
+        sampler = SystemSampler(resolutions=((1, 100), (10, 10)))
+        sampler._readings = lambda: {name: (lambda t=t: t) for name, t in zip(FIELDS, range(len(FIELDS)))}
+
+        for second in range(25):
+            sampler.sample(timestamp=1000.0 + second)
+
+        fine = sampler._resolutions[0].buffer.snapshot()
+        coarse = sampler._resolutions[1].buffer.snapshot()
+        assert len(fine) == 25
+        assert coarse[:, 0].tolist() == [1000.0, 1010.0]
+        assert coarse[0, field("memory_percent")] == 1.0
+
+    def test_unavailable_sources_are_nan(self):
+        """Test failing readers do not break the sample"""
+        sampler = SystemSampler(resolutions=((1, 10),))
+
+        sampler.sample()
+
+        latest = sampler.latest()
+        assert latest["db_pool_size"] is None
+        assert latest["redis_pool_in_use"] is None
+        assert latest["memory_percent"] is not None
+
+    def test_pool_statistics(self):
+        """Test DB and Redis pool usage is sampled"""
+        sampler = SystemSampler(resolutions=((1, 10),))
+        engine = Mock()
+        engine.pool.size.return_value = 10
+        engine.pool.checkedout.return_value = 3
+        engine.pool.overflow.return_value = -7
+        pool = Mock(_in_use_connections={1, 2}, _available_connections=[3])
+        sampler.watch_db_engine(engine)
+        sampler.watch_redis_pool(pool)
+
+        sampler.sample()
+
+        latest = sampler.latest()
+        assert latest["db_pool_size"] == 10
+        assert latest["db_pool_checked_out"] == 3
+        assert latest["redis_pool_in_use"] == 2
+        assert latest["redis_pool_available"] == 1
+
+    def test_loop_lag_measured_from_thread(self):
+        """Test the probe callback records loop scheduling delay"""
+        sampler = SystemSampler(resolutions=((1, 10),))
+
+        async def run():
+            sampler._loop = asyncio.get_running_loop()
+            sampler._probe_loop()
+            time.sleep(0.05)  # hold the loop so the probe waits
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+
+        assert sampler._loop_lag_ms >= 50
+
+    def test_series_picks_covering_resolution(self):
+        """Test long windows are served from coarser buffers"""
+        sampler = SystemSampler(resolutions=((1, 60), (60, 60)))
+
+        step, rows = sampler.series(["cpu_percent"], 30)
+        assert step == 1
+        assert rows.shape[1] == 2
+
+        step, _ = sampler.series(["cpu_percent"], 3600)
+        assert step == 60
+
+    def test_series_rejects_unknown_fields(self):
+        """Test only sampled fields can be requested"""
+        with pytest.raises(ValueError):
+            SystemSampler(resolutions=((1, 10),)).series(["nope"], 60)
+
+    def test_start_and_stop(self):
+        """Test the sampler thread runs in the background"""
+        sampler = SystemSampler(resolutions=((1, 10),))
+
+        sampler.start()
+        time.sleep(0.05)
+        sampler.stop()
+
+        assert sampler.latest()["timestamp"] is not None
+
+
+class TestDownsample:
+    """Test downsample aggregation"""
+
+    def test_aggregations(self):
+        """Test points are grouped by step with the chosen reducer"""
+        timestamps = np.array([0.0, 1.0, 2.0, 10.0, 11.0])
+        values = np.array([1.0, 3.0, np.nan, 10.0, 20.0])
+
+        assert downsample(timestamps, values, 10, "avg") == [(0.0, 2.0), (10.0, 15.0)]
+        assert downsample(timestamps, values, 10, "max") == [(0.0, 3.0), (10.0, 20.0)]
+        assert downsample(timestamps, values, 10, "count") == [(0.0, 2.0), (10.0, 2.0)]
+
+    def test_all_missing_bucket(self):
+        """Test buckets without data produce no value"""
+        points = downsample(np.array([0.0, 1.0]), np.array([np.nan, np.nan]), 10, "avg")
+
+        assert points == [(0.0, None)]
+        assert downsample(np.array([]), np.array([]), 10, "avg") == []
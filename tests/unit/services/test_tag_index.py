@@ -0,0 +1,257 @@
+"""
+Tests for the normalized tag index.
+Tests tag parsing, write-time sync of assignments and counts, indexed filters, facets and rebuilds.
+"""
+
+import json
+from collections import Counter
+
+import pytest
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.database import Base
+from app.services.tag_index import (
+    _apply_count_deltas, facet_counts, install_tag_hooks, normalize_tags, rebuild_tag_index, remove_tag_hooks,
+    sync_tags, tag_counts, tag_filter, tag_search_filter
+)
+
+TABLES = ("data_sources", "data_sinks", "data_sets", "flow_nodes", "projects", "tag_assignments", "tag_counts")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tags.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def hooks(engine):
+    factory = sessionmaker(engine)
+    install_tag_hooks(factory)
+    yield factory
+    remove_tag_hooks()
+
+
+SessionBase = declarative_base()
+
+
+class TaggedFlow(SessionBase):
+    """Stand-in mapped onto the flow_nodes table (with its column defaults) for exercising the tag hooks"""
+    __table__ = Base.metadata.tables["flow_nodes"]
+
+
+def counts(engine, org_id, **kwargs):
+    with engine.connect() as conn:
+        return dict(tag_counts(conn, org_id, **kwargs))
+
+
+def assignments(engine):
+    table = Base.metadata.tables["tag_assignments"]
+    with engine.connect() as conn:
+        return sorted(conn.execute(select(table.c.resource_id, table.c.tag)).all())
+
+
+class TestNormalizeTags:
+    """Test tags are read from every shape the tags columns hold"""
+
+    def test_shapes(self):
+        """Test lists, JSON text and comma strings give stripped, de-duplicated tags"""
+        assert normalize_tags(["pii", " pii ", "", None, "eu"]) == ["pii", "eu"]
+        assert normalize_tags(json.dumps(["daily", "finance"])) == ["daily", "finance"]
+        assert normalize_tags("daily, finance") == ["daily", "finance"]
+        assert normalize_tags(None) == []
+        assert normalize_tags("x" * 150) == ["x" * 100]
+
+    def test_duplicates_ignore_case_and_accents(self):
+        """Test tags the case-insensitive tag columns would treat as one keep their first spelling"""
+        assert normalize_tags(["PII", "pii", "Pïi", "eu", "EU"]) == ["PII", "eu"]
+        assert normalize_tags("Straße, STRASSE") == ["Straße"]
+
+
+class TestSync:
+    """Test assignments and counts follow tag changes"""
+
+    def test_diff_updates_counts(self, engine):
+        """Test adds, removals, org moves and deletes adjust only what changed"""
+        with engine.begin() as conn:
+            sync_tags(conn, "flows", {1: (1, ["pii", "eu"]), 2: (1, ["pii"])})
+        assert counts(engine, 1) == {"pii": 2, "eu": 1}
+
+        # Execute
+        with engine.begin() as conn:
+            changed = sync_tags(conn, "flows", {1: (1, ["pii", "daily"]), 2: (2, ["pii"])})
+
+        # Verify
+        assert changed == 4
+        assert counts(engine, 1) == {"pii": 1, "daily": 1}
+        assert counts(engine, 2) == {"pii": 1}
+
+        with engine.begin() as conn:
+            sync_tags(conn, "flows", {1: (None, None), 2: (None, None)})
+        assert counts(engine, 1) == {} and counts(engine, 2) == {}
+        assert assignments(engine) == []
+
+    def test_counts_upserted(self, engine):
+        """Test count changes land in one upsert that increments rows another writer created"""
+        table = Base.metadata.tables["tag_counts"]
+        with engine.begin() as conn:
+            conn.execute(insert(table).values(org_id=1, resource_type="flows", tag="pii", count=3))
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with engine.begin() as conn:
+            sync_tags(conn, "flows", {1: (1, ["pii", "eu", "daily"]), 2: (1, ["pii"])})
+
+        # Verify
+        assert len(statements) == 3
+        assert "ON CONFLICT" in statements[2]
+        assert counts(engine, 1) == {"pii": 5, "eu": 1, "daily": 1}
+
+    def test_removals_batched(self, engine):
+        """Test removed tags of many resources go in one delete, and a case-only change swaps the spelling"""
+        with engine.begin() as conn:
+            sync_tags(conn, "flows", {1: (1, ["pii", "eu"]), 2: (1, ["pii", "daily"])})
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        # Execute
+        with engine.begin() as conn:
+            sync_tags(conn, "flows", {1: (1, ["PII"]), 2: (1, [])})
+
+        # Verify
+        assert sum(sql.startswith("DELETE FROM tag_assignments") for sql in statements) == 1
+        assert assignments(engine) == [(1, "PII")]
+        assert counts(engine, 1) == {"PII": 1}
+
+    def test_mysql_upsert(self):
+        """Test MySQL gets ON DUPLICATE KEY UPDATE"""
+        class RecordingConnection:
+            dialect = mysql.dialect()
+
+            def __init__(self):
+                self.sql = []
+
+            def execute(self, statement, parameters=None):
+                self.sql.append(str(statement.compile(dialect=self.dialect)))
+
+        conn = RecordingConnection()
+
+        # Execute
+        _apply_count_deltas(conn, "flows", Counter({(1, "pii"): 2, (1, "eu"): -1}))
+
+        # Verify
+        assert "ON DUPLICATE KEY UPDATE count = (tag_counts.count + VALUES(count))" in conn.sql[0]
+        assert conn.sql[1].startswith("DELETE FROM tag_counts")
+
+    def test_orm_writes_are_synced(self, engine, hooks):
+        """Test inserts, tag edits and deletes flushed through a session maintain the index"""
+        with hooks() as session:
+            session.add_all([
+                TaggedFlow(id=1, name="a", owner_id=1, org_id=1, tags=json.dumps(["pii", "eu"])),
+                TaggedFlow(id=2, name="b", owner_id=1, org_id=1, tags=json.dumps(["pii"]))
+            ])
+            session.commit()
+
+            # Execute
+            session.get(TaggedFlow, 1).tags = json.dumps(["eu"])
+            session.get(TaggedFlow, 2).name = "renamed"
+            session.commit()
+            session.delete(session.get(TaggedFlow, 2))
+            session.commit()
+
+        # Verify
+        assert assignments(engine) == [(1, "eu")]
+        assert counts(engine, 1) == {"eu": 1}
+
+    def test_case_variants_flush_once(self, engine, hooks):
+        """Test tags differing only in case write one assignment"""
+        with hooks() as session:
+            # Execute
+            session.add(TaggedFlow(id=1, name="a", owner_id=1, org_id=1, tags=json.dumps(["PII", "pii"])))
+            session.commit()
+
+        # Verify
+        assert assignments(engine) == [(1, "PII")]
+        assert counts(engine, 1) == {"PII": 1}
+
+    def test_rolled_back_writes_leave_no_assignments(self, engine, hooks):
+        """Test assignments share the writing transaction"""
+        with hooks() as session:
+            session.add(TaggedFlow(id=1, name="a", owner_id=1, org_id=1, tags=json.dumps(["pii"])))
+            session.flush()
+            session.rollback()
+
+        # Verify
+        assert assignments(engine) == []
+        assert counts(engine, 1) == {}
+
+
+class TestQueries:
+    """Test indexed filters and facet counts"""
+
+    @pytest.fixture
+    def tagged(self, engine):
+        flows = Base.metadata.tables["flow_nodes"]
+        rows = {1: ["pii", "eu"], 2: ["pii"], 3: ["eu"], 4: []}
+        with engine.begin() as conn:
+            conn.execute(insert(flows), [
+                {"id": flow_id, "name": f"flow {flow_id}", "owner_id": 1, "org_id": 1, "tags": json.dumps(tags)}
+                for flow_id, tags in rows.items()
+            ])
+            sync_tags(conn, "flows", {flow_id: (1, tags) for flow_id, tags in rows.items()})
+        return flows
+
+    def test_filter_requires_every_tag(self, engine, tagged):
+        """Test tag filters match resources carrying all requested tags"""
+        with engine.connect() as conn:
+            # Execute
+            one = conn.execute(select(tagged.c.id).where(tag_filter("flows", tagged.c.id, ["pii"]))).scalars().all()
+            both = conn.execute(select(tagged.c.id).where(tag_filter("flows", tagged.c.id, ["pii", "eu"]))).scalars().all()
+            other_type = conn.execute(select(tagged.c.id).where(tag_filter("data_sources", tagged.c.id, ["pii"]))).scalars().all()
+
+        # Verify
+        assert sorted(one) == [1, 2]
+        assert both == [1]
+        assert other_type == []
+
+    def test_search_matches_part_of_a_tag(self, engine, tagged):
+        """Test free-text search matches tags by substring, with LIKE wildcards taken literally"""
+        with engine.connect() as conn:
+            # Execute
+            part = conn.execute(select(tagged.c.id).where(tag_search_filter("flows", tagged.c.id, "i"))).scalars().all()
+            wildcard = conn.execute(select(tagged.c.id).where(tag_search_filter("flows", tagged.c.id, "%"))).scalars().all()
+
+        # Verify
+        assert sorted(part) == [1, 2]
+        assert wildcard == []
+
+    def test_counts_and_facets(self, engine, tagged):
+        """Test org counts rank and filter tags, facets count within a result set"""
+        assert counts(engine, 1) == {"pii": 2, "eu": 2}
+        assert counts(engine, 1, contains="P") == {"pii": 2}
+        assert list(counts(engine, 1, by_count=False)) == ["eu", "pii"]
+
+        with engine.connect() as conn:
+            # Execute
+            listed = facet_counts(conn, "flows", [2, 3, 4])
+            filtered = facet_counts(conn, "flows", select(tagged.c.id).where(tagged.c.id > 2))
+
+        # Verify
+        assert listed == [("eu", 1), ("pii", 1)]
+        assert filtered == [("eu", 1)]
+
+    def test_rebuild_matches_incremental(self, engine, tagged):
+        """Test a rebuild from the tags columns reproduces the maintained index"""
+        before = (assignments(engine), counts(engine, 1))
+
+        # Execute
+        written = rebuild_tag_index(engine, batch_size=2)
+
+        # Verify
+        assert written["flows"] == 4
+        assert (assignments(engine), counts(engine, 1)) == before
@@ -0,0 +1,205 @@
+"""
+Tests for tracing.
+Tests span nesting, traceparent propagation and the SQL, Redis, request and
+Celery instrumentation.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Router
+from starlette.testclient import TestClient
+
+import app.celery_app as celery_module
+from app.middleware import RequestPipelineMiddleware
+from app.services.tracing import (
+    Tracer,
+    FileSpanExporter,
+    instrument_sqlalchemy,
+    instrument_redis,
+    parse_traceparent
+)
+
+
+@pytest.fixture
+def tracer():
+    return Tracer(enabled=True)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.commands = []
+
+    def execute_command(self, *args, **options):
+        self.commands.append(args)
+        return "OK"
+
+    def pipeline(self):
+        return SimpleNamespace(command_stack=[("INCR", "a"), ("INCR", "b")], execute=lambda: [1, 2])
+
+
+class TestSpans:
+    """Test span creation and context"""
+
+    def test_nested_spans_share_trace(self, tracer):
+        """Test spans started inside a span become its children"""
+        with tracer.span("outer") as outer:
+            with tracer.span("inner") as inner:
+                assert tracer.current_span() is inner
+
+        assert tracer.current_span() is None
+        assert inner.trace_id == outer.trace_id
+        assert inner.parent_id == outer.span_id
+        assert [span.name for span in tracer.exporter.spans] == ["inner", "outer"]
+
+    def test_exception_marks_span(self, tracer):
+        """Test errors raised in a span are recorded"""
+        with pytest.raises(ValueError):
+            with tracer.span("work"):
+                raise ValueError("bad")
+
+        span = tracer.exporter.spans[0]
+        assert span.status == "error"
+        assert span.error == "ValueError: bad"
+
+    def test_disabled_tracer_records_nothing(self):
+        """Test a disabled tracer yields no spans"""
+        tracer = Tracer(enabled=False)
+
+        with tracer.span("work") as span:
+            assert span is None
+            assert tracer.start_child_span("db SELECT") is None
+
+        assert tracer.exporter.spans == []
+
+    def test_child_spans_need_active_span(self, tracer):
+        """Test client spans are skipped outside a trace"""
+        assert tracer.start_child_span("redis GET") is None
+
+    def test_traceparent_round_trip(self, tracer):
+        """Test injected headers parse back to the active span"""
+        headers = {}
+        with tracer.span("publish") as span:
+            tracer.inject(headers)
+
+        assert parse_traceparent(headers["traceparent"]) == span.context
+        assert parse_traceparent("00-xyz-abc-01") is None
+        assert parse_traceparent(None) is None
+
+    def test_file_exporter_writes_json_lines(self, tmp_path):
+        """Test spans are appended to the export file"""
+        path = tmp_path / "spans.jsonl"
+        tracer = Tracer(enabled=True, exporter=FileSpanExporter(str(path)))
+
+        with tracer.span("work", attributes={"flow_id": 7}):
+            pass
+        tracer.exporter.close()
+
+        record = json.loads(path.read_text().splitlines()[0])
+        assert record["name"] == "work"
+        assert record["attributes"] == {"flow_id": 7}
+        assert record["duration_ms"] >= 0
+
+
+class TestInstrumentation:
+    """Test SQL and Redis instrumentation"""
+
+    def test_sql_statements_traced(self, tracer):
+        """Test each statement becomes a child span"""
+        engine = create_engine("sqlite://")
+        instrument_sqlalchemy(engine, tracer)
+
+        with tracer.span("request") as request_span:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 2"))
+
+        db_spans = [span for span in tracer.exporter.spans if span.name.startswith("db ")]
+        assert len(db_spans) == 1
+        assert db_spans[0].name == "db SELECT"
+        assert db_spans[0].attributes["db.statement"] == "SELECT 1"
+        assert db_spans[0].parent_id == request_span.span_id
+
+    def test_sql_errors_traced(self, tracer):
+        """Test failing statements mark their span"""
+        engine = create_engine("sqlite://")
+        instrument_sqlalchemy(engine, tracer)
+
+        with tracer.span("request"):
+            with engine.connect() as conn:
+                with pytest.raises(Exception):
+                    conn.execute(text("SELECT * FROM missing_table"))
+
+        db_span = next(span for span in tracer.exporter.spans if span.name.startswith("db "))
+        assert db_span.status == "error"
+
+    def test_redis_commands_and_pipelines_traced(self, tracer):
+        """Test Redis commands and pipeline executions are traced"""
+        client = instrument_redis(FakeRedis(), tracer)
+
+        with tracer.span("request"):
+            client.execute_command("GET", "key")
+            client.pipeline().execute()
+
+        names = [span.name for span in tracer.exporter.spans]
+        assert names[:2] == ["redis GET", "redis PIPELINE"]
+        assert tracer.exporter.spans[1].attributes["db.redis.commands"] == 2
+        assert client.commands == [("GET", "key")]
+
+
+class TestRequestAndTaskTracing:
+    """Test trace propagation from requests into Celery tasks"""
+
+    def test_request_span_continues_incoming_trace(self, tracer):
+        """Test the pipeline span joins an upstream traceparent and uses the route template"""
+        async def flow_endpoint(request):
+            tracer.start_child_span("db SELECT").end()
+            return JSONResponse({})
+
+        pipeline = RequestPipelineMiddleware(
+            Router(routes=[Route("/flows/{flow_id}", flow_endpoint)]),
+            metrics=False, request_logging=False, audit_logging=False, rate_limiting=False, tracing=True
+        )
+        pipeline.tracer = tracer
+        client = TestClient(pipeline)
+        upstream = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+
+        # Execute
+        client.get("/flows/5", headers={"traceparent": upstream})
+
+        # Verify
+        db_span, server_span = tracer.exporter.spans
+        assert server_span.name == "GET /flows/{flow_id}"
+        assert server_span.trace_id == "a" * 32
+        assert server_span.parent_id == "b" * 16
+        assert server_span.attributes["http.status_code"] == 200
+        assert db_span.parent_id == server_span.span_id
+
+    def test_task_span_links_to_publisher(self, tracer, monkeypatch):
+        """Test Celery headers carry the trace into the task span"""
+        monkeypatch.setattr(celery_module, "tracer", tracer)
+        headers = {}
+        with tracer.span("POST /flows/{flow_id}/run") as request_span:
+            celery_module._inject_trace_context(headers=headers)
+        task = SimpleNamespace(name="flow.execute", request=SimpleNamespace(retries=0, **headers))
+
+        # Execute
+        celery_module._start_task_span(task_id="t-1", task=task)
+        with tracer.span("step"):
+            pass
+        celery_module._record_task_error(task_id="t-1", exception=RuntimeError("boom"))
+        celery_module._end_task_span(task_id="t-1", state="FAILURE")
+
+        # Verify
+        trace = tracer.exporter.get_trace(request_span.trace_id)
+        assert [span.name for span in trace] == ["POST /flows/{flow_id}/run", "celery flow.execute", "step"]
+        task_span = trace[1]
+        assert task_span.parent_id == request_span.span_id
+        assert task_span.status == "error"
+        assert task_span.attributes["celery.state"] == "FAILURE"
+        assert trace[2].parent_id == task_span.span_id
+        assert tracer.current_span() is None